@@ -1,15 +1,28 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response, stream_with_context
 from flask_cors import CORS
 from controllers.emission_controller import EmissionController
+from models.model_registry import ModelRegistry
 import logging
 import time
 import os
 import traceback
-from flask_limiter import Limiter
-from flask_limiter.util import get_remote_address
 import threading
 import json
-from functools import lru_cache
+import hmac
+import itertools
+import gzip
+import zlib
+from utils.serving import (
+    NOT_JSON_RESPONSE, RequestValidationError, create_prediction_batcher, create_prediction_cache,
+    is_json_mimetype, validate_request
+)
+from utils.rate_limiter import TokenBucketLimiter, default_state_path
+from utils.metrics import MetricsRegistry
+from utils.ndjson_stream import LineTooLongError, iter_lines, score_ndjson
+from utils.batch_formats import (
+    BatchFormatError, UnsupportedFormatError, available_formats, decode_batch,
+    encode_predictions, format_from_content_type, maybe_gzip
+)
 
 # Cấu hình logging - Thiết lập hệ thống ghi log để theo dõi hoạt động của server
 logging.basicConfig(
@@ -21,55 +34,128 @@ logger = logging.getLogger(__name__)  # Tạo đối tượng logger cho module
 app = Flask(__name__)  # Khởi tạo ứng dụng Flask
 CORS(app)  # Cho phép truy cập API từ các nguồn khác nhau (Cross-Origin Resource Sharing)
 
-# Giảm rate limiting để cho phép nhiều request hơn - Cơ chế hạn chế số lượng request trong một khoảng thời gian
-limiter = Limiter(
-    get_remote_address,  # Sử dụng IP của client để theo dõi và giới hạn request
-    app=app,
-    default_limits=["200 per minute", "20 per second"],  # Giới hạn mặc định: 200 request/phút, 20 request/giây
-    storage_uri="memory://",  # Lưu trữ thông tin giới hạn trong bộ nhớ
-    strategy="fixed-window"  # Sử dụng chiến lược cửa sổ cố định để giới hạn
-)
-
 # Các biến toàn cục để quản lý trạng thái của server và mô hình
-controller = None  # Đối tượng controller chính để xử lý dự đoán
-model_initialized = False  # Cờ đánh dấu mô hình đã được khởi tạo hay chưa
-initialization_in_progress = False  # Cờ đánh dấu quá trình khởi tạo đang diễn ra
-prediction_lock = threading.RLock()  # Khóa đồng bộ hóa cho các thao tác dự đoán
+# Ảnh chụp bất biến của mô hình đang phục vụ: request chỉ đọc tham chiếu này (không cần khóa),
+# tải lại mô hình là gán tham chiếu mới (phép gán là nguyên tử) nên request đang chạy
+# vẫn hoàn tất trên ảnh chụp cũ mà nó đã đọc
+current_snapshot = None
+initialization_lock = threading.Lock()  # Đảm bảo chỉ một thread khởi tạo mô hình
+reload_lock = threading.Lock()  # Đảm bảo chỉ một lần tải lại mô hình chạy tại một thời điểm
+reload_status = {'state': 'idle'}  # Trạng thái lần tải lại gần nhất
+# Ảnh chụp đã tải theo phiên bản kho: phiên bản đang phục vụ, phiên bản trước (quay lui tức thì)
+# và phiên bản next đã tải trước. Chỉ thread giữ registry_lock được thay dictionary này
+loaded_snapshots = {}
+registry_lock = threading.Lock()  # Đảm bảo chỉ một lần đồng bộ với kho chạy tại một thời điểm
+registry_status = {'state': 'idle'}  # Lần chuyển phiên bản kho gần nhất
+registry_thread = None  # Thread theo dõi con trỏ kho của process hiện tại
+
+# Trạng thái sẵn sàng của process hiện tại: chỉ 'ready' sau khi đã làm nóng các đường phục vụ.
+# Gắn với pid vì mỗi worker gunicorn phải tự làm nóng sau khi fork
+readiness = {'state': 'starting'}
+init_thread = None  # Thread nền khởi tạo mô hình của process hiện tại
+init_thread_lock = threading.Lock()
+first_prediction_logged = False  # Đã ghi log độ trễ của request dự đoán đầu tiên hay chưa
+
+# Ghi log một trên N request dự đoán không trúng cache (0 = tắt)
+PREDICTION_LOG_EVERY = int(os.environ.get('PREDICTION_LOG_EVERY', 10))
+logged_request_counter = itertools.count(1)  # next() trên itertools.count là nguyên tử trong CPython
+
+# Metric của đường /predict, xuất tại /metrics (mỗi worker có bộ metric riêng)
+metrics = MetricsRegistry()
+PREDICT_STAGES = ('parse', 'validation', 'cache_lookup', 'inference', 'serialization')
+stage_histograms = {
+    stage: metrics.histogram('predict_stage_seconds', 'Time spent in each /predict stage', {'stage': stage})
+    for stage in PREDICT_STAGES
+}
+request_histogram = metrics.histogram('predict_request_seconds', 'End-to-end /predict handler time')
+cache_hits = metrics.counter('predict_cache_hits_total', 'Prediction cache hits')
+cache_misses = metrics.counter('predict_cache_misses_total', 'Prediction cache misses')
+fallback_counters = {
+    reason: metrics.counter('predict_fallbacks_total', 'Responses served with the fallback value', {'reason': reason})
+    for reason in ('not_ready', 'missing_fields', 'invalid_values', 'prediction_error')
+}
+stream_rows = metrics.counter('predict_stream_rows_total', 'Rows scored through /predict/stream')
+request_errors = metrics.counter('predict_errors_total', 'Unexpected errors in /predict')
+requests_in_flight = metrics.gauge('predict_requests_in_flight', '/predict requests currently being handled')
+
+# Token bảo vệ các endpoint quản trị (/admin/*) - không đặt thì các endpoint này bị tắt
+ADMIN_TOKEN = os.environ.get('ADMIN_TOKEN')
+
+# Kho phiên bản mô hình (tùy chọn): khi đặt MODEL_REGISTRY_DIR, worker phục vụ phiên bản của con trỏ
+# current và theo dõi các con trỏ để tải trước phiên bản next / chuyển phiên bản mà không cần khởi động lại
+MODEL_REGISTRY_DIR = os.environ.get('MODEL_REGISTRY_DIR')
+REGISTRY_POLL_SECONDS = float(os.environ.get('REGISTRY_POLL_SECONDS', 2))  # Chu kỳ đọc con trỏ (giây)
+model_registry = ModelRegistry(MODEL_REGISTRY_DIR) if MODEL_REGISTRY_DIR else None
+
+# Đường dẫn tuyệt đối đến file dữ liệu
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "co2 Emissions.csv")
+
+# Cache LRU dùng chung cho kết quả dự đoán (cấu hình PREDICTION_CACHE_* trong utils/serving.py)
+prediction_cache = create_prediction_cache()
+
+# Số bản ghi tối đa trong một request dự đoán theo lô
+MAX_BATCH_SIZE = int(os.environ.get('MAX_BATCH_SIZE', 50000))
+
+# Số dòng mỗi lô dự đoán của /predict/stream (bộ nhớ tỉ lệ với giá trị này, không với kích thước luồng)
+STREAM_CHUNK_ROWS = int(os.environ.get('STREAM_CHUNK_ROWS', 4096))
+STREAM_MAX_LINE_BYTES = int(os.environ.get('STREAM_MAX_LINE_BYTES', 1 << 20))  # Dòng dài hơn bị từ chối (413)
+
+# Nén gzip response theo lô khi client gửi Accept-Encoding: gzip
+GZIP_MIN_BYTES = int(os.environ.get('GZIP_MIN_BYTES', 1024))  # Chỉ nén response lớn hơn ngưỡng này
+GZIP_LEVEL = int(os.environ.get('GZIP_LEVEL', 5))  # Mức nén 1 (nhanh) - 9 (nhỏ nhất)
+
+# Giới hạn tốc độ theo IP client bằng token bucket. Trạng thái nằm trong file memory-map dùng chung,
+# nên mọi worker gunicorn (kể cả các worker fork từ master) cùng trừ vào một bucket cho mỗi client
+RATE_LIMIT_FILE = os.environ.get('RATE_LIMIT_FILE') or default_state_path(f"co2-ratelimit-{os.environ.get('PORT', '10000')}")
+RATE_LIMIT_SLOTS = int(os.environ.get('RATE_LIMIT_SLOTS', 65536))  # Số cặp quy tắc/client theo dõi đồng thời
+RATE_LIMIT_BATCH_ROWS = float(os.environ.get('RATE_LIMIT_BATCH_ROWS', 100000))  # Số hàng/giây của /predict/batch
+limiter = TokenBucketLimiter(
+    RATE_LIMIT_FILE, slots=RATE_LIMIT_SLOTS,
+    # Cho phép tắt rate limiting (ví dụ khi chạy benchmark tải)
+    enabled=os.environ.get('RATELIMIT_ENABLED', 'true').lower() == 'true'
+)
+limiter.add_rule('default', rate=200 / 60, burst=20)  # 200 request/phút, tối đa 20 request liên tiếp
+limiter.add_rule('predict', rate=100, burst=100)  # 100 request/giây cho /predict
+# /predict/batch trả theo số hàng: một lô tối đa MAX_BATCH_SIZE hàng luôn vừa một bucket đầy
+limiter.add_rule('batch_rows', rate=RATE_LIMIT_BATCH_ROWS, burst=max(RATE_LIMIT_BATCH_ROWS, MAX_BATCH_SIZE))
+limiter.add_rule('stream', rate=10, burst=10)  # Mỗi luồng có thể chứa hàng triệu dòng
+rate_limited = metrics.counter('rate_limited_total', 'Requests rejected by the rate limiter')
 
-# Cache đơn giản cho kết quả dự đoán - Giúp giảm thời gian xử lý cho các request lặp lại
-prediction_cache = {}
-MAX_CACHE_SIZE = 500  # Kích thước tối đa của cache - 500 kết quả
+# Thời gian chờ kết quả của bộ gom lô (cửa sổ và kích thước lô cấu hình trong utils/serving.py)
+BATCH_RESULT_TIMEOUT = float(os.environ.get('BATCH_RESULT_TIMEOUT', 30))  # Thời gian chờ kết quả tối đa (giây)
 
-# Chuẩn bị cache function với lru_cache - Decorator để tự động lưu cache kết quả trả về
-@lru_cache(maxsize=1000)
-def cached_predict(engine_size, cylinders, fuel_consumption, horsepower, weight, year):
+def check_rate_limit(rule, cost=1):
     """
-    Hàm dự đoán có lưu cache - Sử dụng lru_cache để tối ưu hóa hiệu năng
-    
-    Lưu kết quả dự đoán dựa trên các tham số đầu vào, giúp trả về kết quả ngay lập tức
-    nếu cùng một bộ tham số được sử dụng lại.
+    Trừ cost token khỏi bucket (rule, IP client) của request hiện tại
     
     Parameters:
-        engine_size: Kích thước động cơ (L)
-        cylinders: Số xi-lanh
-        fuel_consumption: Mức tiêu thụ nhiên liệu (L/100km)
-        horsepower: Công suất động cơ
-        weight: Trọng lượng xe (kg)
-        year: Năm sản xuất
+        rule: Tên quy tắc đã khai báo với limiter
+        cost: Chi phí của request (số hàng với /predict/batch)
         
     Returns:
-        float: Giá trị dự đoán lượng khí thải CO2 (g/km)
-    """
-    features = {
-        'Engine Size(L)': float(engine_size),
-        'Cylinders': int(cylinders),
-        'Fuel Consumption Comb (L/100 km)': float(fuel_consumption),
-        'Horsepower': float(horsepower),
-        'Weight (kg)': float(weight),
-        'Year': int(year)
-    }
-    global controller
-    return float(controller.predict_emission(features))
+        Response lỗi 429 (JSON, mã trạng thái, header Retry-After) nếu vượt giới hạn, None nếu được phép
+    """
+    allowed, retry_after = limiter.consume(rule, request.remote_addr, cost)
+    if allowed:
+        return None
+    rate_limited.inc()
+    return jsonify({
+        'status': 'error',
+        'message': f'Rate limit exceeded, retry in {retry_after:.2f} s'
+    }), 429, {'Retry-After': str(max(1, int(retry_after + 0.999)))}
+
+@app.before_request
+def enforce_rate_limit():
+    """Áp dụng quy tắc giới hạn tốc độ của view (mặc định 'default', view miễn trừ thì bỏ qua)"""
+    view = app.view_functions.get(request.endpoint)
+    rule = getattr(view, 'rate_limit_rule', 'default')
+    if rule is None:
+        return None
+    return check_rate_limit(rule)
+
+# Bộ gom lô thay cho khóa toàn cục: khi không có tranh chấp, thread gọi chấm điểm trực tiếp;
+# khi có tranh chấp, các thread gửi hàng đặc trưng vào hàng đợi và chờ kết quả của lô
+prediction_batcher = create_prediction_batcher()
 
 def initialize_model():
     """
@@ -77,92 +163,422 @@ def initialize_model():
     
     Đảm bảo mô hình chỉ được khởi tạo một lần duy nhất, tránh khởi tạo lại
     khi có nhiều request đồng thời. Hàm kiểm tra và xử lý các trường hợp:
-    - Đang trong quá trình khởi tạo
+    - Đang trong quá trình khởi tạo (một thread khác đang giữ khóa khởi tạo)
     - Mô hình đã được khởi tạo
     - Cần khởi tạo mô hình mới
     
     Returns:
         bool: True nếu mô hình đã khởi tạo thành công, False nếu có lỗi
     """
-    global controller, model_initialized, initialization_in_progress
+    global current_snapshot
+    
+    if current_snapshot is not None:
+        return True
     
     # Kiểm tra xem quá trình khởi tạo đã đang diễn ra hay chưa
-    if initialization_in_progress:
+    if not initialization_lock.acquire(blocking=False):
         logger.info("Model initialization already in progress, waiting...")
         return False
         
-    if not model_initialized:
-        try:
-            initialization_in_progress = True  # Đánh dấu bắt đầu quá trình khởi tạo
-            logger.info("Starting model initialization...")
-            start_time = time.perf_counter()  # Bắt đầu đo thời gian
-            
-            controller = EmissionController()  # Tạo đối tượng controller mới
-            # Sử dụng đường dẫn tuyệt đối đến file dữ liệu
-            current_dir = os.path.dirname(os.path.abspath(__file__))
-            csv_path = os.path.join(current_dir, "co2 Emissions.csv")
-            
-            # Kiểm tra sự tồn tại của file dữ liệu
-            if not os.path.exists(csv_path):
-                logger.error(f"Could not find the file: {csv_path}")
-                initialization_in_progress = False
-                return False
-                
-            # Khởi tạo mô hình với dữ liệu từ file
-            test_score = controller.initialize_model(csv_path)
-            initialization_time = time.perf_counter() - start_time
-            logger.info(f"Model initialized with test score: {test_score:.3f} in {initialization_time:.2f} seconds")
-            
-            # Đánh dấu hoàn thành khởi tạo
-            model_initialized = True
-            initialization_in_progress = False
+    try:
+        if current_snapshot is not None:
             return True
-        except Exception as e:
-            logger.error(f"Error initializing model: {str(e)}")
-            logger.error(traceback.format_exc())
-            initialization_in_progress = False
+        
+        logger.info("Starting model initialization...")
+        start_time = time.perf_counter()  # Bắt đầu đo thời gian
+        
+        # Kiểm tra sự tồn tại của file dữ liệu
+        if not os.path.exists(DATA_PATH):
+            logger.error(f"Could not find the file: {DATA_PATH}")
             return False
-    return True
+            
+        registry_version = model_registry.current_version() if model_registry else None
+        if registry_version:
+            # Phục vụ phiên bản mà con trỏ current của kho chỉ định (không huấn luyện)
+            snapshot, warmup_ms = load_registry_snapshot(registry_version)
+            test_score = snapshot.test_score or 0.0
+            loaded_snapshots[registry_version] = snapshot
+        else:
+            # Khởi tạo mô hình với dữ liệu từ file và đóng gói thành ảnh chụp bất biến
+            controller = EmissionController()
+            test_score = controller.initialize_model(DATA_PATH)
+            snapshot = controller.build_snapshot()
+            warmup_ms = snapshot.warm_up()
+        
+        current_snapshot = snapshot  # Công bố ảnh chụp cho các request
+        initialization_time = time.perf_counter() - start_time
+        logger.info(f"Model initialized with test score: {test_score:.3f} in {initialization_time:.2f} seconds "
+                    f"(warm-up {warmup_ms:.1f} ms, version {snapshot.version})")
+        return True
+    except Exception as e:
+        logger.error(f"Error initializing model: {str(e)}")
+        logger.error(traceback.format_exc())
+        return False
+    finally:
+        initialization_lock.release()
 
-# Middleware để khởi tạo mô hình trước khi xử lý request
-@app.before_request
-def setup():
+def warm_up_serving(snapshot, n_rows=16):
     """
-    Khởi tạo mô hình trước khi xử lý các request
+    Làm nóng các đường phục vụ của process hiện tại bằng một lô dữ liệu tổng hợp
     
-    Được gọi tự động trước mỗi request đến server.
-    Đảm bảo mô hình đã sẵn sàng trước khi xử lý các yêu cầu dự đoán.
+    Gửi đồng thời các hàng qua bộ gom lô (khởi động thread nền của bộ gom lô trong
+    worker) rồi ghi/đọc kết quả qua cache dự đoán, giống đường xử lý của /predict.
+    
+    Parameters:
+        snapshot: Ảnh chụp mô hình cần làm nóng
+        n_rows: Số bản ghi tổng hợp
+        
+    Returns:
+        float: Thời gian làm nóng (ms)
     """
-    global model_initialized
-    if not model_initialized:
+    start_time = time.perf_counter()
+    value_rows = [snapshot.feature_values(record) for record in snapshot.synthetic_records(n_rows)]
+    futures = [prediction_batcher.submit((snapshot, list(values))) for values in value_rows]
+    for values, future in zip(value_rows, futures):
+        cache_key = prediction_cache.key_for(snapshot, values)
+        prediction_cache.put(cache_key, float(future.result(timeout=BATCH_RESULT_TIMEOUT)))
+        if prediction_cache.get(cache_key) is None:
+            raise RuntimeError("Prediction cache did not return a warm-up entry")
+    return (time.perf_counter() - start_time) * 1000
+
+def prepare_serving():
+    """
+    Khởi tạo mô hình (nếu chưa có) và làm nóng, sau đó đánh dấu process sẵn sàng
+    
+    Chạy trong thread nền khi worker khởi động. Với gunicorn preload, mô hình đã được
+    tải trong master nên worker chỉ cần làm nóng các đường phục vụ của riêng nó.
+    """
+    global readiness
+    
+    start_time = time.perf_counter()
+    try:
         if not initialize_model():
-            logger.error("Failed to initialize model")
+            readiness = {'state': 'failed', 'pid': os.getpid(), 'message': 'Model initialization failed'}
+            return
+        
+        warmup_ms = warm_up_serving(current_snapshot)
+        time_to_ready_ms = (time.perf_counter() - start_time) * 1000
+        readiness = {
+            'state': 'ready',
+            'pid': os.getpid(),
+            'model_version': current_snapshot.version,
+            'ready_at': time.time(),
+            'time_to_ready_ms': time_to_ready_ms,
+            'warmup_ms': warmup_ms
+        }
+        logger.info(f"Worker {os.getpid()} ready in {time_to_ready_ms:.1f} ms "
+                    f"(serving warm-up {warmup_ms:.1f} ms)")
+        start_registry_watcher()
+    except Exception as e:
+        logger.error(f"Error preparing worker for serving: {str(e)}")
+        logger.error(traceback.format_exc())
+        readiness = {'state': 'failed', 'pid': os.getpid(), 'message': str(e)}
+
+def is_ready():
+    """Process hiện tại đã làm nóng xong và sẵn sàng nhận traffic hay chưa"""
+    return readiness.get('pid') == os.getpid() and readiness['state'] == 'ready'
+
+def start_background_initialization():
+    """
+    Bắt đầu khởi tạo và làm nóng trong thread nền (không chặn request)
+    
+    An toàn khi gọi nhiều lần: không làm gì nếu process đã sẵn sàng hoặc thread
+    khởi tạo đang chạy. Thread không tồn tại qua fork nên mỗi worker tự khởi động.
+    
+    Returns:
+        bool: True nếu một thread khởi tạo mới được khởi động
+    """
+    global init_thread, readiness
+    
+    if is_ready():
+        return False
+    with init_thread_lock:
+        if is_ready() or (init_thread is not None and init_thread.is_alive()
+                          and readiness.get('pid') == os.getpid()):
+            return False
+        readiness = {'state': 'initializing', 'pid': os.getpid(), 'started_at': time.time()}
+        init_thread = threading.Thread(target=prepare_serving, name='model-init', daemon=True)
+        init_thread.start()
+        return True
 
-def get_cache_key(data):
+def reload_model(model_path=None, scaler_path=None):
     """
-    Tạo khóa cache từ dữ liệu đầu vào
+    Tải lại mô hình không gián đoạn (zero-downtime)
     
-    Chuyển đổi dữ liệu đầu vào thành chuỗi khóa duy nhất để lưu và truy xuất trong cache.
+    Tải artifact joblib mới vào một ảnh chụp riêng, làm nóng ảnh chụp đó rồi thay
+    tham chiếu current_snapshot một cách nguyên tử. Request đang chạy tiếp tục trên
+    ảnh chụp cũ; cache không trả kết quả cũ vì khóa cache gắn với phiên bản mô hình.
     
     Parameters:
-        data: Dictionary chứa các thông số của xe
+        model_path: Đường dẫn file mô hình (mặc định: đường dẫn chuẩn của EmissionModel)
+        scaler_path: Đường dẫn file bộ chuẩn hóa (mặc định: đường dẫn chuẩn của EmissionModel)
         
     Returns:
-        str: Chuỗi khóa duy nhất đại diện cho bộ thông số, hoặc None nếu có lỗi
+        dict: Trạng thái tải lại gồm phiên bản mới/cũ và thời gian từng giai đoạn
     """
+    global current_snapshot, reload_status
+    
+    started_at = time.time()
+    reload_status = {'state': 'loading', 'started_at': started_at}
+    start_time = time.perf_counter()
     try:
-        key_parts = []
-        for field in ['Engine Size(L)', 'Cylinders', 'Fuel Consumption Comb (L/100 km)', 
-                     'Horsepower', 'Weight (kg)', 'Year']:
-            if field in data:
-                key_parts.append(f"{field}:{data[field]}")
-        return "|".join(key_parts)
-    except:
-        # Xử lý dự phòng trong trường hợp có lỗi
-        return None
+        controller = EmissionController(model_path, scaler_path)
+        controller.load_trained_model(DATA_PATH)
+        snapshot = controller.build_snapshot()
+        load_ms = (time.perf_counter() - start_time) * 1000
+        
+        warmup_ms = snapshot.warm_up()
+        
+        previous_snapshot = current_snapshot
+        current_snapshot = snapshot  # Thay tham chiếu nguyên tử
+        
+        status = {
+            'state': 'completed',
+            'started_at': started_at,
+            'version': snapshot.version,
+            'previous_version': previous_snapshot.version if previous_snapshot else None,
+            'load_ms': load_ms,
+            'warmup_ms': warmup_ms,
+            'total_ms': (time.perf_counter() - start_time) * 1000
+        }
+        logger.info(f"Model reloaded: {status['previous_version']} -> {status['version']} "
+                    f"(load {load_ms:.1f} ms, warm-up {warmup_ms:.1f} ms)")
+    except Exception as e:
+        logger.error(f"Error reloading model: {str(e)}")
+        logger.error(traceback.format_exc())
+        status = {
+            'state': 'failed',
+            'started_at': started_at,
+            'error': str(e),
+            'total_ms': (time.perf_counter() - start_time) * 1000
+        }
+    
+    reload_status = status
+    return status
+
+def load_registry_snapshot(version):
+    """
+    Tải và làm nóng ảnh chụp của một phiên bản trong kho (không thay ảnh chụp đang phục vụ)
+    
+    Parameters:
+        version: Mã phiên bản (hash nội dung) trong kho
+        
+    Returns:
+        tuple: (ảnh chụp, thời gian làm nóng ms)
+    """
+    model_path, scaler_path = model_registry.artifact_paths(version)
+    controller = EmissionController(model_path, scaler_path)
+    controller.model.export_flat_forest = False  # Thư mục phiên bản là bất biến: không bao giờ ghi rừng vào đó
+    controller.load_trained_model(DATA_PATH)
+    controller.model.model_version = version  # Hash nội dung là phiên bản (không gian tên của cache)
+    snapshot = controller.build_snapshot()
+    return snapshot, snapshot.warm_up()
+
+def switch_to_version(version):
+    """
+    Chuyển ảnh chụp đang phục vụ sang một phiên bản trong kho (gọi khi đang giữ registry_lock)
+    
+    Phiên bản đã tải trước (hoặc phiên bản vừa phục vụ trước đó) được chuyển ngay bằng một
+    phép gán tham chiếu; phiên bản chưa tải thì được tải và làm nóng trước khi chuyển.
+    
+    Parameters:
+        version: Mã phiên bản cần phục vụ
+        
+    Returns:
+        dict: Trạng thái chuyển phiên bản gồm thời gian chuyển (switch_ms)
+    """
+    global current_snapshot, loaded_snapshots, registry_status
+    
+    start_time = time.perf_counter()
+    snapshot = loaded_snapshots.get(version)
+    preloaded = snapshot is not None
+    if snapshot is None:
+        snapshot, _ = load_registry_snapshot(version)
+    previous_snapshot = current_snapshot
+    current_snapshot = snapshot  # Thay tham chiếu nguyên tử
+    switch_ms = (time.perf_counter() - start_time) * 1000
+    
+    # Chỉ giữ phiên bản đang phục vụ, phiên bản trước và phiên bản next đã tải trước
+    upcoming = model_registry.next_version()
+    keep = {version: snapshot}
+    if previous_snapshot is not None:
+        keep[previous_snapshot.version] = previous_snapshot
+    if upcoming in loaded_snapshots:
+        keep[upcoming] = loaded_snapshots[upcoming]
+    loaded_snapshots = keep
+    
+    registry_status = {
+        'state': 'switched',
+        'version': version,
+        'previous_version': previous_snapshot.version if previous_snapshot else None,
+        'preloaded': preloaded,
+        'switch_ms': switch_ms,
+        'switched_at': time.time()
+    }
+    logger.info(f"Switched model version {registry_status['previous_version']} -> {version} "
+                f"in {switch_ms:.2f} ms ({'preloaded' if preloaded else 'cold load'})")
+    return registry_status
+
+def sync_with_registry():
+    """
+    Đồng bộ process hiện tại với các con trỏ của kho
+    
+    Chuyển sang phiên bản của con trỏ current nếu khác phiên bản đang phục vụ, rồi tải
+    trước và làm nóng phiên bản của con trỏ next để lần kích hoạt sau chỉ là thay tham chiếu.
+    
+    Returns:
+        dict: Trạng thái chuyển phiên bản gần nhất
+    """
+    global registry_status
+    
+    with registry_lock:
+        current = model_registry.current_version()
+        if current and (current_snapshot is None or current_snapshot.version != current):
+            switch_to_version(current)
+        
+        upcoming = model_registry.next_version()
+        if upcoming and upcoming not in loaded_snapshots and model_registry.has_version(upcoming):
+            start_time = time.perf_counter()
+            loaded_snapshots[upcoming], _ = load_registry_snapshot(upcoming)
+            preload_ms = (time.perf_counter() - start_time) * 1000
+            registry_status = {**registry_status, 'preloaded_version': upcoming, 'preload_ms': preload_ms}
+            logger.info(f"Preloaded model version {upcoming} in {preload_ms:.1f} ms")
+    return registry_status
+
+def watch_registry():
+    """Vòng lặp của thread nền: đọc các con trỏ của kho theo chu kỳ REGISTRY_POLL_SECONDS"""
+    while True:
+        time.sleep(REGISTRY_POLL_SECONDS)
+        try:
+            sync_with_registry()
+        except Exception as e:
+            logger.error(f"Error syncing with model registry: {str(e)}")
+            logger.error(traceback.format_exc())
+
+def start_registry_watcher():
+    """
+    Khởi động thread theo dõi kho của process hiện tại (nếu kho được bật)
+    
+    Mỗi worker gunicorn tự theo dõi con trỏ, nên kích hoạt một phiên bản trong kho
+    áp dụng cho mọi worker (khác với /admin/reload chỉ áp dụng cho worker nhận request).
+    
+    Returns:
+        bool: True nếu một thread theo dõi mới được khởi động
+    """
+    global registry_thread
+    
+    if model_registry is None or (registry_thread is not None and registry_thread.is_alive()):
+        return False
+    registry_thread = threading.Thread(target=watch_registry, name='model-registry', daemon=True)
+    registry_thread.start()
+    return True
+
+def process_prediction_request(start_time):
+    """
+    Xử lý một request /predict qua các giai đoạn, ghi thời gian từng giai đoạn vào histogram
+    
+    Parameters:
+        start_time: Thời điểm nhận request (time.perf_counter())
+        
+    Returns:
+        tuple: (dictionary kết quả, mã trạng thái HTTP, header bổ sung)
+    """
+    global first_prediction_logged
+    
+    # Đọc ảnh chụp mô hình một lần - cả request dùng cùng một mô hình
+    snapshot = current_snapshot
+    
+    # Mô hình đang được khởi tạo trong nền - báo client thử lại thay vì chờ
+    if snapshot is None:
+        start_background_initialization()
+        fallback_counters['not_ready'].inc()
+        return {
+            'prediction': 200.0,  # Giá trị mặc định: 200g/km
+            'process_time_ms': (time.perf_counter() - start_time) * 1000,
+            'status': 'initializing',
+            'message': 'Model is not ready yet'
+        }, 503, {'Retry-After': '1'}
+    
+    # Giai đoạn phân tích JSON
+    data = request.json
+    parse_end = time.perf_counter()
+    stage_histograms['parse'].observe(parse_end - start_time)
+    
+    # Giai đoạn xác thực: thiếu trường hoặc giá trị không hợp lệ - trả về giá trị dự phòng
+    # (giá trị gốc đã xác thực được dùng để dự đoán và tạo khóa cache)
+    try:
+        feature_values = validate_request(snapshot, data)
+    except RequestValidationError as e:
+        logger.warning(f"{str(e)} - returning fallback")
+        fallback_counters[e.reason].inc()
+        return {
+            'prediction': 200.0,  # Giá trị mặc định
+            'process_time_ms': (time.perf_counter() - start_time) * 1000,
+            'status': 'fallback',
+            'message': e.message
+        }, 200, None
+    validation_end = time.perf_counter()
+    stage_histograms['validation'].observe(validation_end - parse_end)
+    
+    # Kiểm tra cache trước khi thực hiện dự đoán - tối ưu hóa hiệu năng
+    cache_key = prediction_cache.key_for(snapshot, feature_values)
+    cached_result = prediction_cache.get(cache_key)
+    cache_end = time.perf_counter()
+    stage_histograms['cache_lookup'].observe(cache_end - validation_end)
+    if cached_result is not None:
+        cache_hits.inc()
+        return {
+            'prediction': cached_result,
+            'process_time_ms': (cache_end - start_time) * 1000,
+            'cached': True,
+            'status': 'success'
+        }, 200, None
+    cache_misses.inc()
+    
+    # Ghi log mẫu (một trên PREDICTION_LOG_EVERY request không trúng cache)
+    log_this_request = PREDICTION_LOG_EVERY and next(logged_request_counter) % PREDICTION_LOG_EVERY == 0
+    if log_this_request:
+        logger.info(f"Received prediction request: {data}")
+    
+    # Thực hiện dự đoán - chấm điểm trực tiếp khi rảnh, gom lô khi có tranh chấp
+    try:
+        prediction = float(prediction_batcher.predict((snapshot, list(feature_values)), timeout=BATCH_RESULT_TIMEOUT))
+        prediction_cache.put(cache_key, prediction)  # Lưu kết quả vào cache
+    except Exception as inner_e:
+        # Xử lý lỗi khi dự đoán - trả về giá trị dự phòng
+        logger.error(f"Error making prediction: {str(inner_e)}")
+        fallback_counters['prediction_error'].inc()
+        return {
+            'prediction': 200.0,
+            'process_time_ms': (time.perf_counter() - start_time) * 1000,
+            'status': 'fallback',
+            'message': 'Prediction error'
+        }, 200, None
+    inference_end = time.perf_counter()
+    stage_histograms['inference'].observe(inference_end - cache_end)
+    
+    # Tính toán thời gian xử lý
+    process_time = (inference_end - start_time) * 1000
+    
+    # Ghi log kết quả (cùng các request đã được chọn ghi log ở trên)
+    if log_this_request:
+        logger.info(f"Prediction: {prediction:.2f}, Processing time: {process_time:.2f}ms")
+    
+    # Ghi log độ trễ của request dự đoán đầu tiên (không trúng cache) của worker
+    if not first_prediction_logged:
+        first_prediction_logged = True
+        logger.info(f"First prediction request in worker {os.getpid()} served in {process_time:.2f} ms")
+    
+    # Trả về kết quả dự đoán thành công
+    return {
+        'prediction': prediction,
+        'process_time_ms': process_time,
+        'cached': False,
+        'status': 'success'
+    }, 200, None
 
 @app.route('/predict', methods=['POST'])
-@limiter.limit("100 per second")  # Tăng giới hạn lên 100 request/giây cho endpoint này
+@limiter.limit('predict')
 def predict():
     """
     Endpoint chính của API để dự đoán lượng khí thải CO2
@@ -172,7 +588,7 @@ def predict():
     - Kiểm tra và xác thực đầu vào
     - Kiểm tra cache trước khi dự đoán
     - Xử lý lỗi và trả về giá trị mặc định nếu cần
-    - Đo thời gian xử lý
+    - Đo thời gian xử lý từng giai đoạn (xem /metrics)
     
     Returns:
         JSON: Kết quả dự đoán và thông tin liên quan
@@ -181,108 +597,230 @@ def predict():
     start_time = time.perf_counter()
     
     # Kiểm tra định dạng dữ liệu đầu vào
-    if not request.is_json:
-        return jsonify({'error': 'Request must be JSON', 'status': 'error'}), 400
-    
-    try:    
-        # Đảm bảo mô hình đã được khởi tạo - nếu không, trả về giá trị dự phòng
-        if not model_initialized:
-            if not initialize_model():
-                logger.warning("Model not initialized, returning fallback value")
-                return jsonify({
-                    'prediction': 200.0,  # Giá trị mặc định: 200g/km
-                    'process_time_ms': (time.perf_counter() - start_time) * 1000,
-                    'status': 'fallback'
-                }), 200
-        
-        # Lấy dữ liệu từ request
-        data = request.json
-        
-        # Danh sách các trường bắt buộc
-        required_fields = [
-            'Engine Size(L)', 'Cylinders', 
-            'Fuel Consumption Comb (L/100 km)',
-            'Horsepower', 'Weight (kg)', 'Year'
-        ]
+    if not is_json_mimetype(request.mimetype):
+        return jsonify(NOT_JSON_RESPONSE), 400
+    
+    requests_in_flight.inc()
+    try:
+        try:
+            body, status_code, headers = process_prediction_request(start_time)
+        except Exception as e:
+            # Xử lý các lỗi không mong muốn
+            logger.error(f"Error processing request: {str(e)}")
+            logger.error(traceback.format_exc())
+            request_errors.inc()
+            
+            # Luôn trả về status 200 với giá trị dự phòng để cải thiện trải nghiệm người dùng
+            body, status_code, headers = {
+                'prediction': 200.0,  # Giá trị dự phòng
+                'process_time_ms': (time.perf_counter() - start_time) * 1000,
+                'status': 'error',
+                'message': str(e)
+            }, 200, None
         
-        # Kiểm tra đầy đủ các trường - nếu thiếu, trả về giá trị dự phòng
-        if not all(field in data for field in required_fields):
-            logger.warning(f"Missing required fields, returning fallback. Received: {data}")
+        # Giai đoạn tuần tự hóa phản hồi
+        serialization_start = time.perf_counter()
+        response = jsonify(body)
+        serialization_end = time.perf_counter()
+        stage_histograms['serialization'].observe(serialization_end - serialization_start)
+        request_histogram.observe(serialization_end - start_time)
+        return response, status_code, headers
+    finally:
+        requests_in_flight.dec()
+
+@app.route('/predict/batch', methods=['POST'])
+@limiter.limit('batch_rows', charge_in_view=True)  # Trừ theo số hàng sau khi giải mã lô
+def predict_batch():
+    """
+    Endpoint dự đoán lượng khí thải CO2 cho nhiều phương tiện trong một request
+    
+    Định dạng request được chọn theo Content-Type:
+    - application/json: mảng bản ghi (hoặc object có khóa "records")
+    - application/msgpack: mảng bản ghi, hoặc mảng hàng số theo thứ tự EmissionModel.features
+    - application/x-npy: ma trận .npy (n_rows, n_features) theo thứ tự features
+    - application/vnd.apache.arrow.stream: Arrow IPC stream với một cột cho mỗi đặc trưng
+    Định dạng response theo header Accept (mặc định giống request); response lớn được nén
+    gzip nếu client gửi Accept-Encoding: gzip. Request có Content-Encoding: gzip được giải nén.
+    
+    Toàn bộ lô được xác thực trong một lượt rồi dự đoán bằng một lần chuẩn hóa và một
+    lần gọi mô hình. Mỗi hàng có kết quả và ô lỗi riêng, nên một bản ghi hỏng không
+    làm hỏng cả lô.
+    
+    Returns:
+        Kết quả theo từng hàng, kích thước lô và thời gian từng giai đoạn
+    """
+    start_time = time.perf_counter()
+    
+    snapshot = current_snapshot
+    if snapshot is None:
+        start_background_initialization()
+        return jsonify({
+            'status': 'initializing',
+            'message': 'Model not yet initialized'
+        }), 503, {'Retry-After': '1'}
+    
+    try:
+        # Giai đoạn giải mã thân request theo Content-Type
+        parse_start = time.perf_counter()
+        request_format = format_from_content_type(request.content_type)
+        if request_format is None:
             return jsonify({
-                'prediction': 200.0,  # Giá trị mặc định
-                'process_time_ms': (time.perf_counter() - start_time) * 1000,
-                'status': 'fallback',
-                'message': 'Missing fields'
-            }), 200
+                'error': f'Unsupported Content-Type; supported formats: {", ".join(available_formats())}',
+                'status': 'error'
+            }), 415
+        body = request.get_data(cache=False)
+        if request.content_encoding == 'gzip':
+            body = gzip.decompress(body)
+        kind, payload = decode_batch(body, request_format, snapshot.features)
+        parse_time = (time.perf_counter() - parse_start) * 1000
         
-        # Kiểm tra cache trước khi thực hiện dự đoán - tối ưu hóa hiệu năng
-        cache_key = get_cache_key(data)
-        if cache_key and cache_key in prediction_cache:
-            cached_result = prediction_cache[cache_key]
-            process_time = (time.perf_counter() - start_time) * 1000
+        batch_size = len(payload)
+        if batch_size > MAX_BATCH_SIZE:
             return jsonify({
-                'prediction': float(cached_result),
-                'process_time_ms': process_time,
-                'cached': True,
-                'status': 'success'
-            }), 200
+                'error': f'Batch too large: {batch_size} records (max {MAX_BATCH_SIZE})',
+                'status': 'error'
+            }), 413
         
-        # Ghi log request (chỉ log 10% request để giảm tải I/O)
-        if start_time % 10 < 1:
-            logger.info(f"Received prediction request: {data}")
+        # Chi phí giới hạn tốc độ tỉ lệ với số hàng của lô
+        limit_error = check_rate_limit('batch_rows', cost=max(batch_size, 1))
+        if limit_error:
+            return limit_error
         
-        # Thực hiện dự đoán với cache lru
-        try:
-            with prediction_lock:  # Khóa đồng bộ hóa để đảm bảo an toàn thread
-                prediction = cached_predict(
-                    data['Engine Size(L)'],
-                    data['Cylinders'],
-                    data['Fuel Consumption Comb (L/100 km)'],
-                    data['Horsepower'],
-                    data['Weight (kg)'],
-                    data['Year']
-                )
-                
-                # Lưu kết quả vào cache
-                if cache_key and len(prediction_cache) < MAX_CACHE_SIZE:
-                    prediction_cache[cache_key] = prediction
-        except Exception as inner_e:
-            # Xử lý lỗi khi dự đoán - trả về giá trị dự phòng
-            logger.error(f"Error making prediction: {str(inner_e)}")
-            return jsonify({
-                'prediction': 200.0,
-                'process_time_ms': (time.perf_counter() - start_time) * 1000,
-                'status': 'fallback',
-                'message': 'Prediction error'
-            }), 200
+        # Xác thực và dự đoán cả lô (ma trận số đi thẳng vào xác thực vector hóa)
+        if kind == 'matrix':
+            batch_result = snapshot.predict_matrix(payload)
+        else:
+            batch_result = snapshot.predict_batch(payload)
         
-        # Tính toán thời gian xử lý
-        process_time = (time.perf_counter() - start_time) * 1000
+        timings = {'parse': parse_time}
+        timings.update(batch_result['timings_ms'])
+        response_format = format_from_content_type(request.headers.get('Accept'), default=request_format)
         
-        # Ghi log kết quả (chỉ log 10% request)
-        if start_time % 10 < 1:
-            logger.info(f"Prediction: {prediction:.2f}, Processing time: {process_time:.2f}ms")
+        # Giai đoạn dựng và tuần tự hóa kết quả
+        build_start = time.perf_counter()
+        if response_format == 'json':
+            results = []
+            for prediction, error in zip(batch_result['predictions'].tolist(), batch_result['errors']):
+                if error is None:
+                    results.append({'prediction': prediction, 'status': 'success'})
+                else:
+                    results.append({'prediction': None, 'status': 'error', 'message': error})
+            timings['build_results'] = (time.perf_counter() - build_start) * 1000
+            process_time = (time.perf_counter() - start_time) * 1000
+            response = jsonify({
+                'results': results,
+                'batch_size': batch_size,
+                'valid_rows': batch_result['valid_rows'],
+                'timings_ms': timings,
+                'process_time_ms': process_time,
+                'per_row_us': (process_time * 1000 / batch_size) if batch_size else 0.0,
+                'status': 'success'
+            })
+        else:
+            process_time = (time.perf_counter() - start_time) * 1000
+            metadata = {
+                'batch_size': batch_size,
+                'valid_rows': batch_result['valid_rows'],
+                'timings_ms': timings,
+                'process_time_ms': process_time,
+                'per_row_us': (process_time * 1000 / batch_size) if batch_size else 0.0,
+                'status': 'success'
+            }
+            data, content_type = encode_predictions(
+                response_format, batch_result['predictions'], batch_result['errors'], metadata
+            )
+            response = app.response_class(data, status=200, content_type=content_type)
+            response.headers['X-Batch-Size'] = str(batch_size)
+            response.headers['X-Valid-Rows'] = str(batch_result['valid_rows'])
+        serialize_time = (time.perf_counter() - build_start) * 1000
         
-        # Trả về kết quả dự đoán thành công
-        return jsonify({
-            'prediction': float(prediction),
-            'process_time_ms': process_time,
-            'cached': False,
-            'status': 'success'
-        }), 200
+        # Nén gzip nếu client chấp nhận
+        gzip_start = time.perf_counter()
+        data, compressed = maybe_gzip(response.get_data(), request.headers.get('Accept-Encoding'),
+                                      GZIP_MIN_BYTES, GZIP_LEVEL)
+        if compressed:
+            response.set_data(data)
+            response.headers['Content-Encoding'] = 'gzip'
+        response.headers['Vary'] = 'Accept, Accept-Encoding'
+        response.headers['Server-Timing'] = (
+            f"parse;dur={parse_time:.3f}, serialize;dur={serialize_time:.3f}, "
+            f"gzip;dur={(time.perf_counter() - gzip_start) * 1000:.3f}"
+        )
+        return response
         
+    except UnsupportedFormatError as e:
+        return jsonify({'error': str(e), 'status': 'error'}), 415
+    except (BatchFormatError, OSError, EOFError) as e:
+        # Thân request sai định dạng (kể cả dữ liệu gzip hỏng)
+        return jsonify({'error': str(e), 'status': 'error'}), 400
     except Exception as e:
-        # Xử lý các lỗi không mong muốn
-        logger.error(f"Error processing request: {str(e)}")
+        logger.error(f"Error processing batch request: {str(e)}")
         logger.error(traceback.format_exc())
-        
-        # Luôn trả về status 200 với giá trị dự phòng để cải thiện trải nghiệm người dùng
         return jsonify({
-            'prediction': 200.0,  # Giá trị dự phòng
             'process_time_ms': (time.perf_counter() - start_time) * 1000,
             'status': 'error',
             'message': str(e)
-        }), 200
+        }), 500
+
+@app.route('/predict/stream', methods=['POST'])
+@limiter.limit('stream')
+def predict_stream():
+    """
+    Endpoint chấm điểm luồng NDJSON với bộ nhớ không đổi
+    
+    Thân request là NDJSON (mỗi dòng một bản ghi JSON, hoặc một mảng số theo thứ tự
+    EmissionModel.features; có thể nén gzip với Content-Encoding: gzip). Thân request
+    được đọc tăng dần, dự đoán theo lô STREAM_CHUNK_ROWS dòng bằng đường vector hóa và
+    kết quả được trả về NDJSON theo chunked transfer: mỗi dòng đầu vào không rỗng cho
+    đúng một dòng kết quả cùng thứ tự. Toàn bộ luồng dùng cùng một ảnh chụp mô hình.
+    Một dòng dài hơn STREAM_MAX_LINE_BYTES bị từ chối: 413 nếu nằm trong lô đầu tiên,
+    nếu không thì luồng kết thúc bằng một dòng lỗi (header đã được gửi).
+    
+    Returns:
+        Response NDJSON dạng luồng
+    """
+    snapshot = current_snapshot
+    if snapshot is None:
+        start_background_initialization()
+        return jsonify({
+            'status': 'initializing',
+            'message': 'Model not yet initialized'
+        }), 503, {'Retry-After': '1'}
+    
+    start_time = time.perf_counter()
+    lines = iter_lines(request.stream, gzipped=request.content_encoding == 'gzip',
+                       max_line_bytes=STREAM_MAX_LINE_BYTES)
+    stats = {}
+    chunks = score_ndjson(snapshot, lines, chunk_rows=STREAM_CHUNK_ROWS, stats=stats)
+    
+    # Chấm điểm lô đầu tiên trước khi gửi header, để lỗi đầu vào ngay từ đầu có mã trạng thái đúng
+    try:
+        first_chunk = next(chunks, b'')
+    except LineTooLongError as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 413
+    except zlib.error as e:
+        return jsonify({'status': 'error', 'message': f'Invalid gzip body: {e}'}), 400
+    
+    def generate():
+        try:
+            for chunk in itertools.chain((first_chunk,), chunks):
+                stream_rows.inc(chunk.count(b'\n'))
+                yield chunk
+        except Exception as e:
+            # Header đã được gửi nên chỉ có thể báo lỗi bằng một dòng cuối cùng
+            logger.error(f"Error while streaming predictions: {str(e)}")
+            logger.error(traceback.format_exc())
+            yield (json.dumps({'status': 'error', 'message': str(e)}) + '\n').encode()
+            return
+        elapsed = time.perf_counter() - start_time
+        logger.info(f"Streamed {stats['rows']} rows ({stats['errors']} errors) in {elapsed:.2f} s "
+                    f"({stats['rows'] / elapsed if elapsed else 0:.0f} rows/s)")
+    
+    return Response(
+        stream_with_context(generate()),
+        mimetype='application/x-ndjson',
+        headers={'X-Model-Version': str(snapshot.version)}
+    )
 
 @app.route('/health', methods=['GET'])
 def health_check():
@@ -296,8 +834,9 @@ def health_check():
         JSON: Thông tin trạng thái API và model
     """
     try:
-        if not model_initialized:
-            if initialization_in_progress:
+        snapshot = current_snapshot
+        if snapshot is None:
+            if initialization_lock.locked():
                 return jsonify({
                     "status": "initializing",
                     "message": "Model initialization in progress"
@@ -310,8 +849,15 @@ def health_check():
         return jsonify({
             "status": "healthy",
             "message": "API is running and model is initialized",
+            "ready": is_ready(),  # Worker đã làm nóng xong (xem /health/ready)
             "stats": {
-                "cache_size": len(prediction_cache)  # Thống kê kích thước cache hiện tại
+                "cache_size": len(prediction_cache),  # Thống kê kích thước cache hiện tại
+                "cache": prediction_cache.get_stats(),  # Hit/miss/eviction và bộ nhớ của cache
+                "model_version": snapshot.version,  # Phiên bản mô hình đang phục vụ
+                "reload": reload_status,  # Trạng thái lần tải lại mô hình gần nhất
+                "registry": registry_status,  # Lần chuyển phiên bản kho gần nhất
+                "batcher": prediction_batcher.get_stats(),  # Thống kê bộ gom lô
+                "readiness": readiness  # Trạng thái khởi tạo/làm nóng của worker
             }
         }), 200
     except Exception as e:
@@ -321,6 +867,51 @@ def health_check():
             "message": str(e)
         }), 200
 
+@app.route('/health/live', methods=['GET'])
+@limiter.exempt
+def liveness_check():
+    """
+    Endpoint kiểm tra process còn sống (liveness)
+    
+    Không chạm đến mô hình: luôn trả về 200 nếu worker còn phục vụ được HTTP.
+    
+    Returns:
+        JSON: Trạng thái sống của process
+    """
+    return jsonify({"status": "alive", "pid": os.getpid()}), 200
+
+@app.route('/health/ready', methods=['GET'])
+@limiter.exempt
+def readiness_check():
+    """
+    Endpoint kiểm tra worker sẵn sàng nhận traffic (readiness)
+    
+    Trả về 200 chỉ khi mô hình đã được tải và các đường dự đoán/cache đã được
+    làm nóng trong process này; ngược lại trả về 503 (và bắt đầu khởi tạo nền
+    nếu chưa chạy).
+    
+    Returns:
+        JSON: Trạng thái sẵn sàng và thời gian khởi tạo
+    """
+    if is_ready():
+        return jsonify({"status": "ready", **readiness}), 200
+    start_background_initialization()
+    return jsonify({"status": "not_ready", **readiness}), 503, {'Retry-After': '1'}
+
+@app.route('/metrics', methods=['GET'])
+@limiter.exempt
+def metrics_endpoint():
+    """
+    Endpoint xuất metric theo định dạng văn bản Prometheus
+    
+    Gồm histogram thời gian từng giai đoạn của /predict và các bộ đếm trúng cache,
+    giá trị dự phòng, lỗi và số request đang xử lý của worker hiện tại.
+    
+    Returns:
+        Văn bản Prometheus (text/plain; version=0.0.4)
+    """
+    return metrics.render(), 200, {'Content-Type': 'text/plain; version=0.0.4; charset=utf-8'}
+
 @app.route('/cache/clear', methods=['POST'])
 def clear_cache():
     """
@@ -332,14 +923,12 @@ def clear_cache():
     Returns:
         JSON: Kết quả thực hiện xóa cache
     """
-    global prediction_cache
     try:
-        old_size = len(prediction_cache)  # Lưu kích thước cache cũ
-        prediction_cache = {}  # Xóa dictionary cache
-        cached_predict.cache_clear()  # Xóa lru_cache
+        old_size = prediction_cache.clear()  # Xóa cache, lấy số mục đã xóa
         return jsonify({
             "status": "success",
-            "message": f"Cache cleared. {old_size} entries removed."
+            "message": f"Cache cleared. {old_size} entries removed.",
+            "stats": prediction_cache.get_stats()
         }), 200
     except Exception as e:
         return jsonify({
@@ -347,6 +936,115 @@ def clear_cache():
             "message": str(e)
         }), 200
 
+def check_admin_token():
+    """
+    Kiểm tra token quản trị trong header X-Admin-Token
+    
+    Returns:
+        Response lỗi (JSON, mã trạng thái) nếu không hợp lệ, None nếu hợp lệ
+    """
+    if not ADMIN_TOKEN:
+        return jsonify({'status': 'error', 'message': 'Admin endpoints are disabled (ADMIN_TOKEN not set)'}), 403
+    token = request.headers.get('X-Admin-Token', '')
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        return jsonify({'status': 'error', 'message': 'Invalid admin token'}), 401
+    return None
+
+def run_reload_in_background(model_path, scaler_path):
+    """Chạy reload_model trong thread nền và giải phóng khóa tải lại khi xong"""
+    try:
+        reload_model(model_path, scaler_path)
+    finally:
+        reload_lock.release()
+
+@app.route('/admin/reload', methods=['GET', 'POST'])
+def admin_reload():
+    """
+    Endpoint quản trị để tải lại mô hình mà không khởi động lại gunicorn
+    
+    POST: Bắt đầu tải artifact joblib mới (tùy chọn "model_path"/"scaler_path" trong JSON)
+    trong thread nền, làm nóng rồi thay ảnh chụp đang phục vụ. Trả về 202 ngay lập tức.
+    GET: Trả về trạng thái lần tải lại gần nhất.
+    Yêu cầu header X-Admin-Token khớp với biến môi trường ADMIN_TOKEN.
+    
+    Returns:
+        JSON: Trạng thái tải lại
+    """
+    auth_error = check_admin_token()
+    if auth_error:
+        return auth_error
+    
+    if request.method == 'GET':
+        return jsonify(reload_status), 200
+    
+    body = request.get_json(silent=True) or {}
+    if not reload_lock.acquire(blocking=False):
+        return jsonify({'status': 'error', 'message': 'A reload is already in progress'}), 409
+    
+    try:
+        threading.Thread(
+            target=run_reload_in_background,
+            args=(body.get('model_path'), body.get('scaler_path')),
+            name='model-reload',
+            daemon=True
+        ).start()
+    except Exception:
+        reload_lock.release()
+        raise
+    
+    return jsonify({'status': 'accepted', 'message': 'Model reload started'}), 202
+
+@app.route('/admin/registry', methods=['GET', 'POST'])
+def admin_registry():
+    """
+    Endpoint quản trị kho phiên bản mô hình (cần MODEL_REGISTRY_DIR)
+    
+    GET: Liệt kê các phiên bản, các con trỏ, phiên bản đã tải trong worker này và lần
+    chuyển phiên bản gần nhất.
+    POST: JSON {"action": "stage" | "activate" | "rollback", "version": "..."} cập nhật con trỏ
+    của kho rồi đồng bộ ngay worker nhận request; các worker khác đồng bộ trong vòng
+    REGISTRY_POLL_SECONDS. Yêu cầu header X-Admin-Token khớp với biến môi trường ADMIN_TOKEN.
+    
+    Returns:
+        JSON: Trạng thái kho và lần chuyển phiên bản gần nhất
+    """
+    auth_error = check_admin_token()
+    if auth_error:
+        return auth_error
+    if model_registry is None:
+        return jsonify({'status': 'error', 'message': 'Model registry is disabled (MODEL_REGISTRY_DIR not set)'}), 404
+    
+    if request.method == 'POST':
+        body = request.get_json(silent=True) or {}
+        action = body.get('action')
+        if action in ('stage', 'activate') and not ModelRegistry.is_valid_version(body.get('version')):
+            return jsonify({'status': 'error', 'message': 'version must be 16 lowercase hex characters'}), 400
+        try:
+            if action == 'stage':
+                model_registry.stage(body.get('version'))
+            elif action == 'activate':
+                model_registry.activate(body.get('version'))
+            elif action == 'rollback':
+                model_registry.rollback()
+            else:
+                return jsonify({'status': 'error', 'message': "action must be 'stage', 'activate' or 'rollback'"}), 400
+        except KeyError:
+            return jsonify({'status': 'error', 'message': f"Unknown model version: {body.get('version')}"}), 404
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'No previous version to roll back to'}), 409
+        sync_with_registry()
+    
+    snapshot = current_snapshot
+    return jsonify({
+        'status': 'success',
+        'serving_version': snapshot.version if snapshot else None,
+        'current': model_registry.read_pointer('current'),
+        'next': model_registry.read_pointer('next'),
+        'loaded_versions': list(loaded_snapshots),
+        'last_switch': registry_status,
+        'versions': model_registry.list_versions()
+    }), 200
+
 @app.route('/fallback', methods=['POST'])
 def fallback_prediction():
     """
@@ -370,17 +1068,10 @@ if __name__ == '__main__':
     # Lấy cổng từ biến môi trường (Render sets this)
     port = int(os.environ.get('PORT', 10000))
     
-    # Khởi tạo mô hình khi khởi động
+    # Khởi tạo mô hình trong nền - server nhận request ngay, /health/ready báo khi sẵn sàng
     logger.info(f"Starting server on port {port}...")
-    logger.info("Initializing model at startup...")
-    
-    try:
-        if not initialize_model():
-            logger.error("Failed to initialize model at startup")
-            # Vẫn tiếp tục chạy server ngay cả khi khởi tạo thất bại - sẽ sử dụng giá trị dự phòng
-    except Exception as e:
-        logger.error(f"Error during initialization: {str(e)}")
-        logger.error(traceback.format_exc())
+    logger.info("Initializing model in the background...")
+    start_background_initialization()
     
     # Cấu hình máy chủ: sử dụng gunicorn trong môi trường sản xuất, Flask dev server cho phát triển local
     if os.environ.get('RENDER'):
@@ -4,9 +4,7 @@ import sys
 import requests
 import time
 import threading
-import random
-from requests.adapters import HTTPAdapter
-from requests.packages.urllib3.util.retry import Retry
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
 
 # Thêm đường dẫn hiện tại vào sys.path (để đảm bảo imports hoạt động trên Streamlit Cloud)
 # Cần thiết để Streamlit Cloud có thể tìm thấy các module tự tạo
@@ -25,12 +23,13 @@ st.set_page_config(
 # Import các module sau khi đã cấu hình đường dẫn
 from controllers.emission_controller import EmissionController
 from views.main_view import MainView
+from utils.api_client import API_BATCH_RESULT_TIMEOUT, API_CONCURRENCY, get_shared_batcher, get_shared_session
 
 # Thiết lập URL API - kết nối đến API server được triển khai trên Render.com
 os.environ['API_URL'] = 'https://thuco2tiep.onrender.com'
 
 # Cơ chế kiểm soát đồng thời các request đến API
-api_semaphore = threading.Semaphore(10)  # Tăng lên 10 request đồng thời
+api_semaphore = threading.Semaphore(API_CONCURRENCY)  # Mặc định 10 request đồng thời (bằng kích thước pool kết nối)
 
 # Cache lưu kết quả API để tránh gửi lại các request giống nhau
 prediction_cache = {}  # Lưu trữ kết quả dự đoán
@@ -40,27 +39,21 @@ MAX_CACHE_SIZE = 100  # Giới hạn kích thước cache
 # Giá trị mặc định khi API không phản hồi
 DEFAULT_PREDICTION = 200.0  # Giá trị CO2 mặc định (g/km)
 
+# Gom lô phía client: các lời gọi dự đoán đồng thời được gửi chung một request /predict/batch
+API_BATCHING = os.environ.get('API_BATCHING', 'true').lower() == 'true'
+
 def get_session():
     """
-    Tạo phiên requests với cơ chế thử lại tự động
+    Lấy phiên requests dùng chung của process với cơ chế thử lại tự động
     
-    Cấu hình phiên HTTP với chiến lược thử lại để xử lý các lỗi mạng tạm thời
-    và đảm bảo khả năng phục hồi của các yêu cầu API.
+    Phiên giữ pool kết nối keep-alive có kích thước bằng api_semaphore, nên các lời gọi
+    API dùng lại kết nối TCP/TLS sẵn có thay vì bắt tay lại mỗi lần. Chỉ sau khi thất bại
+    mới chờ thử lại (backoff lũy thừa kèm jitter), xem utils/api_client.py.
     
     Returns:
-        requests.Session: Đối tượng phiên có cấu hình thử lại
+        requests.Session: Đối tượng phiên dùng chung có cấu hình thử lại
     """
-    session = requests.Session()
-    retry = Retry(
-        total=5,  # Tăng số lần thử lại tối đa
-        backoff_factor=0.2,  # Giảm thời gian giữa các lần retry để tăng tốc
-        status_forcelist=[429, 500, 502, 503, 504],  # Mã HTTP cần thử lại
-        allowed_methods=["GET", "POST"]  # Các phương thức được phép thử lại
-    )
-    adapter = HTTPAdapter(max_retries=retry)
-    session.mount("http://", adapter)
-    session.mount("https://", adapter)
-    return session
+    return get_shared_session()
 
 def get_cache_key(features):
     """
@@ -83,13 +76,56 @@ def get_cache_key(features):
     except:
         return None
 
+def fallback_result(message):
+    """Kết quả dự phòng khi không có dự đoán từ API (cùng dạng với phản hồi /predict)"""
+    return {
+        'prediction': DEFAULT_PREDICTION,
+        'process_time_ms': 5.0,
+        'status': 'fallback',
+        'message': message
+    }
+
+def predict_batched(features):
+    """
+    Dự đoán qua bộ gom lô phía client
+    
+    Lời gọi được xếp hàng cùng các lời gọi đồng thời khác (từ mọi thread/session Streamlit),
+    gom trong một cửa sổ ngắn và gửi chung một request /predict/batch; mỗi người gọi nhận
+    đúng hàng của mình. Không giới hạn bởi api_semaphore: cả lô chỉ dùng một kết nối.
+    
+    Parameters:
+        features (dict): Các đặc trưng của xe cần dự đoán
+        
+    Returns:
+        dict: Kết quả dự đoán của hàng này hoặc giá trị dự phòng
+    """
+    # Hàng quá hạn bị bỏ khỏi lô (Future bị hủy) nên không chiếm chỗ trong request tiếp theo
+    future = get_shared_batcher().submit(features, timeout=API_BATCH_RESULT_TIMEOUT)
+    try:
+        result = future.result(timeout=API_BATCH_RESULT_TIMEOUT)
+    except (FutureTimeoutError, CancelledError):
+        future.cancel()  # Bỏ khỏi hàng đợi nếu lô chưa được gửi
+        return fallback_result('API timeout')
+    except requests.exceptions.Timeout:
+        return fallback_result('API timeout')
+    except requests.exceptions.RequestException as e:
+        return fallback_result(f'API error: {str(e)}')
+    except Exception as e:
+        return fallback_result(f'Client error: {str(e)}')
+    
+    if result.get('prediction') is None:
+        # Hàng không hợp lệ (server xác thực từng hàng của lô)
+        return fallback_result(result.get('message', 'Invalid feature values'))
+    return result
+
 def predict_with_api(features):
     """
     Thực hiện dự đoán sử dụng API bên ngoài với kiểm soát đồng thời
     
     Hàm này quản lý các request đến API, bao gồm:
     - Kiểm tra cache trước khi gọi API 
-    - Kiểm soát số lượng request đồng thời với semaphore
+    - Gom các lời gọi đồng thời thành một request /predict/batch (API_BATCHING, mặc định bật)
+    - Hoặc kiểm soát số lượng request /predict đồng thời với semaphore
     - Xử lý các trường hợp lỗi và timeout
     - Lưu kết quả vào cache
     
@@ -107,6 +143,15 @@ def predict_with_api(features):
         if cache_key in prediction_cache:
                 return prediction_cache[cache_key]
     
+    benchmark_mode = os.environ.get('BENCHMARK_MODE', 'false').lower() == 'true'
+    if API_BATCHING and not benchmark_mode:
+        result = predict_batched(features)
+        if result['status'] == 'success':
+            with cache_lock:
+                if len(prediction_cache) < MAX_CACHE_SIZE:
+                    prediction_cache[cache_key] = result
+        return result
+    
     # Cơ chế dự phòng khi không thể gửi request
     try:
         # Sử dụng semaphore để giới hạn số request đồng thời
@@ -121,13 +166,7 @@ def predict_with_api(features):
             }
             
         try:
-            # Thêm độ trễ ngẫu nhiên nhỏ để tránh gửi đồng loạt request
-            time.sleep(random.uniform(0.01, 0.1))  # Giảm delay ngẫu nhiên
-            
-            # Kiểm tra chế độ benchmark để chọn endpoint phù hợp
-            benchmark_mode = os.environ.get('BENCHMARK_MODE', 'false').lower() == 'true'
-            
-            # Thực hiện request đến API
+            # Thực hiện request đến API qua phiên dùng chung (kết nối keep-alive được dùng lại)
             session = get_session()
             api_url = os.environ.get('API_URL')
             
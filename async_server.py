@@ -0,0 +1,307 @@
+from aiohttp import web
+from controllers.emission_controller import EmissionController
+import asyncio
+import logging
+import time
+import os
+import traceback
+from utils.serving import (
+    NOT_JSON_RESPONSE, RequestValidationError, create_prediction_batcher, create_prediction_cache,
+    is_json_mimetype, validate_request
+)
+
+# Máy chủ dự đoán dựa trên asyncio (aiohttp) - cùng giao diện /predict, /health, /cache/clear
+# với api_server.py. Kết nối và JSON được xử lý trên event loop; suy luận được đẩy sang
+# bộ gom lô chạy trong thread riêng với độ sâu hàng đợi giới hạn. Khi hàng đợi đầy, server
+# trả về 429 kèm Retry-After ngay lập tức thay vì để request dồn lại.
+#
+# Chạy trực tiếp:   python async_server.py
+# Chạy với gunicorn: gunicorn async_server:create_app --worker-class aiohttp.GunicornWebWorker
+
+# Cấu hình logging - Thiết lập hệ thống ghi log để theo dõi hoạt động của server
+logging.basicConfig(
+    level=logging.INFO,  # Mức độ log: INFO - chỉ ghi lại thông tin quan trọng
+    format='%(asctime)s - %(levelname)s - %(message)s'  # Định dạng: thời gian - mức độ - nội dung
+)
+logger = logging.getLogger(__name__)  # Tạo đối tượng logger cho module hiện tại
+
+# Đường dẫn tuyệt đối đến file dữ liệu
+DATA_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "co2 Emissions.csv")
+
+# Giới hạn hàng đợi suy luận (cache và bộ gom lô dùng cấu hình chung trong utils/serving.py)
+INFERENCE_QUEUE_DEPTH = int(os.environ.get('INFERENCE_QUEUE_DEPTH', 256))  # Số hàng tối đa đang chờ/đang suy luận
+INFERENCE_TIMEOUT = float(os.environ.get('INFERENCE_TIMEOUT', 5))  # Thời gian chờ kết quả tối đa (giây)
+RETRY_AFTER_SECONDS = os.environ.get('RETRY_AFTER_SECONDS', '1')  # Giá trị header Retry-After khi quá tải
+
+
+class ServingState:
+    """
+    Trạng thái phục vụ của một process: ảnh chụp mô hình, cache, bộ gom lô và bộ đếm
+
+    Mọi thuộc tính chỉ được sửa trên event loop (trừ bộ gom lô và cache vốn an toàn
+    đa luồng), nên bộ đếm hàng đợi không cần khóa.
+    """
+    def __init__(self):
+        self.snapshot = None  # Ảnh chụp bất biến của mô hình đang phục vụ
+        self.readiness = {'state': 'starting'}
+        self.cache = create_prediction_cache()
+        self.batcher = create_prediction_batcher(name='async-prediction-batcher')
+        self.queue_depth = 0  # Số hàng đã nhận vào bộ gom lô nhưng chưa có kết quả
+        self.max_queue_depth_seen = 0
+        self.rejected = 0  # Số request bị từ chối (429) vì hàng đợi đầy
+        self.timeouts = 0  # Số request quá thời gian chờ kết quả
+
+    def get_stats(self):
+        """Thống kê hàng đợi suy luận, bộ gom lô và cache"""
+        return {
+            'queue_depth': self.queue_depth,
+            'queue_limit': INFERENCE_QUEUE_DEPTH,
+            'max_queue_depth_seen': self.max_queue_depth_seen,
+            'rejected': self.rejected,
+            'timeouts': self.timeouts,
+            'batcher': self.batcher.get_stats(),
+            'cache': self.cache.get_stats()
+        }
+
+
+def load_snapshot():
+    """
+    Tải mô hình và làm nóng ảnh chụp (chạy trong thread, không chặn event loop)
+
+    Returns:
+        tuple: (ảnh chụp mô hình, điểm kiểm tra, thời gian làm nóng ms)
+    """
+    controller = EmissionController()
+    test_score = controller.initialize_model(DATA_PATH)
+    snapshot = controller.build_snapshot()
+    warmup_ms = snapshot.warm_up()
+    return snapshot, test_score, warmup_ms
+
+
+async def initialize_model(app):
+    """
+    Khởi tạo mô hình trong nền khi server khởi động, rồi làm nóng đường phục vụ
+
+    Server nhận kết nối ngay; /health/ready chỉ trả về 200 sau khi một lô dữ liệu
+    tổng hợp đã đi qua bộ gom lô và cache.
+    """
+    state = app['state']
+    state.readiness = {'state': 'initializing', 'pid': os.getpid(), 'started_at': time.time()}
+    start_time = time.perf_counter()
+    try:
+        if not os.path.exists(DATA_PATH):
+            raise FileNotFoundError(f"Could not find the file: {DATA_PATH}")
+        loop = asyncio.get_running_loop()
+        snapshot, test_score, warmup_ms = await loop.run_in_executor(None, load_snapshot)
+
+        # Làm nóng bộ gom lô và cache của process này
+        serving_start = time.perf_counter()
+        records = snapshot.synthetic_records(16)
+        value_rows = [snapshot.feature_values(record) for record in records]
+        futures = [asyncio.wrap_future(state.batcher.submit((snapshot, list(row)))) for row in value_rows]
+        for row, prediction in zip(value_rows, await asyncio.gather(*futures)):
+            state.cache.put(state.cache.key_for(snapshot, row), float(prediction))
+        serving_warmup_ms = (time.perf_counter() - serving_start) * 1000
+
+        state.snapshot = snapshot  # Công bố ảnh chụp cho các request
+        time_to_ready_ms = (time.perf_counter() - start_time) * 1000
+        state.readiness = {
+            'state': 'ready',
+            'pid': os.getpid(),
+            'model_version': snapshot.version,
+            'ready_at': time.time(),
+            'time_to_ready_ms': time_to_ready_ms,
+            'warmup_ms': warmup_ms + serving_warmup_ms
+        }
+        logger.info(f"Model initialized with test score: {test_score:.3f}; worker {os.getpid()} ready in "
+                    f"{time_to_ready_ms:.1f} ms (version {snapshot.version})")
+    except Exception as e:
+        logger.error(f"Error initializing model: {str(e)}")
+        logger.error(traceback.format_exc())
+        state.readiness = {'state': 'failed', 'pid': os.getpid(), 'message': str(e)}
+
+
+async def start_background_initialization(app):
+    """Hook on_startup: chạy khởi tạo mô hình như một task nền"""
+    app['init_task'] = asyncio.get_running_loop().create_task(initialize_model(app))
+
+
+def fallback_response(start_time, message, status='fallback', http_status=200, headers=None):
+    """Tạo phản hồi JSON với giá trị dự phòng (giống api_server.py)"""
+    return web.json_response({
+        'prediction': 200.0,  # Giá trị mặc định: 200g/km
+        'process_time_ms': (time.perf_counter() - start_time) * 1000,
+        'status': status,
+        'message': message
+    }, status=http_status, headers=headers)
+
+
+async def predict(request):
+    """
+    Endpoint dự đoán lượng khí thải CO2 (cùng giao diện với api_server.py)
+
+    Phân tích JSON, xác thực và tra cache trên event loop. Request không trúng cache
+    được đưa vào bộ gom lô nếu hàng đợi suy luận còn chỗ; nếu không, trả về 429
+    kèm Retry-After ngay lập tức.
+
+    Returns:
+        JSON: Kết quả dự đoán và thông tin liên quan
+    """
+    start_time = time.perf_counter()
+    state = request.app['state']
+
+    # Đọc ảnh chụp mô hình một lần - cả request dùng cùng một mô hình
+    snapshot = state.snapshot
+    if snapshot is None:
+        return fallback_response(start_time, 'Model is not ready yet', status='initializing',
+                                 http_status=503, headers={'Retry-After': RETRY_AFTER_SECONDS})
+
+    # Kiểm tra định dạng dữ liệu đầu vào (cùng quy tắc Content-Type với api_server.py)
+    if not is_json_mimetype(request.content_type):
+        return web.json_response(NOT_JSON_RESPONSE, status=400)
+    try:
+        data = await request.json()
+    except ValueError:
+        return web.json_response(NOT_JSON_RESPONSE, status=400)
+
+    try:
+        # Thiếu trường hoặc giá trị không hợp lệ - trả về giá trị dự phòng
+        # (giá trị gốc đã xác thực được dùng để dự đoán và tạo khóa cache)
+        try:
+            feature_values = validate_request(snapshot, data)
+        except RequestValidationError as e:
+            logger.warning(f"{str(e)} - returning fallback")
+            return fallback_response(start_time, e.message)
+
+        # Kiểm tra cache trước khi thực hiện dự đoán
+        cache_key = state.cache.key_for(snapshot, feature_values)
+        cached_result = state.cache.get(cache_key)
+        if cached_result is not None:
+            return web.json_response({
+                'prediction': cached_result,
+                'process_time_ms': (time.perf_counter() - start_time) * 1000,
+                'cached': True,
+                'status': 'success'
+            })
+
+        # Kiểm soát tải: từ chối ngay khi hàng đợi suy luận đã đầy
+        if state.queue_depth >= INFERENCE_QUEUE_DEPTH:
+            state.rejected += 1
+            return web.json_response({
+                'status': 'error',
+                'message': 'Inference queue is full, retry later',
+                'process_time_ms': (time.perf_counter() - start_time) * 1000
+            }, status=429, headers={'Retry-After': RETRY_AFTER_SECONDS})
+
+        state.queue_depth += 1
+        state.max_queue_depth_seen = max(state.max_queue_depth_seen, state.queue_depth)
+        try:
+            future = asyncio.wrap_future(state.batcher.submit((snapshot, list(feature_values))))
+            prediction = float(await asyncio.wait_for(future, timeout=INFERENCE_TIMEOUT))
+        except asyncio.TimeoutError:
+            state.timeouts += 1
+            logger.error("Prediction timed out in the inference queue")
+            return fallback_response(start_time, 'Prediction timeout', http_status=503,
+                                     headers={'Retry-After': RETRY_AFTER_SECONDS})
+        except Exception as inner_e:
+            logger.error(f"Error making prediction: {str(inner_e)}")
+            return fallback_response(start_time, 'Prediction error')
+        finally:
+            state.queue_depth -= 1
+
+        state.cache.put(cache_key, prediction)  # Lưu kết quả vào cache
+        return web.json_response({
+            'prediction': prediction,
+            'process_time_ms': (time.perf_counter() - start_time) * 1000,
+            'cached': False,
+            'status': 'success'
+        })
+    except Exception as e:
+        # Xử lý các lỗi không mong muốn - trả về giá trị dự phòng như api_server.py
+        logger.error(f"Error processing request: {str(e)}")
+        logger.error(traceback.format_exc())
+        return fallback_response(start_time, str(e), status='error')
+
+
+async def health_check(request):
+    """
+    Endpoint kiểm tra trạng thái hoạt động của API (tương thích với api_server.py)
+
+    Returns:
+        JSON: Thông tin trạng thái API, mô hình và hàng đợi suy luận
+    """
+    state = request.app['state']
+    snapshot = state.snapshot
+    if snapshot is None:
+        return web.json_response({
+            "status": "initializing",
+            "message": "Model not yet initialized",
+            "readiness": state.readiness
+        })
+    return web.json_response({
+        "status": "healthy",
+        "message": "API is running and model is initialized",
+        "ready": True,
+        "stats": dict(
+            state.get_stats(),
+            cache_size=len(state.cache),
+            model_version=snapshot.version,
+            readiness=state.readiness
+        )
+    })
+
+
+async def liveness_check(request):
+    """Endpoint liveness: luôn trả về 200 khi event loop còn phục vụ được HTTP"""
+    return web.json_response({"status": "alive", "pid": os.getpid()})
+
+
+async def readiness_check(request):
+    """Endpoint readiness: 200 khi mô hình đã tải và làm nóng, ngược lại 503"""
+    state = request.app['state']
+    if state.snapshot is not None:
+        return web.json_response(dict(state.readiness, status='ready'))
+    return web.json_response(dict(state.readiness, status='not_ready'), status=503,
+                             headers={'Retry-After': RETRY_AFTER_SECONDS})
+
+
+async def clear_cache(request):
+    """
+    Endpoint xóa cache dự đoán
+
+    Returns:
+        JSON: Kết quả thực hiện xóa cache
+    """
+    cache = request.app['state'].cache
+    old_size = cache.clear()  # Xóa cache, lấy số mục đã xóa
+    return web.json_response({
+        "status": "success",
+        "message": f"Cache cleared. {old_size} entries removed.",
+        "stats": cache.get_stats()
+    })
+
+
+def create_app():
+    """
+    Tạo ứng dụng aiohttp (dùng được làm app factory cho gunicorn aiohttp worker)
+
+    Returns:
+        web.Application: Ứng dụng với các route /predict, /health và /cache/clear
+    """
+    app = web.Application()
+    app['state'] = ServingState()
+    app.on_startup.append(start_background_initialization)
+    app.router.add_post('/predict', predict)
+    app.router.add_get('/health', health_check)
+    app.router.add_get('/health/live', liveness_check)
+    app.router.add_get('/health/ready', readiness_check)
+    app.router.add_post('/cache/clear', clear_cache)
+    return app
+
+
+# Chỉ thực thi khi chạy trực tiếp file này (không khi được import)
+if __name__ == '__main__':
+    # Lấy cổng từ biến môi trường (Render sets this)
+    port = int(os.environ.get('PORT', 10000))
+    logger.info(f"Starting asyncio server on port {port}...")
+    web.run_app(create_app(), host='0.0.0.0', port=port, access_log=None)
@@ -0,0 +1,358 @@
+# Mô tả: Chấm điểm ngoại tuyến một file phương tiện lớn bằng EmissionModel, không cần Flask
+# Đọc file CSV/Parquet theo từng khối, phân phối các khối cho một nhóm process (mỗi process
+# tải mô hình đúng một lần), ghi kết quả tăng dần theo đúng thứ tự đầu vào và lưu checkpoint
+# sau mỗi khối để chạy tiếp được sau sự cố (--resume)
+# Chạy: python bulk_score.py vehicles.csv predictions.csv --workers 4 [--resume]
+
+import argparse
+import io
+import json
+import os
+import sys
+import time
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor
+import numpy as np
+import pandas as pd
+from models.emission_model import EmissionModel
+
+try:
+    import pyarrow.parquet as pq
+except ImportError:  # Thư viện tùy chọn, chỉ cần cho file Parquet
+    pq = None
+
+DEFAULT_CHUNK_ROWS = 100000  # Số hàng mỗi khối gửi cho một worker
+PROGRESS_EVERY_S = 5.0  # Khoảng thời gian giữa hai dòng báo tiến độ (giây)
+
+# Mô hình của process worker hiện tại (tải một lần trong _init_worker)
+_worker_model = None
+
+
+def _init_worker(model_path, scaler_path):
+    """Tải mô hình một lần khi process worker khởi động"""
+    global _worker_model
+    model = EmissionModel(model_path, scaler_path)
+    if not model.load_model():
+        raise RuntimeError(f"Không tìm thấy mô hình đã huấn luyện: {model_path}")
+    _worker_model = model
+
+
+def score_chunk(frame, keep_columns, output_format):
+    """
+    Dự đoán một khối đầu vào và mã hóa khối kết quả (chạy trong process worker)
+
+    Giá trị không phải số hoặc bị thiếu trong một hàng chỉ làm hàng đó lỗi
+    (prediction rỗng, cột error ghi lý do), không làm hỏng cả khối.
+
+    Parameters:
+        frame: DataFrame của khối (các cột đặc trưng và các cột cần giữ lại)
+        keep_columns: Các cột đầu vào được chép sang kết quả
+        output_format: 'csv' (các dòng CSV không header) hoặc 'parquet' (một file Parquet)
+
+    Returns:
+        tuple: (số hàng, số hàng hợp lệ, bytes của khối kết quả)
+    """
+    model = _worker_model
+    X = np.column_stack([
+        pd.to_numeric(frame[field], errors='coerce').to_numpy(dtype=np.float64, na_value=np.nan)
+        for field in model.features
+    ]) if len(frame) else np.empty((0, len(model.features)))
+    result = model.predict_matrix(X)
+
+    out = frame[keep_columns].reset_index(drop=True)
+    out['prediction'] = result['predictions']
+    out['error'] = result['errors']
+    if output_format == 'parquet':
+        buffer = io.BytesIO()
+        out.to_parquet(buffer, index=False)
+        return len(frame), result['valid_rows'], buffer.getvalue()
+    return len(frame), result['valid_rows'], out.to_csv(header=False, index=False).encode()
+
+
+class _InlineExecutor:
+    """Chạy khối ngay trong process chính (--workers 0), cùng giao diện submit() với ProcessPoolExecutor"""
+
+    def __init__(self, model_path, scaler_path):
+        _init_worker(model_path, scaler_path)
+
+    def submit(self, fn, *args):
+        future = Future()
+        future.set_result(fn(*args))
+        return future
+
+    def shutdown(self, wait=True):
+        pass
+
+
+def _file_format(path):
+    """Xác định định dạng file theo phần mở rộng"""
+    return 'parquet' if path.lower().endswith(('.parquet', '.pq')) else 'csv'
+
+
+def input_columns(input_path):
+    """Đọc danh sách cột của file đầu vào (chỉ header/schema, không đọc dữ liệu)"""
+    if _file_format(input_path) == 'parquet':
+        return pq.ParquetFile(input_path).schema_arrow.names
+    return list(pd.read_csv(input_path, nrows=0).columns)
+
+
+def iter_chunks(input_path, columns, chunk_rows, skip_rows=0):
+    """
+    Đọc file đầu vào theo từng khối thay vì một lần pd.read_csv
+
+    Parameters:
+        input_path: File CSV hoặc Parquet
+        columns: Các cột cần đọc
+        chunk_rows: Số hàng mỗi khối
+        skip_rows: Số hàng dữ liệu đầu tiên bỏ qua (khi chạy tiếp)
+
+    Yields:
+        tuple: (DataFrame của khối, tỉ lệ đầu vào đã đọc từ 0 đến 1)
+    """
+    if _file_format(input_path) == 'parquet':
+        parquet_file = pq.ParquetFile(input_path)
+        total_rows = max(parquet_file.metadata.num_rows, 1)
+        rows_read = 0
+        for batch in parquet_file.iter_batches(batch_size=chunk_rows, columns=columns):
+            rows_read += batch.num_rows
+            if skip_rows >= batch.num_rows:
+                skip_rows -= batch.num_rows
+                continue
+            frame = batch.to_pandas().iloc[skip_rows:]
+            skip_rows = 0
+            yield frame, rows_read / total_rows
+        return
+
+    total_bytes = max(os.path.getsize(input_path), 1)
+    with open(input_path, 'rb') as handle:
+        # Bỏ qua các hàng đã chấm điểm mà không giữ danh sách chỉ số trong bộ nhớ (hàng 0 là header)
+        skiprows = (lambda i: 0 < i <= skip_rows) if skip_rows else None
+        reader = pd.read_csv(handle, usecols=columns, chunksize=chunk_rows, skiprows=skiprows)
+        for frame in reader:
+            # Vị trí đọc của file là ước lượng tiến độ (bộ phân tích CSV đọc trước theo khối)
+            yield frame, min(handle.tell() / total_bytes, 1.0)
+
+
+class _OutputWriter:
+    """
+    Ghi các khối kết quả theo thứ tự vào file CSV hoặc thư mục Parquet
+
+    CSV: một file, mỗi khối là các dòng nối tiếp; khi chạy tiếp, file được cắt về
+    đúng số byte đã ghi ở checkpoint. Parquet: một thư mục gồm part-NNNNN.parquet,
+    mỗi khối một file (ghi file tạm rồi đổi tên).
+    """
+
+    def __init__(self, output_path, output_format, header, checkpoint):
+        self.output_path = output_path
+        self.output_format = output_format
+        self.chunks_written = checkpoint['chunks_done'] if checkpoint else 0
+        if output_format == 'parquet':
+            os.makedirs(output_path, exist_ok=True)
+            for name in os.listdir(output_path):
+                # Xóa các phần còn sót lại sau checkpoint (hoặc mọi phần nếu chạy mới)
+                if name.startswith('part-') and (
+                        not name.endswith('.parquet') or int(name[5:10]) >= self.chunks_written):
+                    os.remove(os.path.join(output_path, name))
+            self.handle = None
+            return
+
+        if checkpoint:
+            self.handle = open(output_path, 'r+b')
+            self.handle.truncate(checkpoint['output_bytes'])  # Bỏ phần ghi dở sau checkpoint
+            self.handle.seek(checkpoint['output_bytes'])
+        else:
+            self.handle = open(output_path, 'wb')
+            self.handle.write((','.join(header) + '\n').encode())
+
+    def write(self, payload):
+        """Ghi một khối kết quả và đẩy xuống hệ điều hành trước khi checkpoint trỏ tới nó"""
+        if self.handle is None:
+            part_path = os.path.join(self.output_path, f"part-{self.chunks_written:05d}.parquet")
+            with open(part_path + '.tmp', 'wb') as f:
+                f.write(payload)
+            os.replace(part_path + '.tmp', part_path)
+        else:
+            self.handle.write(payload)
+            self.handle.flush()
+        self.chunks_written += 1
+
+    def tell(self):
+        """Số byte đã ghi (0 với thư mục Parquet)"""
+        return self.handle.tell() if self.handle is not None else 0
+
+    def close(self):
+        if self.handle is not None:
+            self.handle.close()
+
+
+def _checkpoint_path(output_path):
+    """File checkpoint đặt cạnh đầu ra"""
+    return output_path.rstrip(os.sep) + '.progress.json'
+
+
+def _write_checkpoint(path, checkpoint):
+    """Ghi checkpoint (ghi file tạm rồi đổi tên để không bao giờ còn checkpoint dở dang)"""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(checkpoint, f, indent=2)
+    os.replace(temp_path, path)
+
+
+def _load_checkpoint(path, run_info):
+    """Đọc checkpoint cho lần chạy tiếp; báo lỗi nếu nó thuộc về đầu vào/mô hình/tùy chọn khác"""
+    if not os.path.exists(path):
+        return None
+    with open(path, encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    mismatched = [key for key, value in run_info.items() if checkpoint.get(key) != value]
+    if mismatched:
+        raise ValueError(
+            f"Checkpoint {path} does not match this run ({', '.join(mismatched)} changed); "
+            "start again without --resume"
+        )
+    return checkpoint
+
+
+def bulk_score(input_path, output_path, workers=None, chunk_rows=DEFAULT_CHUNK_ROWS,
+               keep_columns=(), resume=False, model_path='models/trained_model.joblib',
+               scaler_path='models/trained_scaler.joblib', progress_every=PROGRESS_EVERY_S):
+    """
+    Chấm điểm toàn bộ file đầu vào và ghi kết quả theo thứ tự đầu vào
+
+    Parameters:
+        input_path: File CSV hoặc Parquet chứa các cột đặc trưng của mô hình
+        output_path: File CSV kết quả, hoặc thư mục nếu kết thúc bằng .parquet
+        workers: Số process worker (0 = chấm điểm ngay trong process chính)
+        chunk_rows: Số hàng mỗi khối
+        keep_columns: Các cột đầu vào chép sang kết quả (ví dụ Make, Model)
+        resume: Chạy tiếp từ checkpoint của lần chạy trước bị gián đoạn
+        progress_every: Khoảng thời gian giữa hai dòng báo tiến độ (giây, 0 = tắt)
+
+    Returns:
+        dict: Thống kê lần chạy (rows, errors, seconds, rows_per_s, resumed_from)
+    """
+    if workers is None:
+        workers = os.cpu_count() or 1
+    input_format, output_format = _file_format(input_path), _file_format(output_path)
+    if pq is None and 'parquet' in (input_format, output_format):
+        raise ValueError("Parquet support requires the 'pyarrow' package")
+
+    # Mô hình chỉ được tải ở đây để kiểm tra và lấy phiên bản; mỗi worker tự tải bản của nó
+    model = EmissionModel(model_path, scaler_path)
+    if not model.load_model():
+        raise ValueError(f"No trained model at {model_path}")
+    available = input_columns(input_path)
+    keep_columns = list(keep_columns)
+    missing = [field for field in model.features + keep_columns if field not in available]
+    if missing:
+        raise ValueError(f"Input is missing columns: {', '.join(missing)}")
+    columns = list(dict.fromkeys(model.features + keep_columns))
+
+    # Checkpoint chỉ hợp lệ với đúng đầu vào, mô hình và tùy chọn đầu ra đã tạo ra nó
+    input_stat = os.stat(input_path)
+    run_info = {
+        'input': os.path.abspath(input_path),
+        'input_size': input_stat.st_size,
+        'input_mtime_ns': input_stat.st_mtime_ns,
+        'model_version': model.model_version,
+        'keep_columns': keep_columns,
+        'output_format': output_format
+    }
+    checkpoint_path = _checkpoint_path(output_path)
+    checkpoint = _load_checkpoint(checkpoint_path, run_info) if resume else None
+    if checkpoint is None and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+    rows_done = checkpoint['rows_done'] if checkpoint else 0
+    errors = checkpoint['errors'] if checkpoint else 0
+    resumed_from = rows_done
+    del model
+
+    writer = _OutputWriter(output_path, output_format, keep_columns + ['prediction', 'error'], checkpoint)
+    if workers > 0:
+        executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                       initargs=(model_path, scaler_path))
+    else:
+        executor = _InlineExecutor(model_path, scaler_path)
+
+    start = last_report = time.perf_counter()
+    fraction = 0.0
+    # Các khối đang xử lý theo thứ tự gửi: ghi lần lượt từ đầu hàng đợi nên đầu ra luôn
+    # đúng thứ tự đầu vào; giới hạn số khối đang xử lý để bộ nhớ không tăng theo kích thước file
+    pending = deque()
+    max_pending = max(2 * workers, 2)
+
+    def write_next():
+        nonlocal rows_done, errors, last_report
+        n_rows, valid_rows, payload = pending.popleft().result()
+        writer.write(payload)
+        rows_done += n_rows
+        errors += n_rows - valid_rows
+        _write_checkpoint(checkpoint_path, dict(
+            run_info, rows_done=rows_done, errors=errors,
+            chunks_done=writer.chunks_written, output_bytes=writer.tell()
+        ))
+        now = time.perf_counter()
+        if progress_every and now - last_report >= progress_every:
+            last_report = now
+            rate = (rows_done - resumed_from) / (now - start)
+            eta = (now - start) * (1 - fraction) / fraction if fraction > 0 else float('nan')
+            print(f"{rows_done:,} rows ({fraction:.0%} of input), {rate:,.0f} rows/s, ETA {eta:.0f}s",
+                  file=sys.stderr, flush=True)
+
+    try:
+        for frame, fraction in iter_chunks(input_path, columns, chunk_rows, skip_rows=rows_done):
+            pending.append(executor.submit(score_chunk, frame, keep_columns, output_format))
+            if len(pending) >= max_pending:
+                write_next()
+        while pending:
+            write_next()
+    finally:
+        # Hủy các khối chưa bắt đầu (khi vòng lặp lỗi) rồi chờ các khối đang chạy;
+        # không dùng shutdown(cancel_futures=...) vì tham số này chỉ có từ Python 3.9
+        for future in pending:
+            future.cancel()
+        executor.shutdown(wait=True)
+        writer.close()
+
+    os.remove(checkpoint_path)  # Hoàn tất: không còn gì để chạy tiếp
+    elapsed = time.perf_counter() - start
+    return {
+        'rows': rows_done,
+        'errors': errors,
+        'seconds': elapsed,
+        'rows_per_s': (rows_done - resumed_from) / elapsed if elapsed > 0 else 0.0,
+        'resumed_from': resumed_from
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Chấm điểm ngoại tuyến một file CSV/Parquet lớn bằng EmissionModel")
+    parser.add_argument('input', help="File đầu vào (.csv hoặc .parquet) có các cột đặc trưng của mô hình")
+    parser.add_argument('output', help="File kết quả .csv, hoặc thư mục .parquet (mỗi khối một file)")
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1,
+                        help="Số process worker (0 = chạy trong process chính)")
+    parser.add_argument('--chunk-rows', type=int, default=DEFAULT_CHUNK_ROWS, help="Số hàng mỗi khối")
+    parser.add_argument('--keep', nargs='*', default=[], help="Các cột đầu vào chép sang kết quả")
+    parser.add_argument('--resume', action='store_true', help="Chạy tiếp từ checkpoint của lần chạy bị gián đoạn")
+    parser.add_argument('--model', default='models/trained_model.joblib', help="Đường dẫn mô hình")
+    parser.add_argument('--scaler', default='models/trained_scaler.joblib', help="Đường dẫn bộ chuẩn hóa")
+    parser.add_argument('--progress-every', type=float, default=PROGRESS_EVERY_S,
+                        help="Giây giữa hai dòng báo tiến độ (0 = tắt)")
+    args = parser.parse_args()
+
+    try:
+        stats = bulk_score(args.input, args.output, workers=args.workers, chunk_rows=args.chunk_rows,
+                           keep_columns=args.keep, resume=args.resume, model_path=args.model,
+                           scaler_path=args.scaler, progress_every=args.progress_every)
+    except ValueError as e:
+        print(f"Error: {e}", file=sys.stderr)
+        return 2
+
+    resumed = f" (resumed after {stats['resumed_from']:,} rows)" if stats['resumed_from'] else ''
+    print(f"Scored {stats['rows']:,} rows{resumed} in {stats['seconds']:.1f}s "
+          f"({stats['rows_per_s']:,.0f} rows/s), {stats['errors']:,} rows with errors -> {args.output}")
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -2,6 +2,7 @@
 # Lớp này đóng vai trò trung gian giữa mô hình và giao diện người dùng
 
 from models.emission_model import EmissionModel
+from models.model_snapshot import ModelSnapshot
 import pandas as pd
 import requests
 import os
@@ -15,9 +16,15 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)  # Khởi tạo logger cho module này
 
 class EmissionController:
-    def __init__(self):
+    def __init__(self, model_path=None, scaler_path=None):
         # Khởi tạo EmissionController với các thuộc tính ban đầu
-        self.model = EmissionModel()  # Tạo instance của mô hình dự đoán
+        model_paths = {}
+        if model_path:
+            model_paths['model_path'] = model_path  # Đường dẫn mô hình tùy chọn (dùng khi tải lại nóng)
+        if scaler_path:
+            model_paths['scaler_path'] = scaler_path  # Đường dẫn bộ chuẩn hóa tùy chọn
+        self.model = EmissionModel(**model_paths)  # Tạo instance của mô hình dự đoán
+        self.test_score = None  # Điểm kiểm tra của mô hình
         self.trained = False  # Trạng thái huấn luyện của mô hình
         self.avg_emission = None  # Giá trị trung bình của khí thải CO2
         # URL API từ biến môi trường hoặc mặc định là localhost
@@ -27,24 +34,41 @@ class EmissionController:
         """Khởi tạo và huấn luyện mô hình"""
         logger.info("Khởi tạo mô hình...")
         
-        # Thử tải mô hình đã huấn luyện trước
-        if self.model.load_model():
-            logger.info("Đã tải thành công mô hình đã huấn luyện trước đó")
-            self.trained = True
-        else:
+        if not (os.path.exists(self.model.model_path) and os.path.exists(self.model.scaler_path)):
             logger.info("Không tìm thấy mô hình đã huấn luyện. Đang huấn luyện mô hình mới...")
             
-        # Lấy điểm kiểm tra (được tính từ mô hình đã tải hoặc từ quá trình huấn luyện)
+        # Tải mô hình đã huấn luyện (kèm metadata) nếu có, nếu không thì huấn luyện mới.
+        # Điểm kiểm tra được lấy từ metadata hoặc từ quá trình huấn luyện
         test_score = self.model.train(data_path)
         self.trained = True
         
-        # Tính toán giá trị khí thải trung bình
-        df = self.model.load_and_preprocess_data(data_path)
-        self.avg_emission = df['CO2 Emissions(g/km)'].mean()
+        # Giá trị khí thải trung bình đã được lưu trong metadata khi huấn luyện
+        self.avg_emission = self.model.metadata['avg_emission']
         
+        self.test_score = test_score
         logger.info(f"Khởi tạo mô hình hoàn tất. Điểm kiểm tra: {test_score:.3f}")
         return test_score
 
+    def load_trained_model(self, data_path):
+        """Chỉ tải mô hình đã huấn luyện (không huấn luyện lại), dùng khi tải lại nóng"""
+        if not self.model.load_model():
+            raise FileNotFoundError(f"Không tìm thấy mô hình tại {self.model.model_path}")
+        self.trained = True
+        self.test_score = self.model.metadata.get('test_score')
+        
+        # Giá trị khí thải trung bình lấy từ metadata; artifact cũ chưa có metadata thì tính từ CSV
+        self.avg_emission = self.model.metadata.get('avg_emission')
+        if self.avg_emission is None:
+            df = self.model.load_and_preprocess_data(data_path, columns=[self.model.target])
+            self.avg_emission = df['CO2 Emissions(g/km)'].mean()
+
+    def build_snapshot(self):
+        """Đóng gói mô hình đã khởi tạo thành ảnh chụp bất biến cho server"""
+        if not self.trained:
+            raise ValueError("Mô hình cần được huấn luyện trước!")
+        
+        return ModelSnapshot(self.model, self.avg_emission, self.test_score)
+
     def predict_emission(self, features):
         """Dự đoán khí thải sử dụng mô hình cục bộ"""
         if not self.trained:
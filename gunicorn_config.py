@@ -1,8 +1,76 @@
 import os
+import gc
+import math
 import multiprocessing
 
+# Bộ nhớ dự trù cho mỗi worker (MB): RSS của một process Flask đã tải mô hình (~250-300 MB).
+# Với preload phần lớn là trang chia sẻ, nhưng giới hạn bộ nhớ của container tính theo RSS khi trang bị ghi lại
+WORKER_MEMORY_MB = int(os.environ.get('WORKER_MEMORY_MB', 300))
+
+def _read_first_line(path):
+    """Dòng đầu của một file hệ thống, None nếu không đọc được"""
+    try:
+        with open(path) as f:
+            return f.readline().strip()
+    except OSError:
+        return None
+
+def cgroup_cpu_limit():
+    """Số CPU theo hạn mức cgroup (cpu.max của v2 hoặc cfs_quota của v1), None nếu không giới hạn"""
+    line = _read_first_line('/sys/fs/cgroup/cpu.max')
+    if line:
+        quota, _, period = line.partition(' ')
+    else:
+        quota = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_quota_us')
+        period = _read_first_line('/sys/fs/cgroup/cpu/cpu.cfs_period_us')
+    try:
+        quota, period = int(quota), int(period)
+    except (TypeError, ValueError):
+        return None  # 'max', -1 hoặc không có cgroup
+    if quota <= 0 or period <= 0:
+        return None
+    return max(1, math.ceil(quota / period))
+
+def memory_limit_bytes():
+    """Bộ nhớ dùng được: nhỏ nhất của giới hạn cgroup và MemAvailable, None nếu không xác định"""
+    limits = []
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        value = _read_first_line(path)
+        if value and value.isdigit() and int(value) < 1 << 60:  # v1 dùng số rất lớn cho "không giới hạn"
+            limits.append(int(value))
+    try:
+        with open('/proc/meminfo') as f:
+            for line in f:
+                if line.startswith('MemAvailable:'):
+                    limits.append(int(line.split()[1]) * 1024)
+                    break
+    except OSError:
+        pass
+    return min(limits) if limits else None
+
+def available_cores():
+    """Số lõi CPU mà process được phép dùng (tôn trọng CPU affinity và hạn mức CPU của container)"""
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = multiprocessing.cpu_count()
+    quota = cgroup_cpu_limit()
+    return min(cores, quota) if quota else cores
+
+def default_workers():
+    """Số worker mặc định: một worker mỗi lõi được phép, nhưng không vượt quá bộ nhớ dành cho WORKER_MEMORY_MB mỗi worker"""
+    workers = available_cores()
+    memory = memory_limit_bytes()
+    if memory is not None:
+        workers = min(workers, memory // (WORKER_MEMORY_MB * 1024 * 1024))
+    return max(1, workers)
+
 # Cấu hình worker cho gunicorn - Tối ưu hóa cho trường hợp nhiều request đồng thời
-workers = 1  # Giảm xuống 1 worker để tránh cạnh tranh tài nguyên - tốt hơn cho mô hình ML
+# Mỗi worker là một process riêng (vượt qua giới hạn GIL), mặc định một worker cho mỗi lõi
+# trong hạn mức CPU và bộ nhớ của container. Mô hình được tải một lần trong master trước khi
+# fork (xem when_ready), rừng mảng phẳng được memory-map từ file .npy nên các worker dùng
+# chung trang bộ nhớ thay vì sao chép
+workers = int(os.environ.get('WEB_CONCURRENCY') or default_workers())
 threads = 8  # Tăng số lượng thread lên 8 để xử lý nhiều request đồng thời trong một worker
 
 # Cấu hình kết nối - Địa chỉ IP và cổng để lắng nghe request
@@ -32,6 +100,29 @@ loglevel = 'error'  # Chỉ ghi log lỗi nghiêm trọng
 accesslog = None  # Tắt access log để giảm I/O
 errorlog = '-'  # Ghi error log ra stderr
 
+def when_ready(server):
+    """
+    Tải mô hình trong process master trước khi fork các worker
+    
+    Với preload_app, api_server đã được import trong master; khởi tạo mô hình tại đây
+    để mọi worker kế thừa cùng một ảnh chụp qua copy-on-write. gc.freeze() chuyển các
+    đối tượng hiện có sang thế hệ vĩnh viễn để bộ thu gom rác của worker không chạm
+    (và do đó không sao chép) các trang bộ nhớ chứa chúng.
+    """
+    import api_server
+    if not api_server.initialize_model():
+        server.log.error("Model preload failed; workers will initialize in the background")
+    gc.freeze()
+
+def post_worker_init(worker):
+    """
+    Bắt đầu làm nóng (và khởi tạo mô hình nếu master chưa tải được) trong thread nền
+    
+    Worker nhận kết nối ngay; /health/ready chỉ trả về 200 sau khi bộ gom lô và
+    cache của worker đã được chạy thử bằng một lô dữ liệu tổng hợp.
+    """
+    import api_server
+    api_server.start_background_initialization()
+
 # Cấu hình loại bỏ - Được giữ lại trong file để dễ tham khảo
-# post_worker_init = None  # Không sử dụng hàm callback sau khi worker được khởi tạo
 # post_fork = None  # Không sử dụng hàm callback sau khi fork worker 
\ No newline at end of file
@@ -0,0 +1,219 @@
+# Mô tả: Công cụ thu gọn rừng ngẫu nhiên - đánh đổi độ chính xác lấy kích thước và độ trễ
+# Đánh giá các biến thể (giới hạn độ sâu, số mẫu tối thiểu ở lá, bớt số cây, ngưỡng/giá trị
+# float32) trên đúng tập kiểm tra của EmissionModel.train, in bảng R², kích thước artifact,
+# thời gian tải và độ trễ mỗi hàng, rồi xuất biến thể được chọn thành artifact mô hình thay thế
+# Chạy: python -m models.compact_forest --tolerance 0.002 --output models/compact/trained_model.joblib
+
+import argparse
+import copy
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+import numpy as np
+from sklearn.base import clone
+from sklearn.metrics import r2_score
+from sklearn.model_selection import train_test_split
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emission_model import EmissionModel
+from models.flat_forest import FlatForest
+
+# Các biến thể được đánh giá; trees là tỉ lệ số cây so với mô hình gốc
+VARIANTS = [
+    {},
+    {'trees': 0.5},
+    {'trees': 0.25},
+    {'max_depth': 16},
+    {'max_depth': 12},
+    {'max_depth': 10},
+    {'max_depth': 8},
+    {'min_samples_leaf': 2},
+    {'min_samples_leaf': 5},
+    {'min_samples_leaf': 10},
+    {'max_depth': 12, 'trees': 0.5},
+    {'min_samples_leaf': 5, 'trees': 0.5},
+]
+
+
+def variant_name(spec, n_trees, float32=False):
+    """Tên ngắn của biến thể, ví dụ 'depth=12,trees=50,f32'"""
+    parts = []
+    if 'max_depth' in spec:
+        parts.append(f"depth={spec['max_depth']}")
+    if 'min_samples_leaf' in spec:
+        parts.append(f"leaf={spec['min_samples_leaf']}")
+    if 'trees' in spec:
+        parts.append(f"trees={n_trees}")
+    if float32:
+        parts.append('f32')
+    return ','.join(parts) or 'baseline'
+
+
+def held_out_split(model, data_path):
+    """Chia dữ liệu giống hệt EmissionModel.train, trả về (X_train, y_train, X_test, y_test) dạng NumPy"""
+    df = model.load_and_preprocess_data(data_path, columns=model.features + [model.target])
+    X, y = model.prepare_features(df)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    return X_train, y_train.to_numpy(), X_test.to_numpy(dtype=np.float64), y_test.to_numpy()
+
+
+def fit_variant(base_forest, spec, X_train_scaled, y_train):
+    """
+    Tạo rừng của một biến thể
+
+    Chỉ bớt số cây thì lấy các cây đầu của rừng gốc (giống hệt rừng fit trực tiếp với
+    cùng random_state); có giới hạn độ sâu/lá thì huấn luyện lại với tham số gốc.
+    """
+    n_trees = max(1, int(len(base_forest.estimators_) * spec.get('trees', 1.0)))
+    if 'max_depth' not in spec and 'min_samples_leaf' not in spec:
+        forest = copy.copy(base_forest)  # Dùng chung các cây với rừng gốc (không sửa cây)
+        forest.estimators_ = base_forest.estimators_[:n_trees]
+        forest.n_estimators = n_trees
+        return forest
+
+    forest = clone(base_forest).set_params(
+        n_estimators=n_trees, warm_start=False, oob_score=False, n_jobs=-1,
+        max_depth=spec.get('max_depth'), min_samples_leaf=spec.get('min_samples_leaf', 1)
+    )
+    forest.fit(X_train_scaled, y_train)
+    forest.set_params(n_jobs=None)  # Dự đoán một luồng như mô hình gốc
+    return forest
+
+
+def build_model(base, forest, flat_forest, model_path, metadata):
+    """Đóng gói rừng thành EmissionModel dùng chung bộ chuẩn hóa của mô hình gốc và lưu ra đĩa"""
+    model = EmissionModel(model_path=model_path,
+                          scaler_path=os.path.join(os.path.dirname(model_path), 'trained_scaler.joblib'))
+    model.model = forest
+    model.scaler = base.scaler
+    model.flat_forest = flat_forest
+    model.metadata = metadata
+    model.save_model()
+    return model
+
+
+def artifact_bytes(model):
+    """Tổng dung lượng của artifact: mô hình, bộ chuẩn hóa, rừng mảng phẳng và metadata"""
+    paths = [model.model_path, model.scaler_path, model.metadata_path]
+    paths += [os.path.join(model.flat_forest_path, f"{name}.npy") for name in FlatForest.ARRAY_NAMES]
+    return sum(os.path.getsize(path) for path in paths)
+
+
+def load_seconds(model_path, repeats=3):
+    """Thời gian tải artifact nhỏ nhất (giây) qua EmissionModel.load_model"""
+    best = float('inf')
+    for _ in range(repeats):
+        model = EmissionModel(model_path=model_path,
+                              scaler_path=os.path.join(os.path.dirname(model_path), 'trained_scaler.joblib'))
+        start = time.perf_counter()
+        model.load_model()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def row_latency_us(flat_forest, rows, repeats=3):
+    """Độ trễ trung bình (µs) của dự đoán từng hàng (đường /predict), lấy lượt nhanh nhất"""
+    flat_forest.predict_row(rows[0])  # Làm nóng
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for row in rows:
+            flat_forest.predict_row(row)
+        best = min(best, time.perf_counter() - start)
+    return best / len(rows) * 1e6
+
+
+def compaction_metadata(base, forest, spec, float32, test_score, tolerance):
+    """Metadata cho artifact đã thu gọn, dựa trên metadata của mô hình gốc"""
+    metadata = {key: value for key, value in base.metadata.items() if key != 'training'}
+    metadata.update({
+        'test_score': float(test_score),
+        'trained_at': datetime.now(timezone.utc).isoformat(),
+        'model_params': {
+            'n_estimators': len(forest.estimators_),
+            'random_state': forest.random_state,
+            'max_depth': forest.max_depth,
+            'min_samples_leaf': forest.min_samples_leaf
+        },
+        'compaction': {
+            'variant': variant_name(spec, len(forest.estimators_), float32),
+            'float32': float32,
+            'tolerance': tolerance,
+            'base_test_score': base.metadata.get('test_score'),
+            'base_n_estimators': len(base.model.estimators_),
+            'base_n_nodes': base.flat_forest.n_nodes
+        }
+    })
+    return metadata
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Đánh giá các biến thể thu gọn rừng và xuất biến thể được chọn")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu")
+    parser.add_argument('--tolerance', type=float, default=0.002,
+                        help="Mức giảm R² tối đa so với mô hình gốc khi chọn biến thể")
+    parser.add_argument('--allow-float32', action='store_true',
+                        help="Cho phép chọn biến thể float32 (dự đoán chỉ xấp xỉ, không còn khớp từng bit với /predict/batch)")
+    parser.add_argument('--latency-rows', type=int, default=1000, help="Số hàng dùng để đo độ trễ")
+    parser.add_argument('--output', default='models/compact/trained_model.joblib',
+                        help="Đường dẫn artifact được xuất (bộ chuẩn hóa, rừng mảng phẳng và metadata đặt cạnh)")
+    args = parser.parse_args()
+
+    base = EmissionModel()
+    base.train(args.data)
+    X_train, y_train, X_test, y_test = held_out_split(base, args.data)
+    X_train_scaled = base.scaler.transform(X_train)
+    rows = [list(base.feature_values(dict(zip(base.features, row)))) for row in X_test[:args.latency_rows].tolist()]
+
+    results = []
+    print(f"{'variant':<24}{'trees':>6}{'nodes':>9}{'test R2':>9}{'f32 |diff|':>11}"
+          f"{'size MB':>9}{'load ms':>9}{'us/row':>8}")
+    with tempfile.TemporaryDirectory() as workdir:
+        for spec in VARIANTS:
+            forest = fit_variant(base.model, spec, X_train_scaled, y_train)
+            flat64 = FlatForest.from_sklearn(forest, base.scaler)
+            predictions64 = flat64.predict(X_test)
+            for float32, flat_forest in ((False, flat64), (True, flat64.to_float32())):
+                name = variant_name(spec, len(forest.estimators_), float32)
+                predictions = flat_forest.predict(X_test)
+                test_score = r2_score(y_test, predictions)
+                model_path = os.path.join(workdir, name, 'trained_model.joblib')
+                model = build_model(base, forest, flat_forest, model_path,
+                                    compaction_metadata(base, forest, spec, float32, test_score, args.tolerance))
+                result = {
+                    'spec': spec, 'float32': float32, 'name': name, 'trees': len(forest.estimators_),
+                    'nodes': flat_forest.n_nodes, 'test_score': test_score,
+                    'max_diff': float(np.abs(predictions - predictions64).max()),
+                    'size_mb': artifact_bytes(model) / 1e6, 'load_ms': load_seconds(model_path) * 1000,
+                    'latency_us': row_latency_us(flat_forest, rows)
+                }
+                results.append(result)
+                diff = f"{result['max_diff']:.2f}" if float32 else '-'  # Sai lệch của float32 so với float64
+                print(f"{name:<24}{result['trees']:>6}{result['nodes']:>9}{test_score:>9.4f}{diff:>11}"
+                      f"{result['size_mb']:>9.1f}{result['load_ms']:>9.1f}{result['latency_us']:>8.1f}")
+
+    # Chọn biến thể nhanh nhất (độ trễ từng hàng) mà R² không giảm quá tolerance
+    base_score = results[0]['test_score']
+    candidates = [r for r in results
+                  if r['test_score'] >= base_score - args.tolerance and (args.allow_float32 or not r['float32'])]
+    chosen = min(candidates, key=lambda r: (r['latency_us'], r['size_mb']))
+    print(f"\nChosen: {chosen['name']} (R2 {chosen['test_score']:.4f} vs {base_score:.4f}, "
+          f"{chosen['size_mb']:.1f} MB vs {results[0]['size_mb']:.1f} MB, "
+          f"{chosen['latency_us']:.1f} vs {results[0]['latency_us']:.1f} us/row)")
+
+    # Dựng lại biến thể được chọn (tất định theo random_state) và xuất thành artifact thay thế
+    forest = fit_variant(base.model, chosen['spec'], X_train_scaled, y_train)
+    flat_forest = FlatForest.from_sklearn(forest, base.scaler)
+    if chosen['float32']:
+        flat_forest = flat_forest.to_float32()
+    build_model(base, forest, flat_forest, args.output,
+                compaction_metadata(base, forest, chosen['spec'], chosen['float32'], chosen['test_score'], args.tolerance))
+    print(f"Wrote {args.output}")
+
+
+if __name__ == '__main__':
+    main()
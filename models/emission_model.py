@@ -5,14 +5,37 @@ import pandas as pd
 import numpy as np
 import os
 import joblib  # Thư viện lưu/tải mô hình ML
+import time
+import threading
+import json
+import hashlib
+import shutil
+import tempfile
+import warnings
+from datetime import datetime, timezone
+import sklearn
 from sklearn.ensemble import RandomForestRegressor  
+from sklearn.base import clone  # Sao chép tham số của estimator (không sao chép trạng thái đã fit)
 from sklearn.preprocessing import StandardScaler  # Chuẩn hóa dữ liệu
 from sklearn.model_selection import train_test_split  # Chia dữ liệu huấn luyện/kiểm tra
+from models.flat_forest import FlatForest  # Rừng dạng mảng phẳng cho đường dự đoán nhanh
+
+# Phiên bản bước tiền xử lý: tăng khi thay đổi _preprocess_csv để các cache cũ không còn được dùng
+PREPROCESS_VERSION = 1
 
 class EmissionModel:
-    def __init__(self):
-        # Khởi tạo mô hình rừng ngẫu nhiên với 100 cây và hạt giống cố định
-        self.model = RandomForestRegressor(n_estimators=100, random_state=42)
+    def __init__(self, model_path='models/trained_model.joblib', scaler_path='models/trained_scaler.joblib'):
+        # Tham số tăng trưởng rừng khi huấn luyện: thêm dần từng nhóm cây (warm start) và dừng
+        # khi điểm OOB không còn cải thiện, nên rừng chỉ lớn vừa đủ để đạt độ chính xác
+        self.tree_step = 10  # Số cây thêm vào mỗi bước
+        self.max_estimators = 300  # Số cây tối đa
+        self.min_oob_gain = 0.001  # Mức tăng R² OOB tối thiểu để coi là còn cải thiện
+        self.oob_patience = 2  # Số bước liên tiếp không cải thiện trước khi dừng
+        self.n_jobs = -1  # Số lõi CPU dùng khi huấn luyện (-1 = tất cả)
+        # Mô hình rừng ngẫu nhiên với hạt giống cố định, lớn dần theo tree_step
+        self.model = RandomForestRegressor(
+            n_estimators=self.tree_step, random_state=42, warm_start=True, oob_score=True
+        )
         self.scaler = StandardScaler()  # Bộ chuẩn hóa dữ liệu
         self.features = [
             'Engine Size(L)',  # Kích thước động cơ (lít)
@@ -22,23 +45,71 @@ class EmissionModel:
             'Weight (kg)',  # Trọng lượng xe (tính năng mới)
             'Year'  # Năm sản xuất (tính năng mới)
         ]
+        # Số chữ số thập phân của từng đặc trưng (theo độ chính xác của dữ liệu/giao diện nhập)
+        # Chỉ dùng để tạo khóa cache 'canonical' (2 và 2.0 là cùng một khóa); giá trị đưa vào
+        # mô hình luôn là số thực gốc, không làm tròn
+        self.feature_precision = {
+            'Engine Size(L)': 1,
+            'Cylinders': 0,
+            'Fuel Consumption Comb (L/100 km)': 1,
+            'Horsepower': 0,
+            'Weight (kg)': 0,
+            'Year': 0
+        }
         self.target = 'CO2 Emissions(g/km)'  # Biến mục tiêu: lượng phát thải CO2
         self.trained = False  # Trạng thái huấn luyện
-        self.model_path = 'models/trained_model.joblib'  # Đường dẫn lưu mô hình
-        self.scaler_path = 'models/trained_scaler.joblib'  # Đường dẫn lưu bộ chuẩn hóa
+        self.model_version = None  # Phiên bản mô hình (dùng làm không gian tên cho cache)
+        self.model_path = model_path  # Đường dẫn lưu mô hình
+        self.scaler_path = scaler_path  # Đường dẫn lưu bộ chuẩn hóa
+        # Thư mục lưu rừng dạng mảng phẳng, đặt cạnh file mô hình
+        self.flat_forest_path = os.path.splitext(model_path)[0] + '_forest'
+        # File metadata huấn luyện (điểm kiểm tra, khí thải trung bình, lược đồ, hash dữ liệu)
+        self.metadata_path = os.path.splitext(model_path)[0] + '.meta.json'
+        self.metadata = {}  # Metadata của mô hình đang tải
+        # Thư mục cache dạng cột của dữ liệu đã tiền xử lý, đặt cạnh mô hình
+        self.preprocessed_dir = os.path.join(os.path.dirname(model_path), 'preprocessed')
+        self.flat_forest = None  # Rừng dạng mảng phẳng (đã gộp bộ chuẩn hóa)
+        # Cho phép ghi lại rừng mảng phẳng khi thiếu/không khớp mô hình; tắt với artifact bất biến (kho phiên bản)
+        self.export_flat_forest = True
+        # Trạng thái cho đường dự đoán nhanh một hàng (không dùng pandas)
+        self._row_buffers = threading.local()  # Bộ đệm hàng cấp phát sẵn, riêng cho mỗi thread
+        self._scaler_mean = None  # mean_ của bộ chuẩn hóa
+        self._scaler_scale = None  # scale_ của bộ chuẩn hóa
+        self._trees = []  # Cấu trúc cây (tree_) của từng cây trong rừng
+
+    def load_and_preprocess_data(self, data_path, columns=None, use_cache=True):
+        """
+        Tải dữ liệu đã tiền xử lý, chỉ với các cột cần dùng
+
+        Lần đầu đọc CSV, tiền xử lý rồi ghi cache dạng cột (mỗi cột một file .npy có kiểu
+        dữ liệu gọn) trong thư mục khóa theo hash nội dung CSV và PREPROCESS_VERSION. Các lần
+        sau chỉ memory-map các cột được yêu cầu, không phân tích lại CSV.
+        """
+        if not use_cache:
+            df = self._preprocess_csv(data_path)
+            return df if columns is None else df[list(columns)]
+
+        cache_dir = self.preprocessed_cache_path(data_path)
+        if not os.path.exists(os.path.join(cache_dir, 'columns.json')):
+            self._write_preprocessed_cache(self._preprocess_csv(data_path), cache_dir, data_path)
+        return self._load_preprocessed_cache(cache_dir, columns)
 
-    def load_and_preprocess_data(self, data_path):
-        """Tải và tiền xử lý dữ liệu"""
+    def _preprocess_csv(self, data_path):
+        """Đọc CSV và tiền xử lý (thêm đặc trưng tổng hợp, ánh xạ nhiên liệu, lọc khí tự nhiên)"""
         df = pd.read_csv(data_path)  # Đọc file CSV
         
         # Thêm các tính năng tổng hợp cho mục đích demo
-        np.random.seed(42)  # Đặt hạt giống cho việc tạo số ngẫu nhiên
+        # RandomState(42) cho đúng dãy số như np.random.seed(42) nhưng không đổi trạng thái toàn cục
+        rng = np.random.RandomState(42)
         # Tạo tính năng công suất dựa trên kích thước động cơ
-        df['Horsepower'] = df['Engine Size(L)'] * 100 + np.random.normal(0, 10, len(df))
+        df['Horsepower'] = df['Engine Size(L)'] * 100 + rng.normal(0, 10, len(df))
         # Tạo tính năng trọng lượng dựa trên kích thước động cơ
-        df['Weight (kg)'] = df['Engine Size(L)'] * 500 + np.random.normal(0, 50, len(df))
+        df['Weight (kg)'] = df['Engine Size(L)'] * 500 + rng.normal(0, 50, len(df))
         # Tạo tính năm sản xuất ngẫu nhiên
-        df['Year'] = np.random.randint(2015, 2024, len(df))
+        df['Year'] = rng.randint(2015, 2024, len(df))
+        
+        # Loại bỏ các phương tiện sử dụng khí tự nhiên (quá ít mẫu) - so sánh mã, không tìm chuỗi
+        df = df[df["Fuel Type"] != "N"].reset_index(drop=True)
         
         # Ánh xạ các loại nhiên liệu
         fuel_type_mapping = {
@@ -46,15 +117,76 @@ class EmissionModel:
             "X": "Regular Gasoline",  # Xăng thông thường
             "D": "Diesel",  # Dầu diesel
             "E": "Ethanol(E85)",  # Nhiên liệu ethanol
-            "N": "Natural Gas"  # Khí tự nhiên
         }
         df["Fuel Type"] = df["Fuel Type"].map(fuel_type_mapping)
         
-        # Loại bỏ các phương tiện sử dụng khí tự nhiên (quá ít mẫu)
-        df = df[~df["Fuel Type"].str.contains("Natural Gas")].reset_index(drop=True)
-        
         return df
 
+    def preprocessed_cache_path(self, data_path):
+        """Thư mục cache của dữ liệu đã tiền xử lý, khóa theo hash nội dung CSV và phiên bản tiền xử lý"""
+        data_hash = self.compute_data_hash(data_path).split(':', 1)[1]
+        stem = os.path.splitext(os.path.basename(data_path))[0].replace(' ', '_')
+        return os.path.join(self.preprocessed_dir, f"{stem}-{data_hash[:16]}-v{PREPROCESS_VERSION}")
+
+    def _write_preprocessed_cache(self, df, cache_dir, data_path):
+        """Ghi mỗi cột thành một file .npy (chuỗi -> mã category, số nguyên -> kiểu nhỏ nhất đủ chứa)"""
+        os.makedirs(self.preprocessed_dir, exist_ok=True)
+        # Ghi vào thư mục tạm rồi đổi tên, để process khác không bao giờ đọc phải cache dở dang
+        temp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=self.preprocessed_dir)
+        columns = []
+        for i, name in enumerate(df.columns):
+            series = df[name]
+            entry = {'name': name, 'file': f"col_{i:02d}.npy"}
+            if series.dtype == object or isinstance(series.dtype, pd.StringDtype):
+                categorical = pd.Categorical(series)
+                values = categorical.codes  # int8/int16 tùy số giá trị khác nhau, -1 là thiếu
+                entry['categories'] = categorical.categories.tolist()
+            elif np.issubdtype(series.dtype, np.integer):
+                values = series.to_numpy()
+                for dtype in (np.int8, np.int16, np.int32):
+                    info = np.iinfo(dtype)
+                    if len(values) == 0 or (info.min <= values.min() and values.max() <= info.max):
+                        values = values.astype(dtype)
+                        break
+            else:
+                values = series.to_numpy(dtype=np.float64)  # Giữ nguyên giá trị số thực
+            np.save(os.path.join(temp_dir, entry['file']), values, allow_pickle=False)
+            entry['dtype'] = str(values.dtype)
+            columns.append(entry)
+
+        with open(os.path.join(temp_dir, 'columns.json'), 'w', encoding='utf-8') as f:
+            json.dump({
+                'preprocess_version': PREPROCESS_VERSION,
+                'data_file': os.path.basename(data_path),
+                'data_hash': self.compute_data_hash(data_path),
+                'n_rows': int(len(df)),
+                'columns': columns
+            }, f, ensure_ascii=False, indent=2)
+        try:
+            os.rename(temp_dir, cache_dir)
+        except OSError:
+            shutil.rmtree(temp_dir, ignore_errors=True)  # Process khác đã ghi xong cùng cache
+            if not os.path.exists(os.path.join(cache_dir, 'columns.json')):
+                raise
+
+    def _load_preprocessed_cache(self, cache_dir, columns=None):
+        """Memory-map các cột được yêu cầu của cache thành DataFrame (cột số không sao chép)"""
+        with open(os.path.join(cache_dir, 'columns.json'), encoding='utf-8') as f:
+            entries = {entry['name']: entry for entry in json.load(f)['columns']}
+        names = list(entries) if columns is None else list(columns)
+        missing = [name for name in names if name not in entries]
+        if missing:
+            raise KeyError(f"Cột không có trong dữ liệu: {', '.join(missing)}")
+
+        data = {}
+        for name in names:
+            entry = entries[name]
+            values = np.load(os.path.join(cache_dir, entry['file']), mmap_mode='r')
+            if 'categories' in entry:
+                values = pd.Categorical.from_codes(values, categories=entry['categories'])
+            data[name] = values
+        return pd.DataFrame(data, copy=False)
+
     def prepare_features(self, df):
         """Chuẩn bị các đặc trưng cho huấn luyện/dự đoán"""
         X = df[self.features].copy()  # Trích xuất các cột đặc trưng
@@ -72,12 +204,157 @@ class EmissionModel:
         # Lưu mô hình và bộ chuẩn hóa
         joblib.dump(self.model, self.model_path)
         joblib.dump(self.scaler, self.scaler_path)
+
+        # Xuất rừng dạng mảng phẳng đi kèm mô hình, đánh dấu bằng hash nội dung của mô hình vừa ghi
+        self.flat_forest.save(self.flat_forest_path, stamp=self._artifact_stamp())
+
+        # Lưu metadata huấn luyện cạnh file mô hình
+        self.save_metadata()
+
+    def save_metadata(self):
+        """Ghi metadata huấn luyện ra file JSON (ghi file tạm rồi đổi tên để tránh file dở dang)"""
+        temp_path = self.metadata_path + '.tmp'
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.metadata, f, ensure_ascii=False, indent=2)
+        os.replace(temp_path, self.metadata_path)
+
+    def load_metadata(self):
+        """Đọc metadata huấn luyện, trả về dictionary rỗng nếu chưa có"""
+        if not os.path.exists(self.metadata_path):
+            return {}
+        with open(self.metadata_path, encoding='utf-8') as f:
+            return json.load(f)
+
+    @staticmethod
+    def compute_data_hash(data_path):
+        """Tính SHA-256 nội dung file dữ liệu (đọc theo khối, không phân tích CSV)"""
+        digest = hashlib.sha256()
+        with open(data_path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        return 'sha256:' + digest.hexdigest()
+
+    def _build_metadata(self, data_path, df, test_score, n_train, n_test, trained_at=None, training=None):
+        """Tạo metadata huấn luyện từ dữ liệu đã tiền xử lý và kết quả đánh giá"""
+        if trained_at is None:
+            trained_at = datetime.now(timezone.utc)
+        metadata = {
+            'test_score': float(test_score),  # Điểm R² trên tập kiểm tra
+            'avg_emission': float(df[self.target].mean()),  # Khí thải trung bình của bộ dữ liệu
+            'features': list(self.features),  # Lược đồ đặc trưng theo đúng thứ tự
+            'feature_precision': dict(self.feature_precision),
+            'target': self.target,
+            'data_file': os.path.basename(data_path),
+            'data_hash': self.compute_data_hash(data_path),
+            'n_rows': int(len(df)),
+            'n_train': int(n_train),
+            'n_test': int(n_test),
+            'trained_at': trained_at.isoformat(),
+            'sklearn_version': sklearn.__version__,
+            'model_params': {
+                'n_estimators': len(self.model.estimators_),
+                'random_state': self.model.random_state
+            }
+        }
+        if training is not None:
+            metadata['training'] = training  # Thời gian fit, số lõi, đường cong OOB
+        return metadata
+
+    def fit_forest(self, X_train_scaled, y_train):
+        """
+        Huấn luyện rừng bằng cách thêm dần tree_step cây (warm start) trên mọi lõi CPU
+
+        Sau mỗi bước đo R² out-of-bag; dừng khi oob_patience bước liên tiếp không tăng
+        được min_oob_gain so với điểm tốt nhất, rồi cắt rừng về kích thước tốt nhất đó.
+        Với cùng random_state, rừng n cây giống hệt rừng fit trực tiếp n cây.
+        """
+        # Bản sao chưa huấn luyện của mô hình, bắt đầu từ rừng rỗng
+        model = clone(self.model).set_params(warm_start=True, oob_score=True, n_jobs=self.n_jobs)
+        model.n_estimators = 0  # Tăng trước mỗi lần fit nên không bao giờ fit với 0 cây
+        self.model = model
+        oob_curve = []  # [(số cây, R² OOB)]
+        best_n, best_score, stale_steps = 0, -np.inf, 0
+        stopped_because = 'max_estimators'
+
+        start = time.perf_counter()
+        while model.n_estimators < self.max_estimators:
+            model.set_params(n_estimators=min(model.n_estimators + self.tree_step, self.max_estimators))
+            with warnings.catch_warnings():
+                # Vài bước đầu có mẫu chưa nằm ngoài túi của cây nào: sklearn cảnh báo, điểm vẫn dùng được
+                warnings.simplefilter('ignore', UserWarning)
+                model.fit(X_train_scaled, y_train)
+            oob_curve.append((model.n_estimators, float(model.oob_score_)))
+
+            if model.oob_score_ >= best_score + self.min_oob_gain:
+                best_n, best_score, stale_steps = model.n_estimators, model.oob_score_, 0
+            else:
+                stale_steps += 1
+                if stale_steps >= self.oob_patience:
+                    stopped_because = 'oob_plateau'
+                    break
+        fit_seconds = time.perf_counter() - start
+
+        # Bỏ các cây thêm sau điểm tốt nhất (warm start chỉ nối thêm cây nên đây đúng là rừng best_n cây)
+        if best_n < model.n_estimators:
+            model.estimators_ = model.estimators_[:best_n]
+            model.set_params(n_estimators=best_n)
+            del model.oob_score_, model.oob_prediction_  # Không còn khớp với rừng đã cắt
+        # Phục vụ dự đoán trên một luồng: song song hóa đã nằm ở tầng process/batcher
+        model.set_params(n_jobs=None, warm_start=False)
+
+        return {
+            'fit_seconds': fit_seconds,
+            'n_jobs': self.n_jobs,
+            'cpu_count': os.cpu_count(),
+            'n_estimators': best_n,
+            'oob_score': float(best_score),
+            'stopped_because': stopped_because,
+            'tree_step': self.tree_step,
+            'oob_curve': oob_curve
+        }
+
+    def _compute_model_version(self):
+        """Xác định phiên bản mô hình từ kích thước và thời điểm ghi file mô hình"""
+        stat = os.stat(self.model_path)
+        return f"{stat.st_size:x}-{stat.st_mtime_ns:x}"
+
+    def _artifact_stamp(self):
+        """Hash SHA-256 nội dung file mô hình và bộ chuẩn hóa (đánh dấu rừng mảng phẳng đã xuất từ chúng)"""
+        digest = hashlib.sha256()
+        for path in (self.model_path, self.scaler_path):
+            with open(path, 'rb') as f:
+                for block in iter(lambda: f.read(1 << 20), b''):
+                    digest.update(block)
+        return 'sha256:' + digest.hexdigest()
+
+    def _load_flat_forest(self):
+        """Tải rừng dạng mảng phẳng đã xuất, hoặc xuất lại nếu chưa có/dấu nguồn không khớp mô hình"""
+        stamp = self._artifact_stamp()
+        if FlatForest.exists(self.flat_forest_path) and FlatForest.read_stamp(self.flat_forest_path) == stamp:
+            return FlatForest.load(self.flat_forest_path, mmap_mode='r')
+
+        # Lưu ra thư mục mới rồi đổi tên (xem FlatForest.save): process khác đang map rừng cũ không bị ảnh hưởng
+        flat_forest = FlatForest.from_sklearn(self.model, self.scaler)
+        if self.export_flat_forest:
+            flat_forest.save(self.flat_forest_path, stamp=stamp)
+        return flat_forest
+
+    def _prepare_fast_path(self):
+        """Trích xuất tham số chuẩn hóa và các cây cho đường dự đoán nhanh"""
+        self._scaler_mean = self.scaler.mean_
+        self._scaler_scale = self.scaler.scale_
+        self._trees = [estimator.tree_ for estimator in self.model.estimators_]
+        self._row_buffers = threading.local()  # Bỏ các bộ đệm cũ gắn với mô hình trước
         
     def load_model(self):
         """Tải mô hình đã huấn luyện và bộ chuẩn hóa từ đĩa"""
         if os.path.exists(self.model_path) and os.path.exists(self.scaler_path):
             self.model = joblib.load(self.model_path)
             self.scaler = joblib.load(self.scaler_path)
+            self.metadata = self.load_metadata()
+            self.flat_forest = self._load_flat_forest()
+            self.model_version = self._compute_model_version()
+            self._prepare_fast_path()
             self.trained = True
             return True
         return False
@@ -87,16 +364,23 @@ class EmissionModel:
         # Thử tải mô hình trước
         if self.load_model():
             print("Đã tải mô hình đã huấn luyện từ đĩa")
-            # Vẫn cần tính toán điểm test cho các đánh giá
-            df = self.load_and_preprocess_data(data_path)
+            # Điểm test đã được lưu trong metadata khi huấn luyện - không cần đọc lại CSV
+            if 'test_score' in self.metadata and 'avg_emission' in self.metadata:
+                return self.metadata['test_score']
+
+            # Mô hình cũ chưa có metadata: tính điểm test một lần rồi ghi bổ sung
+            df = self.load_and_preprocess_data(data_path, columns=self.features + [self.target])
             X, y = self.prepare_features(df)
             X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
             X_test_scaled = self.scaler.transform(X_test)
             test_score = self.model.score(X_test_scaled, y_test)
+            trained_at = datetime.fromtimestamp(os.path.getmtime(self.model_path), timezone.utc)
+            self.metadata = self._build_metadata(data_path, df, test_score, len(X_train), len(X_test), trained_at)
+            self.save_metadata()
             return test_score
             
         # Nếu không có mô hình đã huấn luyện, huấn luyện mô hình mới
-        df = self.load_and_preprocess_data(data_path)
+        df = self.load_and_preprocess_data(data_path, columns=self.features + [self.target])
         X, y = self.prepare_features(df)
         
         # Chia dữ liệu
@@ -105,20 +389,76 @@ class EmissionModel:
         # Chuẩn hóa các đặc trưng
         X_train_scaled = self.scaler.fit_transform(X_train)
         
-        # Huấn luyện mô hình
-        self.model.fit(X_train_scaled, y_train)
+        # Huấn luyện mô hình (rừng lớn dần đến khi điểm OOB không còn cải thiện)
+        training = self.fit_forest(X_train_scaled, y_train)
+        self.flat_forest = FlatForest.from_sklearn(self.model, self.scaler)
+        self._prepare_fast_path()
         self.trained = True
         
-        # Lưu mô hình đã huấn luyện
-        self.save_model()
-        
-        # Tính toán và trả về các chỉ số
+        # Tính toán các chỉ số
         X_test_scaled = self.scaler.transform(X_test)
         test_score = self.model.score(X_test_scaled, y_test)
+        self.metadata = self._build_metadata(data_path, df, test_score, len(X_train), len(X_test),
+                                             training=training)
+        
+        # Lưu mô hình đã huấn luyện (kèm metadata)
+        self.save_model()
+        self.model_version = self._compute_model_version()
         return test_score
 
+    def _get_row_buffers(self):
+        """Lấy (hoặc cấp phát lần đầu) bộ đệm một hàng của thread hiện tại"""
+        buffers = self._row_buffers
+        if not hasattr(buffers, 'row'):
+            buffers.row = np.empty((1, len(self.features)), dtype=np.float64)  # Hàng đặc trưng gốc
+            buffers.row32 = np.empty((1, len(self.features)), dtype=np.float32)  # Hàng đã chuẩn hóa cho cây
+        return buffers.row, buffers.row32
+
     def predict(self, features_dict):
-        """Thực hiện dự đoán"""
+        """Thực hiện dự đoán (đường nhanh, không dùng pandas và bỏ qua kiểm tra đầu vào của sklearn)"""
+        if not self.trained:
+            raise ValueError("Mô hình cần được huấn luyện trước!")
+
+        row, row32 = self._get_row_buffers()
+        values = row[0]
+        for j, field in enumerate(self.features):
+            values[j] = features_dict[field]
+
+        # Cùng phép toán với StandardScaler.transform: (x - mean_) / scale_, thực hiện tại chỗ
+        np.subtract(row, self._scaler_mean, out=row)
+        np.divide(row, self._scaler_scale, out=row)
+        # Rừng ngẫu nhiên của sklearn luôn duyệt cây trên float32
+        np.copyto(row32, row, casting='same_kind')
+
+        # Cộng dồn theo đúng thứ tự cây rồi chia như RandomForestRegressor.predict
+        total = 0.0
+        for tree in self._trees:
+            total += tree.predict(row32)[0, 0]
+        return total / len(self._trees)
+
+    def predict_compiled(self, features_dict):
+        """Dự đoán bằng rừng dạng mảng phẳng: không chuẩn hóa, không cấp phát mảng tạm"""
+        if not self.trained:
+            raise ValueError("Mô hình cần được huấn luyện trước!")
+
+        return self.flat_forest.predict_row([features_dict[field] for field in self.features])
+
+    def predict_compiled_batch(self, rows):
+        """Dự đoán cho nhiều hàng đặc trưng gốc (theo thứ tự self.features) bằng rừng mảng phẳng"""
+        if not self.trained:
+            raise ValueError("Mô hình cần được huấn luyện trước!")
+
+        return self.flat_forest.predict(rows)
+
+    def region_signature(self, values):
+        """Chữ ký vùng (theo ngưỡng tách của rừng) của bộ đặc trưng đã xác thực, dùng làm khóa cache"""
+        if not self.trained:
+            raise ValueError("Mô hình cần được huấn luyện trước!")
+
+        return self.flat_forest.region_signature(values)
+
+    def predict_reference(self, features_dict):
+        """Dự đoán qua DataFrame và API công khai của sklearn (đường tham chiếu để đối chiếu)"""
         if not self.trained:
             raise ValueError("Mô hình cần được huấn luyện trước!")
             
@@ -133,6 +473,114 @@ class EmissionModel:
         
         return prediction
 
+    def feature_values(self, features_dict):
+        """Xác thực bộ đặc trưng thành tuple số thực hữu hạn theo thứ tự self.features (không làm tròn)"""
+        values = []
+        for field in self.features:
+            value = float(features_dict[field])
+            if not np.isfinite(value):
+                raise ValueError(f"Invalid value for field '{field}'")
+            values.append(value + 0.0)  # + 0.0 để -0.0 và 0.0 trùng khóa
+        return tuple(values)
+
+    def canonicalize(self, values):
+        """Làm tròn bộ đặc trưng đã xác thực (feature_values) theo self.feature_precision - chỉ dùng làm khóa cache"""
+        return tuple(
+            round(value, self.feature_precision[field]) + 0.0
+            for field, value in zip(self.features, values)
+        )
+
+    def validate_records(self, records):
+        """Xác thực danh sách bản ghi trong một lượt và xếp vào ma trận NumPy liên tục"""
+        n_features = len(self.features)
+        # Ma trận float64 liên tục (C-order), mỗi hàng là một phương tiện
+        X = np.zeros((len(records), n_features), dtype=np.float64)
+        errors = [None] * len(records)  # Thông báo lỗi theo từng hàng (None nếu hợp lệ)
+
+        for i, record in enumerate(records):
+            if not isinstance(record, dict):
+                errors[i] = 'Record must be a JSON object'
+                continue
+
+            missing = [field for field in self.features if field not in record]
+            if missing:
+                errors[i] = f"Missing fields: {', '.join(missing)}"
+                continue
+
+            try:
+                for j, field in enumerate(self.features):
+                    # Ép kiểu giống hệt endpoint /predict để kết quả hai đường nhất quán
+                    X[i, j] = float(record[field])
+            except (TypeError, ValueError, OverflowError):
+                X[i] = 0.0
+                errors[i] = f"Invalid value for field '{field}'"
+                continue
+
+            if not np.isfinite(X[i]).all():
+                X[i] = 0.0
+                errors[i] = 'Feature values must be finite numbers'
+
+        valid_mask = np.array([error is None for error in errors], dtype=bool)
+        return X, valid_mask, errors
+
+    def validate_matrix(self, X):
+        """Xác thực ma trận số (n_rows, n_features) theo thứ tự self.features"""
+        X = np.asarray(X, dtype=np.float64)  # Không sao chép nếu đã là float64
+        if X.ndim != 2 or X.shape[1] != len(self.features):
+            raise ValueError(f"Matrix must have shape (n_rows, {len(self.features)}) in feature order")
+
+        valid_mask = np.isfinite(X).all(axis=1)
+        if not valid_mask.all():
+            X = X.copy()  # Không sửa bộ đệm của người gọi
+            X[~valid_mask] = 0.0
+        errors = [None if valid else 'Feature values must be finite numbers' for valid in valid_mask.tolist()]
+        return X, valid_mask, errors
+
+    def predict_batch(self, records):
+        """Dự đoán cho nhiều phương tiện với một lần chuẩn hóa và một lần gọi mô hình"""
+        # Giai đoạn 1: xác thực và dựng ma trận đầu vào
+        stage_start = time.perf_counter()
+        X, valid_mask, errors = self.validate_records(records)
+        return self._predict_validated(X, valid_mask, errors, time.perf_counter() - stage_start)
+
+    def predict_matrix(self, X):
+        """Dự đoán cho ma trận đặc trưng số (ví dụ giải mã từ .npy/Arrow/msgpack) theo thứ tự self.features"""
+        stage_start = time.perf_counter()
+        X, valid_mask, errors = self.validate_matrix(X)
+        return self._predict_validated(X, valid_mask, errors, time.perf_counter() - stage_start)
+
+    def _predict_validated(self, X, valid_mask, errors, validation_time):
+        """Chuẩn hóa và dự đoán các hàng hợp lệ của ma trận đã xác thực"""
+        if not self.trained:
+            raise ValueError("Mô hình cần được huấn luyện trước!")
+
+        X_valid = X[valid_mask] if not valid_mask.all() else X
+        predictions = np.full(len(X), np.nan)  # NaN cho các hàng không hợp lệ
+        scaling_time = inference_time = 0.0
+
+        if len(X_valid) > 0:
+            # Giai đoạn 2: một lần gọi StandardScaler.transform cho cả lô
+            stage_start = time.perf_counter()
+            # Bọc ma trận (không sao chép) kèm tên cột vì scaler được fit trên DataFrame
+            X_scaled = self.scaler.transform(pd.DataFrame(X_valid, columns=self.features, copy=False))
+            scaling_time = time.perf_counter() - stage_start
+
+            # Giai đoạn 3: một lần duyệt rừng ngẫu nhiên cho cả lô
+            stage_start = time.perf_counter()
+            predictions[valid_mask] = self.model.predict(X_scaled)
+            inference_time = time.perf_counter() - stage_start
+
+        return {
+            'predictions': predictions,  # Mảng dự đoán, NaN ở các hàng lỗi
+            'errors': errors,  # Lỗi theo từng hàng
+            'valid_rows': int(valid_mask.sum()),  # Số hàng hợp lệ
+            'timings_ms': {
+                'validation': validation_time * 1000,
+                'scaling': scaling_time * 1000,
+                'inference': inference_time * 1000
+            }
+        }
+
     def get_feature_importance(self):
         """Lấy điểm quan trọng của các đặc trưng"""
         if not self.trained:
@@ -0,0 +1,262 @@
+# Mô tả: Rừng ngẫu nhiên dạng mảng phẳng (structure-of-arrays) cho đường dự đoán nhanh
+# Xuất RandomForestRegressor đã huấn luyện thành các mảng liên tục theo nút và gộp
+# StandardScaler vào ngưỡng tách, để khi dự đoán không cần chuẩn hóa dữ liệu
+
+import json
+import os
+import shutil
+import tempfile
+from bisect import bisect_left
+import numpy as np
+
+STAMP_FILE = 'stamp.json'  # Dấu nguồn của rừng đã xuất (hash nội dung artifact mô hình)
+
+
+def _fold_thresholds(threshold, mean, scale):
+    """
+    Chuyển ngưỡng tách từ không gian đã chuẩn hóa sang không gian dữ liệu gốc
+
+    Cây của sklearn so sánh float32((x - mean) / scale) <= threshold. Hàm này tìm
+    (bằng chia đôi trên các số float64) giá trị x lớn nhất vẫn đi sang nhánh trái,
+    nên phép so sánh x <= ngưỡng_gộp cho đúng cùng một nhánh với sklearn.
+    """
+    def goes_left(x):
+        return ((x - mean) / scale).astype(np.float32) <= threshold
+
+    guess = threshold * scale + mean
+    width = (np.abs(guess) + scale) * 1e-6
+    lo, hi = guess - width, guess + width
+
+    # Nới rộng khoảng cho đến khi lo đi trái và hi đi phải
+    while True:
+        bad_lo = ~goes_left(lo)
+        bad_hi = goes_left(hi)
+        if not (bad_lo.any() or bad_hi.any()):
+            break
+        width *= 2
+        lo = np.where(bad_lo, guess - width, lo)
+        hi = np.where(bad_hi, guess + width, hi)
+
+    # Chia đôi cho đến khi lo và hi là hai số float64 liền kề
+    while (np.nextafter(lo, np.inf) < hi).any():
+        mid = lo + (hi - lo) / 2
+        left = goes_left(mid)
+        lo = np.where(left, mid, lo)
+        hi = np.where(left, hi, mid)
+    return lo
+
+
+class FlatForest:
+    """
+    Rừng ngẫu nhiên lưu dưới dạng các mảng phẳng theo nút
+
+    Mỗi nút có: chỉ số đặc trưng, ngưỡng (đã gộp bộ chuẩn hóa), con trái, con phải
+    và giá trị lá. Nút lá trỏ về chính nó ở cả hai nhánh (ngưỡng +inf), nên việc
+    duyệt dừng khi nút con trùng nút hiện tại.
+    """
+    ARRAY_NAMES = ('feature', 'threshold', 'left', 'right', 'value', 'roots')
+    # Dưới ngưỡng số hàng này, duyệt từng hàng bằng Python nhanh hơn duyệt vector hóa
+    VECTORIZE_MIN_ROWS = 4
+
+    def __init__(self, feature, threshold, left, right, value, roots):
+        self.feature = feature  # Chỉ số đặc trưng dùng để tách tại mỗi nút (int32)
+        self.threshold = threshold  # Ngưỡng tách trong không gian dữ liệu gốc (float64)
+        self.left = left  # Chỉ số nút con trái (int32)
+        self.right = right  # Chỉ số nút con phải (int32)
+        self.value = value  # Giá trị dự đoán tại nút lá (float64)
+        self.roots = roots  # Chỉ số nút gốc của từng cây (int32)
+        # memoryview cho phép đọc từng phần tử mà không tạo đối tượng NumPy tạm
+        self._feature_view = memoryview(feature)
+        self._threshold_view = memoryview(threshold)
+        self._left_view = memoryview(left)
+        self._right_view = memoryview(right)
+        self._value_view = memoryview(value)
+        self._root_list = roots.tolist()
+        # Các ngưỡng tách không trùng của từng đặc trưng, đã sắp xếp (nút lá có ngưỡng +inf)
+        split = np.isfinite(threshold)
+        n_features = int(feature[split].max()) + 1 if split.any() else 0
+        self.split_edges = [np.unique(threshold[split & (feature == j)]) for j in range(n_features)]
+        self._edge_lists = [edges.tolist() for edges in self.split_edges]
+
+    @classmethod
+    def from_sklearn(cls, forest, scaler=None):
+        """Xuất RandomForestRegressor (và StandardScaler tùy chọn) sang dạng mảng phẳng"""
+        features, thresholds, lefts, rights, values, roots = [], [], [], [], [], []
+        offset = 0
+        for estimator in forest.estimators_:
+            tree = estimator.tree_
+            node_ids = np.arange(offset, offset + tree.node_count)
+            is_leaf = tree.children_left == -1
+
+            feature = np.where(is_leaf, 0, tree.feature)
+            threshold = tree.threshold.astype(np.float64)
+            if scaler is not None:
+                split = ~is_leaf
+                threshold[split] = _fold_thresholds(
+                    threshold[split], scaler.mean_[feature[split]], scaler.scale_[feature[split]]
+                )
+            threshold[is_leaf] = np.inf
+
+            roots.append(offset)
+            features.append(feature)
+            thresholds.append(threshold)
+            lefts.append(np.where(is_leaf, node_ids, tree.children_left + offset))
+            rights.append(np.where(is_leaf, node_ids, tree.children_right + offset))
+            values.append(tree.value[:, 0, 0])
+            offset += tree.node_count
+
+        return cls(
+            feature=np.ascontiguousarray(np.concatenate(features), dtype=np.int32),
+            threshold=np.ascontiguousarray(np.concatenate(thresholds), dtype=np.float64),
+            left=np.ascontiguousarray(np.concatenate(lefts), dtype=np.int32),
+            right=np.ascontiguousarray(np.concatenate(rights), dtype=np.int32),
+            value=np.ascontiguousarray(np.concatenate(values), dtype=np.float64),
+            roots=np.asarray(roots, dtype=np.int32)
+        )
+
+    def to_float32(self):
+        """
+        Bản sao gọn hơn: ngưỡng và giá trị lá float32, chỉ số đặc trưng int8
+
+        Chỉ số đặc trưng đổi kiểu không mất thông tin. Ngưỡng float32 có thể đổi nhánh
+        với các giá trị nằm sát ngưỡng, nên dự đoán chỉ xấp xỉ rừng float64.
+        """
+        return FlatForest(
+            feature=self.feature.astype(np.int8),
+            threshold=self.threshold.astype(np.float32),
+            left=np.asarray(self.left),
+            right=np.asarray(self.right),
+            value=self.value.astype(np.float32),
+            roots=np.asarray(self.roots)
+        )
+
+    @property
+    def n_trees(self):
+        """Số cây trong rừng"""
+        return len(self._root_list)
+
+    @property
+    def n_nodes(self):
+        """Tổng số nút của tất cả các cây"""
+        return len(self.feature)
+
+    @property
+    def nbytes(self):
+        """Tổng dung lượng (byte) của các mảng"""
+        return sum(getattr(self, name).nbytes for name in self.ARRAY_NAMES)
+
+    def predict_row(self, x):
+        """
+        Dự đoán cho một hàng đặc trưng gốc (list/tuple theo thứ tự EmissionModel.features)
+
+        Duyệt từng cây bằng vòng lặp thuần Python trên memoryview, không cấp phát
+        mảng tạm. Cộng dồn theo thứ tự cây rồi chia như RandomForestRegressor.predict.
+        """
+        feature = self._feature_view
+        threshold = self._threshold_view
+        left = self._left_view
+        right = self._right_view
+        total = 0.0
+        for node in self._root_list:
+            while True:
+                child = left[node] if x[feature[node]] <= threshold[node] else right[node]
+                if child == node:
+                    break
+                node = child
+            total += self._value_view[node]
+        return total / len(self._root_list)
+
+    def region_signature(self, x):
+        """
+        Chữ ký vùng của một hàng đặc trưng gốc: với mỗi đặc trưng, số ngưỡng tách nhỏ hơn giá trị
+
+        Mỗi nút so sánh x <= ngưỡng, nên hai hàng có cùng chữ ký đi cùng nhánh ở mọi nút
+        của mọi cây và có dự đoán giống hệt nhau từng bit. Đặc trưng không được dùng để
+        tách không có trong chữ ký.
+        """
+        return tuple(bisect_left(edges, value) for edges, value in zip(self._edge_lists, x))
+
+    def region_signatures(self, X):
+        """Chữ ký vùng cho ma trận đặc trưng gốc (n_rows, n_features), trả về mảng số nguyên"""
+        X = np.asarray(X, dtype=np.float64)
+        return np.column_stack([
+            np.searchsorted(edges, X[:, j], side='left') for j, edges in enumerate(self.split_edges)
+        ])
+
+    def predict(self, X):
+        """Dự đoán cho ma trận đặc trưng gốc (n_rows, n_features), duyệt mọi cây song song theo mức"""
+        X = np.asarray(X, dtype=np.float64)
+        n_rows = X.shape[0]
+        if n_rows < self.VECTORIZE_MIN_ROWS:
+            return np.array([self.predict_row(row) for row in X.tolist()], dtype=np.float64)
+
+        row_index = np.arange(n_rows)[:, None]
+        nodes = np.repeat(self.roots[None, :], n_rows, axis=0)
+        while True:
+            go_left = X[row_index, self.feature[nodes]] <= self.threshold[nodes]
+            next_nodes = np.where(go_left, self.left[nodes], self.right[nodes])
+            if np.array_equal(next_nodes, nodes):
+                break
+            nodes = next_nodes
+
+        # Cộng dồn theo thứ tự cây để khớp từng bit với sklearn
+        leaf_values = self.value[nodes]
+        total = np.zeros(n_rows, dtype=np.float64)
+        for t in range(self.n_trees):
+            total += leaf_values[:, t]
+        return total / self.n_trees
+
+    def save(self, directory, stamp=None):
+        """
+        Lưu mỗi mảng thành một file .npy trong thư mục (có thể memory-map khi tải)
+
+        Không bao giờ ghi đè file đang được memory-map: mảng được ghi vào thư mục tạm rồi
+        đổi tên thay thư mục cũ. Thư mục cũ chỉ bị xóa liên kết (unlink), nên process đang
+        map nó vẫn đọc đúng mảng cũ cho đến khi đóng. stamp (ví dụ hash nội dung mô hình)
+        được ghi kèm để lần tải sau biết rừng thuộc về artifact nào.
+        """
+        parent = os.path.dirname(os.path.abspath(directory))
+        os.makedirs(parent, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix='.tmp-', dir=parent)
+        try:
+            for name in self.ARRAY_NAMES:
+                np.save(os.path.join(temp_dir, f"{name}.npy"), getattr(self, name))
+            with open(os.path.join(temp_dir, STAMP_FILE), 'w', encoding='utf-8') as f:
+                json.dump({'stamp': stamp}, f)
+            retired_dir = None
+            if os.path.exists(directory):
+                # Dời thư mục cũ sang chỗ khác trước (rename không đụng tới nội dung file)
+                retired_dir = tempfile.mkdtemp(prefix='.old-', dir=parent)
+                os.rename(directory, os.path.join(retired_dir, 'forest'))
+            os.rename(temp_dir, directory)
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        if retired_dir is not None:
+            shutil.rmtree(retired_dir, ignore_errors=True)
+
+    @classmethod
+    def load(cls, directory, mmap_mode=None):
+        """Tải rừng từ thư mục .npy; mmap_mode='r' để chia sẻ trang bộ nhớ giữa các process"""
+        arrays = {
+            name: np.load(os.path.join(directory, f"{name}.npy"), mmap_mode=mmap_mode)
+            for name in cls.ARRAY_NAMES
+        }
+        return cls(**arrays)
+
+    @staticmethod
+    def read_stamp(directory):
+        """Dấu nguồn đã ghi khi lưu rừng, None nếu không có (rừng xuất bởi phiên bản cũ)"""
+        try:
+            with open(os.path.join(directory, STAMP_FILE), encoding='utf-8') as f:
+                return json.load(f).get('stamp')
+        except (OSError, ValueError):
+            return None
+
+    @staticmethod
+    def exists(directory):
+        """Kiểm tra thư mục có chứa đủ các mảng của một rừng đã xuất hay không"""
+        return all(
+            os.path.exists(os.path.join(directory, f"{name}.npy"))
+            for name in FlatForest.ARRAY_NAMES
+        )
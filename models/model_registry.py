@@ -0,0 +1,254 @@
+# Mô tả: Kho phiên bản mô hình cục bộ (model registry)
+# Mỗi phiên bản là một thư mục bất biến đặt tên theo hash nội dung, chứa đủ bộ artifact
+# (mô hình, bộ chuẩn hóa, rừng mảng phẳng, metadata). Con trỏ "current" (phiên bản đang
+# phục vụ) và "next" (phiên bản cần tải trước) là các file JSON nhỏ được thay nguyên tử,
+# nên process phục vụ không bao giờ đọc phải artifact đang ghi dở.
+# Chạy: python -m models.model_registry {list,train,publish,stage,activate,rollback}
+#
+# Cấu trúc thư mục:
+#   <root>/versions/<version>/trained_model.joblib, trained_scaler.joblib,
+#                             trained_model.meta.json, trained_model_forest/*.npy
+#   <root>/current.json  {"version", "previous", "updated_at"}
+#   <root>/next.json     {"version", "updated_at"}
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import shutil
+import sys
+import tempfile
+import time
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emission_model import EmissionModel
+
+# Tên file của artifact bên trong thư mục phiên bản (giống bố cục mặc định của EmissionModel)
+MODEL_FILE = 'trained_model.joblib'
+SCALER_FILE = 'trained_scaler.joblib'
+# Mã phiên bản hợp lệ: 16 ký tự hex đầu của SHA-256 (xem publish); mọi giá trị khác bị từ chối
+# trước khi dựng đường dẫn, nên không thể thoát ra ngoài versions/ bằng '../'
+VERSION_PATTERN = re.compile(r'^[0-9a-f]{16}$')
+
+
+class ModelRegistry:
+    def __init__(self, root='models/registry'):
+        self.root = root  # Thư mục gốc của kho
+        self.versions_dir = os.path.join(root, 'versions')  # Các phiên bản bất biến
+
+    @staticmethod
+    def is_valid_version(version):
+        """Mã phiên bản có đúng dạng hash 16 ký tự hex hay không"""
+        return isinstance(version, str) and VERSION_PATTERN.match(version) is not None
+
+    def version_dir(self, version):
+        """Thư mục của một phiên bản (ValueError nếu mã phiên bản không hợp lệ)"""
+        if not self.is_valid_version(version):
+            raise ValueError(f"Invalid model version {version!r}: expected 16 lowercase hex characters")
+        return os.path.join(self.versions_dir, version)
+
+    def artifact_paths(self, version):
+        """(model_path, scaler_path) của một phiên bản, dùng cho EmissionModel/EmissionController"""
+        if not self.has_version(version):
+            raise KeyError(f"Không có phiên bản {version} trong kho {self.root}")
+        directory = self.version_dir(version)
+        return os.path.join(directory, MODEL_FILE), os.path.join(directory, SCALER_FILE)
+
+    def has_version(self, version):
+        """Phiên bản đã được công bố đầy đủ hay chưa"""
+        return self.is_valid_version(version) and os.path.isdir(self.version_dir(version))
+
+    @staticmethod
+    def artifact_files(model_path, scaler_path):
+        """Danh sách (tên tương đối trong kho, đường dẫn nguồn) của một artifact, theo thứ tự cố định"""
+        model = EmissionModel(model_path=model_path, scaler_path=scaler_path)
+        files = [(MODEL_FILE, model_path), (SCALER_FILE, scaler_path)]
+        if os.path.exists(model.metadata_path):
+            files.append(('trained_model.meta.json', model.metadata_path))
+        if os.path.isdir(model.flat_forest_path):
+            for name in sorted(os.listdir(model.flat_forest_path)):
+                files.append((f"trained_model_forest/{name}", os.path.join(model.flat_forest_path, name)))
+        return files
+
+    def publish(self, model_path, scaler_path, activate=False):
+        """
+        Sao chép một artifact vào kho dưới dạng phiên bản bất biến, trả về mã phiên bản
+
+        Mã phiên bản là 16 ký tự đầu của SHA-256 trên tên và nội dung mọi file, nên
+        công bố lại cùng artifact không tạo bản sao. File được ghi vào thư mục tạm rồi
+        đổi tên, nên thư mục phiên bản chỉ xuất hiện khi đã đầy đủ.
+        """
+        if not (os.path.exists(model_path) and os.path.exists(scaler_path)):
+            raise FileNotFoundError(f"Không tìm thấy mô hình tại {model_path}")
+        os.makedirs(self.versions_dir, exist_ok=True)
+        temp_dir = tempfile.mkdtemp(prefix='.publish-', dir=self.versions_dir)
+        try:
+            digest = hashlib.sha256()
+            for name, source in self.artifact_files(model_path, scaler_path):
+                target = os.path.join(temp_dir, name)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                digest.update(name.encode() + b'\0')
+                with open(source, 'rb') as src, open(target, 'wb') as dst:
+                    for block in iter(lambda: src.read(1 << 20), b''):
+                        digest.update(block)
+                        dst.write(block)
+                    dst.flush()
+                    os.fsync(dst.fileno())  # Nội dung nằm trên đĩa trước khi thư mục được công bố
+            version = digest.hexdigest()[:16]
+            if self.has_version(version):
+                shutil.rmtree(temp_dir)  # Đã có phiên bản giống hệt
+            else:
+                os.rename(temp_dir, self.version_dir(version))
+        except BaseException:
+            shutil.rmtree(temp_dir, ignore_errors=True)
+            raise
+        if activate:
+            self.activate(version)
+        return version
+
+    def list_versions(self):
+        """Các phiên bản trong kho kèm metadata chính, sắp xếp theo thời điểm công bố"""
+        if not os.path.isdir(self.versions_dir):
+            return []
+        versions = []
+        for version in os.listdir(self.versions_dir):
+            if not self.is_valid_version(version):
+                continue  # Thư mục tạm của lần công bố đang chạy hoặc bị dừng giữa chừng
+            model = EmissionModel(*self.artifact_paths(version))
+            metadata = model.load_metadata()
+            versions.append({
+                'version': version,
+                'published_at': os.path.getmtime(self.version_dir(version)),
+                'trained_at': metadata.get('trained_at'),
+                'test_score': metadata.get('test_score'),
+                'n_estimators': metadata.get('model_params', {}).get('n_estimators')
+            })
+        return sorted(versions, key=lambda v: v['published_at'])
+
+    def read_pointer(self, name):
+        """Đọc con trỏ 'current' hoặc 'next', trả về dictionary rỗng nếu chưa có"""
+        path = os.path.join(self.root, f"{name}.json")
+        if not os.path.exists(path):
+            return {}
+        with open(path, encoding='utf-8') as f:
+            return json.load(f)
+
+    def _write_pointer(self, name, pointer):
+        """Ghi con trỏ ra file tạm rồi đổi tên (os.replace là nguyên tử)"""
+        os.makedirs(self.root, exist_ok=True)
+        path = os.path.join(self.root, f"{name}.json")
+        temp_path = f"{path}.{os.getpid()}.tmp"
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(pointer, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+
+    def current_version(self):
+        """Phiên bản đang được chỉ định phục vụ (None nếu kho chưa có con trỏ)"""
+        return self.read_pointer('current').get('version')
+
+    def next_version(self):
+        """Phiên bản được chỉ định tải trước (None nếu không có)"""
+        return self.read_pointer('next').get('version')
+
+    def stage(self, version):
+        """Đánh dấu phiên bản cần tải trước; process phục vụ tải và làm nóng nó trong nền"""
+        if not self.has_version(version):
+            raise KeyError(f"Không có phiên bản {version} trong kho {self.root}")
+        self._write_pointer('next', {'version': version, 'updated_at': time.time()})
+
+    def activate(self, version):
+        """Chuyển con trỏ current sang phiên bản, ghi nhớ phiên bản trước để quay lui"""
+        if not self.has_version(version):
+            raise KeyError(f"Không có phiên bản {version} trong kho {self.root}")
+        previous = self.current_version()
+        if previous == version:
+            return
+        self._write_pointer('current', {'version': version, 'previous': previous, 'updated_at': time.time()})
+        if self.next_version() == version:
+            try:
+                os.remove(os.path.join(self.root, 'next.json'))  # Phiên bản tải trước đã được kích hoạt
+            except FileNotFoundError:
+                pass  # Một process khác vừa xóa con trỏ
+
+    def rollback(self):
+        """Quay lui về phiên bản trước đó của con trỏ current, trả về phiên bản được kích hoạt"""
+        previous = self.read_pointer('current').get('previous')
+        if not previous:
+            raise ValueError("Không có phiên bản trước đó để quay lui")
+        self.activate(previous)
+        return previous
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Quản lý kho phiên bản mô hình cục bộ")
+    parser.add_argument('--registry', default='models/registry', help="Thư mục gốc của kho")
+    commands = parser.add_subparsers(dest='command', required=True)
+    commands.add_parser('list', help="Liệt kê các phiên bản và con trỏ")
+    train = commands.add_parser('train', help="Huấn luyện mô hình mới vào thư mục tạm rồi công bố")
+    train.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu")
+    train.add_argument('--activate', action='store_true', help="Kích hoạt ngay phiên bản mới")
+    train.add_argument('--stage', action='store_true', help="Đánh dấu phiên bản mới để tải trước")
+    publish = commands.add_parser('publish', help="Công bố một artifact có sẵn")
+    publish.add_argument('--model-path', default='models/trained_model.joblib', help="Đường dẫn file mô hình")
+    publish.add_argument('--scaler-path', default=None,
+                         help="Đường dẫn bộ chuẩn hóa (mặc định: trained_scaler.joblib cạnh mô hình)")
+    publish.add_argument('--activate', action='store_true', help="Kích hoạt ngay phiên bản mới")
+    publish.add_argument('--stage', action='store_true', help="Đánh dấu phiên bản mới để tải trước")
+    for name in ('stage', 'activate'):
+        commands.add_parser(name, help=f"Con trỏ {name}").add_argument('version', help="Mã phiên bản")
+    commands.add_parser('rollback', help="Quay lui về phiên bản trước")
+    args = parser.parse_args()
+
+    registry = ModelRegistry(args.registry)
+    try:
+        if args.command == 'list':
+            current, upcoming = registry.current_version(), registry.next_version()
+            print(f"{'version':<18}{'published':>21}{'test R2':>9}{'trees':>7}  pointer")
+            for entry in registry.list_versions():
+                pointer = 'current' if entry['version'] == current else 'next' if entry['version'] == upcoming else ''
+                published = time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(entry['published_at']))
+                score = f"{entry['test_score']:.4f}" if entry['test_score'] is not None else '-'
+                print(f"{entry['version']:<18}{published:>21}{score:>9}{entry['n_estimators'] or '-':>7}  {pointer}")
+            return 0
+
+        if args.command in ('train', 'publish'):
+            if args.command == 'train':
+                # Huấn luyện vào thư mục tạm: không ghi đè artifact đang được phục vụ
+                with tempfile.TemporaryDirectory() as workdir:
+                    model = EmissionModel(model_path=os.path.join(workdir, MODEL_FILE),
+                                          scaler_path=os.path.join(workdir, SCALER_FILE))
+                    model.preprocessed_dir = 'models/preprocessed'  # Dùng chung cache dữ liệu đã tiền xử lý
+                    test_score = model.train(args.data)
+                    version = registry.publish(model.model_path, model.scaler_path)
+                print(f"Trained test R2 {test_score:.4f}")
+            else:
+                scaler_path = args.scaler_path or os.path.join(os.path.dirname(args.model_path), SCALER_FILE)
+                version = registry.publish(args.model_path, scaler_path)
+            print(f"Published {version}")
+            if args.activate:
+                registry.activate(version)
+                print(f"Activated {version}")
+            elif args.stage:
+                registry.stage(version)
+                print(f"Staged {version}")
+        elif args.command == 'stage':
+            registry.stage(args.version)
+            print(f"Staged {args.version}")
+        elif args.command == 'activate':
+            registry.activate(args.version)
+            print(f"Activated {args.version}")
+        elif args.command == 'rollback':
+            print(f"Rolled back to {registry.rollback()}")
+    except (KeyError, ValueError, FileNotFoundError) as e:
+        print(f"Error: {e.args[0] if e.args else e}", file=sys.stderr)
+        return 2
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
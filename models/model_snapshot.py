@@ -0,0 +1,95 @@
+# Mô tả: Ảnh chụp bất biến của mô hình đang phục vụ
+# Gói mô hình, bộ chuẩn hóa, danh sách đặc trưng và giá trị khí thải trung bình vào
+# một đối tượng không thay đổi sau khi tạo. Các thread xử lý request chỉ cần đọc
+# tham chiếu hiện tại (không cần khóa); tải lại mô hình là thay tham chiếu nguyên tử
+
+import time
+import numpy as np
+
+
+class ModelSnapshot:
+    """
+    Ảnh chụp bất biến của một mô hình đã huấn luyện
+
+    Parameters:
+        model: EmissionModel đã được tải/huấn luyện (không được sửa sau khi tạo ảnh chụp)
+        avg_emission: Giá trị khí thải CO2 trung bình của bộ dữ liệu
+        test_score: Điểm R² trên tập kiểm tra (nếu có)
+    """
+    __slots__ = ('model', 'scaler', 'features', 'avg_emission', 'test_score', 'version', 'created_at')
+
+    def __init__(self, model, avg_emission, test_score=None):
+        if not model.trained:
+            raise ValueError("Mô hình cần được huấn luyện trước!")
+        set_attr = object.__setattr__
+        set_attr(self, 'model', model)
+        set_attr(self, 'scaler', model.scaler)
+        set_attr(self, 'features', tuple(model.features))
+        set_attr(self, 'avg_emission', float(avg_emission))
+        set_attr(self, 'test_score', test_score)
+        set_attr(self, 'version', model.model_version)
+        set_attr(self, 'created_at', time.time())
+
+    def __setattr__(self, name, value):
+        raise AttributeError("ModelSnapshot là bất biến")
+
+    def __delattr__(self, name):
+        raise AttributeError("ModelSnapshot là bất biến")
+
+    def feature_values(self, features_dict):
+        """Xác thực bộ đặc trưng thành tuple số thực (xem EmissionModel.feature_values)"""
+        return self.model.feature_values(features_dict)
+
+    def canonicalize(self, values):
+        """Làm tròn bộ đặc trưng đã xác thực để làm khóa cache (xem EmissionModel.canonicalize)"""
+        return self.model.canonicalize(values)
+
+    def region_signature(self, values):
+        """Chữ ký vùng của bộ đặc trưng đã xác thực (xem FlatForest.region_signature)"""
+        return self.model.region_signature(values)
+
+    def predict_rows(self, rows):
+        """Dự đoán cho các hàng đặc trưng đã xác thực bằng rừng mảng phẳng"""
+        return self.model.predict_compiled_batch(rows)
+
+    def predict_batch(self, records):
+        """Xác thực và dự đoán một lô bản ghi (xem EmissionModel.predict_batch)"""
+        return self.model.predict_batch(records)
+
+    def predict_matrix(self, X):
+        """Xác thực và dự đoán một ma trận đặc trưng số (xem EmissionModel.predict_matrix)"""
+        return self.model.predict_matrix(X)
+
+    @staticmethod
+    def synthetic_records(n_rows, seed=0):
+        """Tạo các bản ghi đặc trưng tổng hợp (dạng JSON của API) để làm nóng"""
+        rng = np.random.default_rng(seed)
+        return [
+            {
+                'Engine Size(L)': rng.uniform(1.0, 8.0),
+                'Cylinders': int(rng.integers(3, 12)),
+                'Fuel Consumption Comb (L/100 km)': rng.uniform(4.0, 20.0),
+                'Horsepower': rng.uniform(100, 800),
+                'Weight (kg)': rng.uniform(1000, 4000),
+                'Year': int(rng.integers(2015, 2024))
+            }
+            for _ in range(n_rows)
+        ]
+
+    def warm_up(self, n_rows=64, seed=0):
+        """
+        Chạy thử các đường dự đoán trên một lô dữ liệu tổng hợp
+
+        Làm nóng bộ nhớ đệm của rừng mảng phẳng (kể cả các trang memory-map) và
+        các đường dự đoán từng hàng/theo lô trước khi ảnh chụp nhận traffic thật.
+
+        Returns:
+            float: Thời gian làm nóng (ms)
+        """
+        start = time.perf_counter()
+        records = self.synthetic_records(n_rows, seed)
+        rows = [list(self.feature_values(record)) for record in records]
+        self.predict_rows(rows)  # Đường vector hóa
+        self.predict_rows(rows[:1])  # Đường duyệt từng hàng
+        self.predict_batch(records)  # Đường /predict/batch (scaler + sklearn)
+        return (time.perf_counter() - start) * 1000
@@ -0,0 +1,32 @@
+# Mô tả: Cấu hình chung cho các kiểm thử: mô hình nhỏ huấn luyện một lần trên bộ dữ liệu thật
+
+import os
+import sys
+import pytest
+
+# Cho phép import các module của dự án khi chạy pytest từ bất kỳ thư mục nào
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from models.emission_model import EmissionModel
+
+DATA_PATH = os.path.join(PROJECT_DIR, 'co2 Emissions.csv')
+
+
+@pytest.fixture(scope='session')
+def trained_model(tmp_path_factory):
+    """Mô hình huấn luyện vào thư mục tạm (rừng nhỏ cho nhanh), không chạm artifact trong models/"""
+    model_dir = tmp_path_factory.mktemp('model')
+    model = EmissionModel(model_path=str(model_dir / 'trained_model.joblib'),
+                          scaler_path=str(model_dir / 'trained_scaler.joblib'))
+    model.tree_step = 10
+    model.max_estimators = 20
+    model.train(DATA_PATH)
+    return model
+
+
+@pytest.fixture(scope='session')
+def dataset_features(trained_model):
+    """Ma trận đặc trưng gốc (float64) của toàn bộ dữ liệu đã tiền xử lý"""
+    df = trained_model.load_and_preprocess_data(DATA_PATH, columns=trained_model.features)
+    return df[trained_model.features].to_numpy(dtype='float64')
@@ -0,0 +1,42 @@
+# Mô tả: Các định dạng nhị phân của /predict/batch giải mã ra cùng một ma trận
+
+import io
+import numpy as np
+import pytest
+from utils.batch_formats import decode_batch
+
+FEATURES = ['a', 'b', 'c']
+X = np.array([[1.5, 4, 2019], [2.0, 6, 2020], [3.25, 8, 2021]])
+
+
+def test_npy_is_a_view_of_the_request_body():
+    buffer = io.BytesIO()
+    np.save(buffer, X)
+    body = buffer.getvalue()
+    kind, decoded = decode_batch(body, 'npy', FEATURES)
+    assert kind == 'matrix'
+    np.testing.assert_array_equal(decoded, X)
+    assert np.shares_memory(decoded, np.frombuffer(body, dtype=np.uint8))
+
+
+def test_arrow_chunks_and_nulls():
+    pa = pytest.importorskip('pyarrow')
+    table = pa.table({
+        'a': pa.chunked_array([X[:2, 0], X[2:, 0]]),
+        'b': pa.array([4, None, 8]),  # Cột số nguyên có null
+        'c': pa.array(X[:, 2])
+    })
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    kind, decoded = decode_batch(sink.getvalue().to_pybytes(), 'arrow', FEATURES)
+    expected = X.copy()
+    expected[1, 1] = np.nan
+    np.testing.assert_array_equal(decoded, expected)
+
+
+def test_msgpack_numeric_rows():
+    msgpack = pytest.importorskip('msgpack')
+    kind, decoded = decode_batch(msgpack.packb(X.tolist()), 'msgpack', FEATURES)
+    assert kind == 'matrix'
+    np.testing.assert_array_equal(decoded, X)
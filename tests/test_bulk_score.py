@@ -0,0 +1,108 @@
+# Mô tả: Chấm điểm ngoại tuyến theo khối: đúng thứ tự đầu vào và chạy tiếp sau sự cố cho cùng kết quả
+
+import json
+import os
+import numpy as np
+import pandas as pd
+import pytest
+import bulk_score
+from bulk_score import bulk_score as run_bulk_score
+
+
+class SimulatedCrash(Exception):
+    """Sự cố giả lập giữa hai khối"""
+
+
+@pytest.fixture(scope='module')
+def input_csv(trained_model, dataset_features, tmp_path_factory):
+    """File CSV nhỏ có cột id để giữ lại và vài giá trị không hợp lệ"""
+    frame = pd.DataFrame(dataset_features[:1000], columns=trained_model.features)
+    frame.insert(0, 'id', np.arange(len(frame)))
+    frame = frame.astype({'Year': object})
+    frame.loc[[5, 333], 'Year'] = 'unknown'
+    path = tmp_path_factory.mktemp('bulk') / 'vehicles.csv'
+    frame.to_csv(path, index=False)
+    return str(path)
+
+
+def score(trained_model, input_csv, output_path, **kwargs):
+    return run_bulk_score(input_csv, output_path, workers=0, chunk_rows=128, keep_columns=['id'],
+                          model_path=trained_model.model_path, scaler_path=trained_model.scaler_path,
+                          progress_every=0, **kwargs)
+
+
+def crash_after_first_chunk(monkeypatch, partial_bytes=False):
+    """Cho khối đầu ghi xong, khối thứ hai (tùy chọn ghi dở một phần) thì gây sự cố"""
+    original_write = bulk_score._OutputWriter.write
+
+    def write(self, payload):
+        if self.chunks_written >= 1:
+            if partial_bytes and self.handle is not None:
+                self.handle.write(payload[:len(payload) // 2])
+                self.handle.flush()
+            raise SimulatedCrash()
+        original_write(self, payload)
+    monkeypatch.setattr(bulk_score._OutputWriter, 'write', write)
+
+
+def test_csv_output_is_in_input_order(trained_model, input_csv, tmp_path):
+    output = str(tmp_path / 'out.csv')
+    stats = score(trained_model, input_csv, output)
+    result = pd.read_csv(output)
+    assert stats['rows'] == 1000 and stats['errors'] == 2
+    assert result['id'].tolist() == list(range(1000))
+    assert result['prediction'].isna().sum() == 2
+    assert not os.path.exists(output + '.progress.json')
+
+
+def test_csv_resume_matches_uninterrupted_run(trained_model, input_csv, tmp_path, monkeypatch):
+    expected = str(tmp_path / 'expected.csv')
+    score(trained_model, input_csv, expected)
+
+    output = str(tmp_path / 'out.csv')
+    with monkeypatch.context() as patch:
+        crash_after_first_chunk(patch, partial_bytes=True)
+        with pytest.raises(SimulatedCrash):
+            score(trained_model, input_csv, output)
+    with open(output + '.progress.json', encoding='utf-8') as f:
+        checkpoint = json.load(f)
+    assert checkpoint['rows_done'] == 128
+    assert os.path.getsize(output) > checkpoint['output_bytes']  # Còn phần ghi dở sau checkpoint
+
+    stats = score(trained_model, input_csv, output, resume=True)
+    assert stats['resumed_from'] == 128 and stats['rows'] == 1000
+    with open(output, 'rb') as f, open(expected, 'rb') as g:
+        assert f.read() == g.read()
+    pd.testing.assert_frame_equal(pd.read_csv(output), pd.read_csv(expected))
+
+
+def test_parquet_resume_removes_parts_after_checkpoint(trained_model, input_csv, tmp_path, monkeypatch):
+    expected = str(tmp_path / 'expected.parquet')
+    score(trained_model, input_csv, expected)
+
+    output = str(tmp_path / 'out.parquet')
+    with monkeypatch.context() as patch:
+        crash_after_first_chunk(patch)
+        with pytest.raises(SimulatedCrash):
+            score(trained_model, input_csv, output)
+    # Các phần sau checkpoint (file tạm ghi dở, phần của lần chạy trước dài hơn) phải bị xóa khi chạy tiếp
+    stray = pd.read_parquet(os.path.join(output, 'part-00000.parquet')).iloc[:3]
+    stray.to_parquet(os.path.join(output, 'part-00099.parquet'), index=False)
+    with open(os.path.join(output, 'part-00001.parquet.tmp'), 'wb') as f:
+        f.write(b'partial')
+
+    score(trained_model, input_csv, output, resume=True)
+    assert sorted(os.listdir(output)) == sorted(os.listdir(expected))
+    pd.testing.assert_frame_equal(pd.read_parquet(output), pd.read_parquet(expected))
+
+
+def test_resume_rejects_checkpoint_of_another_run(trained_model, input_csv, tmp_path, monkeypatch):
+    output = str(tmp_path / 'out.csv')
+    with monkeypatch.context() as patch:
+        crash_after_first_chunk(patch)
+        with pytest.raises(SimulatedCrash):
+            score(trained_model, input_csv, output)
+    with pytest.raises(ValueError, match='keep_columns'):
+        run_bulk_score(input_csv, output, workers=0, chunk_rows=128, keep_columns=[], resume=True,
+                       model_path=trained_model.model_path, scaler_path=trained_model.scaler_path,
+                       progress_every=0)
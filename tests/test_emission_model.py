@@ -0,0 +1,40 @@
+# Mô tả: Các đường dự đoán của EmissionModel phải cho đúng kết quả của sklearn trên giá trị gốc
+
+import numpy as np
+import pandas as pd
+
+
+def sklearn_predict(model, X):
+    """Dự đoán tham chiếu: StandardScaler.transform rồi RandomForestRegressor.predict"""
+    return model.model.predict(model.scaler.transform(pd.DataFrame(X, columns=model.features)))
+
+
+def test_predict_batch_matches_sklearn_on_dataset(trained_model, dataset_features):
+    records = [dict(zip(trained_model.features, row)) for row in dataset_features.tolist()]
+    result = trained_model.predict_batch(records)
+    assert result['valid_rows'] == len(records)
+    np.testing.assert_array_equal(result['predictions'], sklearn_predict(trained_model, dataset_features))
+
+
+def test_predict_matrix_matches_sklearn_on_dataset(trained_model, dataset_features):
+    result = trained_model.predict_matrix(dataset_features)
+    np.testing.assert_array_equal(result['predictions'], sklearn_predict(trained_model, dataset_features))
+
+
+def test_feature_values_are_not_rounded(trained_model, dataset_features):
+    row = dataset_features[0].tolist()
+    values = trained_model.feature_values(dict(zip(trained_model.features, row)))
+    assert list(values) == row
+    # Chỉ khóa cache 'canonical' được làm tròn
+    assert trained_model.canonicalize(values) != tuple(row)
+
+
+def test_invalid_rows_do_not_break_the_batch(trained_model, dataset_features):
+    records = [dict(zip(trained_model.features, row)) for row in dataset_features[:3].tolist()]
+    records[1] = dict(records[1], Horsepower='fast')
+    result = trained_model.predict_batch(records)
+    assert result['valid_rows'] == 2
+    assert np.isnan(result['predictions'][1])
+    assert result['errors'][1] == "Invalid value for field 'Horsepower'"
+    expected = sklearn_predict(trained_model, dataset_features[[0, 2]])
+    np.testing.assert_array_equal(result['predictions'][[0, 2]], expected)
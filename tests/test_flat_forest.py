@@ -0,0 +1,54 @@
+# Mô tả: Lưu/tải rừng dạng mảng phẳng: không bao giờ ghi đè mảng đang được memory-map
+
+import os
+import numpy as np
+import pandas as pd
+import pytest
+from models.flat_forest import FlatForest
+from utils.serving_benchmark import random_rows
+
+
+def sklearn_predict(model, X):
+    """Dự đoán tham chiếu: StandardScaler.transform rồi RandomForestRegressor.predict"""
+    return model.model.predict(model.scaler.transform(pd.DataFrame(X, columns=model.features)))
+
+
+@pytest.mark.parametrize('source', ['dataset', 'random'])
+def test_flat_forest_matches_sklearn(trained_model, dataset_features, source):
+    X = dataset_features if source == 'dataset' else np.array(random_rows(5000, seed=3))
+    expected = sklearn_predict(trained_model, X)
+    # Cả rừng vừa chuyển đổi lẫn rừng memory-map từ đĩa (models/trained_model_forest/ khi chạy thật)
+    for forest in (trained_model.flat_forest, FlatForest.load(trained_model.flat_forest_path, mmap_mode='r')):
+        np.testing.assert_array_equal(forest.predict(X), expected)
+        np.testing.assert_array_equal([forest.predict_row(row) for row in X.tolist()], expected)
+
+
+def test_save_replaces_directory_without_touching_mapped_arrays(trained_model, tmp_path):
+    directory = str(tmp_path / 'forest')
+    forest = trained_model.flat_forest
+    forest.save(directory, stamp='a')
+    mapped = FlatForest.load(directory, mmap_mode='r')
+    before = np.array(mapped.value)
+
+    # Ghi một rừng khác (giá trị lá đổi) vào cùng thư mục trong khi bản map cũ vẫn đang dùng
+    changed = FlatForest(forest.feature, forest.threshold, forest.left, forest.right,
+                         forest.value + 1.0, forest.roots)
+    changed.save(directory, stamp='b')
+
+    np.testing.assert_array_equal(mapped.value, before)  # Ảnh chụp cũ không đổi
+    reloaded = FlatForest.load(directory, mmap_mode='r')
+    np.testing.assert_array_equal(reloaded.value, before + 1.0)
+    assert FlatForest.read_stamp(directory) == 'b'
+    assert sorted(os.listdir(tmp_path)) == ['forest']  # Không còn thư mục tạm
+
+
+def test_load_model_reexports_forest_only_when_stamp_differs(trained_model):
+    path = trained_model.flat_forest_path
+    assert FlatForest.read_stamp(path) == trained_model._artifact_stamp()
+    mtime = os.stat(os.path.join(path, 'value.npy')).st_mtime_ns
+    trained_model.load_model()
+    assert os.stat(os.path.join(path, 'value.npy')).st_mtime_ns == mtime  # Dấu khớp: chỉ memory-map
+
+    trained_model.flat_forest.save(path, stamp='sha256:other')
+    trained_model.load_model()
+    assert FlatForest.read_stamp(path) == trained_model._artifact_stamp()
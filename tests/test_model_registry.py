@@ -0,0 +1,30 @@
+# Mô tả: Kho phiên bản mô hình: mã phiên bản được kiểm tra và thư mục phiên bản không bị ghi lại
+
+import os
+import pytest
+from models.emission_model import EmissionModel
+from models.model_registry import ModelRegistry
+
+
+def test_version_must_be_a_content_hash(tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    for version in ('../..', '../../etc', 'ABCDEF0123456789', '0123', None):
+        assert not registry.has_version(version)
+        with pytest.raises((KeyError, ValueError)):
+            registry.activate(version)
+    with pytest.raises(ValueError):
+        registry.version_dir('../outside')
+
+
+def test_loading_a_version_never_writes_into_it(trained_model, tmp_path):
+    registry = ModelRegistry(str(tmp_path / 'registry'))
+    version = registry.publish(trained_model.model_path, trained_model.scaler_path)
+    assert ModelRegistry.is_valid_version(version)
+    model = EmissionModel(*registry.artifact_paths(version))
+    os.remove(os.path.join(model.flat_forest_path, 'stamp.json'))  # Dấu không khớp: đường xuất lại
+    before = sorted(os.listdir(model.flat_forest_path))
+
+    model.export_flat_forest = False
+    assert model.load_model()
+    assert sorted(os.listdir(model.flat_forest_path)) == before
+    assert model.flat_forest.n_trees == len(model.model.estimators_)
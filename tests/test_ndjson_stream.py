@@ -0,0 +1,36 @@
+# Mô tả: Đọc luồng NDJSON với bộ nhớ có giới hạn (độ dài dòng, giải nén gzip từng phần)
+
+import gzip
+import io
+import pytest
+from utils.ndjson_stream import LineTooLongError, iter_lines
+
+
+class CountingStream(io.BytesIO):
+    """BytesIO ghi lại số byte đã đọc"""
+    def read(self, size=-1):
+        data = super().read(size)
+        self.consumed = self.tell()
+        return data
+
+
+def test_lines_are_split_across_blocks_and_gzip():
+    body = b''.join(f'{{"row": {i}}}\n'.encode() for i in range(1000)) + b'{"row": "last"}'
+    expected = body.split(b'\n')
+    assert list(iter_lines(io.BytesIO(body), block_size=7)) == expected
+    assert list(iter_lines(io.BytesIO(gzip.compress(body)), block_size=7, gzipped=True)) == expected
+
+
+def test_line_without_newline_is_rejected():
+    with pytest.raises(LineTooLongError):
+        list(iter_lines(io.BytesIO(b'x' * 5000), block_size=512, max_line_bytes=1000))
+
+
+def test_gzip_bomb_is_not_expanded_in_full():
+    bomb = gzip.compress(b'\n' * (64 << 20))  # 64 MB dòng trống nén thành ~64 KB
+    stream = CountingStream(bomb)
+    lines = iter_lines(stream, block_size=1024, gzipped=True)
+    for _ in range(10):
+        next(lines)
+    # Mới đọc một phần nhỏ đầu vào: mỗi bước giải nén tối đa block_size byte
+    assert stream.consumed < len(bomb)
@@ -0,0 +1,77 @@
+# Mô tả: Bộ gom lô chấm điểm trực tiếp khi rảnh và chỉ xếp hàng khi có tranh chấp
+
+import threading
+import time
+from concurrent.futures import TimeoutError as FutureTimeoutError
+import pytest
+from utils.prediction_batcher import PredictionBatcher
+
+
+def score_with_thread(items):
+    """Trả về tên thread đã chấm điểm cho từng item"""
+    return [threading.current_thread().name for _ in items]
+
+
+def test_uncontended_predict_is_scored_inline():
+    batcher = PredictionBatcher(score_with_thread, name='test-batcher')
+    assert batcher.predict('row') == threading.current_thread().name
+    assert batcher.get_stats()['inline_items'] == 1
+    assert batcher.batches == 0
+
+
+def test_contended_predict_is_batched():
+    started, release = threading.Event(), threading.Event()
+
+    def slow_score(items):
+        started.set()
+        release.wait(5)
+        return score_with_thread(items)
+
+    batcher = PredictionBatcher(slow_score, name='test-batcher')
+    inline = threading.Thread(target=batcher.predict, args=('first',))
+    inline.start()
+    started.wait(5)
+    # Thread đầu đang giữ đường chấm điểm trực tiếp: item này phải đi qua hàng đợi
+    future = batcher.submit('queued')
+    result = {}
+    waiter = threading.Thread(target=lambda: result.update(value=batcher.predict('second', timeout=5)))
+    waiter.start()
+    deadline = time.monotonic() + 5
+    while batcher._queue.unfinished_tasks < 2 and time.monotonic() < deadline:
+        time.sleep(0.001)  # Chờ item thứ hai vào hàng đợi trước khi cho lô chạy xong
+    release.set()
+    inline.join(5)
+    waiter.join(5)
+    assert future.result(5) == 'test-batcher'
+    assert result['value'] == 'test-batcher'
+    assert batcher.get_stats()['inline_items'] == 1
+
+
+def test_queued_only_batcher_never_scores_inline():
+    batcher = PredictionBatcher(score_with_thread, name='test-batcher', inline_when_idle=False)
+    assert batcher.predict('row', timeout=5) == 'test-batcher'
+    assert batcher.get_stats()['inline_items'] == 0
+
+
+def test_expired_items_are_dropped_from_the_batch():
+    started, release = threading.Event(), threading.Event()
+    scored = []
+
+    def slow_score(items):
+        scored.extend(items)
+        started.set()
+        release.wait(5)
+        return items
+
+    batcher = PredictionBatcher(slow_score, name='test-batcher', inline_when_idle=False)
+    first = batcher.submit('slow')
+    started.wait(5)
+    # Lô đầu đang bị chặn: hai item sau hết hạn trước khi được gom
+    expired = batcher.submit('expired', timeout=0.01)
+    with pytest.raises(FutureTimeoutError):
+        batcher.predict('timed-out', timeout=0.05)
+    release.set()
+    assert first.result(5) == 'slow'
+    assert batcher.predict('next', timeout=5) == 'next'
+    assert expired.cancelled()
+    assert scored == ['slow', 'next']
@@ -0,0 +1,98 @@
+# Mô tả: Token bucket trong file memory-map: hết burst, nạp lại theo thời gian, chung nhóm ô và reset
+
+import pytest
+from utils import rate_limiter
+from utils.rate_limiter import WAYS, TokenBucketLimiter
+
+
+class FakeClock:
+    """Đồng hồ time.monotonic giả, chỉ tiến khi kiểm thử gọi advance()"""
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+    def advance(self, seconds):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(rate_limiter.time, 'monotonic', clock)
+    return clock
+
+
+def make_limiter(tmp_path, slots=1024):
+    limiter = TokenBucketLimiter(str(tmp_path / 'ratelimit.bin'), slots=slots)
+    limiter.add_rule('predict', rate=10, burst=5)
+    return limiter
+
+
+def test_burst_drains_then_refills(tmp_path, clock):
+    limiter = make_limiter(tmp_path)
+    assert all(limiter.consume('predict', 'client')[0] for _ in range(5))
+    allowed, retry_after = limiter.consume('predict', 'client')
+    assert not allowed and retry_after == pytest.approx(0.1)  # 1 token với tốc độ 10 token/giây
+
+    clock.advance(0.25)  # Nạp 2.5 token
+    assert limiter.consume('predict', 'client', cost=2) == (True, 0.0)
+    assert not limiter.consume('predict', 'client')[0]
+
+    clock.advance(60)  # Nạp lại không vượt quá burst
+    assert limiter.consume('predict', 'client', cost=5)[0]
+    assert not limiter.consume('predict', 'client')[0]
+
+
+def test_cost_above_burst_is_never_allowed(tmp_path, clock):
+    limiter = make_limiter(tmp_path)
+    assert not limiter.consume('predict', 'client', cost=6)[0]
+    clock.advance(3600)
+    assert not limiter.consume('predict', 'client', cost=6)[0]
+
+
+def test_clients_and_processes_share_the_file(tmp_path, clock):
+    limiter = make_limiter(tmp_path)
+    other_worker = make_limiter(tmp_path)  # Worker khác mở cùng file trạng thái
+    for _ in range(5):
+        assert limiter.consume('predict', 'a')[0]
+    assert not other_worker.consume('predict', 'a')[0]
+    assert other_worker.consume('predict', 'b')[0]  # Client khác có bucket riêng
+
+
+def test_keys_in_the_same_group_keep_separate_buckets(tmp_path, clock):
+    limiter = make_limiter(tmp_path, slots=WAYS)  # Một nhóm: mọi khóa (hash khác nhau) chung nhóm ô
+    assert limiter.n_groups == 1
+    clients = [f"10.0.0.{i}" for i in range(WAYS)]
+    for i, client in enumerate(clients):
+        assert limiter.consume('predict', client, cost=i + 1)[0]
+    # Mỗi khóa vẫn giữ số token của chính nó trong nhóm
+    for i, client in enumerate(clients):
+        assert limiter.consume('predict', client, cost=5 - (i + 1))[0]
+        assert not limiter.consume('predict', client)[0]
+
+    # Khóa mới khi nhóm đầy thay ô lâu không cập nhật nhất bằng một bucket đầy
+    clock.advance(0.01)
+    limiter.consume('predict', clients[1])
+    limiter.consume('predict', clients[2])
+    limiter.consume('predict', clients[3])
+    assert limiter.consume('predict', 'newcomer', cost=5)[0]
+    assert limiter.consume('predict', clients[0], cost=5)[0]  # Bị thay ra nên bắt đầu lại đầy
+
+
+def test_reset_refills_every_bucket(tmp_path, clock):
+    limiter = make_limiter(tmp_path)
+    other_worker = make_limiter(tmp_path)
+    for client in ('a', 'b'):
+        limiter.consume('predict', client, cost=5)
+        assert not limiter.consume('predict', client)[0]
+    other_worker.reset()
+    assert limiter.consume('predict', 'a', cost=5)[0]
+    assert limiter.consume('predict', 'b', cost=5)[0]
+
+
+def test_disabled_limiter_allows_everything(tmp_path, clock):
+    limiter = TokenBucketLimiter(str(tmp_path / 'ratelimit.bin'), enabled=False)
+    limiter.add_rule('predict', rate=1, burst=1)
+    assert all(limiter.consume('predict', 'client', cost=100)[0] for _ in range(10))
@@ -0,0 +1,32 @@
+# Mô tả: DataFrame và view của ResultRecorder không được sửa vào dữ liệu đã ghi
+
+import pytest
+from utils.result_recorder import ResultRecorder
+
+
+@pytest.fixture
+def recorder():
+    recorder = ResultRecorder(capacity=4)
+    for i in range(10):
+        recorder.record(i, total_time=1.0 + i, prediction=200.0 + i)
+    return recorder
+
+
+def test_dataframe_columns_are_read_only(recorder):
+    df = recorder.to_dataframe()
+    with pytest.raises(ValueError):
+        df.loc[0, 'total_time'] = 99
+    assert recorder.get(0)['total_time'] == 1.0
+    # Bản sao sửa được và không ảnh hưởng bộ ghi
+    copied = df.copy()
+    copied.loc[0, 'total_time'] = 99
+    assert recorder.get(0)['total_time'] == 1.0
+
+
+def test_views_are_read_only_and_recording_continues(recorder):
+    column = recorder.column('prediction')
+    with pytest.raises(ValueError):
+        column[0] = 0.0
+    recorder.record(10, total_time=11.0)
+    assert recorder.get(10)['total_time'] == 11.0
+    assert recorder.get(0)['prediction'] == 200.0
@@ -0,0 +1,103 @@
+# Mô tả: Xác thực và chấm điểm dùng chung của api_server.py và async_server.py
+
+import numpy as np
+import pandas as pd
+import pytest
+from models.model_snapshot import ModelSnapshot
+from utils.prediction_cache import PredictionCache
+from utils.serving import REQUIRED_FIELDS, RequestValidationError, is_json_mimetype, score_rows, validate_request
+
+
+@pytest.fixture(scope='module')
+def snapshot(trained_model):
+    return ModelSnapshot(trained_model, avg_emission=250.0)
+
+
+def test_validate_request_returns_exact_values(snapshot, dataset_features):
+    row = dataset_features[0].tolist()
+    assert list(validate_request(snapshot, dict(zip(REQUIRED_FIELDS, row)))) == row
+
+
+@pytest.mark.parametrize('data, reason', [
+    ([1, 2, 3], 'missing_fields'),
+    ({'Engine Size(L)': 2.0}, 'missing_fields'),
+    (dict.fromkeys(REQUIRED_FIELDS, 'abc'), 'invalid_values'),
+    (dict.fromkeys(REQUIRED_FIELDS, float('nan')), 'invalid_values'),
+])
+def test_validate_request_rejects_bad_bodies(snapshot, data, reason):
+    with pytest.raises(RequestValidationError) as info:
+        validate_request(snapshot, data)
+    assert info.value.reason == reason
+
+
+def test_score_rows_groups_by_snapshot(trained_model, snapshot, dataset_features):
+    # Ảnh chụp khác (như sau khi tải lại) cho mỗi hàng kết quả của chính nó
+    reloaded = ModelSnapshot(trained_model, avg_emission=250.0)
+    rows = dataset_features[:6].tolist()
+    items = [(snapshot if i % 2 else reloaded, row) for i, row in enumerate(rows)]
+    expected = trained_model.predict_compiled_batch(rows)
+    np.testing.assert_array_equal(score_rows(items), expected)
+
+
+def sklearn_predict(model, rows):
+    """Dự đoán tham chiếu: StandardScaler.transform rồi RandomForestRegressor.predict"""
+    return model.model.predict(model.scaler.transform(pd.DataFrame(rows, columns=model.features))).tolist()
+
+
+def threshold_cases(snapshot, dataset_features, n_rows=50, seed=0):
+    """
+    Với các hàng dữ liệu ngẫu nhiên và một ngưỡng tách t của một đặc trưng, tạo ba biến thể:
+    ngay trên ngưỡng trước đó, đúng bằng t (cùng khoảng, nhánh trái) và ngay trên t (khoảng kế tiếp)
+    """
+    rng = np.random.default_rng(seed)
+    cases = []
+    for row in dataset_features[rng.choice(len(dataset_features), n_rows, replace=False)]:
+        for j, edges in enumerate(snapshot.model.flat_forest.split_edges):
+            if len(edges) < 2:
+                continue
+            k = int(rng.integers(1, len(edges)))
+            variants = []
+            for value in (np.nextafter(edges[k - 1], np.inf), edges[k], np.nextafter(edges[k], np.inf)):
+                variant = row.copy()
+                variant[j] = value
+                variants.append(tuple(variant.tolist()))
+            cases.append(variants)
+    return cases
+
+
+def test_region_key_hit_returns_the_forest_prediction(trained_model, snapshot, dataset_features):
+    cache = PredictionCache(max_size=100000, key_mode='region')
+    cases = threshold_cases(snapshot, dataset_features)
+    assert cases
+    for low, at_threshold, _ in cases:
+        key = cache.key_for(snapshot, low)
+        assert cache.key_for(snapshot, at_threshold) == key  # Cùng khoảng giữa hai ngưỡng: cùng khóa
+        expected_low, expected_at = sklearn_predict(trained_model, [low, at_threshold])
+        assert expected_low == expected_at
+        cache.clear()
+        cache.put(key, float(snapshot.predict_rows([low])[0]))
+        # Kết quả trúng cache của đầu vào kia đúng bằng dự đoán của rừng cho chính nó
+        assert cache.get(cache.key_for(snapshot, at_threshold)) == expected_at
+
+
+def test_region_keys_differ_across_a_threshold(snapshot, dataset_features):
+    cache = PredictionCache(key_mode='region')
+    for _, at_threshold, above in threshold_cases(snapshot, dataset_features):
+        assert cache.key_for(snapshot, at_threshold) != cache.key_for(snapshot, above)
+
+
+@pytest.mark.parametrize('mimetype, expected', [
+    ('application/json', True),
+    ('Application/JSON', True),
+    ('application/problem+json', True),
+    ('text/plain', False),
+    ('application/x-www-form-urlencoded', False),
+    ('', False),
+    (None, False),
+])
+def test_json_content_type_rule_matches_flask(mimetype, expected):
+    from flask import Request
+    from werkzeug.test import EnvironBuilder
+    assert is_json_mimetype(mimetype) is expected
+    environ = EnvironBuilder(method='POST', content_type=mimetype or None, data=b'{}').get_environ()
+    assert Request(environ).is_json is expected
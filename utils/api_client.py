@@ -0,0 +1,147 @@
+# Mô tả: Client HTTP dùng chung cho các lời gọi API của giao diện Streamlit (app.py)
+# Một requests.Session duy nhất cho cả process, với pool kết nối keep-alive có kích thước bằng
+# số request đồng thời tối đa, nên mỗi lời gọi dùng lại kết nối TCP/TLS sẵn có thay vì bắt tay
+# lại từ đầu. Các lời gọi dự đoán đồng thời (từ mọi session Streamlit) được gom lô phía client
+# và gửi chung một request /predict/batch. Module được import (không chạy lại như app.py mỗi
+# lần Streamlit rerun), nên Session, pool và bộ gom lô tồn tại suốt vòng đời process
+
+import os
+import threading
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from utils.prediction_batcher import PredictionBatcher
+
+# Số request API đồng thời tối đa (kích thước semaphore của app.py và của pool kết nối)
+API_CONCURRENCY = int(os.environ.get('API_CONCURRENCY', 10))
+
+# Gom lô phía client: cửa sổ gom, số hàng tối đa mỗi request /predict/batch, thời gian chờ
+# kết quả của người gọi và thời gian chờ HTTP. Đường gom lô chỉ gửi một lần, không thử lại:
+# mọi lời gọi đang xếp hàng chờ cùng một thread gửi, nên một lô thử lại sẽ chặn tất cả
+API_BATCH_WINDOW_MS = float(os.environ.get('API_BATCH_WINDOW_MS', 10))
+API_BATCH_MAX_SIZE = int(os.environ.get('API_BATCH_MAX_SIZE', 256))
+API_BATCH_RESULT_TIMEOUT = float(os.environ.get('API_BATCH_RESULT_TIMEOUT', 3))
+# Lần gửi HTTP phải kết thúc trong thời gian chờ kết quả (trừ cửa sổ gom)
+API_BATCH_HTTP_TIMEOUT = min(float(os.environ.get('API_BATCH_HTTP_TIMEOUT', 2)),
+                             API_BATCH_RESULT_TIMEOUT - API_BATCH_WINDOW_MS / 1000)
+
+_shared_session = None
+_shared_session_lock = threading.Lock()
+_shared_batch_session = None
+_shared_batcher = None
+_shared_batcher_lock = threading.Lock()
+
+
+def create_session(pool_size=API_CONCURRENCY, retries=5):
+    """
+    Tạo phiên requests với pool kết nối keep-alive và cơ chế thử lại tự động
+
+    Lần gửi đầu tiên không bị trì hoãn; chỉ sau khi thất bại mới chờ theo backoff lũy thừa
+    cộng thêm jitter ngẫu nhiên (tránh các client thử lại đồng loạt), và tôn trọng header
+    Retry-After của phản hồi 429/503.
+
+    Parameters:
+        pool_size: Số kết nối tối đa được giữ mở tới mỗi host
+        retries: Số lần thử lại tối đa (0 = chỉ gửi một lần, lỗi được ném ra ngay)
+
+    Returns:
+        requests.Session: Đối tượng phiên có pool kết nối và cấu hình thử lại
+    """
+    session = requests.Session()
+    retry = Retry(
+        total=retries,  # Số lần thử lại tối đa
+        backoff_factor=0.2,  # Backoff lũy thừa sau mỗi lần thất bại: 0.2s, 0.4s, 0.8s...
+        backoff_jitter=0.1,  # Cộng thêm tối đa 0.1s ngẫu nhiên vào mỗi lần chờ
+        status_forcelist=[429, 500, 502, 503, 504],  # Mã HTTP cần thử lại
+        allowed_methods=["GET", "POST"]  # Các phương thức được phép thử lại
+    )
+    adapter = HTTPAdapter(
+        pool_connections=4,  # Số host được giữ pool (API chỉ dùng một host)
+        pool_maxsize=pool_size,  # Số kết nối keep-alive tối đa tới một host
+        pool_block=True,  # Chờ kết nối rảnh thay vì mở kết nối tạm rồi đóng ngay
+        max_retries=retry
+    )
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def get_shared_session():
+    """Phiên dùng chung của process (tạo lần đầu khi được gọi, an toàn đa luồng)"""
+    global _shared_session
+    if _shared_session is None:
+        with _shared_session_lock:
+            if _shared_session is None:
+                _shared_session = create_session(API_CONCURRENCY)
+    return _shared_session
+
+
+def get_shared_batch_session():
+    """Phiên không thử lại của bộ gom lô dùng chung (một thread gửi nên chỉ cần một kết nối)"""
+    global _shared_batch_session
+    if _shared_batch_session is None:
+        with _shared_session_lock:
+            if _shared_batch_session is None:
+                _shared_batch_session = create_session(pool_size=1, retries=0)
+    return _shared_batch_session
+
+
+def connection_stats(session):
+    """
+    Số kết nối đã mở (số lần bắt tay TCP/TLS) và số request đã gửi qua các pool của phiên
+
+    Returns:
+        dict: connections_opened, requests_sent
+    """
+    stats = {'connections_opened': 0, 'requests_sent': 0}
+    adapters = {id(adapter): adapter for adapter in session.adapters.values()}  # http:// và https:// dùng chung adapter
+    for adapter in adapters.values():
+        pools = adapter.poolmanager.pools
+        for key in pools.keys():
+            pool = pools[key]
+            stats['connections_opened'] += pool.num_connections
+            stats['requests_sent'] += pool.num_requests
+    return stats
+
+
+def score_remote(features_list, session=None, api_url=None, timeout=API_BATCH_HTTP_TIMEOUT):
+    """
+    Dự đoán một lô bộ đặc trưng bằng một request /predict/batch
+
+    Parameters:
+        features_list: Danh sách dictionary đặc trưng (như thân request /predict)
+        session: Phiên requests (mặc định: phiên không thử lại của bộ gom lô)
+        api_url: URL gốc của API (mặc định: biến môi trường API_URL)
+        timeout: Thời gian chờ HTTP (giây)
+
+    Returns:
+        list: Kết quả từng hàng cùng thứ tự, dạng phản hồi /predict ('prediction' là None
+        ở hàng không hợp lệ, kèm 'message'); lỗi HTTP được ném ra cho mọi hàng
+    """
+    session = session or get_shared_batch_session()
+    api_url = api_url or os.environ.get('API_URL')
+    response = session.post(f"{api_url}/predict/batch", json=features_list, timeout=timeout)
+    response.raise_for_status()
+    body = response.json()
+    process_time_ms = body.get('process_time_ms', 0.0)
+    return [
+        dict(row, process_time_ms=process_time_ms, batch_size=len(features_list))
+        for row in body['results']
+    ]
+
+
+def get_shared_batcher():
+    """
+    Bộ gom lô dùng chung của process: gom lời gọi trong API_BATCH_WINDOW_MS rồi gọi score_remote
+
+    Người gọi nên gửi kèm timeout=API_BATCH_RESULT_TIMEOUT để các hàng đã quá hạn bị bỏ khỏi lô.
+    """
+    global _shared_batcher
+    if _shared_batcher is None:
+        with _shared_batcher_lock:
+            if _shared_batcher is None:
+                _shared_batcher = PredictionBatcher(
+                    score_remote, max_batch_size=API_BATCH_MAX_SIZE,
+                    max_wait_ms=API_BATCH_WINDOW_MS, name='api-client-batcher'
+                )
+    return _shared_batcher
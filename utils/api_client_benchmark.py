@@ -0,0 +1,111 @@
+# Mô tả: So sánh client API cũ của app.py (mỗi dự đoán một Session mới + chờ ngẫu nhiên 10-100 ms)
+# với phiên dùng chung có pool kết nối keep-alive (utils/api_client.py): độ trễ p50/p99 phía
+# client và số lần bắt tay (kết nối mới) cho 1000 dự đoán với API_CONCURRENCY luồng đồng thời.
+# Mặc định khởi động gunicorn cục bộ; --url để đo với server thật (ví dụ HTTPS trên Render)
+# Chạy: python -m utils.api_client_benchmark --predictions 1000
+
+import argparse
+import os
+import random
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from utils.api_client import API_CONCURRENCY, connection_stats, create_session
+from utils.scaling_benchmark import FEATURES, wait_until_healthy
+from utils.serving_benchmark import random_rows
+
+
+def legacy_session():
+    """Phiên mới cho mỗi lời gọi, giống get_session() cũ của app.py"""
+    session = requests.Session()
+    retry = Retry(total=5, backoff_factor=0.2, status_forcelist=[429, 500, 502, 503, 504],
+                  allowed_methods=["GET", "POST"])
+    adapter = HTTPAdapter(max_retries=retry)
+    session.mount("http://", adapter)
+    session.mount("https://", adapter)
+    return session
+
+
+def run_mode(mode, base_url, payloads, concurrency):
+    """
+    Gửi các dự đoán với concurrency luồng theo một cách gọi API
+
+    mode: 'legacy' (Session mới + chờ ngẫu nhiên), 'legacy-no-sleep' (chỉ Session mới)
+    hoặc 'pooled' (phiên dùng chung). Trả về độ trễ từng lời gọi (ms), số kết nối mới và
+    thời gian chạy.
+    """
+    shared = create_session(concurrency) if mode == 'pooled' else None
+    handshakes = []
+
+    def call(features):
+        start = time.perf_counter()
+        if shared is None:
+            session = legacy_session()
+            if mode == 'legacy':
+                time.sleep(random.uniform(0.01, 0.1))  # Độ trễ ngẫu nhiên của predict_with_api cũ
+        else:
+            session = shared
+        response = session.post(f"{base_url}/predict", json=features, timeout=2)
+        response.raise_for_status()
+        latency_ms = (time.perf_counter() - start) * 1000
+        if shared is None:
+            handshakes.append(connection_stats(session)['connections_opened'])
+        return latency_ms
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        latencies = np.array(list(executor.map(call, payloads)))
+    elapsed = time.perf_counter() - start
+    opened = connection_stats(shared)['connections_opened'] if shared is not None else sum(handshakes)
+    return latencies, opened, elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Client API: Session mới mỗi lần gọi so với pool keep-alive dùng chung")
+    parser.add_argument('--predictions', type=int, default=1000, help="Số dự đoán mỗi cách gọi")
+    parser.add_argument('--concurrency', type=int, default=API_CONCURRENCY, help="Số luồng (kích thước api_semaphore)")
+    parser.add_argument('--url', default=None, help="URL API có sẵn (mặc định: khởi động gunicorn cục bộ)")
+    parser.add_argument('--port', type=int, default=10110, help="Cổng của gunicorn cục bộ")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        env = dict(os.environ, WEB_CONCURRENCY='1', PORT=str(args.port), RATELIMIT_ENABLED='false')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', 'api_server:app'],
+            cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    try:
+        if not wait_until_healthy(base_url):
+            raise RuntimeError(f"API at {base_url} did not become ready")
+        # Mỗi dự đoán một bộ tham số khác nhau (không trúng cache phía client của app.py)
+        payloads = [dict(zip(FEATURES, row)) for row in random_rows(args.predictions)]
+
+        print(f"{args.predictions} predictions, {args.concurrency} concurrent, {base_url}")
+        print(f"{'mode':<17}{'handshakes':>11}{'p50 ms':>9}{'p99 ms':>9}{'pred/s':>9}")
+        for mode in ('legacy', 'legacy-no-sleep', 'pooled'):
+            latencies, opened, elapsed = run_mode(mode, base_url, payloads, args.concurrency)
+            print(f"{mode:<17}{opened:>11}{np.percentile(latencies, 50):>9.2f}"
+                  f"{np.percentile(latencies, 99):>9.2f}{len(latencies) / elapsed:>9.1f}")
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGINT)  # Tắt nhanh, không chờ các kết nối keep-alive
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+# Mô tả: Kiểm thử tải so sánh máy chủ gunicorn (api_server) và máy chủ asyncio (async_server)
+# Khởi động lần lượt từng máy chủ, mở nhiều kết nối đồng thời bằng aiohttp gửi /predict
+# (chủ yếu không trúng cache) và đo thông lượng, độ trễ p50/p99 và phân bố mã trạng thái
+# (200 / 429 / 503 / lỗi kết nối hoặc timeout)
+# Chạy: python -m utils.async_load_test --connections 64 256 1024 --duration 10
+
+import argparse
+import asyncio
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import time
+from collections import Counter
+
+import aiohttp
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from utils.serving_benchmark import random_rows
+
+FEATURES = [
+    'Engine Size(L)', 'Cylinders', 'Fuel Consumption Comb (L/100 km)',
+    'Horsepower', 'Weight (kg)', 'Year'
+]
+
+# Lệnh khởi động của từng máy chủ (cùng một process phục vụ để so sánh công bằng)
+SERVERS = {
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', 'api_server:app'],
+    'asyncio': [sys.executable, 'async_server.py']
+}
+
+
+async def wait_until_ready(base_url, timeout=120):
+    """Chờ đến khi /health/ready trả về 200"""
+    deadline = time.time() + timeout
+    async with aiohttp.ClientSession() as session:
+        while time.time() < deadline:
+            try:
+                async with session.get(f"{base_url}/health/ready") as response:
+                    if response.status == 200:
+                        return True
+            except aiohttp.ClientError:
+                pass
+            await asyncio.sleep(0.5)
+    return False
+
+
+async def run_load(base_url, n_connections, duration, request_timeout, rows):
+    """Chạy n_connections client đồng thời trong duration giây, trả về thống kê"""
+    statuses = Counter()
+    latencies_ms = []
+    deadline = time.perf_counter() + duration
+    connector = aiohttp.TCPConnector(limit=n_connections)
+    timeout = aiohttp.ClientTimeout(total=request_timeout)
+
+    async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+        async def client(client_id):
+            i = client_id
+            while time.perf_counter() < deadline:
+                payload = dict(zip(FEATURES, rows[i % len(rows)]))
+                i += n_connections
+                start = time.perf_counter()
+                try:
+                    async with session.post(f"{base_url}/predict", json=payload) as response:
+                        await response.read()
+                        statuses[response.status] += 1
+                        if response.status == 200:
+                            latencies_ms.append((time.perf_counter() - start) * 1000)
+                        elif response.status in (429, 503):
+                            # Tôn trọng backpressure ở mức tối thiểu để không tạo vòng lặp bận
+                            await asyncio.sleep(0.01)
+                except asyncio.TimeoutError:
+                    statuses['timeout'] += 1
+                except aiohttp.ClientError:
+                    statuses['conn_error'] += 1
+
+        start = time.perf_counter()
+        await asyncio.gather(*(client(c) for c in range(n_connections)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms.sort()
+    return {
+        'rps': statuses[200] / elapsed,
+        'p50_ms': statistics.median(latencies_ms) if latencies_ms else float('nan'),
+        'p99_ms': latencies_ms[int(len(latencies_ms) * 0.99) - 1] if latencies_ms else float('nan'),
+        'statuses': statuses
+    }
+
+
+def run_server(name, args):
+    """Khởi động một máy chủ, chạy các mức kết nối và trả về danh sách kết quả"""
+    base_url = f"http://127.0.0.1:{args.port}"
+    env = dict(os.environ, PORT=str(args.port), WEB_CONCURRENCY=str(args.workers),
+               RATELIMIT_ENABLED='false', PREDICTION_CACHE_SIZE=str(args.cache_size))
+    server = subprocess.Popen(SERVERS[name], cwd=PROJECT_DIR, env=env, start_new_session=True,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    results = []
+    try:
+        if not asyncio.run(wait_until_ready(base_url)):
+            raise RuntimeError(f"{name} server did not become ready")
+        for n_connections in args.connections:
+            rows = random_rows(50000, seed=n_connections)  # Dữ liệu mới mỗi mức để hạn chế trúng cache
+            result = asyncio.run(run_load(base_url, n_connections, args.duration, args.request_timeout, rows))
+            results.append((n_connections, result))
+    finally:
+        server.send_signal(signal.SIGINT)  # Tắt nhanh, không chờ các kết nối keep-alive
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)  # Dừng cả master lẫn các worker còn sót
+            server.wait()
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh tải giữa máy chủ gunicorn và asyncio")
+    parser.add_argument('--connections', type=int, nargs='+', default=[64, 256, 1024],
+                        help="Các mức số kết nối đồng thời")
+    parser.add_argument('--duration', type=float, default=10.0, help="Thời gian mỗi mức (giây)")
+    parser.add_argument('--request-timeout', type=float, default=30.0, help="Timeout mỗi request phía client (giây)")
+    parser.add_argument('--workers', type=int, default=1, help="Số worker gunicorn")
+    parser.add_argument('--cache-size', type=int, default=1000, help="Kích thước cache dự đoán của máy chủ")
+    parser.add_argument('--port', type=int, default=10110, help="Cổng chạy máy chủ")
+    parser.add_argument('--servers', nargs='+', default=list(SERVERS), choices=list(SERVERS))
+    args = parser.parse_args()
+
+    print(f"{'server':<10}{'conns':>7}{'ok req/s':>10}{'p50 ms':>9}{'p99 ms':>9}"
+          f"{'429':>8}{'503':>8}{'timeout':>9}{'conn err':>10}")
+    for name in args.servers:
+        for n_connections, result in run_server(name, args):
+            statuses = result['statuses']
+            print(f"{name:<10}{n_connections:>7}{result['rps']:>10.0f}{result['p50_ms']:>9.1f}{result['p99_ms']:>9.1f}"
+                  f"{statuses[429]:>8}{statuses[503]:>8}{statuses['timeout']:>9}{statuses['conn_error']:>10}")
+
+
+if __name__ == '__main__':
+    main()
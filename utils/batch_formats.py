@@ -0,0 +1,221 @@
+# Mô tả: Giải mã/mã hóa các định dạng request và response cho dự đoán theo lô
+# Ngoài JSON, hỗ trợ msgpack (danh sách hàng), ma trận .npy thô và Arrow IPC stream.
+# Dữ liệu số được giải mã thành ma trận NumPy theo thứ tự EmissionModel.features, không qua
+# dict từng bản ghi. Chỉ .npy là view trên chính bộ đệm request (không sao chép); cột Arrow
+# được chép đúng một lần từ bộ đệm Arrow vào ma trận; hàng msgpack được giải mã thành list
+# Python trước rồi mới dựng ma trận. msgpack và pyarrow có trong requirements.txt nhưng vẫn
+# được import tùy chọn: nếu thiếu, định dạng tương ứng bị từ chối với lỗi 415.
+
+import gzip
+import io
+import json
+import numpy as np
+
+try:
+    import msgpack
+except ImportError:  # Thư viện tùy chọn
+    msgpack = None
+
+try:
+    import pyarrow as pa
+    import pyarrow.ipc
+except ImportError:  # Thư viện tùy chọn
+    pa = None
+
+JSON_TYPE = 'application/json'
+MSGPACK_TYPE = 'application/msgpack'
+NPY_TYPE = 'application/x-npy'
+ARROW_TYPE = 'application/vnd.apache.arrow.stream'
+
+# Tên định dạng theo content type (chấp nhận cả các tên thay thế phổ biến)
+CONTENT_TYPES = {
+    'application/json': 'json',
+    'application/msgpack': 'msgpack',
+    'application/x-msgpack': 'msgpack',
+    'application/x-npy': 'npy',
+    'application/octet-stream+npy': 'npy',
+    'application/vnd.apache.arrow.stream': 'arrow',
+}
+FORMAT_CONTENT_TYPES = {'json': JSON_TYPE, 'msgpack': MSGPACK_TYPE, 'npy': NPY_TYPE, 'arrow': ARROW_TYPE}
+
+
+class UnsupportedFormatError(ValueError):
+    """Content type không được hỗ trợ hoặc thiếu thư viện tùy chọn (HTTP 415)"""
+
+
+class BatchFormatError(ValueError):
+    """Nội dung request không đúng định dạng đã khai báo (HTTP 400)"""
+
+
+def available_formats():
+    """Danh sách định dạng dùng được trong môi trường hiện tại"""
+    formats = ['json', 'npy']
+    if msgpack is not None:
+        formats.append('msgpack')
+    if pa is not None:
+        formats.append('arrow')
+    return formats
+
+
+def format_from_content_type(content_type, default=None):
+    """Lấy tên định dạng từ header Content-Type/Accept (bỏ qua tham số như charset)"""
+    if not content_type:
+        return default
+    for part in content_type.split(','):
+        media_type = part.split(';')[0].strip().lower()
+        if media_type in CONTENT_TYPES:
+            return CONTENT_TYPES[media_type]
+    return default
+
+
+def _require(fmt):
+    """Báo lỗi 415 nếu thư viện của định dạng chưa được cài"""
+    if fmt == 'msgpack' and msgpack is None:
+        raise UnsupportedFormatError("msgpack support requires the 'msgpack' package")
+    if fmt == 'arrow' and pa is None:
+        raise UnsupportedFormatError("Arrow support requires the 'pyarrow' package")
+
+
+def _decode_npy(body, n_features):
+    """Đọc header .npy rồi tạo view NumPy trên bộ đệm request (không sao chép dữ liệu)"""
+    stream = io.BytesIO(body)
+    try:
+        version = np.lib.format.read_magic(stream)
+        if version == (1, 0):
+            shape, fortran_order, dtype = np.lib.format.read_array_header_1_0(stream)
+        else:
+            shape, fortran_order, dtype = np.lib.format.read_array_header_2_0(stream)
+    except ValueError as e:
+        raise BatchFormatError(f"Invalid .npy payload: {e}")
+
+    if dtype.kind not in 'fiu':
+        raise BatchFormatError(f"Unsupported .npy dtype {dtype}; expected a numeric matrix")
+    if len(shape) != 2 or shape[1] != n_features:
+        raise BatchFormatError(f".npy matrix must have shape (n_rows, {n_features}), got {shape}")
+
+    count = shape[0] * shape[1]
+    if len(body) - stream.tell() < count * dtype.itemsize:
+        raise BatchFormatError("Truncated .npy payload")
+    X = np.frombuffer(body, dtype=dtype, count=count, offset=stream.tell())
+    return X.reshape(shape, order='F' if fortran_order else 'C')
+
+
+def _decode_arrow(body, features):
+    """
+    Đọc Arrow IPC stream thành ma trận theo thứ tự features (giá trị null thành NaN)
+
+    Arrow lưu theo cột còn mô hình cần ma trận theo hàng, nên luôn có một lần sao chép:
+    mỗi khối cột float64 không có null được đọc dưới dạng view rồi chép thẳng vào ma trận.
+    """
+    try:
+        table = pa.ipc.open_stream(pa.py_buffer(body)).read_all()
+    except (pa.ArrowInvalid, OSError) as e:
+        raise BatchFormatError(f"Invalid Arrow IPC stream: {e}")
+
+    missing = [field for field in features if field not in table.column_names]
+    if missing:
+        raise BatchFormatError(f"Missing columns: {', '.join(missing)}")
+
+    # Ghi từng cột vào ma trận thứ tự cột (Fortran) để mỗi cột là một khối liên tục
+    X = np.empty((table.num_rows, len(features)), dtype=np.float64, order='F')
+    for j, field in enumerate(features):
+        column = table.column(field)
+        try:
+            if column.type != pa.float64():
+                column = column.cast(pa.float64())
+        except (pa.ArrowInvalid, pa.ArrowNotImplementedError) as e:
+            raise BatchFormatError(f"Column '{field}' is not numeric: {e}")
+        start = 0
+        for chunk in column.chunks:
+            # Không có null: view trên bộ đệm Arrow; có null: mảng mới với NaN ở các ô null
+            X[start:start + len(chunk), j] = chunk.to_numpy(zero_copy_only=chunk.null_count == 0)
+            start += len(chunk)
+    return X
+
+
+def decode_batch(body, fmt, features):
+    """
+    Giải mã thân request dự đoán theo lô
+
+    Parameters:
+        body: Thân request (bytes)
+        fmt: Tên định dạng ('json', 'msgpack', 'npy', 'arrow')
+        features: Danh sách đặc trưng theo thứ tự của mô hình
+
+    Returns:
+        tuple: ('records', danh sách dict) hoặc ('matrix', ma trận NumPy (n_rows, n_features))
+    """
+    _require(fmt)
+    if fmt == 'npy':
+        return 'matrix', _decode_npy(body, len(features))
+    if fmt == 'arrow':
+        return 'matrix', _decode_arrow(body, features)
+
+    try:
+        data = msgpack.unpackb(body, raw=False) if fmt == 'msgpack' else json.loads(body)
+    except Exception as e:  # msgpack báo lỗi bằng nhiều loại ngoại lệ khác nhau
+        raise BatchFormatError(f"Invalid {fmt} payload: {e}")
+    records = data.get('records') if isinstance(data, dict) else data
+    if not isinstance(records, list):
+        raise BatchFormatError('Body must be an array of records or an object with "records"')
+
+    # msgpack có thể gửi hàng dạng mảng số theo thứ tự features (gọn hơn nhiều so với dict);
+    # các hàng đã là list Python sau unpackb nên np.array sao chép chúng thành ma trận
+    if fmt == 'msgpack' and records and isinstance(records[0], (list, tuple)):
+        try:
+            X = np.array(records, dtype=np.float64)
+        except (TypeError, ValueError) as e:
+            raise BatchFormatError(f"msgpack rows must be numeric arrays of equal length: {e}")
+        if X.ndim != 2 or X.shape[1] != len(features):
+            raise BatchFormatError(f"msgpack rows must each have {len(features)} values in feature order")
+        return 'matrix', X
+    return 'records', records
+
+
+def encode_predictions(fmt, predictions, errors, metadata):
+    """
+    Mã hóa kết quả dự đoán theo lô dạng cột cho các định dạng nhị phân
+
+    Parameters:
+        fmt: 'msgpack', 'npy' hoặc 'arrow'
+        predictions: Mảng float64 các dự đoán (NaN ở hàng lỗi)
+        errors: Danh sách lỗi theo từng hàng (None nếu hợp lệ)
+        metadata: Dictionary thông tin lô (batch_size, valid_rows, timings_ms...)
+
+    Returns:
+        tuple: (bytes, content type)
+    """
+    _require(fmt)
+    if fmt == 'npy':
+        # Chỉ mảng dự đoán; thông tin lô được gửi qua header HTTP
+        buffer = io.BytesIO()
+        np.save(buffer, np.ascontiguousarray(predictions, dtype=np.float64), allow_pickle=False)
+        return buffer.getvalue(), NPY_TYPE
+    if fmt == 'arrow':
+        valid = ~np.isnan(predictions)
+        table = pa.table({
+            'prediction': pa.array(predictions, mask=~valid),
+            'error': pa.array(errors, type=pa.string())
+        })
+        table = table.replace_schema_metadata({'batch': json.dumps(metadata)})
+        sink = pa.BufferOutputStream()
+        with pa.ipc.new_stream(sink, table.schema) as writer:
+            writer.write_table(table)
+        return sink.getvalue().to_pybytes(), ARROW_TYPE
+
+    payload = dict(metadata)
+    payload['predictions'] = [None if p != p else p for p in predictions.tolist()]  # NaN -> nil
+    payload['errors'] = errors
+    return msgpack.packb(payload, use_bin_type=True), MSGPACK_TYPE
+
+
+def maybe_gzip(body, accept_encoding, min_bytes, level):
+    """
+    Nén gzip thân response nếu client chấp nhận và đủ lớn
+
+    Returns:
+        tuple: (bytes, True nếu đã nén)
+    """
+    if len(body) < min_bytes or 'gzip' not in (accept_encoding or '').lower():
+        return body, False
+    return gzip.compress(body, compresslevel=level), True
@@ -1,187 +1,201 @@
 # Mô tả: Công cụ để chạy và phân tích các bài kiểm tra hiệu suất (benchmark)
 # Lớp này theo dõi và tính toán các thông số về tốc độ, độ chính xác và phân phối thời gian
+# Kết quả được lưu dạng cột (utils/result_recorder.py); phân phối thời gian được giữ trong
+# histogram log-tuyến tính (utils/latency_histogram.py), cập nhật từ các cột khi đọc thống kê
 
 import time
 import pandas as pd
 import numpy as np
-from datetime import datetime
 import matplotlib.pyplot as plt
+from utils.latency_histogram import LatencyHistogram
+from utils.result_recorder import ResultRecorder, ResultStatus
+
+# Các thời gian được ghi vào histogram phân vị (giây, như các cột của ResultRecorder)
+HISTOGRAM_FIELDS = ('total_time', 'queue_time', 'network_time', 'processing_time')
+
+# Vị trí các nhãn trên trục phân vị của biểu đồ (phân vị -> nhãn)
+PERCENTILE_TICKS = {50: '50%', 90: '90%', 99: '99%', 99.9: '99.9%', 99.99: '99.99%', 99.999: '99.999%'}
 
 class BenchmarkUtils:
     def __init__(self):
-        self.results = []  # Danh sách lưu kết quả của từng lần dự đoán
+        self.recorder = ResultRecorder()  # Kết quả từng lần dự đoán, lưu dạng cột (utils/result_recorder.py)
         self.start_time = None  # Thời điểm bắt đầu benchmark
         self.end_time = None  # Thời điểm kết thúc benchmark
-        
-    def start_benchmark(self):
-        """Bắt đầu phiên benchmark"""
+        self.merged_time = 0.0  # Thời gian chạy của các phiên đã gộp bằng merge()
+        self.total_requests = 0  # Tổng số yêu cầu đã đưa vào histogram
+        self.successful_requests = 0  # Số yêu cầu thành công
+        # Histogram độ trễ của các yêu cầu thành công: bộ nhớ cố định, gộp được
+        self.histograms = {field: LatencyHistogram() for field in HISTOGRAM_FIELDS}
+        self._folded = ()  # Vị trí đọc của recorder: các hàng trước đó đã được đưa vào histogram
+        
+    def start_benchmark(self, capacity=None):
+        """Bắt đầu phiên benchmark; capacity là số yêu cầu dự kiến (cấp phát trước bộ ghi)"""
         self.start_time = time.perf_counter()  # Lưu thời điểm bắt đầu với độ chính xác cao
-        self.results = []  # Xóa kết quả cũ
+        self.end_time = None
+        self.recorder.clear(capacity)  # Xóa kết quả cũ
+        self.merged_time = 0.0
+        self.total_requests = 0
+        self.successful_requests = 0
+        self._folded = ()
+        for histogram in self.histograms.values():
+            histogram.reset()
         
     def record_prediction(self, timing_data):
-        """Ghi lại kết quả dự đoán với các số liệu về mạng"""
-        # Đảm bảo tất cả các trường cần thiết tồn tại với giá trị mặc định
-        timing_data = {
-            'timestamp': datetime.now(),  # Thời điểm ghi lại
-            'total_time': timing_data.get('total_time', 0),  # Tổng thời gian
-            'network_time': timing_data.get('network_time', 0),  # Thời gian mạng
-            'processing_time': timing_data.get('processing_time', 0),  # Thời gian xử lý
-            'prediction': timing_data.get('prediction'),  # Giá trị dự đoán
-            'status': timing_data.get('status', 'error'),  # Trạng thái (thành công/lỗi)
-            'error': timing_data.get('error')  # Thông báo lỗi nếu có
-        }
-        
-        self.results.append(timing_data)  # Thêm kết quả vào danh sách
+        """Ghi lại kết quả dự đoán (dictionary) với các số liệu về mạng"""
+        # Các trường thiếu nhận giá trị mặc định; trạng thái khác 'success' được ghi là lỗi
+        status = timing_data.get('status', 'error')
+        prediction = timing_data.get('prediction')
+        self.recorder.record(
+            timing_data.get('scheduled_ns') or time.perf_counter_ns(),  # Thời điểm gửi (hoặc lúc ghi lại)
+            timing_data.get('total_time', 0),  # Tổng thời gian
+            timing_data.get('queue_time', 0),  # Trễ so với lịch gửi (bộ sinh tải vòng mở)
+            timing_data.get('network_time', 0),  # Thời gian mạng
+            timing_data.get('processing_time', 0),  # Thời gian xử lý
+            float('nan') if prediction is None else prediction,  # Giá trị dự đoán
+            ResultStatus.SUCCESS if status == 'success' else ResultStatus.ERROR,  # Trạng thái
+            timing_data.get('http_status', 0),  # Mã HTTP nếu có
+            timing_data.get('error')  # Thông báo lỗi nếu có
+        )
         
     def end_benchmark(self):
         """Kết thúc phiên benchmark"""
         self.end_time = time.perf_counter()  # Lưu thời điểm kết thúc
+
+    def _fold(self):
+        """Đưa các hàng mới của recorder vào histogram (vector hóa, mỗi hàng đúng một lần)"""
+        rows, self._folded = self.recorder.read_since(self._folded)
+        if not len(rows):
+            return
+        successful = rows[rows['status'] == ResultStatus.SUCCESS]  # Chỉ yêu cầu thành công tính vào độ trễ
+        for field, histogram in self.histograms.items():
+            histogram.record_array(successful[field])
+        self.total_requests += len(rows)
+        self.successful_requests += len(successful)
+
+    def merge(self, other):
+        """Gộp kết quả của một phiên benchmark khác (lượt chạy hoặc process khác) vào phiên này"""
+        self._fold()
+        other._fold()
+        self.merged_time += other.get_statistics()['total_time']
+        self.recorder.extend(other.recorder)
+        self._folded = self.recorder.read_since(self._folded)[1]  # Các hàng vừa nối đã có trong histogram của other
+        self.total_requests += other.total_requests
+        self.successful_requests += other.successful_requests
+        for field, histogram in self.histograms.items():
+            histogram.merge(other.histograms[field])
+        return self
         
     def get_statistics(self):
-        """Tính toán các thống kê benchmark bao gồm các số liệu về mạng"""
-        if not self.results:
-            # Trả về các giá trị mặc định nếu không có kết quả
-            return {
-                'total_time': 0,
-                'total_requests': 0,
-                'successful_requests': 0,
-                'requests_per_second': 0,
-                'success_rate': 0,
-                'avg_total_time': 0,
-                'avg_network_time': 0,
-                'avg_processing_time': 0,
-                'min_response_time': 0,
-                'max_response_time': 0
-            }
-            
-        df = pd.DataFrame(self.results)  # Chuyển đổi kết quả thành DataFrame
-        successful_df = df[df['status'] == 'success']  # Lọc các yêu cầu thành công
-        
-        total_time = self.end_time - self.start_time  # Tính tổng thời gian
-        total_requests = len(df)  # Tổng số yêu cầu
-        successful_requests = len(successful_df)  # Số yêu cầu thành công
-        
-        # Tính toán thống kê chỉ khi có các yêu cầu thành công
-        if successful_requests > 0:
-            avg_total_time = successful_df['total_time'].mean()  # Thời gian trung bình
-            avg_network_time = successful_df['network_time'].mean()  # Thời gian mạng trung bình
-            avg_processing_time = successful_df['processing_time'].mean()  # Thời gian xử lý trung bình
-            min_response_time = successful_df['total_time'].min()  # Thời gian phản hồi tối thiểu
-            max_response_time = successful_df['total_time'].max()  # Thời gian phản hồi tối đa
-        else:
-            avg_total_time = avg_network_time = avg_processing_time = min_response_time = max_response_time = 0
+        """
+        Tính toán các thống kê benchmark bao gồm các số liệu về mạng
+
+        Trung bình, min, max và các phân vị (p50/p90/p99/p99.9) được đọc từ histogram độ trễ,
+        không cần duyệt lại danh sách kết quả; 'percentiles' chứa bảng phân vị của từng thời gian
+        """
+        self._fold()
+        elapsed = self.end_time - self.start_time if self.start_time is not None and self.end_time is not None else 0
+        total_time = elapsed + self.merged_time  # Tổng thời gian (giây)
+        total = self.histograms['total_time']
         
         # Tổng hợp tất cả thống kê
         stats = {
             'total_time': total_time,  # Tổng thời gian (giây)
-            'total_requests': total_requests,  # Tổng số yêu cầu
-            'successful_requests': successful_requests,  # Số yêu cầu thành công
-            'requests_per_second': total_requests / total_time if total_time > 0 else 0,  # Tốc độ (yêu cầu/giây)
-            'success_rate': (successful_requests / total_requests * 100) if total_requests > 0 else 0,  # Tỷ lệ thành công (%)
-            'avg_total_time': avg_total_time,  # Thời gian trung bình (ms)
-            'avg_network_time': avg_network_time,  # Thời gian mạng trung bình (ms)
-            'avg_processing_time': avg_processing_time,  # Thời gian xử lý trung bình (ms)
-            'min_response_time': min_response_time,  # Thời gian phản hồi tối thiểu (ms)
-            'max_response_time': max_response_time  # Thời gian phản hồi tối đa (ms)
+            'total_requests': self.total_requests,  # Tổng số yêu cầu
+            'successful_requests': self.successful_requests,  # Số yêu cầu thành công
+            'requests_per_second': self.total_requests / total_time if total_time > 0 else 0,  # Tốc độ (yêu cầu/giây)
+            'success_rate': (self.successful_requests / self.total_requests * 100) if self.total_requests > 0 else 0,  # Tỷ lệ thành công (%)
+            'avg_total_time': total.mean,  # Thời gian trung bình (ms)
+            'avg_network_time': self.histograms['network_time'].mean,  # Thời gian mạng trung bình (ms)
+            'avg_processing_time': self.histograms['processing_time'].mean,  # Thời gian xử lý trung bình (ms)
+            'avg_queue_time': self.histograms['queue_time'].mean,  # Trễ so với lịch gửi trung bình (ms)
+            'min_response_time': total.min_seconds or 0,  # Thời gian phản hồi tối thiểu (ms)
+            'max_response_time': total.max_seconds or 0,  # Thời gian phản hồi tối đa (ms)
+            'percentiles': {field: histogram.summary() for field, histogram in self.histograms.items()}  # count/mean/min/p50/p90/p99/p99.9/max
         }
         
         return stats
     
-    def plot_response_times(self):
-        """Tạo biểu đồ xu hướng thời gian phản hồi với phân tích mạng"""
-        df = pd.DataFrame(self.results)  # Chuyển đổi kết quả thành DataFrame
-        successful_df = df[df['status'] == 'success']  # Lọc các yêu cầu thành công
+    def get_percentiles_df(self, scale=1000):
+        """Bảng phân vị (mỗi hàng một loại thời gian), nhân với scale (mặc định giây -> ms)"""
+        self._fold()
+        rows = []
+        for field, histogram in self.histograms.items():
+            summary = histogram.summary()
+            summary.pop('count')
+            rows.append({'metric': field, **{key: value * scale for key, value in summary.items()}})
+        return pd.DataFrame(rows).set_index('metric')
+    
+    def plot_percentiles(self, scale=1000, unit='ms'):
+        """Tạo biểu đồ đường phân vị độ trễ từ histogram (trục phân vị dạng log: 50%, 90%, 99%...)"""
+        self._fold()
+        fig, ax = plt.subplots(figsize=(10, 4))
+        total = self.histograms['total_time']
         
-        if successful_df.empty:
+        if not total.total_count:
             # Tạo biểu đồ trống nếu không có yêu cầu thành công
-            fig, ax = plt.subplots(figsize=(10, 4))
             ax.text(0.5, 0.5, 'Không có yêu cầu thành công để vẽ biểu đồ', 
                    ha='center', va='center')
-            ax.set_xlabel('Số thứ tự yêu cầu')
-            ax.set_ylabel('Thời gian (ms)')
-            ax.set_title('Phân tích thời gian phản hồi')
+            ax.set_xlabel('Phân vị')
+            ax.set_ylabel(f'Thời gian ({unit})')
+            ax.set_title('Phân vị thời gian phản hồi')
             return fig
-            
-        fig, ax = plt.subplots(figsize=(10, 4))
-        
-        # Vẽ tổng thời gian
-        ax.plot(range(len(successful_df)), successful_df['total_time'], 
-                label='Tổng thời gian', color='blue')
-        
-        # Vẽ thời gian mạng
-        ax.plot(range(len(successful_df)), successful_df['network_time'],
-                label='Thời gian mạng', color='red', alpha=0.7)
         
-        # Vẽ thời gian xử lý
-        ax.plot(range(len(successful_df)), successful_df['processing_time'],
-                label='Thời gian xử lý', color='green', alpha=0.7)
-        
-        ax.set_xlabel('Số thứ tự yêu cầu')
-        ax.set_ylabel('Thời gian (ms)')
-        ax.set_title('Phân tích thời gian phản hồi')
+        # Trục x: 1 / (1 - phân vị), để đuôi 99% - 99.9% được giãn ra; phân vị 100% đặt tại 1/N
+        styles = {
+            'total_time': ('Tổng thời gian', 'blue'),
+            'queue_time': ('Trễ so với lịch', 'orange'),
+            'network_time': ('Thời gian mạng', 'red'),
+            'processing_time': ('Thời gian xử lý', 'green')
+        }
+        for field, (label, color) in styles.items():
+            histogram = self.histograms[field]
+            percentiles, values = histogram.percentile_curve()
+            positions = [1 / (1 - p / 100) if p < 100 else histogram.total_count for p in percentiles]
+            ax.step(positions, [v * scale for v in values], where='post', label=label, color=color,
+                    alpha=1.0 if field == 'total_time' else 0.7)
+        
+        # Nhãn phân vị trong phạm vi dữ liệu có được
+        ticks = {1 / (1 - q / 100): label for q, label in PERCENTILE_TICKS.items()
+                 if 1 / (1 - q / 100) <= max(2, total.total_count)}
+        ax.set_xscale('log')
+        ax.set_xticks(list(ticks))
+        ax.set_xticklabels(list(ticks.values()))
+        ax.minorticks_off()
+        ax.set_xlabel('Phân vị')
+        ax.set_ylabel(f'Thời gian ({unit})')
+        ax.set_title('Phân vị thời gian phản hồi')
         ax.legend()
         plt.grid(True, alpha=0.3)
         return fig
     
-    def plot_response_distribution(self):
-        """Tạo biểu đồ phân phối thời gian phản hồi với phân tích mạng"""
-        df = pd.DataFrame(self.results)  # Chuyển đổi kết quả thành DataFrame
-        successful_df = df[df['status'] == 'success']  # Lọc các yêu cầu thành công
-        
-        if successful_df.empty:
-            # Tạo biểu đồ trống nếu không có yêu cầu thành công
-            fig, ax = plt.subplots(figsize=(10, 4))
-            ax.text(0.5, 0.5, 'Không có yêu cầu thành công để vẽ biểu đồ', 
-                   ha='center', va='center')
-            ax.set_xlabel('Thời gian (ms)')
-            ax.set_ylabel('Tần suất')
-            ax.set_title('Phân phối thời gian phản hồi')
-            return fig
-            
-        fig, (ax1, ax2, ax3) = plt.subplots(1, 3, figsize=(15, 4))
-        
-        # Phân phối tổng thời gian
-        ax1.hist(successful_df['total_time'], bins=30, color='blue', alpha=0.7)
-        ax1.set_xlabel('Tổng thời gian (ms)')
-        ax1.set_ylabel('Tần suất')
-        ax1.set_title('Tổng thời gian phản hồi')
-        ax1.grid(True, alpha=0.3)
-        
-        # Phân phối thời gian mạng
-        ax2.hist(successful_df['network_time'], bins=30, color='red', alpha=0.7)
-        ax2.set_xlabel('Thời gian mạng (ms)')
-        ax2.set_title('Thời gian mạng')
-        ax2.grid(True, alpha=0.3)
-        
-        # Phân phối thời gian xử lý
-        ax3.hist(successful_df['processing_time'], bins=30, color='green', alpha=0.7)
-        ax3.set_xlabel('Thời gian xử lý (ms)')
-        ax3.set_title('Thời gian xử lý')
-        ax3.grid(True, alpha=0.3)
-        
-        plt.tight_layout()
-        return fig
-    
-    def get_results_df(self):
-        """Lấy kết quả dưới dạng DataFrame với các số liệu về mạng"""
-        df = pd.DataFrame(self.results)  # Chuyển đổi kết quả thành DataFrame
+    def get_results_df(self, sample=None):
+        """
+        Lấy kết quả dưới dạng DataFrame với các số liệu về mạng
+
+        Parameters:
+            sample: Số hàng ngẫu nhiên cần lấy (None: mọi hàng); các cột phần trăm và làm tròn
+                chỉ được tính trên các hàng được lấy
+        """
+        df = self.recorder.to_dataframe()  # Các cột số là view của bộ ghi, không sao chép
+        df['request_number'] = np.arange(1, len(df) + 1)  # Thêm số thứ tự yêu cầu
+        if sample is not None and len(df) > sample:
+            df = df.sample(n=sample).sort_index()
+        else:
+            df = df.copy()  # Các cột bên dưới được ghi đè: không sửa vào bộ ghi
         if not df.empty:
             # Tính toán phần trăm
             total_time = df['total_time']
             df['network_percentage'] = (df['network_time'] / total_time * 100).round(2)  # Phần trăm thời gian mạng
             df['processing_percentage'] = (df['processing_time'] / total_time * 100).round(2)  # Phần trăm thời gian xử lý
             
-            # Thêm số thứ tự yêu cầu
-            df['request_number'] = range(1, len(df) + 1)
-            
             # Làm tròn các giá trị thời gian để dễ đọc (giữ 3 chữ số thập phân)
             df['total_time'] = df['total_time'].round(3)
             df['network_time'] = df['network_time'].round(3)
             df['processing_time'] = df['processing_time'].round(3)
+            df['queue_time'] = df['queue_time'].round(3)
             
-            # Sắp xếp lại cột
-            columns = ['request_number', 'timestamp', 'total_time', 'network_time', 
-                      'processing_time', 'network_percentage', 'processing_percentage',
-                      'prediction', 'status', 'error']
-            df = df[columns]
-        return df 
\ No newline at end of file
+        # Sắp xếp lại cột
+        columns = ['request_number', 'timestamp', 'total_time', 'queue_time', 'network_time',
+                  'processing_time', 'network_percentage', 'processing_percentage',
+                  'prediction', 'status', 'error']
+        return df.reindex(columns=columns)
@@ -0,0 +1,121 @@
+# Mô tả: Báo cáo thông lượng của bulk_score.py theo số process worker
+# Tạo một file CSV lớn gấp N lần 'co2 Emissions.csv' (mặc định 1000 lần), chấm điểm với
+# nhiều mức worker, kiểm tra đầu ra giống hệt nhau và đúng thứ tự đầu vào, rồi kiểm tra
+# chạy tiếp: dừng cứng (SIGKILL) một lần chạy giữa chừng, chạy lại với --resume và so sánh
+# Chạy: python -m utils.bulk_score_benchmark --copies 1000 --workers 1 2 4
+
+import argparse
+import hashlib
+import json
+import os
+import signal
+import subprocess
+import sys
+import time
+import numpy as np
+import pandas as pd
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from bulk_score import bulk_score
+from models.emission_model import EmissionModel
+
+
+def build_input(data_path, copies, path):
+    """Ghi file CSV gồm copies bản sao của bộ dữ liệu đã tiền xử lý, trả về dự đoán tham chiếu của một bản"""
+    model = EmissionModel()
+    model.load_model()
+    df = model.load_and_preprocess_data(data_path)[['Make', 'Model'] + model.features]
+    reference = model.predict_matrix(df[model.features].to_numpy())['predictions']
+    if not os.path.exists(path):
+        block = df.to_csv(header=False, index=False).encode()
+        with open(path + '.tmp', 'wb') as f:
+            f.write((','.join(df.columns) + '\n').encode())
+            for _ in range(copies):
+                f.write(block)
+        os.replace(path + '.tmp', path)
+    return reference
+
+
+def file_hash(path):
+    """SHA-256 của một file (đọc theo khối)"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def check_order(output_path, reference, copies):
+    """Kiểm tra mỗi bản sao trong đầu ra có đúng dự đoán tham chiếu theo đúng thứ tự"""
+    predictions = pd.read_csv(output_path, usecols=['prediction'])['prediction'].to_numpy()
+    if len(predictions) != len(reference) * copies:
+        return False
+    return bool(np.array_equal(predictions.reshape(copies, len(reference)),
+                               np.broadcast_to(reference, (copies, len(reference)))))
+
+
+def resume_check(input_path, output_path, workers, chunk_rows, kill_after):
+    """Dừng cứng một lần chạy sau kill_after giây rồi chạy tiếp với --resume, trả về (số hàng đã có, thống kê)"""
+    checkpoint_path = output_path + '.progress.json'
+    process = subprocess.Popen(
+        [sys.executable, 'bulk_score.py', input_path, output_path, '--workers', str(workers),
+         '--chunk-rows', str(chunk_rows), '--progress-every', '0'],
+        cwd=PROJECT_DIR, start_new_session=True, stdout=subprocess.DEVNULL
+    )
+    # Dừng sau kill_after giây, nhưng chỉ khi đã có ít nhất một checkpoint
+    deadline = time.perf_counter() + kill_after
+    while time.perf_counter() < deadline or not os.path.exists(checkpoint_path):
+        if process.poll() is not None:
+            raise RuntimeError("The run finished before it could be interrupted; lower --kill-after")
+        time.sleep(0.05)
+    os.killpg(process.pid, signal.SIGKILL)  # Dừng cả process chính lẫn các worker
+    process.wait()
+    with open(checkpoint_path, encoding='utf-8') as f:
+        rows_before = json.load(f)['rows_done']
+    stats = bulk_score(input_path, output_path, workers=workers, chunk_rows=chunk_rows,
+                       resume=True, progress_every=0)
+    return rows_before, stats
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thông lượng bulk_score.py theo số worker trên file lớn")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu gốc")
+    parser.add_argument('--copies', type=int, default=1000, help="Số bản sao của bộ dữ liệu trong file lớn")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="Các mức số worker")
+    parser.add_argument('--chunk-rows', type=int, default=100000, help="Số hàng mỗi khối")
+    parser.add_argument('--kill-after', type=float, default=20.0, help="Giây trước khi dừng cứng lần chạy kiểm tra resume")
+    parser.add_argument('--workdir', default='/tmp/bulk_score_benchmark', help="Thư mục chứa file tạm")
+    args = parser.parse_args()
+
+    os.makedirs(args.workdir, exist_ok=True)
+    input_path = os.path.join(args.workdir, f"vehicles_x{args.copies}.csv")
+    start = time.perf_counter()
+    reference = build_input(args.data, args.copies, input_path)
+    n_rows = len(reference) * args.copies
+    print(f"Input: {n_rows:,} rows, {os.path.getsize(input_path) / 1e6:.0f} MB "
+          f"(prepared in {time.perf_counter() - start:.1f}s), {os.cpu_count()} CPU(s)")
+
+    print(f"{'workers':>8}{'seconds':>10}{'rows/s':>12}{'speedup':>9}{'ordered':>9}")
+    hashes, baseline = set(), None
+    for workers in args.workers:
+        output_path = os.path.join(args.workdir, f"scores_w{workers}.csv")
+        stats = bulk_score(input_path, output_path, workers=workers, chunk_rows=args.chunk_rows, progress_every=0)
+        baseline = baseline or stats['rows_per_s']
+        ordered = check_order(output_path, reference, args.copies)
+        hashes.add(file_hash(output_path))
+        print(f"{workers:>8}{stats['seconds']:>10.1f}{stats['rows_per_s']:>12,.0f}"
+              f"{stats['rows_per_s'] / baseline:>9.2f}{'yes' if ordered else 'NO':>9}")
+    print(f"Outputs identical across worker counts: {'yes' if len(hashes) == 1 else 'NO'}")
+
+    output_path = os.path.join(args.workdir, 'scores_resumed.csv')
+    rows_before, stats = resume_check(input_path, output_path, args.workers[-1], args.chunk_rows, args.kill_after)
+    identical = file_hash(output_path) in hashes
+    print(f"Resume: killed after {rows_before:,} rows, resumed run scored {stats['rows'] - rows_before:,} rows "
+          f"in {stats['seconds']:.1f}s, output identical to a clean run: {'yes' if identical else 'NO'}")
+
+
+if __name__ == '__main__':
+    main()
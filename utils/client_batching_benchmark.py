@@ -0,0 +1,144 @@
+# Mô tả: Đo tỉ lệ dự phòng và thông lượng của predict_with_api (app.py) với nhiều người dùng đồng thời
+# - per-request: mỗi lời gọi một request /predict dưới semaphore API_CONCURRENCY slot, chờ slot
+#   tối đa 0.5 giây rồi trả giá trị dự phòng (cách cũ, API_BATCHING=false)
+# - batched: các lời gọi được gom lô phía client và gửi chung request /predict/batch (mặc định)
+# Hai luồng được dựng lại từ utils/api_client.py vì app.py cần streamlit khi import.
+# Mặc định khởi động gunicorn cục bộ; --url để đo với server có sẵn
+# Chạy: python -m utils.client_batching_benchmark --users 200 --duration 10
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import CancelledError, TimeoutError as FutureTimeoutError
+import numpy as np
+import requests
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from utils.api_client import (
+    API_BATCH_MAX_SIZE, API_BATCH_RESULT_TIMEOUT, API_BATCH_WINDOW_MS, API_CONCURRENCY, create_session,
+    score_remote
+)
+from utils.prediction_batcher import PredictionBatcher
+from utils.scaling_benchmark import FEATURES, wait_until_healthy
+from utils.serving_benchmark import random_rows
+
+
+def make_per_request_client(base_url, session):
+    """Lời gọi theo cách cũ: semaphore API_CONCURRENCY slot, một request /predict mỗi lời gọi"""
+    semaphore = threading.Semaphore(API_CONCURRENCY)
+
+    def predict(features):
+        if not semaphore.acquire(timeout=0.5):
+            return 'fallback'  # Too many concurrent requests
+        try:
+            response = session.post(f"{base_url}/predict", json=features, timeout=2)
+            response.raise_for_status()
+            return response.json().get('status', 'success')
+        except requests.exceptions.RequestException:
+            return 'fallback'
+        finally:
+            semaphore.release()
+    return predict, None
+
+
+def make_batched_client(base_url, session):
+    """Lời gọi qua bộ gom lô phía client, giống predict_batched trong app.py"""
+    batcher = PredictionBatcher(
+        lambda items: score_remote(items, session=session, api_url=base_url),
+        max_batch_size=API_BATCH_MAX_SIZE, max_wait_ms=API_BATCH_WINDOW_MS, name='api-client-batcher'
+    )
+
+    def predict(features):
+        future = batcher.submit(features, timeout=API_BATCH_RESULT_TIMEOUT)
+        try:
+            result = future.result(timeout=API_BATCH_RESULT_TIMEOUT)
+        except (FutureTimeoutError, CancelledError):
+            future.cancel()
+            return 'fallback'
+        except requests.exceptions.RequestException:
+            return 'fallback'
+        return result['status'] if result.get('prediction') is not None else 'fallback'
+    return predict, batcher
+
+
+def run_mode(mode, base_url, users, duration, think_ms):
+    """users thread gọi predict liên tục trong duration giây, trả về (độ trễ ms, trạng thái, thống kê lô)"""
+    # Như app.py: đường gom lô dùng phiên một kết nối, không thử lại
+    session = create_session(1, retries=0) if mode == 'batched' else create_session(API_CONCURRENCY)
+    factory = make_batched_client if mode == 'batched' else make_per_request_client
+    predict, batcher = factory(base_url, session)
+    samples = []
+    samples_lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    def user(user_id):
+        rows = random_rows(2000, seed=user_id)  # Mỗi lời gọi một bộ tham số khác nhau
+        local = []
+        i = 0
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            status = predict(dict(zip(FEATURES, rows[i % len(rows)])))
+            local.append(((time.perf_counter() - start) * 1000, status))
+            i += 1
+            if think_ms:
+                time.sleep(think_ms / 1000)
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=user, args=(u,)) for u in range(users)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    latencies = np.array([s[0] for s in samples])
+    statuses = [s[1] for s in samples]
+    return latencies, statuses, batcher.get_stats() if batcher else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tỉ lệ dự phòng và thông lượng: /predict từng lời gọi so với gom lô phía client")
+    parser.add_argument('--users', type=int, default=200, help="Số người dùng mô phỏng (thread)")
+    parser.add_argument('--duration', type=float, default=10.0, help="Thời gian chạy mỗi cách (giây)")
+    parser.add_argument('--think-ms', type=float, default=0.0, help="Thời gian nghỉ giữa hai lời gọi của một người dùng")
+    parser.add_argument('--url', default=None, help="URL API có sẵn (mặc định: khởi động gunicorn cục bộ)")
+    parser.add_argument('--port', type=int, default=10120, help="Cổng của gunicorn cục bộ")
+    parser.add_argument('--rate-limit', action='store_true', help="Bật giới hạn tốc độ của server cục bộ")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        env = dict(os.environ, WEB_CONCURRENCY='1', PORT=str(args.port),
+                   RATELIMIT_ENABLED='true' if args.rate_limit else 'false')
+        server = subprocess.Popen(
+            [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', 'api_server:app'],
+            cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL,
+            start_new_session=True
+        )
+    try:
+        if not wait_until_healthy(base_url):
+            raise RuntimeError(f"API at {base_url} did not become ready")
+        print(f"{args.users} users, {args.duration:.0f} s each, {base_url}")
+        print(f"{'mode':<13}{'calls':>8}{'pred/s':>9}{'fallback':>10}{'p50 ms':>9}{'p99 ms':>9}{'avg batch':>11}")
+        for mode in ('per-request', 'batched'):
+            latencies, statuses, batch_stats = run_mode(mode, base_url, args.users, args.duration, args.think_ms)
+            fallback_rate = sum(status != 'success' for status in statuses) / len(statuses)
+            avg_batch = f"{batch_stats['avg_batch_size']:.1f}" if batch_stats else '-'
+            print(f"{mode:<13}{len(statuses):>8}{len(statuses) / args.duration:>9.1f}{fallback_rate:>10.1%}"
+                  f"{np.percentile(latencies, 50):>9.1f}{np.percentile(latencies, 99):>9.1f}{avg_batch:>11}")
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGINT)  # Tắt nhanh, không chờ các kết nối keep-alive
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,105 @@
+# Mô tả: Đo thời gian tải và bộ nhớ đỉnh của dữ liệu đã tiền xử lý: đọc lại CSV so với
+# cache dạng cột memory-map (toàn bộ cột hoặc chỉ các cột huấn luyện cần), trên bộ dữ liệu
+# gốc và bản lớn gấp 100 lần. Mỗi kịch bản chạy trong một process riêng để đo RSS đỉnh
+# Chạy: python -m utils.dataset_cache_benchmark --scales 1 100
+
+import argparse
+import json
+import os
+import resource
+import shutil
+import subprocess
+import sys
+import time
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+# Kịch bản -> (dùng cache, chỉ các cột cần dùng)
+SCENARIOS = {
+    'csv': (False, False),
+    'cache-cold': (True, False),
+    'cache-all': (True, False),
+    'cache-needed': (True, True)
+}
+
+
+def peak_rss_mb():
+    """RSS đỉnh của process hiện tại (MB)"""
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def run_child(scenario, data_path, workdir):
+    """Chạy một kịch bản trong process hiện tại và in kết quả dạng JSON"""
+    from models.emission_model import EmissionModel
+    model = EmissionModel(model_path=os.path.join(workdir, 'model.joblib'))
+    use_cache, needed_only = SCENARIOS[scenario]
+    columns = model.features + [model.target] if needed_only else None
+    baseline = peak_rss_mb()
+
+    start = time.perf_counter()
+    df = model.load_and_preprocess_data(data_path, columns=columns, use_cache=use_cache)
+    load_s = time.perf_counter() - start
+
+    # Dùng dữ liệu như khi huấn luyện: ma trận đặc trưng và vector mục tiêu
+    start = time.perf_counter()
+    X, y = model.prepare_features(df)
+    X.to_numpy(dtype='float64'), y.to_numpy(dtype='float64')
+    use_s = time.perf_counter() - start
+    print(json.dumps({'rows': len(df), 'load_s': load_s, 'use_s': use_s,
+                      'peak_mb': peak_rss_mb() - baseline}))
+
+
+def scaled_csv(data_path, scale, workdir):
+    """Tạo file CSV gồm scale bản sao các dòng dữ liệu của file gốc"""
+    if scale == 1:
+        return data_path
+    path = os.path.join(workdir, f"co2_x{scale}.csv")
+    if not os.path.exists(path):
+        with open(data_path, 'rb') as f:
+            header = f.readline()
+            body = f.read()
+        if not body.endswith(b'\n'):
+            body += b'\n'
+        with open(path, 'wb') as f:
+            f.write(header)
+            for _ in range(scale):
+                f.write(body)
+    return path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thời gian tải và bộ nhớ đỉnh: CSV so với cache dạng cột")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 100], help="Các bội số kích thước dữ liệu")
+    parser.add_argument('--repeats', type=int, default=3, help="Số lần chạy mỗi kịch bản (lấy thời gian tốt nhất)")
+    parser.add_argument('--workdir', default='/tmp/dataset_cache_benchmark', help="Thư mục chứa file tạm và cache")
+    parser.add_argument('--child', nargs=3, metavar=('SCENARIO', 'DATA', 'WORKDIR'), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        run_child(*args.child)
+        return
+
+    os.makedirs(args.workdir, exist_ok=True)
+    print(f"{'scale':>6}{'rows':>9}{'CSV MB':>8}{'scenario':>14}{'load s':>9}{'use s':>8}{'peak MB':>9}")
+    for scale in args.scales:
+        data_path = os.path.abspath(scaled_csv(os.path.join(PROJECT_DIR, args.data), scale, args.workdir))
+        for scenario in SCENARIOS:
+            results = []
+            for _ in range(args.repeats if scenario != 'cache-cold' else 1):
+                if scenario == 'cache-cold':
+                    shutil.rmtree(os.path.join(args.workdir, 'preprocessed'), ignore_errors=True)
+                output = subprocess.run(
+                    [sys.executable, '-m', 'utils.dataset_cache_benchmark', '--child', scenario, data_path, args.workdir],
+                    cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+                ).stdout
+                results.append(json.loads(output.strip().splitlines()[-1]))
+            best = min(results, key=lambda r: r['load_s'])
+            print(f"{scale:>6}{best['rows']:>9}{os.path.getsize(data_path) / 1e6:>8.1f}{scenario:>14}"
+                  f"{best['load_s']:>9.3f}{best['use_s']:>8.3f}{max(r['peak_mb'] for r in results):>9.1f}")
+
+
+if __name__ == '__main__':
+    main()
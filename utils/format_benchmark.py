@@ -0,0 +1,115 @@
+# Mô tả: Benchmark chi phí giải mã request và tuần tự hóa response của /predict/batch
+# theo từng định dạng (JSON, msgpack, .npy, Arrow IPC): kích thước payload (thô và gzip),
+# thời gian giải mã/tuần tự hóa mỗi hàng và thời gian xử lý đầu-cuối qua Flask test client
+# Chạy: python -m utils.format_benchmark --rows 1000 10000
+
+import argparse
+import gzip
+import io
+import json
+import os
+import sys
+import time
+import numpy as np
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.batch_formats import (
+    FORMAT_CONTENT_TYPES, available_formats, decode_batch, encode_predictions, msgpack, pa
+)
+from utils.serving_benchmark import random_rows
+
+FEATURES = [
+    'Engine Size(L)', 'Cylinders', 'Fuel Consumption Comb (L/100 km)',
+    'Horsepower', 'Weight (kg)', 'Year'
+]
+
+
+def encode_request(fmt, rows):
+    """Mã hóa các hàng đặc trưng thành thân request theo định dạng (như một client sẽ làm)"""
+    if fmt == 'json':
+        return json.dumps([dict(zip(FEATURES, row)) for row in rows]).encode()
+    if fmt == 'msgpack':
+        return msgpack.packb(rows)
+    if fmt == 'npy':
+        buffer = io.BytesIO()
+        np.save(buffer, np.asarray(rows, dtype=np.float64), allow_pickle=False)
+        return buffer.getvalue()
+    X = np.asarray(rows, dtype=np.float64)
+    table = pa.table({field: X[:, j] for j, field in enumerate(FEATURES)})
+    sink = pa.BufferOutputStream()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue().to_pybytes()
+
+
+def encode_response(fmt, predictions, errors, metadata):
+    """Tuần tự hóa response giống /predict/batch (JSON: danh sách kết quả theo hàng)"""
+    if fmt != 'json':
+        return encode_predictions(fmt, predictions, errors, metadata)[0]
+    results = [
+        {'prediction': prediction, 'status': 'success'} if error is None
+        else {'prediction': None, 'status': 'error', 'message': error}
+        for prediction, error in zip(predictions.tolist(), errors)
+    ]
+    return json.dumps(dict(metadata, results=results)).encode()
+
+
+def best_of(fn, repeats):
+    """Thời gian nhỏ nhất (giây) của fn qua nhiều lần chạy"""
+    best = float('inf')
+    for _ in range(repeats):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def end_to_end_us(client, fmt, body, n_rows, repeats):
+    """Thời gian đầu-cuối mỗi hàng (µs) của /predict/batch qua Flask test client"""
+    content_type = FORMAT_CONTENT_TYPES[fmt]
+    return best_of(
+        lambda: client.post('/predict/batch', data=body, content_type=content_type,
+                            headers={'Accept': content_type}),
+        repeats
+    ) / n_rows * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark các định dạng request/response của /predict/batch")
+    parser.add_argument('--rows', type=int, nargs='+', default=[1000, 10000], help="Các kích thước lô")
+    parser.add_argument('--repeats', type=int, default=5, help="Số lần lặp (lấy thời gian tốt nhất)")
+    args = parser.parse_args()
+
+    import api_server
+    api_server.limiter.enabled = False  # Không để rate limiter ảnh hưởng phép đo
+    api_server.start_background_initialization()
+    while not api_server.is_ready():
+        time.sleep(0.05)
+    client = api_server.app.test_client()
+
+    formats = available_formats()
+    print(f"Formats: {', '.join(formats)}")
+    for n_rows in args.rows:
+        rows = random_rows(n_rows, seed=n_rows)
+        predictions = np.array([200.0 + i % 50 for i in range(n_rows)])
+        errors = [None] * n_rows
+        metadata = {'batch_size': n_rows, 'valid_rows': n_rows, 'status': 'success'}
+
+        print(f"\n{n_rows} rows")
+        print(f"{'format':<9}{'req KB':>9}{'req gz KB':>11}{'parse us/row':>14}"
+              f"{'resp KB':>9}{'resp gz KB':>12}{'serialize us/row':>18}{'end-to-end us/row':>19}")
+        for fmt in formats:
+            body = encode_request(fmt, rows)
+            parse_s = best_of(lambda: decode_batch(body, fmt, FEATURES), args.repeats)
+            response = encode_response(fmt, predictions, errors, metadata)
+            serialize_s = best_of(lambda: encode_response(fmt, predictions, errors, metadata), args.repeats)
+            e2e_us = end_to_end_us(client, fmt, body, n_rows, args.repeats)
+            print(f"{fmt:<9}{len(body) / 1024:>9.1f}{len(gzip.compress(body, 5)) / 1024:>11.1f}"
+                  f"{parse_s / n_rows * 1e6:>14.3f}{len(response) / 1024:>9.1f}"
+                  f"{len(gzip.compress(response, 5)) / 1024:>12.1f}{serialize_s / n_rows * 1e6:>18.3f}{e2e_us:>19.2f}")
+
+
+if __name__ == '__main__':
+    main()
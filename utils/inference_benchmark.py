@@ -0,0 +1,104 @@
+# Mô tả: Microbenchmark độ trễ dự đoán một hàng của EmissionModel
+# So sánh đường tham chiếu (DataFrame + sklearn), đường nhanh không dùng pandas
+# và rừng dạng mảng phẳng (FlatForest) dùng trên đường phục vụ của API
+# Chạy: python -m utils.inference_benchmark --calls 2000
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emission_model import EmissionModel
+
+
+def load_feature_rows(model, data_path, limit=None):
+    """Đọc bộ dữ liệu và trả về danh sách dictionary đặc trưng như request /predict"""
+    df = model.load_and_preprocess_data(data_path)
+    rows = df[model.features].to_dict(orient='records')
+    return rows[:limit] if limit else rows
+
+
+def check_equivalence(predict_fn, reference_fn, rows, exact=True, tolerance=1e-9):
+    """Đối chiếu hai hàm dự đoán trên từng hàng, trả về (số hàng lệch, độ lệch lớn nhất)"""
+    mismatches = 0
+    max_diff = 0.0
+    for features in rows:
+        value = predict_fn(features)
+        expected = reference_fn(features)
+        diff = abs(float(value) - float(expected))
+        max_diff = max(max_diff, diff)
+        if (value != expected) if exact else (diff > tolerance):
+            mismatches += 1
+    return mismatches, max_diff
+
+
+def time_per_call(predict_fn, rows, n_calls, warmup=50):
+    """Đo độ trễ từng lần gọi (µs), trả về thống kê p50/p99/trung bình"""
+    for i in range(warmup):
+        predict_fn(rows[i % len(rows)])
+
+    latencies = np.empty(n_calls)
+    for i in range(n_calls):
+        features = rows[i % len(rows)]
+        start = time.perf_counter()
+        predict_fn(features)
+        latencies[i] = (time.perf_counter() - start) * 1e6
+    return {
+        'mean_us': latencies.mean(),
+        'p50_us': np.percentile(latencies, 50),
+        'p99_us': np.percentile(latencies, 99)
+    }
+
+
+def print_latency_table(results):
+    """In bảng độ trễ của các đường dự đoán"""
+    print(f"{'path':<24}{'mean (us)':>12}{'p50 (us)':>12}{'p99 (us)':>12}")
+    for name, stats in results.items():
+        print(f"{name:<24}{stats['mean_us']:>12.1f}{stats['p50_us']:>12.1f}{stats['p99_us']:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark độ trễ dự đoán một hàng")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu")
+    parser.add_argument('--calls', type=int, default=2000, help="Số lần gọi cho mỗi đường dự đoán")
+    parser.add_argument('--check-rows', type=int, default=None,
+                        help="Số hàng dùng để đối chiếu kết quả (mặc định: toàn bộ dữ liệu)")
+    args = parser.parse_args()
+
+    model = EmissionModel()
+    model.train(args.data)  # Tải mô hình đã lưu (hoặc huấn luyện nếu chưa có)
+    rows = load_feature_rows(model, args.data)
+
+    # Đường nhanh phải trùng khớp từng bit với đường tham chiếu
+    mismatches, max_diff = check_equivalence(
+        model.predict, model.predict_reference, rows[:args.check_rows]
+    )
+    print(f"Equivalence (fast vs reference): {mismatches} mismatches, max |diff| = {max_diff:.3g}")
+
+    # Rừng dạng mảng phẳng: đối chiếu trên toàn bộ dữ liệu với sai số dấu phẩy động
+    compiled_mismatches, compiled_max_diff = check_equivalence(
+        model.predict_compiled, model.predict, rows, exact=False
+    )
+    print(f"Equivalence (compiled vs fast): {compiled_mismatches} mismatches, "
+          f"max |diff| = {compiled_max_diff:.3g}")
+
+    results = {
+        'reference (pandas)': time_per_call(model.predict_reference, rows, args.calls),
+        'fast path': time_per_call(model.predict, rows, args.calls),
+        'compiled (flat forest)': time_per_call(model.predict_compiled, rows, args.calls)
+    }
+    print_latency_table(results)
+    reference_p50 = results['reference (pandas)']['p50_us']
+    for name in ('fast path', 'compiled (flat forest)'):
+        print(f"Speed-up vs reference (p50), {name}: {reference_p50 / results[name]['p50_us']:.1f}x")
+
+    if mismatches or compiled_mismatches:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,189 @@
+# Mô tả: Histogram độ trễ dạng HDR (bucket log-tuyến tính) cho BenchmarkUtils
+# Giá trị được lưu theo micro giây nguyên: mỗi khoảng lũy thừa 2 được chia thành 128 bucket
+# tuyến tính, nên sai số tương đối của mọi phân vị nhỏ hơn 1/128 (< 0.8%) trên toàn dải từ
+# 1 µs đến highest_seconds. Ghi một giá trị là O(1) (vài phép dịch bit và một phép cộng),
+# bộ nhớ cố định (~2600 bộ đếm cho dải 1 µs - 60 s), và hai histogram cùng cấu hình được gộp
+# bằng cách cộng các bộ đếm - dùng để gộp nhiều lượt chạy, nhiều thread hoặc nhiều process.
+# record_array() ghi cả một cột NumPy (ví dụ từ utils/result_recorder.py) bằng các phép vector hóa
+
+import numpy as np
+
+SUB_BUCKET_HALF_MAGNITUDE = 7  # 2^7 = 128 bucket tuyến tính cho mỗi khoảng lũy thừa 2
+SUB_BUCKET_COUNT = 2 << SUB_BUCKET_HALF_MAGNITUDE  # 256 bucket trong khoảng đầu tiên (0 - 255 µs)
+DEFAULT_PERCENTILES = (50, 90, 99, 99.9)
+
+
+class LatencyHistogram:
+    """
+    Histogram độ trễ log-tuyến tính, gộp được, bộ nhớ cố định
+
+    Giá trị lớn hơn highest_seconds được ghi vào bucket cuối (giá trị max vẫn chính xác).
+    Không có khóa: mỗi thread/process ghi histogram riêng rồi gộp bằng merge().
+
+    Parameters:
+        highest_seconds: Giá trị lớn nhất được phân biệt (giây)
+    """
+
+    def __init__(self, highest_seconds=60.0):
+        self.highest_seconds = highest_seconds
+        self._highest_us = max(SUB_BUCKET_COUNT, int(highest_seconds * 1e6))
+        self.counts = [0] * (self._index(self._highest_us) + 1)
+        self.total_count = 0
+        self.total_seconds = 0.0  # Tổng chính xác (để tính trung bình)
+        self._min = float('inf')  # Min/max chính xác; vô cực khi chưa có giá trị
+        self._max = float('-inf')
+
+    @staticmethod
+    def _index(value_us):
+        """Vị trí bucket của một giá trị (µs nguyên không âm)"""
+        bucket = max(0, value_us.bit_length() - SUB_BUCKET_HALF_MAGNITUDE - 1)
+        return (bucket << SUB_BUCKET_HALF_MAGNITUDE) + (value_us >> bucket)
+
+    @staticmethod
+    def _bucket_range(index):
+        """Khoảng giá trị (µs) [thấp nhất, cao nhất] của bucket thứ index"""
+        bucket = max(0, (index >> SUB_BUCKET_HALF_MAGNITUDE) - 1)
+        low = (index - (bucket << SUB_BUCKET_HALF_MAGNITUDE)) << bucket
+        return low, low + (1 << bucket) - 1
+
+    def record(self, seconds, count=1):
+        """Ghi nhận một giá trị (giây), count lần"""
+        value_us = int(seconds * 1e6)
+        if value_us > self._highest_us:
+            value_us = self._highest_us
+        elif value_us < 0:
+            value_us = 0
+        bucket = value_us.bit_length() - SUB_BUCKET_HALF_MAGNITUDE - 1  # Như _index(), viết trực tiếp cho nhanh
+        if bucket < 0:
+            bucket = 0
+        self.counts[(bucket << SUB_BUCKET_HALF_MAGNITUDE) + (value_us >> bucket)] += count
+        self.total_count += count
+        self.total_seconds += seconds * count
+        if seconds < self._min:
+            self._min = seconds
+        if seconds > self._max:
+            self._max = seconds
+
+    def record_array(self, seconds):
+        """Ghi nhận một mảng giá trị (giây) bằng các phép NumPy vector hóa"""
+        seconds = np.asarray(seconds, dtype=np.float64)
+        if not len(seconds):
+            return
+        values_us = np.clip((seconds * 1e6).astype(np.int64), 0, self._highest_us)
+        # np.frexp trả về số mũ e với v = m * 2^e, 0.5 <= m < 1, tức e = v.bit_length()
+        buckets = np.maximum(np.frexp(values_us.astype(np.float64))[1] - SUB_BUCKET_HALF_MAGNITUDE - 1, 0)
+        indexes = (buckets << SUB_BUCKET_HALF_MAGNITUDE) + (values_us >> buckets)
+        counts = np.bincount(indexes, minlength=len(self.counts))
+        for index in np.flatnonzero(counts):
+            self.counts[index] += int(counts[index])
+        self.total_count += len(seconds)
+        self.total_seconds += float(seconds.sum())
+        self._min = min(self._min, float(seconds.min()))
+        self._max = max(self._max, float(seconds.max()))
+
+    @property
+    def min_seconds(self):
+        """Giá trị nhỏ nhất đã ghi (giây), None nếu chưa có"""
+        return self._min if self.total_count else None
+
+    @property
+    def max_seconds(self):
+        """Giá trị lớn nhất đã ghi (giây), None nếu chưa có"""
+        return self._max if self.total_count else None
+
+    def merge(self, other):
+        """Cộng các bộ đếm của histogram khác (cùng highest_seconds) vào histogram này"""
+        if len(other.counts) != len(self.counts):
+            raise ValueError("Cannot merge latency histograms with different ranges")
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total_count += other.total_count
+        self.total_seconds += other.total_seconds
+        self._min = min(self._min, other._min)
+        self._max = max(self._max, other._max)
+        return self
+
+    def reset(self):
+        """Xóa mọi giá trị đã ghi"""
+        self.counts = [0] * len(self.counts)
+        self.total_count = 0
+        self.total_seconds = 0.0
+        self._min, self._max = float('inf'), float('-inf')
+
+    @property
+    def mean(self):
+        """Giá trị trung bình (giây), 0 nếu chưa có giá trị"""
+        return self.total_seconds / self.total_count if self.total_count else 0.0
+
+    def percentile(self, q):
+        """Phân vị q (0-100) tính bằng giây: cận trên của bucket chứa nó, không vượt quá max"""
+        return self.percentiles((q,))[q]
+
+    def percentiles(self, qs=DEFAULT_PERCENTILES):
+        """Nhiều phân vị trong một lần duyệt bộ đếm: {q: giây} (0 nếu chưa có giá trị)"""
+        if not self.total_count:
+            return {q: 0.0 for q in qs}
+        result = {}
+        pending = sorted(qs)
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            cumulative += count
+            while pending and cumulative >= pending[0] / 100.0 * self.total_count:
+                high_us = self._bucket_range(index)[1]
+                result[pending.pop(0)] = min(self.max_seconds, (high_us + 1) / 1e6)
+            if not pending:
+                break
+        for q in pending:  # Chỉ còn lại do sai số làm tròn của q = 100
+            result[q] = self.max_seconds
+        return result
+
+    def summary(self, qs=DEFAULT_PERCENTILES):
+        """Số giá trị, trung bình, min, các phân vị và max (giây), ví dụ {'p50': ..., 'p99.9': ..., 'max': ...}"""
+        stats = {'count': self.total_count, 'mean': self.mean, 'min': self.min_seconds or 0.0}
+        for q, seconds in self.percentiles(qs).items():
+            stats[f"p{q:g}"] = seconds
+        stats['max'] = self.max_seconds or 0.0
+        return stats
+
+    def percentile_curve(self):
+        """
+        Đường phân vị để vẽ biểu đồ
+
+        Returns:
+            tuple: (danh sách phân vị 0-100, danh sách giá trị giây tương ứng), mỗi bucket có dữ liệu một điểm
+        """
+        percentiles, values = [], []
+        cumulative = 0
+        for index, count in enumerate(self.counts):
+            if not count:
+                continue
+            cumulative += count
+            percentiles.append(cumulative / self.total_count * 100)
+            values.append(min(self.max_seconds, (self._bucket_range(index)[1] + 1) / 1e6))
+        return percentiles, values
+
+    def to_dict(self):
+        """Dạng tuần tự hóa gọn (chỉ các bucket khác 0) để gửi giữa các process hoặc lưu JSON"""
+        return {
+            'highest_seconds': self.highest_seconds,
+            'counts': {str(i): count for i, count in enumerate(self.counts) if count},
+            'total_count': self.total_count,
+            'total_seconds': self.total_seconds,
+            'min_seconds': self.min_seconds,
+            'max_seconds': self.max_seconds
+        }
+
+    @classmethod
+    def from_dict(cls, data):
+        """Tạo lại histogram từ to_dict()"""
+        histogram = cls(data['highest_seconds'])
+        for index, count in data['counts'].items():
+            histogram.counts[int(index)] = count
+        histogram.total_count = data['total_count']
+        histogram.total_seconds = data['total_seconds']
+        if histogram.total_count:
+            histogram._min, histogram._max = data['min_seconds'], data['max_seconds']
+        return histogram
@@ -0,0 +1,211 @@
+# Mô tả: Bộ sinh tải asyncio cho trang Benchmark (views/main_view.py)
+# - closed: concurrency client, mỗi client gửi request kế tiếp ngay khi nhận phản hồi
+# - constant / poisson (vòng mở): request được lên lịch theo tốc độ mục tiêu (khoảng cách đều
+#   hoặc phân phối mũ) và được gửi đúng lịch bất kể các request trước đã xong hay chưa
+# Độ trễ được đo từ thời điểm request *được lên lịch* gửi, nên khi server (hoặc pool kết nối)
+# chậm lại, thời gian chờ được tính vào độ trễ thay vì bị bỏ qua (coordinated omission).
+# Mọi request dùng chung một aiohttp.ClientSession với pool kết nối keep-alive; thân JSON được
+# mã hóa trước khi bắt đầu đo để vòng lặp sự kiện chỉ lo gửi/nhận, và kết quả được ghi thẳng
+# vào một ResultRecorder dạng cột (utils/result_recorder.py)
+# Chạy: python -m utils.load_generator --url http://127.0.0.1:10000 --mode poisson --rate 2000
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+import numpy as np
+import aiohttp
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.result_recorder import ResultRecorder, ResultStatus
+
+MODES = ('closed', 'constant', 'poisson')
+JSON_HEADERS = {'Content-Type': 'application/json'}
+YIELD_EVERY = 64  # Khi bị trễ lịch, nhường vòng lặp sau mỗi YIELD_EVERY request để các phản hồi được xử lý
+
+
+class LoadGenerator:
+    """
+    Sinh tải HTTP vòng đóng hoặc vòng mở tới một endpoint của API
+
+    Parameters:
+        base_url: URL gốc của API
+        endpoint: Đường dẫn nhận POST JSON (mặc định /predict)
+        connections: Số kết nối keep-alive tối đa của pool
+        timeout: Thời gian chờ tối đa của mỗi request (giây)
+    """
+
+    def __init__(self, base_url, endpoint='/predict', connections=100, timeout=5.0):
+        self.url = f"{base_url.rstrip('/')}{endpoint}"
+        self.connections = connections
+        self.timeout = timeout
+
+    def run(self, payloads, mode='closed', concurrency=50, rate=None, seed=None,
+            benchmark_utils=None, on_progress=None):
+        """
+        Chạy một lượt tải (đồng bộ, tạo vòng lặp sự kiện riêng)
+
+        Parameters:
+            payloads: Danh sách dictionary đặc trưng, mỗi phần tử một request
+            mode: 'closed', 'constant' hoặc 'poisson'
+            concurrency: Số client đồng thời của chế độ closed
+            rate: Tốc độ mục tiêu (request/giây) của chế độ vòng mở
+            seed: Hạt giống của khoảng cách Poisson
+            benchmark_utils: BenchmarkUtils nhận kết quả (start/record/end), có thể None
+            on_progress: Hàm on_progress(completed, total) được gọi khoảng 100 lần trong lượt chạy
+
+        Returns:
+            ResultRecorder: Kết quả từng request theo thứ tự hoàn thành (thời gian tính bằng giây,
+            'queue_time' là trễ so với lịch); là benchmark_utils.recorder nếu có benchmark_utils
+        """
+        if mode not in MODES:
+            raise ValueError(f"Unknown load mode '{mode}', expected one of {MODES}")
+        if mode != 'closed' and not rate:
+            raise ValueError(f"Mode '{mode}' needs a positive target rate")
+        if benchmark_utils is not None:
+            benchmark_utils.start_benchmark(capacity=len(payloads))
+            recorder = benchmark_utils.recorder
+        else:
+            recorder = ResultRecorder(capacity=len(payloads))
+        asyncio.run(self._run(payloads, mode, concurrency, rate, seed, recorder, on_progress))
+        if benchmark_utils is not None:
+            benchmark_utils.end_benchmark()
+        return recorder
+
+    def schedule(self, n_requests, mode, rate, seed=None):
+        """Thời điểm gửi dự kiến (giây tính từ lúc bắt đầu) của n_requests request vòng mở"""
+        if mode == 'poisson':
+            gaps = np.random.default_rng(seed).exponential(1.0 / rate, n_requests)
+        else:
+            gaps = np.full(n_requests, 1.0 / rate)
+        return np.concatenate(([0.0], np.cumsum(gaps[:-1])))  # Request đầu tiên gửi ngay
+
+    async def _run(self, payloads, mode, concurrency, rate, seed, recorder, on_progress):
+        """Mở pool kết nối, chạy chế độ tải đã chọn, ghi kết quả vào recorder"""
+        bodies = [json.dumps(payload).encode() for payload in payloads]  # Mã hóa trước khi đo
+        n_requests = len(bodies)
+        progress = {'completed': 0, 'step': max(1, n_requests // 100)}
+
+        async def send(index, scheduled_ns):
+            await self._send(session, bodies[index], scheduled_ns, recorder)
+            progress['completed'] += 1
+            if on_progress is not None and (progress['completed'] % progress['step'] == 0
+                                            or progress['completed'] == n_requests):
+                on_progress(progress['completed'], n_requests)
+
+        connector = aiohttp.TCPConnector(limit=self.connections, limit_per_host=self.connections)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout) as session:
+            if mode == 'closed':
+                await self._closed_loop(n_requests, concurrency, send)
+            else:
+                offsets = self.schedule(n_requests, mode, rate, seed)
+                await self._open_loop(offsets, send)
+
+    async def _closed_loop(self, n_requests, concurrency, send):
+        """concurrency client lần lượt lấy request kế tiếp; lịch gửi chính là lúc client rảnh"""
+        next_index = iter(range(n_requests))
+
+        async def client():
+            for index in next_index:  # Iterator dùng chung: mỗi request được lấy đúng một lần
+                await send(index, time.perf_counter_ns())
+
+        await asyncio.gather(*(client() for _ in range(min(concurrency, n_requests))))
+
+    async def _open_loop(self, offsets, send):
+        """Gửi mỗi request đúng thời điểm lên lịch, không chờ các request đang bay"""
+        start_ns = time.perf_counter_ns()
+        offsets_ns = (offsets * 1e9).astype(np.int64).tolist()
+        tasks = []
+        for index, offset_ns in enumerate(offsets_ns):
+            scheduled_ns = start_ns + offset_ns
+            delay = (scheduled_ns - time.perf_counter_ns()) / 1e9
+            if delay > 0:
+                await asyncio.sleep(delay)
+            elif index % YIELD_EVERY == 0:
+                await asyncio.sleep(0)  # Bị trễ lịch: vẫn gửi bù ngay nhưng không chặn vòng lặp
+            tasks.append(asyncio.ensure_future(send(index, scheduled_ns)))
+        await asyncio.gather(*tasks)
+
+    async def _send(self, session, body, scheduled_ns, recorder):
+        """Gửi một request, ghi thời gian tính từ lịch gửi và kết quả dự đoán vào recorder"""
+        sent_ns = time.perf_counter_ns()
+        http_status = 0
+        result = None
+        status = ResultStatus.SUCCESS
+        error = None
+        try:
+            async with session.post(self.url, data=body, headers=JSON_HEADERS) as response:
+                http_status = response.status
+                raw = await response.read()
+            if http_status == 200:
+                result = json.loads(raw)
+            else:
+                status, error = ResultStatus.HTTP_ERROR, f"HTTP {http_status}"
+        except asyncio.TimeoutError:
+            status, error = ResultStatus.TIMEOUT, f"Timeout after {self.timeout}s"
+        except aiohttp.ClientError as e:
+            status, error = ResultStatus.CONNECTION_ERROR, str(e) or type(e).__name__
+        except ValueError as e:
+            status, error = ResultStatus.ERROR, f"Invalid JSON response: {e}"
+        finished_ns = time.perf_counter_ns()
+
+        processing_time = result.get('process_time_ms', 0) / 1000 if result is not None else 0.0
+        prediction = result.get('prediction') if result is not None else None
+        if prediction is None:
+            prediction = float('nan')
+        recorder.record(
+            scheduled_ns,
+            (finished_ns - scheduled_ns) / 1e9,  # Độ trễ tính từ lịch gửi (giây)
+            (sent_ns - scheduled_ns) / 1e9,  # Trễ của bộ sinh tải so với lịch
+            max(0.0, (finished_ns - sent_ns) / 1e9 - processing_time),
+            processing_time,
+            prediction,
+            status,
+            http_status,
+            error
+        )
+
+
+def summarize(recorder, elapsed):
+    """Tốc độ đạt được, tỉ lệ thành công và độ trễ p50/p99 (ms) của một lượt chạy"""
+    rows = recorder.view()
+    latencies = rows['total_time'][rows['status'] == ResultStatus.SUCCESS] * 1000
+    return {
+        'achieved_rate': len(rows) / elapsed if elapsed > 0 else 0,
+        'success_rate': len(latencies) / len(rows) * 100 if len(rows) else 0,
+        'p50_ms': float(np.percentile(latencies, 50)) if len(latencies) else float('nan'),
+        'p99_ms': float(np.percentile(latencies, 99)) if len(latencies) else float('nan'),
+        'max_lag_ms': float(rows['queue_time'].max()) * 1000 if len(rows) else 0.0
+    }
+
+
+def main():
+    from utils.scaling_benchmark import FEATURES
+    from utils.serving_benchmark import random_rows
+
+    parser = argparse.ArgumentParser(description="Sinh tải vòng đóng/vòng mở tới /predict")
+    parser.add_argument('--url', default=os.environ.get('API_URL', 'http://127.0.0.1:10000'), help="URL gốc của API")
+    parser.add_argument('--mode', choices=MODES, default='poisson', help="Chế độ tải")
+    parser.add_argument('--requests', type=int, default=10000, help="Số request")
+    parser.add_argument('--rate', type=float, default=2000.0, help="Tốc độ mục tiêu (request/giây, vòng mở)")
+    parser.add_argument('--concurrency', type=int, default=50, help="Số client đồng thời (vòng đóng)")
+    parser.add_argument('--connections', type=int, default=100, help="Số kết nối keep-alive tối đa")
+    parser.add_argument('--timeout', type=float, default=5.0, help="Thời gian chờ mỗi request (giây)")
+    args = parser.parse_args()
+
+    payloads = [dict(zip(FEATURES, row)) for row in random_rows(args.requests)]
+    generator = LoadGenerator(args.url, connections=args.connections, timeout=args.timeout)
+    start = time.perf_counter()
+    recorder = generator.run(payloads, mode=args.mode, concurrency=args.concurrency, rate=args.rate)
+    summary = summarize(recorder, time.perf_counter() - start)
+    print(f"{args.mode}: {summary['achieved_rate']:.0f} req/s, {summary['success_rate']:.1f}% ok, "
+          f"p50 {summary['p50_ms']:.1f} ms, p99 {summary['p99_ms']:.1f} ms, max lag {summary['max_lag_ms']:.1f} ms")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,106 @@
+# Mô tả: So sánh cách gửi tải cũ của trang Benchmark (ThreadPoolExecutor 50 luồng, mỗi lời gọi
+# một requests.post) với bộ sinh tải asyncio (utils/load_generator.py) ở chế độ vòng đóng và vòng
+# mở: tốc độ đạt được, độ trễ p50/p99 và thời gian CPU phía client cho mỗi request (giới hạn tốc
+# độ mà một process client có thể tạo ra = 1e6 / µs CPU mỗi request).
+# Ở vòng mở, độ trễ tính từ lịch gửi: khi tốc độ mục tiêu vượt sức chứa của server, độ trễ tăng
+# theo hàng đợi thay vì bị che đi như ở vòng đóng (coordinated omission)
+# Chạy: python -m utils.load_generator_benchmark --requests 5000 --rates 500 1000 2000
+
+import argparse
+import os
+import signal
+import subprocess
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+import numpy as np
+import requests
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from utils.load_generator import LoadGenerator
+from utils.result_recorder import ResultRecorder, ResultStatus
+from utils.scaling_benchmark import FEATURES, wait_until_healthy
+from utils.serving_benchmark import random_rows
+
+SERVERS = {
+    'gunicorn': [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', 'api_server:app'],
+    'asyncio': [sys.executable, 'async_server.py']
+}
+
+
+def run_legacy(base_url, payloads, workers=50):
+    """Cách cũ của _show_benchmark_page: requests.post (kết nối mới mỗi lần) qua 50 luồng"""
+    recorder = ResultRecorder(capacity=len(payloads))
+
+    def call(features):
+        start = time.perf_counter_ns()
+        try:
+            response = requests.post(f"{base_url}/predict", json=features, timeout=5)
+            status = ResultStatus.SUCCESS if response.status_code == 200 else ResultStatus.HTTP_ERROR
+        except requests.exceptions.RequestException:
+            status = ResultStatus.CONNECTION_ERROR
+        recorder.record(start, (time.perf_counter_ns() - start) / 1e9, status=status)
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        list(executor.map(call, payloads))
+    return recorder
+
+
+def measure(label, run):
+    """Chạy một cách gửi tải, in tốc độ, độ trễ và CPU phía client"""
+    cpu_start, start = time.process_time(), time.perf_counter()
+    recorder = run()
+    elapsed, cpu = time.perf_counter() - start, time.process_time() - cpu_start
+    rows = recorder.view()
+    latencies = rows['total_time'][rows['status'] == ResultStatus.SUCCESS] * 1000
+    ok_rate = len(latencies) / len(rows)
+    cpu_us = cpu / len(rows) * 1e6
+    print(f"{label:<22}{len(rows) / elapsed:>9.0f}{ok_rate:>7.1%}{np.percentile(latencies, 50):>9.1f}"
+          f"{np.percentile(latencies, 99):>9.1f}{cpu_us:>9.0f}{1e6 / cpu_us:>11.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Bộ sinh tải cũ (thread) so với asyncio vòng đóng/vòng mở")
+    parser.add_argument('--requests', type=int, default=5000, help="Số request mỗi lượt")
+    parser.add_argument('--rates', type=float, nargs='+', default=[500, 1000, 2000],
+                        help="Các tốc độ mục tiêu của vòng mở (request/giây)")
+    parser.add_argument('--concurrency', type=int, default=50, help="Số client đồng thời của vòng đóng")
+    parser.add_argument('--server', choices=list(SERVERS), default='asyncio', help="Máy chủ cục bộ được khởi động")
+    parser.add_argument('--url', default=None, help="URL API có sẵn (mặc định: khởi động máy chủ cục bộ)")
+    parser.add_argument('--port', type=int, default=10130, help="Cổng của máy chủ cục bộ")
+    args = parser.parse_args()
+
+    server = None
+    base_url = args.url
+    if base_url is None:
+        base_url = f"http://127.0.0.1:{args.port}"
+        env = dict(os.environ, WEB_CONCURRENCY='1', PORT=str(args.port), RATELIMIT_ENABLED='false')
+        server = subprocess.Popen(SERVERS[args.server], cwd=PROJECT_DIR, env=env, start_new_session=True,
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        if not wait_until_healthy(base_url):
+            raise RuntimeError(f"API at {base_url} did not become ready")
+        # Mỗi lượt một bộ dữ liệu khác để không trúng cache dự đoán của lượt trước
+        datasets = [[dict(zip(FEATURES, row)) for row in random_rows(args.requests, seed=seed)]
+                    for seed in range(2 + len(args.rates))]
+        generator = LoadGenerator(base_url, connections=100)
+
+        print(f"{args.requests} requests per run, {base_url}")
+        print(f"{'client':<22}{'req/s':>9}{'ok':>7}{'p50 ms':>9}{'p99 ms':>9}{'cpu us':>9}{'max req/s':>11}")
+        measure('threads (legacy)', lambda: run_legacy(base_url, datasets[0], args.concurrency))
+        measure(f"asyncio closed x{args.concurrency}",
+                lambda: generator.run(datasets[1], mode='closed', concurrency=args.concurrency))
+        for i, rate in enumerate(args.rates):
+            measure(f"asyncio poisson {rate:.0f}/s",
+                    lambda: generator.run(datasets[2 + i], mode='poisson', rate=rate, seed=0))
+    finally:
+        if server is not None:
+            os.killpg(server.pid, signal.SIGINT)  # Tắt nhanh, không chờ các kết nối keep-alive
+            server.wait(timeout=60)
+
+
+if __name__ == '__main__':
+    main()
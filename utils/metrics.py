@@ -0,0 +1,209 @@
+# Mô tả: Bộ đếm và histogram độ trễ chi phí thấp, xuất theo định dạng văn bản Prometheus
+# Mỗi thread ghi vào phân mảnh (shard) riêng của mình nên đường ghi không cần khóa;
+# khóa chỉ được dùng khi một thread tạo phân mảnh lần đầu và khi tổng hợp để xuất
+
+import bisect
+import threading
+
+# Cận trên các bucket độ trễ (giây): từ 25 µs đến 2.5 s
+DEFAULT_LATENCY_BUCKETS = (
+    0.000025, 0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005,
+    0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5
+)
+
+
+def _format_labels(labels):
+    """Định dạng nhãn Prometheus: {key="value",...}"""
+    items = list(labels.items())
+    if not items:
+        return ''
+    parts = []
+    for key, value in items:
+        value = str(value).replace('\\', '\\\\').replace('"', '\\"')
+        parts.append(f'{key}="{value}"')
+    return '{' + ','.join(parts) + '}'
+
+
+def _format_value(value):
+    """Định dạng giá trị số theo kiểu Prometheus (+Inf cho vô cực)"""
+    if value == float('inf'):
+        return '+Inf'
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value)
+
+
+class _ShardedMetric:
+    """
+    Lớp cơ sở cho metric phân mảnh theo thread
+
+    Parameters:
+        name: Tên metric Prometheus
+        documentation: Mô tả metric (dòng # HELP)
+        labels: Dictionary nhãn cố định của chuỗi thời gian này
+    """
+    metric_type = None
+
+    def __init__(self, name, documentation, labels=None):
+        self.name = name
+        self.documentation = documentation
+        self.labels = dict(labels or {})
+        self._local = threading.local()
+        self._shards = []  # Mọi phân mảnh đã tạo (kể cả của thread đã kết thúc)
+        self._shards_lock = threading.Lock()
+
+    def _new_shard(self):
+        """Tạo giá trị ban đầu của một phân mảnh"""
+        raise NotImplementedError
+
+    def _shard(self):
+        """Lấy phân mảnh của thread hiện tại, tạo mới nếu chưa có"""
+        try:
+            return self._local.shard
+        except AttributeError:
+            shard = self._new_shard()
+            with self._shards_lock:
+                self._shards.append(shard)
+            self._local.shard = shard
+            return shard
+
+    def _collect_shards(self):
+        """Danh sách phân mảnh hiện có (bản sao để duyệt an toàn)"""
+        with self._shards_lock:
+            return list(self._shards)
+
+
+class Counter(_ShardedMetric):
+    """Bộ đếm chỉ tăng (ví dụ số lần trúng cache)"""
+    metric_type = 'counter'
+
+    def _new_shard(self):
+        return [0]
+
+    def inc(self, amount=1):
+        """Tăng bộ đếm của thread hiện tại"""
+        self._shard()[0] += amount
+
+    @property
+    def value(self):
+        """Tổng giá trị trên mọi phân mảnh"""
+        return sum(shard[0] for shard in self._collect_shards())
+
+    def samples(self):
+        """Các dòng mẫu Prometheus của bộ đếm"""
+        return [(self.name, self.labels, self.value)]
+
+
+class Gauge(Counter):
+    """Giá trị có thể tăng/giảm (ví dụ số request đang xử lý)"""
+    metric_type = 'gauge'
+
+    def dec(self, amount=1):
+        """Giảm giá trị của thread hiện tại"""
+        self._shard()[0] -= amount
+
+
+class Histogram(_ShardedMetric):
+    """
+    Histogram độ trễ với các bucket cố định (giây)
+
+    Mỗi phân mảnh là một list [đếm bucket..., đếm vượt bucket cuối, tổng giây];
+    observe() chỉ tìm bucket bằng bisect và tăng hai phần tử của list.
+    """
+    metric_type = 'histogram'
+
+    def __init__(self, name, documentation, labels=None, buckets=DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labels)
+        self.buckets = tuple(sorted(buckets))
+        self._n_buckets = len(self.buckets)
+
+    def _new_shard(self):
+        return [0] * (self._n_buckets + 1) + [0.0]
+
+    def observe(self, seconds):
+        """Ghi nhận một giá trị (giây) vào phân mảnh của thread hiện tại"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        shard[bisect.bisect_left(self.buckets, seconds)] += 1
+        shard[-1] += seconds
+
+    def snapshot(self):
+        """Tổng hợp mọi phân mảnh: (số đếm từng bucket không cộng dồn, tổng số, tổng giây)"""
+        counts = [0] * (self._n_buckets + 1)
+        total_seconds = 0.0
+        for shard in self._collect_shards():
+            for i in range(self._n_buckets + 1):
+                counts[i] += shard[i]
+            total_seconds += shard[-1]
+        return counts, sum(counts), total_seconds
+
+    def percentile(self, q):
+        """Ước lượng phân vị q (0-100) bằng cận trên của bucket chứa nó"""
+        counts, total, _ = self.snapshot()
+        if total == 0:
+            return None
+        rank = q / 100.0 * total
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            if cumulative >= rank:
+                return bound
+        return float('inf')
+
+    def samples(self):
+        """Các dòng mẫu Prometheus: _bucket (cộng dồn), _sum và _count"""
+        counts, total, total_seconds = self.snapshot()
+        lines = []
+        cumulative = 0
+        for bound, count in zip(self.buckets + (float('inf'),), counts):
+            cumulative += count
+            lines.append((self.name + '_bucket', dict(self.labels, le=_format_value(float(bound))), cumulative))
+        lines.append((self.name + '_sum', self.labels, total_seconds))
+        lines.append((self.name + '_count', self.labels, total))
+        return lines
+
+
+class MetricsRegistry:
+    """Tập hợp các metric của process, xuất ra định dạng văn bản Prometheus"""
+
+    def __init__(self):
+        self._metrics = []
+        self._lock = threading.Lock()
+
+    def _register(self, metric):
+        with self._lock:
+            self._metrics.append(metric)
+        return metric
+
+    def counter(self, name, documentation, labels=None):
+        """Tạo và đăng ký một Counter"""
+        return self._register(Counter(name, documentation, labels))
+
+    def gauge(self, name, documentation, labels=None):
+        """Tạo và đăng ký một Gauge"""
+        return self._register(Gauge(name, documentation, labels))
+
+    def histogram(self, name, documentation, labels=None, buckets=DEFAULT_LATENCY_BUCKETS):
+        """Tạo và đăng ký một Histogram"""
+        return self._register(Histogram(name, documentation, labels, buckets))
+
+    def render(self):
+        """Xuất mọi metric theo định dạng văn bản Prometheus (phiên bản 0.0.4)"""
+        with self._lock:
+            metrics = list(self._metrics)
+
+        # Nhóm các chuỗi thời gian cùng tên để mỗi tên chỉ có một dòng HELP/TYPE
+        families = {}
+        for metric in metrics:
+            families.setdefault(metric.name, []).append(metric)
+
+        lines = []
+        for name, members in families.items():
+            lines.append(f"# HELP {name} {members[0].documentation}")
+            lines.append(f"# TYPE {name} {members[0].metric_type}")
+            for metric in members:
+                for sample_name, labels, value in metric.samples():
+                    lines.append(f"{sample_name}{_format_labels(labels)} {_format_value(value)}")
+        return '\n'.join(lines) + '\n'
@@ -0,0 +1,132 @@
+# Mô tả: Benchmark chi phí của việc đo metric trên đường /predict
+# So sánh chi phí ghi metric của một request (5 histogram giai đoạn, histogram tổng,
+# bộ đếm cache và gauge request đang xử lý) với độ trễ của một request trúng cache,
+# và so sánh histogram phân mảnh theo thread với histogram dùng một khóa chung
+# Chạy: python -m utils.metrics_benchmark
+
+import argparse
+import bisect
+import os
+import statistics
+import sys
+import threading
+import time
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.metrics import DEFAULT_LATENCY_BUCKETS, MetricsRegistry
+
+
+class LockedHistogram:
+    """Histogram tham chiếu: mọi thread ghi vào cùng một mảng dưới một khóa"""
+
+    def __init__(self, buckets=DEFAULT_LATENCY_BUCKETS):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.total = 0.0
+        self.lock = threading.Lock()
+
+    def observe(self, seconds):
+        with self.lock:
+            self.counts[bisect.bisect_left(self.buckets, seconds)] += 1
+            self.total += seconds
+
+
+def instrumentation_cost_ns(n_iterations):
+    """Thời gian (ns) của các thao tác metric mà một request /predict trúng cache thực hiện"""
+    registry = MetricsRegistry()
+    stages = {
+        stage: registry.histogram('stage_seconds', 'stage', {'stage': stage})
+        for stage in ('parse', 'validation', 'cache_lookup', 'serialization')
+    }
+    total = registry.histogram('request_seconds', 'request')
+    hits = registry.counter('hits_total', 'hits')
+    in_flight = registry.gauge('in_flight', 'in flight')
+    perf_counter = time.perf_counter
+
+    start = perf_counter()
+    for _ in range(n_iterations):
+        in_flight.inc()
+        t0 = perf_counter()
+        t1 = perf_counter()
+        stages['parse'].observe(t1 - t0)
+        t2 = perf_counter()
+        stages['validation'].observe(t2 - t1)
+        t3 = perf_counter()
+        stages['cache_lookup'].observe(t3 - t2)
+        hits.inc()
+        t4 = perf_counter()
+        stages['serialization'].observe(t4 - t3)
+        total.observe(t4 - t0)
+        in_flight.dec()
+    return (perf_counter() - start) / n_iterations * 1e9
+
+
+def cache_hit_latency_us(n_requests):
+    """Độ trễ trung vị (µs) của request /predict trúng cache qua Flask test client"""
+    import api_server
+    api_server.limiter.enabled = False  # Không để rate limiter ảnh hưởng phép đo
+    api_server.start_background_initialization()
+    while not api_server.is_ready():
+        time.sleep(0.05)
+
+    client = api_server.app.test_client()
+    payload = {
+        'Engine Size(L)': 2.0, 'Cylinders': 4, 'Fuel Consumption Comb (L/100 km)': 8.0,
+        'Horsepower': 200, 'Weight (kg)': 1500, 'Year': 2020
+    }
+    client.post('/predict', json=payload)  # Đưa kết quả vào cache
+
+    latencies = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        response = client.post('/predict', json=payload)
+        latencies.append((time.perf_counter() - start) * 1e6)
+        assert response.json['cached']
+    handler_us = api_server.request_histogram.snapshot()
+    return statistics.median(latencies), handler_us[2] / handler_us[1] * 1e6
+
+
+def contended_throughput(histogram, n_threads, n_per_thread):
+    """Số lần observe mỗi giây khi n_threads thread ghi đồng thời vào histogram"""
+    def worker():
+        observe = histogram.observe
+        for i in range(n_per_thread):
+            observe(0.0001 * (i % 50))
+
+    threads = [threading.Thread(target=worker) for _ in range(n_threads)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return n_threads * n_per_thread / (time.perf_counter() - start)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chi phí đo metric của /predict")
+    parser.add_argument('--iterations', type=int, default=200000, help="Số vòng đo chi phí metric")
+    parser.add_argument('--requests', type=int, default=3000, help="Số request trúng cache")
+    parser.add_argument('--threads', type=int, default=8, help="Số thread ghi đồng thời")
+    args = parser.parse_args()
+
+    cost_ns = instrumentation_cost_ns(args.iterations)
+    client_us, handler_us = cache_hit_latency_us(args.requests)
+    print(f"Instrumentation per request:        {cost_ns / 1000:8.2f} us")
+    print(f"Cache-hit request (test client p50): {client_us:8.2f} us")
+    print(f"Cache-hit handler (mean, /metrics):  {handler_us:8.2f} us")
+    print(f"Overhead vs cache-hit request:       {cost_ns / 1000 / client_us * 100:8.2f} %")
+    print(f"Overhead vs cache-hit handler:       {cost_ns / 1000 / handler_us * 100:8.2f} %")
+
+    n_per_thread = args.iterations // args.threads
+    sharded = MetricsRegistry().histogram('sharded_seconds', 'sharded')
+    locked = LockedHistogram()
+    print(f"\nConcurrent observe() with {args.threads} threads:")
+    print(f"  per-thread shards: {contended_throughput(sharded, args.threads, n_per_thread):12,.0f} ops/s")
+    print(f"  single lock:       {contended_throughput(locked, args.threads, n_per_thread):12,.0f} ops/s")
+    assert sharded.snapshot()[1] == args.threads * n_per_thread  # Không mất lần ghi nào
+
+
+if __name__ == '__main__':
+    main()
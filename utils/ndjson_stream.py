@@ -0,0 +1,130 @@
+# Mô tả: Chấm điểm luồng NDJSON với bộ nhớ không đổi
+# Đọc thân request theo khối, tách thành từng dòng JSON, gom thành các lô nhỏ cố định để
+# dự đoán bằng đường vector hóa rồi trả về kết quả NDJSON theo từng lô. Tại mọi thời điểm
+# chỉ một khối đầu vào và một lô kết quả nằm trong bộ nhớ, bất kể kích thước luồng.
+
+import json
+import zlib
+
+# Kích thước khối đọc từ thân request (byte), cũng là lượng dữ liệu giải nén tối đa mỗi bước
+READ_BLOCK_BYTES = 1 << 16
+
+# Độ dài tối đa của một dòng (byte): giới hạn bộ nhớ khi đầu vào không có ký tự xuống dòng
+MAX_LINE_BYTES = 1 << 20
+
+
+class LineTooLongError(ValueError):
+    """Một dòng của luồng vượt quá max_line_bytes"""
+
+
+def _iter_blocks(stream, block_size, gzipped):
+    """Các khối dữ liệu (đã giải nén nếu gzipped), mỗi khối không quá block_size byte sau giải nén"""
+    decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS) if gzipped else None
+    while True:
+        block = stream.read(block_size)
+        if not block:
+            break
+        if decompressor is None:
+            yield block
+            continue
+        # max_length giới hạn đầu ra mỗi lần gọi: phần đầu vào chưa giải nén nằm trong unconsumed_tail,
+        # nên một "bom gzip" nhỏ không bao giờ được bung toàn bộ vào bộ nhớ
+        data = decompressor.decompress(block, block_size)
+        while data:
+            yield data
+            data = decompressor.decompress(decompressor.unconsumed_tail, block_size)
+    if decompressor is not None:
+        data = decompressor.flush()
+        if data:
+            yield data
+
+
+def iter_lines(stream, block_size=READ_BLOCK_BYTES, gzipped=False, max_line_bytes=MAX_LINE_BYTES):
+    """
+    Đọc luồng byte theo khối và trả về từng dòng (bytes, không gồm ký tự xuống dòng)
+
+    Parameters:
+        stream: Đối tượng có phương thức read(n) (ví dụ request.stream)
+        block_size: Số byte đọc (và giải nén) mỗi lần
+        gzipped: Giải nén gzip tăng dần nếu thân request có Content-Encoding: gzip
+        max_line_bytes: Độ dài tối đa của một dòng; dài hơn thì ném LineTooLongError
+    """
+    pending = b''
+    for block in _iter_blocks(stream, block_size, gzipped):
+        data = pending + block
+        lines = data.split(b'\n')
+        pending = lines.pop()  # Dòng cuối có thể chưa trọn
+        # Chỉ cần đo từng dòng khi cả khối đã dài hơn giới hạn
+        if len(data) > max_line_bytes and max(len(pending), max(map(len, lines), default=0)) > max_line_bytes:
+            raise LineTooLongError(f"NDJSON line exceeds {max_line_bytes} bytes")
+        yield from lines
+    if pending:
+        yield pending
+
+def _parse_line(line, features):
+    """Phân tích một dòng NDJSON thành bản ghi dict (object hoặc mảng số theo thứ tự features)"""
+    value = json.loads(line)
+    if isinstance(value, list):
+        if len(value) != len(features):
+            raise ValueError(f"Row arrays must have {len(features)} values in feature order")
+        return dict(zip(features, value))
+    return value
+
+
+def score_ndjson(snapshot, lines, chunk_rows=4096, stats=None):
+    """
+    Chấm điểm các dòng NDJSON theo lô và trả về kết quả NDJSON (bytes) theo từng lô
+
+    Mỗi dòng đầu vào không rỗng cho đúng một dòng kết quả cùng thứ tự:
+    {"prediction": <số>} hoặc {"prediction": null, "error": "..."}.
+
+    Parameters:
+        snapshot: Ảnh chụp mô hình dùng cho toàn bộ luồng
+        lines: Iterable các dòng (bytes)
+        chunk_rows: Số dòng mỗi lô dự đoán
+        stats: Dictionary tùy chọn để ghi số dòng/số lỗi đã xử lý
+    """
+    features = snapshot.features
+    records = []  # Bản ghi của lô hiện tại (None với dòng không đọc được)
+    parse_errors = {}  # Vị trí trong lô -> thông báo lỗi phân tích JSON
+    if stats is None:
+        stats = {}
+    stats.setdefault('rows', 0)
+    stats.setdefault('errors', 0)
+
+    def flush():
+        """Dự đoán lô hiện tại và dựng các dòng kết quả"""
+        valid_positions = [i for i, record in enumerate(records) if record is not None]
+        result = snapshot.predict_batch([records[i] for i in valid_positions])
+        errors = dict(parse_errors)
+        predictions = {}
+        for i, prediction, error in zip(valid_positions, result['predictions'].tolist(), result['errors']):
+            if error is None:
+                predictions[i] = prediction
+            else:
+                errors[i] = error
+
+        out = []
+        for i in range(len(records)):
+            if i in predictions:
+                out.append(f'{{"prediction": {predictions[i]!r}}}\n')
+            else:
+                out.append(json.dumps({'prediction': None, 'error': errors[i]}) + '\n')
+        stats['rows'] += len(records)
+        stats['errors'] += len(errors)
+        records.clear()
+        parse_errors.clear()
+        return ''.join(out).encode()
+
+    for line in lines:
+        if not line.strip():
+            continue  # Bỏ qua dòng trống (ví dụ dòng cuối của tệp)
+        try:
+            records.append(_parse_line(line, features))
+        except (ValueError, TypeError) as e:
+            parse_errors[len(records)] = f'Invalid JSON line: {e}'
+            records.append(None)
+        if len(records) >= chunk_rows:
+            yield flush()
+    if records:
+        yield flush()
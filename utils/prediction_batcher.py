@@ -0,0 +1,154 @@
+# Mô tả: Bộ gom lô (micro-batching) cho các yêu cầu dự đoán đồng thời
+# Khi không có tranh chấp (không thread nào đang chấm điểm trực tiếp và không có lô nào
+# đang chờ hay đang được chấm điểm),
+# predict() chấm điểm ngay trong thread gọi, không qua hàng đợi hay đánh thức thread nền.
+# Chỉ khi có tranh chấp, các yêu cầu mới được xếp hàng, gom trong một cửa sổ thời gian ngắn
+# (hoặc đến kích thước lô tối đa), dự đoán bằng một lần gọi vector hóa rồi trả kết quả
+# về cho từng thread đang chờ
+
+import os
+import queue
+import threading
+import time
+from concurrent.futures import Future, TimeoutError as FutureTimeoutError
+
+
+class PredictionBatcher:
+    """
+    Gom các yêu cầu dự đoán đồng thời thành lô và chấm điểm trong một thread nền
+
+    Parameters:
+        score_fn: Hàm nhận danh sách item và trả về danh sách kết quả cùng thứ tự
+        max_batch_size: Số item tối đa trong một lô
+        max_wait_ms: Thời gian tối đa (ms) chờ thêm item sau khi nhận item đầu tiên
+        name: Tên thread nền (để dễ theo dõi khi gỡ lỗi)
+        inline_when_idle: predict() chấm điểm trực tiếp trong thread gọi khi không có tranh chấp
+    """
+    def __init__(self, score_fn, max_batch_size=64, max_wait_ms=1.0, name='prediction-batcher',
+                 inline_when_idle=True):
+        self.score_fn = score_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.name = name
+        self.inline_when_idle = inline_when_idle
+        self._inline_lock = threading.Lock()  # Được giữ khi một thread đang chấm điểm trực tiếp
+        self._queue = queue.Queue()  # Hàng đợi các bộ (item, future, hạn chót)
+        self._start_lock = threading.Lock()
+        self._thread = None
+        self._pid = None  # Process sở hữu thread nền (thread không tồn tại qua fork)
+        # Thống kê kích thước lô
+        self.batches = 0
+        self.items = 0
+        self.inline_items = 0  # Số item được chấm điểm trực tiếp (không qua hàng đợi)
+
+    def _ensure_started(self):
+        """Khởi động thread nền lần đầu sử dụng, hoặc sau khi process bị fork"""
+        if self._pid == os.getpid() and self._thread is not None:
+            return
+        with self._start_lock:
+            if self._pid == os.getpid() and self._thread is not None:
+                return
+            if self._pid != os.getpid():
+                self._queue = queue.Queue()  # Hàng đợi sao chép từ process cha không còn người đọc
+            self._thread = threading.Thread(target=self._run, name=self.name, daemon=True)
+            self._thread.start()
+            self._pid = os.getpid()
+
+    def submit(self, item, timeout=None):
+        """
+        Đưa một item vào hàng đợi, trả về Future chứa kết quả
+
+        Với timeout (giây), item chưa được chấm điểm khi hết hạn bị bỏ khỏi lô và Future
+        bị hủy, kể cả khi người gọi chưa kịp tự hủy.
+        """
+        self._ensure_started()
+        future = Future()
+        deadline = time.monotonic() + timeout if timeout is not None else None
+        self._queue.put((item, future, deadline))
+        return future
+
+    def predict(self, item, timeout=None):
+        """
+        Chấm điểm một item và chờ kết quả (giữ nguyên giao diện gọi đồng bộ)
+
+        Nếu không thread nào khác đang chấm điểm trực tiếp và không có item nào trong hàng đợi
+        hoặc trong lô đang chấm điểm, item được chấm điểm ngay trong thread gọi. Khóa chỉ được thử lấy, không bao giờ chờ: khi đang có
+        tranh chấp, item được xếp hàng để gom lô như trước.
+        """
+        # unfinished_tasks đếm cả item đã lấy khỏi hàng đợi nhưng lô chưa trả kết quả
+        if (self.inline_when_idle and self._queue.unfinished_tasks == 0
+                and self._inline_lock.acquire(blocking=False)):
+            try:
+                result = self.score_fn([item])[0]
+            finally:
+                self._inline_lock.release()
+            self.inline_items += 1
+            return result
+        future = self.submit(item, timeout=timeout)
+        try:
+            return future.result(timeout=timeout)
+        except FutureTimeoutError:
+            future.cancel()  # Người gọi đã bỏ cuộc: không chấm điểm item này nữa
+            raise
+
+    def _collect_batch(self):
+        """Lấy item đầu tiên (chờ vô hạn) rồi gom thêm đến khi hết cửa sổ hoặc đủ lô"""
+        batch = [self._queue.get()]
+        deadline = time.perf_counter() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.perf_counter()
+            try:
+                if remaining <= 0:
+                    batch.append(self._queue.get_nowait())  # Vẫn lấy các item đã sẵn trong hàng đợi
+                else:
+                    batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        """Vòng lặp của thread nền: gom lô, chấm điểm và trả kết quả"""
+        while True:
+            collected = self._collect_batch()
+            try:
+                self._score_batch(collected)
+            finally:
+                for _ in collected:
+                    self._queue.task_done()  # Lô đã xong: predict() lại có thể chấm điểm trực tiếp
+
+    def _score_batch(self, collected):
+        """Chấm điểm một lô đã gom và đặt kết quả (hoặc lỗi) cho từng future"""
+        # Bỏ các item đã quá hạn hoặc người gọi đã hủy (ví dụ hết thời gian chờ); các future
+        # còn lại chuyển sang trạng thái đang chạy nên không thể bị hủy giữa chừng
+        now = time.monotonic()
+        batch = []
+        for item, future, deadline in collected:
+            if deadline is not None and now >= deadline:
+                future.cancel()
+            if future.set_running_or_notify_cancel():
+                batch.append((item, future))
+        if not batch:
+            return
+        items = [item for item, _ in batch]
+        try:
+            results = self.score_fn(items)
+        except Exception as e:
+            for _, future in batch:
+                future.set_exception(e)
+            return
+
+        self.batches += 1
+        self.items += len(batch)
+        for (_, future), result in zip(batch, results):
+            future.set_result(result)
+
+    def get_stats(self):
+        """Thống kê số lô, số item và kích thước lô trung bình"""
+        return {
+            'batches': self.batches,
+            'items': self.items,
+            'avg_batch_size': (self.items / self.batches) if self.batches else 0.0,
+            'inline_items': self.inline_items,
+            'max_batch_size': self.max_batch_size,
+            'max_wait_ms': self.max_wait * 1000
+        }
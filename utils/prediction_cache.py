@@ -0,0 +1,124 @@
+# Mô tả: Cache kết quả dự đoán an toàn đa luồng, có giới hạn kích thước (LRU) và TTL tùy chọn
+# Khóa cache được đặt trong không gian tên theo phiên bản mô hình, nên sau khi tải lại
+# mô hình các kết quả cũ không bao giờ được trả về. Phần còn lại của khóa là chữ ký vùng theo
+# ngưỡng tách của rừng ('region', chính xác từng bit) hoặc bộ đặc trưng đã làm tròn ('canonical',
+# xấp xỉ: các đầu vào chỉ khác nhau dưới độ chính xác làm tròn dùng chung một kết quả)
+
+import sys
+import threading
+import time
+from collections import OrderedDict
+
+# Chi phí ước tính (byte) cho một nút của OrderedDict ngoài khóa và giá trị
+ENTRY_OVERHEAD_BYTES = 100
+
+
+def _estimate_size(key, value):
+    """Ước tính dung lượng bộ nhớ (byte) của một mục cache"""
+    size = ENTRY_OVERHEAD_BYTES + sys.getsizeof(key) + sys.getsizeof(value)
+    if isinstance(key, tuple):
+        size += sum(sys.getsizeof(part) for part in key)
+    return size
+
+
+class PredictionCache:
+    """
+    Cache LRU có giới hạn cho kết quả dự đoán
+
+    Parameters:
+        max_size: Số mục tối đa; mục ít được dùng gần đây nhất bị loại khi đầy
+        ttl_seconds: Thời gian sống của mỗi mục (giây), None để không hết hạn
+        key_mode: 'region' (chữ ký vùng, chỉ gộp các đầu vào luôn cho cùng dự đoán) hoặc
+            'canonical' (bộ đặc trưng đã làm tròn, trả kết quả của đầu vào lân cận)
+    """
+    KEY_MODES = ('region', 'canonical')
+
+    def __init__(self, max_size=10000, ttl_seconds=None, key_mode='region'):
+        if key_mode not in self.KEY_MODES:
+            raise ValueError(f"Unknown cache key mode '{key_mode}', expected one of {self.KEY_MODES}")
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self.key_mode = key_mode
+        self._entries = OrderedDict()  # khóa -> (giá trị, thời điểm hết hạn, dung lượng)
+        self._lock = threading.Lock()
+        self._memory_bytes = 0
+        # Bộ đếm thống kê
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    @staticmethod
+    def make_key(model_version, key_features):
+        """Tạo khóa cache từ phiên bản mô hình và phần khóa của bộ đặc trưng (tuple)"""
+        return (model_version,) + tuple(key_features)
+
+    def key_for(self, snapshot, values):
+        """Tạo khóa cache cho bộ đặc trưng đã xác thực (ModelSnapshot.feature_values) theo key_mode"""
+        if self.key_mode == 'region':
+            return self.make_key(snapshot.version, snapshot.region_signature(values))
+        return self.make_key(snapshot.version, snapshot.canonicalize(values))
+
+    def get(self, key):
+        """Lấy giá trị đã cache, trả về None nếu không có hoặc đã hết hạn"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            value, expires_at, size = entry
+            if expires_at is not None and time.monotonic() >= expires_at:
+                del self._entries[key]
+                self._memory_bytes -= size
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)  # Đánh dấu vừa được sử dụng
+            self.hits += 1
+            return value
+
+    def put(self, key, value):
+        """Lưu giá trị vào cache, loại bỏ các mục cũ nhất nếu vượt quá kích thước"""
+        expires_at = time.monotonic() + self.ttl_seconds if self.ttl_seconds else None
+        size = _estimate_size(key, value)
+        with self._lock:
+            old_entry = self._entries.pop(key, None)
+            if old_entry is not None:
+                self._memory_bytes -= old_entry[2]
+            self._entries[key] = (value, expires_at, size)
+            self._memory_bytes += size
+
+            while len(self._entries) > self.max_size:
+                _, (_, _, evicted_size) = self._entries.popitem(last=False)
+                self._memory_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """Xóa toàn bộ cache, trả về số mục đã xóa"""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            self._memory_bytes = 0
+            return removed
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get_stats(self):
+        """Thống kê hit/miss/eviction và dung lượng bộ nhớ ước tính"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._entries),
+                'max_size': self.max_size,
+                'ttl_seconds': self.ttl_seconds,
+                'key_mode': self.key_mode,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': (self.hits / lookups) if lookups else 0.0,
+                'evictions': self.evictions,
+                'expirations': self.expirations,
+                'memory_bytes': self._memory_bytes
+            }
@@ -0,0 +1,183 @@
+# Mô tả: So sánh bộ giới hạn token bucket dùng chung (utils/rate_limiter.py) với cấu hình cũ
+# flask_limiter (storage memory://, cửa sổ cố định):
+# - chi phí mỗi request: ứng dụng Flask tối giản không giới hạn / flask_limiter / token bucket
+# - nhất quán giữa các process: P process cùng gửi request của một client với quy tắc 100/giây
+# - dồn request ở biên cửa sổ: một request mở cửa sổ, chờ 0.95 giây rồi gửi dồn trong 100 ms
+# Chạy: python -m utils.rate_limit_benchmark --processes 1 2 4 --duration 3
+
+import argparse
+import multiprocessing
+import os
+import sys
+import tempfile
+import time
+import numpy as np
+from flask import Flask, jsonify, request
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.rate_limiter import TokenBucketLimiter
+
+try:
+    from flask_limiter import Limiter
+    from limits import parse
+    from limits.storage import MemoryStorage
+    from limits.strategies import FixedWindowRateLimiter
+except ImportError:  # flask_limiter không còn là phụ thuộc của server; chỉ cần để so sánh
+    Limiter = None
+
+RATE = 100  # Quy tắc của /predict: 100 request/giây
+
+
+def build_app(kind, state_path):
+    """Ứng dụng Flask tối giản với một endpoint, giới hạn theo kiểu kind (giới hạn cao để không từ chối)"""
+    app = Flask(__name__)
+
+    if kind == 'flask_limiter':
+        limiter = Limiter(lambda: '127.0.0.1', app=app, default_limits=["200 per minute", "20 per second"],
+                          storage_uri="memory://", strategy="fixed-window")
+        decorate = limiter.limit("1000000 per second")
+    elif kind == 'token_bucket':
+        limiter = TokenBucketLimiter(state_path)
+        limiter.add_rule('default', rate=200 / 60, burst=20)
+        limiter.add_rule('predict', rate=1e6, burst=1e6)
+        decorate = limiter.limit('predict')
+
+        @app.before_request
+        def enforce_rate_limit():
+            view = app.view_functions.get(request.endpoint)
+            rule = getattr(view, 'rate_limit_rule', 'default')
+            if rule is not None and not limiter.consume(rule, request.remote_addr)[0]:
+                return jsonify({'status': 'error'}), 429
+            return None
+    else:
+        def decorate(view):
+            return view
+
+    @app.route('/predict', methods=['POST'])
+    @decorate
+    def predict():
+        return jsonify({'prediction': 200.0, 'status': 'success'})
+
+    return app
+
+
+def request_cost_us(kind, state_path, n_requests):
+    """Thời gian trung bình (µs) của một request qua test client, lấy lượt nhanh nhất trong 3 lượt"""
+    http = build_app(kind, state_path).test_client()
+    for _ in range(200):
+        http.post('/predict')  # Làm nóng
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(n_requests):
+            http.post('/predict')
+        best = min(best, time.perf_counter() - start)
+    return best / n_requests * 1e6
+
+
+def consume_cost_us(kind, state_path, n_calls):
+    """Thời gian (µs) của riêng một lần kiểm tra giới hạn"""
+    if kind == 'flask_limiter':
+        limiter, item = FixedWindowRateLimiter(MemoryStorage()), parse("1000000 per second")
+        check = lambda: limiter.hit(item, 'predict', '127.0.0.1')  # noqa: E731
+    else:
+        limiter = TokenBucketLimiter(state_path)
+        limiter.add_rule('predict', rate=1e6, burst=1e6)
+        check = lambda: limiter.consume('predict', '127.0.0.1')  # noqa: E731
+    start = time.perf_counter()
+    for _ in range(n_calls):
+        check()
+    return (time.perf_counter() - start) / n_calls * 1e6
+
+
+def make_check(kind, state_path):
+    """Hàm kiểm tra một request của client cố định theo quy tắc RATE/giây, trả về True nếu được phép"""
+    if kind == 'flask_limiter':
+        limiter, item = FixedWindowRateLimiter(MemoryStorage()), parse(f"{RATE} per second")
+        return lambda: limiter.hit(item, 'predict', '127.0.0.1')
+    limiter = TokenBucketLimiter(state_path)
+    limiter.add_rule('predict', rate=RATE, burst=RATE)
+    return lambda: limiter.consume('predict', '127.0.0.1')[0]
+
+
+def hammer(kind, state_path, start_at, duration, queue):
+    """Một process (như một worker) gửi request của cùng một client liên tục, ghi thời điểm được phép"""
+    check = make_check(kind, state_path)
+    while time.time() < start_at:
+        time.sleep(0.0005)
+    allowed = []
+    end = start_at + duration
+    while (now := time.time()) < end:
+        if check():
+            allowed.append(now)
+    queue.put(allowed)
+
+
+def run_processes(kind, n_processes, duration):
+    """Chạy n_processes process trên cùng một file trạng thái, trả về các thời điểm được phép"""
+    with tempfile.TemporaryDirectory() as workdir:
+        state_path = os.path.join(workdir, 'ratelimit.bin')
+        queue = multiprocessing.Queue()
+        # Bắt đầu ngay trước biên giây để cửa sổ cố định bị cắt ngang trong lúc đo
+        start_at = int(time.time()) + 1.9
+        processes = [multiprocessing.Process(target=hammer, args=(kind, state_path, start_at, duration, queue))
+                     for _ in range(n_processes)]
+        for process in processes:
+            process.start()
+        allowed = np.sort(np.concatenate([queue.get() for _ in processes]))
+        for process in processes:
+            process.join()
+    return allowed
+
+
+def edge_burst(kind, state_path):
+    """Số request được phép khi client gửi dồn trong 100 ms quanh biên cửa sổ (0.95 - 1.05 giây)"""
+    check = make_check(kind, state_path)
+    check()  # Request đầu tiên mở cửa sổ cố định
+    start = time.perf_counter()
+    time.sleep(0.95)
+    allowed = 0
+    while time.perf_counter() - start < 1.05:
+        allowed += bool(check())
+    return allowed
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Token bucket dùng chung so với flask_limiter memory://")
+    parser.add_argument('--requests', type=int, default=5000, help="Số request đo chi phí mỗi request")
+    parser.add_argument('--processes', type=int, nargs='+', default=[1, 2, 4], help="Các số process (worker)")
+    parser.add_argument('--duration', type=float, default=3.0, help="Thời gian gửi request mỗi lượt (giây)")
+    args = parser.parse_args()
+
+    kinds = ['token_bucket'] + (['flask_limiter'] if Limiter is not None else [])
+    if Limiter is None:
+        print("flask_limiter is not installed; only the token bucket is measured")
+
+    with tempfile.TemporaryDirectory() as workdir:
+        state_path = os.path.join(workdir, 'ratelimit.bin')
+        baseline = request_cost_us('none', state_path, args.requests)
+        print(f"{'limiter':<15}{'us/request':>11}{'overhead us':>13}{'check us':>10}")
+        print(f"{'none':<15}{baseline:>11.1f}{'-':>13}{'-':>10}")
+        for kind in kinds:
+            cost = request_cost_us(kind, state_path, args.requests)
+            check = consume_cost_us(kind, os.path.join(workdir, f"{kind}.bin"), args.requests * 10)
+            print(f"{kind:<15}{cost:>11.1f}{cost - baseline:>13.1f}{check:>10.2f}")
+
+    expected = RATE + RATE * args.duration  # Bucket đầy ban đầu + lượng nạp trong thời gian đo
+    print(f"\nOne client, rule {RATE}/s, {args.duration:.0f} s (a single shared limit allows ~{expected:.0f})")
+    print(f"{'limiter':<15}{'processes':>10}{'allowed':>9}{'allowed/s':>11}")
+    for kind in kinds:
+        for n_processes in args.processes:
+            allowed = run_processes(kind, n_processes, args.duration)
+            print(f"{kind:<15}{n_processes:>10}{len(allowed):>9}{len(allowed) / args.duration:>11.1f}")
+
+    print(f"\nBurst across a window edge (100 ms of requests after 0.95 s idle, rule {RATE}/s)")
+    with tempfile.TemporaryDirectory() as workdir:
+        for kind in kinds:
+            print(f"{kind:<15}{edge_burst(kind, os.path.join(workdir, f'{kind}.bin')):>10} allowed")
+
+
+if __name__ == '__main__':
+    main()
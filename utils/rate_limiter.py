@@ -0,0 +1,145 @@
+# Mô tả: Bộ giới hạn tốc độ token bucket với trạng thái trong bộ nhớ chia sẻ giữa các process
+# Trạng thái các bucket nằm trong một file được memory-map (mặc định trên /dev/shm), nên mọi
+# worker gunicorn cùng trừ vào một bucket cho mỗi client thay vì mỗi worker một giới hạn riêng.
+# Mỗi lần kiểm tra là O(1): băm khóa vào một nhóm 4 ô, khóa đúng vùng byte của nhóm đó
+# (fcntl.lockf giữa các process, threading.Lock giữa các thread), nạp lại token theo thời
+# gian đã trôi qua và trừ chi phí của request (ví dụ số hàng của một lô)
+
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import threading
+import time
+
+# Một ô: hash khóa (uint64), số token (float64), thời điểm cập nhật (float64, time.monotonic), đệm
+SLOT = struct.Struct('<Qdd8x')
+WAYS = 4  # Số ô trong một nhóm; khóa mới thay ô lâu không được cập nhật nhất của nhóm
+GROUP_BYTES = SLOT.size * WAYS
+THREAD_STRIPES = 64  # Số khóa thread (mỗi nhóm dùng khóa group % THREAD_STRIPES)
+
+
+def default_state_path(name='co2-ratelimit'):
+    """Đường dẫn file trạng thái mặc định: /dev/shm (bộ nhớ) nếu có, nếu không thì thư mục tạm"""
+    directory = '/dev/shm' if os.path.isdir('/dev/shm') else os.environ.get('TMPDIR', '/tmp')
+    return os.path.join(directory, f"{name}.bin")
+
+
+class TokenBucketLimiter:
+    """
+    Giới hạn tốc độ token bucket, dùng chung giữa các process qua file memory-map
+
+    Mỗi quy tắc có tốc độ nạp (token/giây) và dung lượng (burst). Bucket của một khóa
+    (quy tắc, client) bắt đầu đầy; request chỉ được phép khi bucket còn đủ token cho chi phí
+    của nó. Khác với cửa sổ cố định, không có biên cửa sổ để dồn gấp đôi request.
+
+    Parameters:
+        path: File trạng thái (tạo mới nếu chưa có); các process dùng cùng file chia sẻ giới hạn
+        slots: Số ô tối đa (số cặp quy tắc/client được theo dõi đồng thời), làm tròn lên bội của WAYS
+        enabled: False để cho phép mọi request (ví dụ khi benchmark tải)
+    """
+
+    def __init__(self, path, slots=65536, enabled=True):
+        self.path = path
+        self.enabled = enabled
+        self.n_groups = max(1, -(-slots // WAYS))
+        self.rules = {}  # tên quy tắc -> (tốc độ nạp, dung lượng)
+        size = self.n_groups * GROUP_BYTES
+        self._fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o600)
+        if os.fstat(self._fd).st_size < size:
+            os.ftruncate(self._fd, size)  # Vùng mới đọc ra toàn số 0 = các ô trống
+        self._map = mmap.mmap(self._fd, size, mmap.MAP_SHARED)
+        # fcntl.lockf không loại trừ các thread trong cùng process, nên cần thêm khóa thread
+        self._thread_locks = [threading.Lock() for _ in range(THREAD_STRIPES)]
+
+    def add_rule(self, name, rate, burst):
+        """Khai báo quy tắc: nạp rate token mỗi giây, tối đa burst token"""
+        if rate <= 0 or burst <= 0:
+            raise ValueError(f"Rate limit rule '{name}' needs a positive rate and burst")
+        self.rules[name] = (float(rate), float(burst))
+
+    def limit(self, rule, charge_in_view=False):
+        """
+        Decorator gắn quy tắc cho một view (được áp dụng bởi hook trước request của ứng dụng)
+
+        charge_in_view=True: hook bỏ qua view này, chính view tự gọi consume() khi đã biết
+        chi phí (ví dụ số hàng của một lô)
+        """
+        if rule not in self.rules:
+            raise ValueError(f"Unknown rate limit rule '{rule}'")
+
+        def decorator(view):
+            view.rate_limit_rule = None if charge_in_view else rule
+            return view
+        return decorator
+
+    def exempt(self, view):
+        """Decorator: view không bị giới hạn tốc độ"""
+        view.rate_limit_rule = None
+        return view
+
+    def consume(self, rule, key, cost=1):
+        """
+        Trừ cost token khỏi bucket của (rule, key); cost lớn hơn burst không bao giờ được phép
+
+        Returns:
+            tuple: (được phép hay không, số giây cần chờ trước khi đủ token; 0 nếu được phép)
+        """
+        if not self.enabled:
+            return True, 0.0
+        rate, burst = self.rules[rule]
+        key_hash = int.from_bytes(
+            hashlib.blake2b(f"{rule}\0{key}".encode(), digest_size=8).digest(), 'little'
+        ) or 1  # 0 đánh dấu ô trống
+        group = key_hash % self.n_groups
+        offset = group * GROUP_BYTES
+
+        with self._thread_locks[group % THREAD_STRIPES]:
+            fcntl.lockf(self._fd, fcntl.LOCK_EX, GROUP_BYTES, offset)
+            try:
+                now = time.monotonic()
+                target = None
+                oldest = None
+                for way in range(WAYS):
+                    slot_offset = offset + way * SLOT.size
+                    slot_hash, tokens, updated = SLOT.unpack_from(self._map, slot_offset)
+                    if slot_hash == key_hash:
+                        target = slot_offset
+                        break
+                    if oldest is None or updated < oldest[1]:
+                        oldest = (slot_offset, updated)
+                if target is None:
+                    # Khóa chưa được theo dõi: thay ô lâu không dùng nhất bằng một bucket đầy
+                    target, tokens = oldest[0], burst
+                else:
+                    # Nạp token theo thời gian trôi qua (không âm, kể cả khi đồng hồ bị đặt lại)
+                    tokens = min(burst, tokens + max(0.0, now - updated) * rate)
+
+                allowed = tokens >= cost
+                if allowed:
+                    tokens -= cost
+                SLOT.pack_into(self._map, target, key_hash, tokens, now)
+            finally:
+                fcntl.lockf(self._fd, fcntl.LOCK_UN, GROUP_BYTES, offset)
+
+        if allowed:
+            return True, 0.0
+        return False, (cost - tokens) / rate
+
+    def reset(self):
+        """Xóa trạng thái của mọi bucket (mọi process dùng cùng file)"""
+        fcntl.lockf(self._fd, fcntl.LOCK_EX)
+        try:
+            self._map[:] = bytes(len(self._map))
+        finally:
+            fcntl.lockf(self._fd, fcntl.LOCK_UN)
+
+    def get_stats(self):
+        """Cấu hình của bộ giới hạn (file trạng thái, số ô, các quy tắc)"""
+        return {
+            'enabled': self.enabled,
+            'state_file': self.path,
+            'slots': self.n_groups * WAYS,
+            'rules': {name: {'rate': rate, 'burst': burst} for name, (rate, burst) in self.rules.items()}
+        }
@@ -0,0 +1,132 @@
+# Mô tả: Chi phí ghi kết quả benchmark: danh sách dictionary (cách cũ của BenchmarkUtils và của
+# trang Benchmark, mỗi request một dict kèm datetime/pd.Timestamp) so với ResultRecorder dạng cột
+# (utils/result_recorder.py), ghi từ một thread và từ nhiều thread.
+# Đo thời gian mỗi lần ghi, bộ nhớ mỗi hàng (tracemalloc) và thời gian dựng DataFrame/xuất file
+# Chạy: python -m utils.recorder_benchmark --rows 1000000 --threads 8
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from datetime import datetime
+import pandas as pd
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.result_recorder import ResultRecorder, ResultStatus, pyarrow
+
+
+def record_page_dicts(n_rows):
+    """Cách cũ của trang Benchmark: make_request tạo một dict kèm pd.Timestamp.now() cho mỗi request"""
+    results = []
+    for i in range(n_rows):
+        results.append({
+            'timestamp': pd.Timestamp.now(),
+            'total_time': 0.012,
+            'network_time': 0.008,
+            'processing_time': 0.004,
+            'prediction': 200.0,
+            'status': 'success',
+            'error': None
+        })
+    return results
+
+
+def record_utils_dicts(n_rows):
+    """Cách cũ của BenchmarkUtils.record_prediction: chép dict của người gọi sang dict mới kèm datetime.now()"""
+    results = []
+    for i in range(n_rows):
+        timing_data = {'total_time': 0.012, 'network_time': 0.008, 'processing_time': 0.004,
+                       'prediction': 200.0, 'status': 'success'}
+        results.append({
+            'timestamp': datetime.now(),
+            'total_time': timing_data.get('total_time', 0),
+            'network_time': timing_data.get('network_time', 0),
+            'processing_time': timing_data.get('processing_time', 0),
+            'prediction': timing_data.get('prediction'),
+            'status': timing_data.get('status', 'error'),
+            'error': timing_data.get('error')
+        })
+    return results
+
+
+def record_columns(recorder, n_rows):
+    """ResultRecorder: mỗi request một hàng của mảng cấp phát trước"""
+    for i in range(n_rows):
+        recorder.record(time.perf_counter_ns(), 0.012, 0.0, 0.008, 0.004, 200.0, ResultStatus.SUCCESS, 200)
+
+
+def columnar(recorder, n_rows):
+    """Ghi n_rows hàng vào recorder và trả về recorder"""
+    record_columns(recorder, n_rows)
+    return recorder
+
+
+def measure(label, record, to_dataframe, n_rows):
+    """
+    Ghi n_rows hàng, in ns mỗi lần ghi, byte mỗi hàng và thời gian dựng DataFrame
+
+    Thời gian và bộ nhớ được đo ở hai lượt riêng vì tracemalloc làm chậm mọi phép cấp phát
+    """
+    start = time.perf_counter()
+    store = record()
+    elapsed = time.perf_counter() - start
+    start = time.perf_counter()
+    to_dataframe(store)
+    df_ms = (time.perf_counter() - start) * 1000
+    del store
+    tracemalloc.start()
+    store = record()
+    memory = tracemalloc.get_traced_memory()[0]
+    tracemalloc.stop()
+    print(f"{label:<26}{elapsed / n_rows * 1e9:>10.0f}{memory / n_rows:>11.0f}{df_ms:>13.1f}")
+    return store
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Danh sách dictionary so với ResultRecorder dạng cột")
+    parser.add_argument('--rows', type=int, default=1000000, help="Số kết quả được ghi")
+    parser.add_argument('--threads', type=int, default=8, help="Số thread ghi đồng thời")
+    args = parser.parse_args()
+    n_rows = args.rows
+
+    def threaded():
+        recorder = ResultRecorder(capacity=n_rows)
+        per_thread = n_rows // args.threads
+        threads = [threading.Thread(target=record_columns, args=(recorder, per_thread)) for _ in range(args.threads)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return recorder
+
+    print(f"{n_rows} results")
+    print(f"{'recorder':<26}{'ns/record':>10}{'bytes/row':>11}{'DataFrame ms':>13}")
+    measure('old page dicts', lambda: record_page_dicts(n_rows), pd.DataFrame, n_rows)
+    measure('old record_prediction', lambda: record_utils_dicts(n_rows), pd.DataFrame, n_rows)
+    measure('columnar, grown from 1024', lambda: columnar(ResultRecorder(), n_rows),
+            lambda r: r.to_dataframe(), n_rows)
+    recorder = measure('columnar, preallocated', lambda: columnar(ResultRecorder(capacity=n_rows), n_rows),
+                       lambda r: r.to_dataframe(), n_rows)
+    measure(f"columnar, {args.threads} threads", threaded, lambda r: r.to_dataframe(), n_rows)
+
+    start = time.perf_counter()
+    recorder.to_dataframe(timestamps=False, errors=False)
+    print(f"\nZero-copy DataFrame view (no timestamp/error columns): {(time.perf_counter() - start) * 1000:.2f} ms")
+    with tempfile.TemporaryDirectory() as workdir:
+        for name, export in (('CSV', recorder.to_csv), ('Parquet', recorder.to_parquet if pyarrow else None)):
+            if export is None:
+                print(f"{name} export skipped (pyarrow is not installed)")
+                continue
+            path = os.path.join(workdir, f"results.{name.lower()}")
+            start = time.perf_counter()
+            export(path)
+            print(f"{name} export: {time.perf_counter() - start:.2f} s, {os.path.getsize(path) / 1e6:.1f} MB")
+
+
+if __name__ == '__main__':
+    main()
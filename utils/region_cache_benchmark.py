@@ -0,0 +1,126 @@
+# Mô tả: So sánh tỉ lệ trúng cache của ba kiểu khóa trên traffic phát lại
+# - string: chuỗi giá trị thô như get_cache_key trong app.py
+# - canonical: bộ đặc trưng làm tròn theo độ chính xác dữ liệu (PREDICTION_CACHE_KEY=canonical)
+# - region: chữ ký vùng theo ngưỡng tách của rừng (khóa mặc định của /predict)
+# và đếm số lần trúng cache trả về kết quả khác dự đoán trực tiếp trên giá trị gốc (region: luôn 0)
+# Chạy: python -m utils.region_cache_benchmark --requests 100000 --cache-size 10000
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emission_model import EmissionModel
+from utils.prediction_cache import PredictionCache
+
+
+def string_key(features):
+    """Khóa chuỗi giống get_cache_key trong app.py"""
+    return "|".join(f"{k}:{v}" for k, v in sorted(features.items()))
+
+
+def random_traffic(n_requests, seed):
+    """Tham số ngẫu nhiên như MainView.generate_random_features"""
+    rng = np.random.RandomState(seed)
+    return [
+        {
+            'Engine Size(L)': rng.uniform(1.0, 8.0),
+            'Cylinders': rng.randint(3, 12),
+            'Fuel Consumption Comb (L/100 km)': rng.uniform(4.0, 20.0),
+            'Horsepower': rng.uniform(100, 800),
+            'Weight (kg)': rng.uniform(1000, 4000),
+            'Year': rng.randint(2015, 2024)
+        }
+        for _ in range(n_requests)
+    ]
+
+
+def form_traffic(n_requests, seed):
+    """Giá trị nhập từ form (bước nhập của MainView: 0.1 L, 10 mã lực, 100 kg)"""
+    rng = np.random.RandomState(seed)
+    return [
+        {
+            'Engine Size(L)': round(rng.randint(10, 81) * 0.1, 1),
+            'Cylinders': int(rng.choice([3, 4, 6, 8, 10, 12])),
+            'Fuel Consumption Comb (L/100 km)': round(rng.randint(40, 201) * 0.1, 1),
+            'Horsepower': int(rng.randint(10, 81) * 10),
+            'Weight (kg)': int(rng.randint(10, 41) * 100),
+            'Year': int(rng.randint(2015, 2025))
+        }
+        for _ in range(n_requests)
+    ]
+
+
+def dataset_traffic(model, data_path, n_requests, seed):
+    """Các phương tiện lấy ngẫu nhiên (có lặp) từ bộ dữ liệu đã tiền xử lý"""
+    df = model.load_and_preprocess_data(data_path)
+    rows = df[model.features].to_numpy()[np.random.RandomState(seed).randint(0, len(df), n_requests)]
+    return [dict(zip(model.features, row.tolist())) for row in rows]
+
+
+def replay(model, traffic, cache_size):
+    """Phát lại traffic qua ba cache, trả về tỉ lệ trúng, số vùng khác nhau và số lần trúng sai"""
+    flat_forest = model.flat_forest
+    caches = {name: PredictionCache(max_size=cache_size) for name in ('string', 'canonical', 'region')}
+    regions = set()
+    mismatches = {'canonical': 0, 'region': 0}
+    signature_seconds = 0.0
+
+    for features in traffic:
+        values = model.feature_values(features)
+        canonical = model.canonicalize(values)
+        start = time.perf_counter()
+        signature = model.region_signature(values)
+        signature_seconds += time.perf_counter() - start
+        regions.add(signature)
+        prediction = flat_forest.predict_row(values)  # Dự đoán trên giá trị gốc, không làm tròn
+
+        for name, key in (('string', string_key(features)), ('canonical', canonical), ('region', signature)):
+            cached = caches[name].get(key)
+            if cached is None:
+                caches[name].put(key, prediction)
+            elif name in mismatches and cached != prediction:
+                mismatches[name] += 1  # Trúng cache nhưng khác dự đoán trực tiếp
+
+    return {
+        'hit_rates': {name: cache.get_stats()['hit_rate'] for name, cache in caches.items()},
+        'regions': len(regions),
+        'mismatches': mismatches,
+        'signature_us': signature_seconds / len(traffic) * 1e6
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Tỉ lệ trúng cache: khóa chuỗi, khóa làm tròn và chữ ký vùng")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu")
+    parser.add_argument('--requests', type=int, default=100000, help="Số request phát lại cho mỗi loại traffic")
+    parser.add_argument('--cache-size', type=int, default=10000, help="Kích thước cache (như PREDICTION_CACHE_SIZE)")
+    args = parser.parse_args()
+
+    model = EmissionModel()
+    model.train(args.data)
+    edges = [len(e) for e in model.flat_forest.split_edges]
+    print(f"{model.flat_forest.n_trees} trees, split thresholds per feature: "
+          + ", ".join(f"{field}={n}" for field, n in zip(model.features, edges)))
+
+    traffics = {
+        'random': random_traffic(args.requests, seed=0),
+        'form': form_traffic(args.requests, seed=0),
+        'dataset': dataset_traffic(model, args.data, args.requests, seed=0)
+    }
+    print(f"{'traffic':<9}{'string':>9}{'canonical':>11}{'region':>9}{'regions':>10}"
+          f"{'wrong canon':>12}{'wrong region':>13}{'sig us':>8}")
+    for name, traffic in traffics.items():
+        result = replay(model, traffic, args.cache_size)
+        rates = result['hit_rates']
+        print(f"{name:<9}{rates['string']:>9.1%}{rates['canonical']:>11.1%}{rates['region']:>9.1%}"
+              f"{result['regions']:>10}{result['mismatches']['canonical']:>12}{result['mismatches']['region']:>13}"
+              f"{result['signature_us']:>8.1f}")
+
+
+if __name__ == '__main__':
+    main()
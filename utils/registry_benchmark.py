@@ -0,0 +1,121 @@
+# Mô tả: Đo thời gian chuyển phiên bản mô hình qua kho phiên bản (models/model_registry.py)
+# Công bố hai phiên bản (mô hình hiện tại và bản 25 cây của nó) vào một kho tạm, rồi luân phiên
+# chuyển phiên bản theo ba cách trong khi các client gửi request /predict liên tục:
+# - cold: kích hoạt phiên bản chưa tải (tải + làm nóng trong lúc chuyển)
+# - preloaded: đánh dấu next, worker tải trước trong nền, rồi mới kích hoạt
+# - rollback: quay lui về phiên bản trước (vẫn còn trong bộ nhớ)
+# Chạy: python -m utils.registry_benchmark --switches 5
+
+import argparse
+import os
+import sys
+import tempfile
+import threading
+import time
+import numpy as np
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from models.compact_forest import build_model, fit_variant
+from models.emission_model import EmissionModel
+from models.flat_forest import FlatForest
+from models.model_registry import ModelRegistry
+from utils.serving_benchmark import random_rows
+
+
+def publish_versions(registry, workdir):
+    """Công bố mô hình hiện tại và bản 25 cây của nó, trả về hai mã phiên bản"""
+    base = EmissionModel()
+    base.train(api_server.DATA_PATH)
+    first = registry.publish(base.model_path, base.scaler_path)
+    forest = fit_variant(base.model, {'trees': 0.25}, None, None)
+    metadata = {**base.metadata, 'model_params': {**base.metadata.get('model_params', {}),
+                                                  'n_estimators': len(forest.estimators_)}}
+    smaller = build_model(base, forest, FlatForest.from_sklearn(forest, base.scaler),
+                          os.path.join(workdir, 'trained_model.joblib'), metadata)
+    return first, registry.publish(smaller.model_path, smaller.scaler_path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thời gian chuyển phiên bản mô hình qua kho phiên bản")
+    parser.add_argument('--switches', type=int, default=5, help="Số lần chuyển cho mỗi cách")
+    parser.add_argument('--clients', type=int, default=4, help="Số client gửi /predict đồng thời")
+    parser.add_argument('--pause', type=float, default=0.5, help="Thời gian nghỉ giữa các lần chuyển (giây)")
+    args = parser.parse_args()
+
+    api_server.limiter.enabled = False  # Đo đường phục vụ, không đo giới hạn tốc độ
+    with tempfile.TemporaryDirectory() as workdir:
+        registry = ModelRegistry(os.path.join(workdir, 'registry'))
+        versions = publish_versions(registry, workdir)
+        registry.activate(versions[0])
+        api_server.model_registry = registry
+        if not api_server.initialize_model():
+            sys.exit("Model initialization failed")
+
+        features = api_server.current_snapshot.features
+        rows = random_rows(20000)
+        samples = []  # (thời điểm bắt đầu, thời điểm kết thúc, độ trễ ms)
+        samples_lock = threading.Lock()
+        stop = threading.Event()
+
+        def client(client_id):
+            http = api_server.app.test_client()
+            local = []
+            i = client_id
+            while not stop.is_set():
+                payload = dict(zip(features, rows[i % len(rows)]))
+                i += args.clients
+                start = time.perf_counter()
+                http.post('/predict', json=payload)
+                end = time.perf_counter()
+                local.append((start, end, (end - start) * 1000))
+            with samples_lock:
+                samples.extend(local)
+
+        threads = [threading.Thread(target=client, args=(c,)) for c in range(args.clients)]
+        for thread in threads:
+            thread.start()
+
+        switches = {'cold': [], 'preloaded': [], 'rollback': []}  # Cách -> [(bắt đầu, kết thúc, switch_ms)]
+        for i in range(args.switches):
+            for mode in switches:
+                time.sleep(args.pause)
+                target = versions[(versions.index(api_server.current_snapshot.version) + 1) % 2]
+                if mode == 'cold':
+                    with api_server.registry_lock:
+                        api_server.loaded_snapshots.pop(target, None)  # Bỏ bản đã tải để buộc tải lại
+                elif mode == 'preloaded':
+                    with api_server.registry_lock:
+                        api_server.loaded_snapshots.pop(target, None)
+                    registry.stage(target)
+                    api_server.sync_with_registry()  # Việc của thread theo dõi: tải trước trong nền
+                start = time.perf_counter()
+                if mode == 'rollback':
+                    registry.rollback()
+                else:
+                    registry.activate(target)
+                status = api_server.sync_with_registry()
+                switches[mode].append((start, time.perf_counter(), status['switch_ms']))
+                assert status['preloaded'] == (mode != 'cold')
+
+        stop.set()
+        for thread in threads:
+            thread.join()
+
+    steady = np.array([s[2] for s in samples
+                       if not any(s[0] < end and s[1] > start for runs in switches.values() for start, end, _ in runs)])
+    print(f"Requests: {len(samples)}, steady state p50 {np.percentile(steady, 50):.2f} ms, "
+          f"p99 {np.percentile(steady, 99):.2f} ms")
+    print(f"{'mode':<11}{'switch ms':>11}{'max':>9}{'requests':>10}{'p50 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for mode, runs in switches.items():
+        switch_ms = np.array([r[2] for r in runs])
+        during = np.array([s[2] for s in samples if any(s[0] < end and s[1] > start for start, end, _ in runs)])
+        latency = (f"{len(during):>10}{np.percentile(during, 50):>9.2f}{np.percentile(during, 99):>9.2f}"
+                   f"{during.max():>9.2f}") if len(during) else f"{0:>10}{'-':>9}{'-':>9}{'-':>9}"
+        print(f"{mode:<11}{np.median(switch_ms):>11.3f}{switch_ms.max():>9.3f}{latency}")
+
+
+if __name__ == '__main__':
+    main()
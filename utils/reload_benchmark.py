@@ -0,0 +1,88 @@
+# Mô tả: Đo độ trễ tải lại nóng mô hình và ảnh hưởng của nó lên độ trễ request /predict
+# Các thread client gửi request liên tục tới ứng dụng Flask (trong process) trong khi
+# mô hình được tải lại định kỳ; so sánh độ trễ của request trùng với lần tải lại
+# với các request còn lại. Chạy: python -m utils.reload_benchmark --duration 20
+
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import api_server
+from utils.serving_benchmark import random_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark tải lại mô hình không gián đoạn")
+    parser.add_argument('--duration', type=float, default=20.0, help="Thời gian chạy (giây)")
+    parser.add_argument('--clients', type=int, default=8, help="Số client đồng thời")
+    parser.add_argument('--reload-every', type=float, default=4.0, help="Chu kỳ tải lại mô hình (giây)")
+    args = parser.parse_args()
+
+    api_server.limiter.enabled = False  # Đo đường phục vụ, không đo giới hạn tốc độ
+    if not api_server.initialize_model():
+        sys.exit("Model initialization failed")
+
+    features = api_server.current_snapshot.features
+    rows = random_rows(50000)
+    samples = []  # (thời điểm bắt đầu, thời điểm kết thúc, độ trễ ms, status)
+    samples_lock = threading.Lock()
+    stop = threading.Event()
+
+    def client(client_id):
+        http = api_server.app.test_client()
+        local = []
+        i = client_id
+        while not stop.is_set():
+            payload = dict(zip(features, rows[i % len(rows)]))
+            i += args.clients
+            start = time.perf_counter()
+            response = http.post('/predict', json=payload)
+            end = time.perf_counter()
+            status = response.json['status'] if response.status_code == 200 else f"HTTP {response.status_code}"
+            local.append((start, end, (end - start) * 1000, status))
+        with samples_lock:
+            samples.extend(local)
+
+    threads = [threading.Thread(target=client, args=(c,)) for c in range(args.clients)]
+    for thread in threads:
+        thread.start()
+
+    reloads = []  # (bắt đầu, kết thúc, trạng thái)
+    deadline = time.perf_counter() + args.duration
+    while time.perf_counter() + args.reload_every < deadline:
+        time.sleep(args.reload_every)
+        start = time.perf_counter()
+        status = api_server.reload_model()
+        reloads.append((start, time.perf_counter(), status))
+
+    stop.set()
+    for thread in threads:
+        thread.join()
+
+    def during_reload(start, end):
+        return any(start < r_end and end > r_start for r_start, r_end, _ in reloads)
+
+    overlapping = np.array([s[2] for s in samples if during_reload(s[0], s[1])])
+    normal = np.array([s[2] for s in samples if not during_reload(s[0], s[1])])
+    failures = sum(1 for s in samples if s[3] != 'success')
+
+    print(f"Reloads: {len(reloads)}")
+    for _, _, status in reloads:
+        print(f"  {status['state']}: load {status.get('load_ms', 0):.1f} ms, "
+              f"warm-up {status.get('warmup_ms', 0):.1f} ms, total {status['total_ms']:.1f} ms")
+    print(f"Requests: {len(samples)} ({failures} non-success)")
+    print(f"{'window':<16}{'count':>8}{'p50 (ms)':>12}{'p99 (ms)':>12}{'max (ms)':>12}")
+    for name, latencies in (('steady state', normal), ('during reload', overlapping)):
+        if len(latencies):
+            print(f"{name:<16}{len(latencies):>8}{np.percentile(latencies, 50):>12.2f}"
+                  f"{np.percentile(latencies, 99):>12.2f}{latencies.max():>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
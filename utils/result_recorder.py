@@ -0,0 +1,273 @@
+# Mô tả: Bộ ghi kết quả benchmark dạng cột, cấp phát trước, dùng cho các lượt chạy hàng triệu request
+# Mỗi request là một hàng của mảng NumPy có cấu trúc (thời điểm perf_counter_ns, các thời gian
+# float64, dự đoán, mã trạng thái int8, mã HTTP int16) thay vì một dictionary Python kèm đối
+# tượng datetime: ghi một hàng là một phép gán vào mảng đã cấp phát, bộ nhớ ~51 byte/hàng.
+# Mảng được cấp phát trước theo số request dự kiến và tăng gấp đôi khi đầy. Mỗi thread ghi vào
+# phân mảnh riêng (không khóa). Các cột được đọc ra DataFrame dưới dạng view (không sao chép);
+# chỉ thông báo lỗi (thưa) được giữ riêng trong dictionary
+
+import threading
+import time
+from enum import IntEnum
+import numpy as np
+import pandas as pd
+
+try:
+    import pyarrow  # noqa: F401  (pandas dùng pyarrow để ghi Parquet)
+except ImportError:  # Thư viện tùy chọn
+    pyarrow = None
+
+
+class ResultStatus(IntEnum):
+    """Trạng thái của một request (lưu dạng int8)"""
+    SUCCESS = 0
+    HTTP_ERROR = 1
+    TIMEOUT = 2
+    CONNECTION_ERROR = 3
+    ERROR = 4
+
+
+# Tên trạng thái trong DataFrame ('success' giống trường status của phản hồi API)
+STATUS_NAMES = [status.name.lower() for status in ResultStatus]
+
+# Một hàng kết quả; các thời gian tính bằng giây
+RESULT_DTYPE = np.dtype([
+    ('scheduled_ns', '<i8'),  # perf_counter_ns lúc request được lên lịch gửi
+    ('total_time', '<f8'),
+    ('queue_time', '<f8'),
+    ('network_time', '<f8'),
+    ('processing_time', '<f8'),
+    ('prediction', '<f8'),  # NaN nếu không có dự đoán
+    ('status', 'i1'),  # ResultStatus
+    ('http_status', '<i2')  # 0 nếu không nhận được phản hồi
+])
+
+
+DEFAULT_SHARD_ROWS = 1024  # Kích thước ban đầu của phân mảnh cho các thread ghi sau thread đầu tiên
+
+
+class _Shard:
+    """Các hàng do một thread ghi: mảng có cấu trúc, số hàng đã ghi, thông báo lỗi theo chỉ số hàng"""
+    __slots__ = ('data', 'size', 'errors')
+
+    def __init__(self, capacity):
+        self.data = np.zeros(max(1, int(capacity)), dtype=RESULT_DTYPE)
+        self.size = 0
+        self.errors = {}
+
+    def grow(self):
+        """Tăng gấp đôi mảng (chỉ thread sở hữu gọi); view đã lấy trước đó vẫn trỏ tới mảng cũ"""
+        data = np.zeros(len(self.data) * 2, dtype=RESULT_DTYPE)
+        data[:self.size] = self.data[:self.size]
+        self.data = data
+
+    def rows(self):
+        """Các hàng đã ghi (view)"""
+        data = self.data  # Đọc mảng trước số hàng: nếu đang tăng mảng, lát cắt tự dừng ở cuối mảng cũ
+        return data[:self.size]
+
+
+class ResultRecorder:
+    """
+    Bộ ghi kết quả dạng cột, an toàn đa luồng
+
+    Như utils/metrics.py, mỗi thread ghi vào phân mảnh riêng nên đường ghi không cần khóa; khóa
+    chỉ được dùng khi một thread tạo phân mảnh lần đầu. Khi chỉ một thread ghi (ví dụ vòng lặp
+    asyncio của LoadGenerator), mọi cột đọc ra là view không sao chép; với nhiều thread, các phân
+    mảnh được nối và sắp theo thời điểm lên lịch khi đọc.
+
+    Parameters:
+        capacity: Số hàng cấp phát trước cho thread ghi đầu tiên (nên bằng số request dự kiến)
+    """
+
+    def __init__(self, capacity=1024):
+        self._capacity = max(1, int(capacity))
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        """Bỏ mọi phân mảnh; threading.local mới buộc mọi thread tạo lại phân mảnh ở lần ghi sau"""
+        self._local = threading.local()
+        self._shards = []
+        # Mốc đổi perf_counter_ns sang thời gian thực khi xuất (perf_counter không phải đồng hồ lịch)
+        self.clock_origin = (time.perf_counter_ns(), time.time_ns())
+
+    def _shard(self):
+        """Tạo phân mảnh cho thread hiện tại"""
+        with self._lock:
+            shard = _Shard(self._capacity if not self._shards else min(self._capacity, DEFAULT_SHARD_ROWS))
+            self._shards.append(shard)
+        self._local.shard = shard
+        return shard
+
+    def __len__(self):
+        return sum(shard.size for shard in list(self._shards))
+
+    @property
+    def size(self):
+        """Số hàng đã ghi"""
+        return len(self)
+
+    @property
+    def capacity(self):
+        """Số hàng đã cấp phát (mọi phân mảnh)"""
+        return sum(len(shard.data) for shard in list(self._shards)) or self._capacity
+
+    @property
+    def nbytes(self):
+        """Bộ nhớ của các mảng kết quả (byte), không tính thông báo lỗi"""
+        return sum(shard.data.nbytes for shard in list(self._shards))
+
+    def record(self, scheduled_ns, total_time, queue_time=0.0, network_time=0.0, processing_time=0.0,
+               prediction=float('nan'), status=ResultStatus.SUCCESS, http_status=0, error=None):
+        """Ghi một request vào phân mảnh của thread hiện tại"""
+        try:
+            shard = self._local.shard
+        except AttributeError:
+            shard = self._shard()
+        index = shard.size
+        if index == len(shard.data):
+            shard.grow()
+        shard.data[index] = (scheduled_ns, total_time, queue_time, network_time, processing_time,
+                             prediction, status, http_status)
+        if error is not None:
+            shard.errors[index] = error
+        shard.size = index + 1
+
+    def extend(self, other):
+        """Nối các hàng của một bộ ghi khác (ví dụ của lượt chạy khác) thành một phân mảnh mới"""
+        rows, errors = other._collect()
+        shard = _Shard(len(rows))
+        shard.data[:len(rows)] = rows
+        shard.size = len(rows)
+        shard.errors = dict(errors)
+        with self._lock:
+            self._shards.append(shard)
+
+    def clear(self, capacity=None):
+        """Xóa mọi hàng; capacity để cấp phát lại theo số request dự kiến của lượt mới"""
+        with self._lock:
+            if capacity is not None:
+                self._capacity = max(1, int(capacity))
+            self._reset()
+
+    def _collect(self):
+        """
+        Các hàng đã ghi và thông báo lỗi theo chỉ số hàng
+
+        Một phân mảnh: view không sao chép. Nhiều phân mảnh: nối lại và sắp theo thời điểm lên lịch.
+        Mảng trả về luôn chỉ đọc, để view(), column() và to_dataframe() không thể sửa vào bộ ghi.
+        """
+        shards = list(self._shards)
+        if not shards:
+            return np.zeros(0, dtype=RESULT_DTYPE), {}
+        if len(shards) == 1:
+            shard = shards[0]
+            rows = shard.rows()
+            rows.setflags(write=False)  # Chỉ khóa view này, phân mảnh vẫn ghi được
+            return rows, {index: error for index, error in list(shard.errors.items()) if index < len(rows)}
+        parts = [shard.rows() for shard in shards]
+        rows = np.concatenate(parts)
+        order = np.argsort(rows['scheduled_ns'], kind='stable')
+        position = np.empty(len(order), dtype=np.int64)
+        position[order] = np.arange(len(order))  # Chỉ số cũ (sau khi nối) -> vị trí sau khi sắp
+        errors = {}
+        offset = 0
+        for shard, part in zip(shards, parts):
+            for index, error in list(shard.errors.items()):
+                if index < len(part):
+                    errors[int(position[offset + index])] = error
+            offset += len(part)
+        rows = rows[order]
+        rows.setflags(write=False)
+        return rows, errors
+
+    def read_since(self, cursor=()):
+        """
+        Các hàng được ghi sau cursor (thứ tự không xác định), để xử lý tăng dần như cập nhật histogram
+
+        Returns:
+            tuple: (mảng các hàng mới, cursor mới) - cursor là số hàng đã đọc của từng phân mảnh
+        """
+        parts, sizes = [], []
+        for i, shard in enumerate(list(self._shards)):
+            rows = shard.rows()
+            parts.append(rows[cursor[i] if i < len(cursor) else 0:])
+            sizes.append(len(rows))
+        rows = np.concatenate(parts) if len(parts) > 1 else (parts[0] if parts else np.zeros(0, dtype=RESULT_DTYPE))
+        return rows, tuple(sizes)
+
+    def view(self):
+        """Các hàng đã ghi dưới dạng mảng có cấu trúc chỉ đọc (view không sao chép nếu chỉ một thread ghi)"""
+        return self._collect()[0]
+
+    def column(self, name):
+        """Một cột chỉ đọc (view không sao chép nếu chỉ một thread ghi)"""
+        return self.view()[name]
+
+    @property
+    def errors(self):
+        """Thông báo lỗi theo chỉ số hàng của view()"""
+        return self._collect()[1]
+
+    def get(self, index):
+        """Một hàng dưới dạng dictionary (cùng dạng với BenchmarkUtils.record_prediction)"""
+        rows, errors = self._collect()
+        if not 0 <= index < len(rows):
+            raise IndexError(f"Row {index} has not been recorded")
+        row = rows[index]
+        return {
+            'timestamp': pd.Timestamp(self._wall_ns(row['scheduled_ns']), unit='ns'),
+            'total_time': float(row['total_time']),
+            'queue_time': float(row['queue_time']),
+            'network_time': float(row['network_time']),
+            'processing_time': float(row['processing_time']),
+            'prediction': float(row['prediction']),
+            'status': STATUS_NAMES[row['status']],
+            'http_status': int(row['http_status']),
+            'error': errors.get(index)
+        }
+
+    def _wall_ns(self, perf_ns):
+        """Đổi perf_counter_ns sang nano giây Unix theo mốc của bộ ghi"""
+        return perf_ns - self.clock_origin[0] + self.clock_origin[1]
+
+    def to_dataframe(self, timestamps=True, errors=True):
+        """
+        DataFrame các kết quả; cột số và cột status (Categorical) là view chỉ đọc của mảng, không sao chép
+
+        Gán giá trị vào các cột này báo lỗi "assignment destination is read-only"; cần sửa thì
+        gọi .copy() trước (như BenchmarkUtils.get_results_df). Thêm hoặc thay cả cột thì không cần.
+
+        Parameters:
+            timestamps: Thêm cột 'timestamp' (thời gian thực lúc lên lịch gửi, tạo mảng mới)
+            errors: Thêm cột 'error' (thông báo lỗi, tạo mảng object mới)
+
+        Returns:
+            pd.DataFrame: Mỗi hàng một request (một thread ghi: theo thứ tự ghi; nhiều thread:
+            theo thời điểm lên lịch)
+        """
+        rows, row_errors = self._collect()
+        columns = {}
+        if timestamps:
+            columns['timestamp'] = pd.to_datetime(self._wall_ns(rows['scheduled_ns']), unit='ns')
+        for name in ('scheduled_ns', 'total_time', 'queue_time', 'network_time', 'processing_time', 'prediction'):
+            columns[name] = rows[name]
+        columns['status'] = pd.Categorical.from_codes(rows['status'], STATUS_NAMES)
+        columns['http_status'] = rows['http_status']
+        if errors:
+            error_column = np.full(len(rows), None, dtype=object)
+            for index, message in row_errors.items():
+                error_column[index] = message
+            columns['error'] = error_column
+        return pd.DataFrame(columns, copy=False)
+
+    def to_csv(self, path):
+        """Xuất ra file CSV"""
+        self.to_dataframe().to_csv(path, index=False)
+
+    def to_parquet(self, path):
+        """Xuất ra file Parquet (cần thư viện tùy chọn pyarrow)"""
+        if pyarrow is None:
+            raise ImportError("Parquet export requires the 'pyarrow' package")
+        self.to_dataframe().to_parquet(path, index=False)
@@ -0,0 +1,152 @@
+# Mô tả: Benchmark khả năng mở rộng của API theo số worker gunicorn
+# Khởi động gunicorn với 1..N worker, tạo tải /predict từ nhiều process client, đo
+# requests/giây và bộ nhớ (RSS, PSS, phần riêng) của từng worker đọc từ /proc (Linux)
+# Chạy: python -m utils.scaling_benchmark --max-workers 4 --duration 10
+
+import argparse
+import multiprocessing
+import os
+import signal
+import subprocess
+import sys
+import threading
+import time
+import requests
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from utils.serving_benchmark import random_rows
+
+FEATURES = [
+    'Engine Size(L)', 'Cylinders', 'Fuel Consumption Comb (L/100 km)',
+    'Horsepower', 'Weight (kg)', 'Year'
+]
+
+
+def wait_until_healthy(base_url, timeout=120):
+    """Chờ đến khi /health/ready báo worker đã làm nóng xong"""
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            response = requests.get(f"{base_url}/health/ready", timeout=2)
+            if response.ok:
+                return True
+        except requests.exceptions.RequestException:
+            pass
+        time.sleep(0.5)
+    return False
+
+
+def child_pids(parent_pid):
+    """Liệt kê các process con trực tiếp (các worker gunicorn) của một process"""
+    pids = []
+    for entry in os.listdir('/proc'):
+        if not entry.isdigit():
+            continue
+        try:
+            with open(f"/proc/{entry}/stat") as f:
+                # Trường thứ 4 là PPID; tên process nằm trong ngoặc có thể chứa dấu cách
+                fields = f.read().rsplit(')', 1)[1].split()
+            if int(fields[1]) == parent_pid:
+                pids.append(int(entry))
+        except (OSError, IndexError, ValueError):
+            continue
+    return pids
+
+
+def memory_kb(pid):
+    """Đọc RSS, PSS và bộ nhớ riêng (kB) của một process từ /proc/<pid>/smaps_rollup"""
+    values = {'Rss': 0, 'Pss': 0, 'Private_Clean': 0, 'Private_Dirty': 0}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            key = parts[0].rstrip(':')
+            if key in values:
+                values[key] = int(parts[1])
+    return {
+        'rss': values['Rss'],
+        'pss': values['Pss'],
+        'private': values['Private_Clean'] + values['Private_Dirty']
+    }
+
+
+def client_process(base_url, duration, n_threads, seed):
+    """Một process client: n_threads thread gửi /predict liên tục, trả về số request thành công"""
+    rows = random_rows(20000, seed=seed)
+    counts = [0] * n_threads
+    deadline = time.perf_counter() + duration
+
+    def worker(thread_id):
+        session = requests.Session()
+        i = thread_id
+        while time.perf_counter() < deadline:
+            payload = dict(zip(FEATURES, rows[i % len(rows)]))
+            i += n_threads
+            try:
+                if session.post(f"{base_url}/predict", json=payload, timeout=10).ok:
+                    counts[thread_id] += 1
+            except requests.exceptions.RequestException:
+                pass
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return sum(counts)
+
+
+def run_level(n_workers, args):
+    """Chạy gunicorn với n_workers worker, tạo tải và đo thông lượng/bộ nhớ"""
+    port = args.port
+    base_url = f"http://127.0.0.1:{port}"
+    env = dict(os.environ, WEB_CONCURRENCY=str(n_workers), PORT=str(port), RATELIMIT_ENABLED='false')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', 'api_server:app'],
+        cwd=PROJECT_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_until_healthy(base_url):
+            raise RuntimeError(f"Server with {n_workers} workers did not become healthy")
+
+        with multiprocessing.Pool(args.client_processes) as pool:
+            counts = pool.starmap(client_process, [
+                (base_url, args.duration, args.client_threads, seed)
+                for seed in range(args.client_processes)
+            ])
+
+        workers = [memory_kb(pid) for pid in child_pids(server.pid)]
+        master = memory_kb(server.pid)
+        return {
+            'workers': n_workers,
+            'rps': sum(counts) / args.duration,
+            'master_rss_mb': master['rss'] / 1024,
+            'worker_rss_mb': sum(w['rss'] for w in workers) / len(workers) / 1024,
+            'worker_pss_mb': sum(w['pss'] for w in workers) / len(workers) / 1024,
+            'worker_private_mb': sum(w['private'] for w in workers) / len(workers) / 1024
+        }
+    finally:
+        server.send_signal(signal.SIGINT)  # Tắt nhanh, không chờ các kết nối keep-alive
+        server.wait(timeout=60)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thông lượng và bộ nhớ theo số worker gunicorn")
+    parser.add_argument('--max-workers', type=int, default=os.cpu_count(), help="Số worker tối đa")
+    parser.add_argument('--duration', type=float, default=10.0, help="Thời gian tạo tải mỗi mức (giây)")
+    parser.add_argument('--client-processes', type=int, default=os.cpu_count(), help="Số process client")
+    parser.add_argument('--client-threads', type=int, default=16, help="Số thread mỗi process client")
+    parser.add_argument('--port', type=int, default=10100, help="Cổng chạy gunicorn")
+    args = parser.parse_args()
+
+    print(f"{'workers':>8}{'req/s':>10}{'master RSS':>12}{'worker RSS':>12}{'worker PSS':>12}{'private':>10}  (MB)")
+    for n_workers in range(1, args.max_workers + 1):
+        result = run_level(n_workers, args)
+        print(f"{result['workers']:>8}{result['rps']:>10.0f}{result['master_rss_mb']:>12.1f}"
+              f"{result['worker_rss_mb']:>12.1f}{result['worker_pss_mb']:>12.1f}{result['worker_private_mb']:>10.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,113 @@
+# Mô tả: Phần dùng chung của hai máy chủ dự đoán (api_server.py và async_server.py)
+# Xác thực request /predict, chấm điểm lô theo ảnh chụp mô hình và cấu hình cache/bộ gom lô
+# nằm ở một chỗ, để hai server luôn cho cùng kết quả với cùng biến môi trường
+
+import os
+from utils.prediction_batcher import PredictionBatcher
+from utils.prediction_cache import PredictionCache
+
+# Danh sách các trường bắt buộc của một request /predict
+REQUIRED_FIELDS = (
+    'Engine Size(L)', 'Cylinders',
+    'Fuel Consumption Comb (L/100 km)',
+    'Horsepower', 'Weight (kg)', 'Year'
+)
+
+# Cache LRU cho kết quả dự đoán - Giúp giảm thời gian xử lý cho các request lặp lại
+PREDICTION_CACHE_SIZE = int(os.environ.get('PREDICTION_CACHE_SIZE', 10000))  # Số mục tối đa
+PREDICTION_CACHE_TTL = float(os.environ.get('PREDICTION_CACHE_TTL', 0)) or None  # Thời gian sống (giây), 0 = không hết hạn
+# Khóa cache: 'region' (chữ ký vùng theo ngưỡng tách của rừng, chính xác) hoặc 'canonical' (đặc trưng đã làm tròn, xấp xỉ)
+PREDICTION_CACHE_KEY = os.environ.get('PREDICTION_CACHE_KEY', 'region')
+
+# Cấu hình bộ gom lô cho các request /predict đồng thời không trúng cache
+BATCH_WINDOW_MS = float(os.environ.get('BATCH_WINDOW_MS', 1.0))  # Cửa sổ gom lô (ms)
+BATCH_MAX_SIZE = int(os.environ.get('BATCH_MAX_SIZE', 64))  # Kích thước lô tối đa
+
+# Phản hồi 400 khi body của /predict không được gửi dưới dạng JSON
+NOT_JSON_RESPONSE = {'error': 'Request must be JSON', 'status': 'error'}
+
+# Thông điệp trả cho client theo lý do trả về giá trị dự phòng
+FALLBACK_MESSAGES = {
+    'missing_fields': 'Missing fields',
+    'invalid_values': 'Invalid feature values'
+}
+
+
+class RequestValidationError(ValueError):
+    """
+    Request /predict không hợp lệ - server trả về giá trị dự phòng
+
+    Attributes:
+        reason: 'missing_fields' hoặc 'invalid_values' (dùng làm nhãn metric)
+        message: Thông điệp trả cho client
+    """
+    def __init__(self, reason, detail):
+        super().__init__(detail)
+        self.reason = reason
+        self.message = FALLBACK_MESSAGES[reason]
+
+
+def is_json_mimetype(mimetype):
+    """Content-Type (không kèm tham số) có phải JSON không - cùng quy tắc với Flask Request.is_json"""
+    mimetype = (mimetype or '').lower()
+    return mimetype == 'application/json' or (mimetype.startswith('application/') and mimetype.endswith('+json'))
+
+
+def validate_request(snapshot, data):
+    """
+    Xác thực body JSON của /predict thành bộ đặc trưng số thực hữu hạn
+
+    Parameters:
+        snapshot: Ảnh chụp mô hình mà request đã đọc
+        data: Body JSON đã phân tích
+
+    Returns:
+        tuple: Giá trị đặc trưng gốc theo thứ tự EmissionModel.features (dùng để dự đoán và tạo khóa cache)
+
+    Raises:
+        RequestValidationError: Body không phải object, thiếu trường hoặc giá trị không hợp lệ
+    """
+    if not isinstance(data, dict) or not all(field in data for field in REQUIRED_FIELDS):
+        raise RequestValidationError('missing_fields', f"Missing required fields. Received: {data}")
+    try:
+        return snapshot.feature_values(data)
+    except (TypeError, ValueError) as e:
+        raise RequestValidationError('invalid_values', f"Invalid feature values: {str(e)}") from e
+
+
+def score_rows(items):
+    """
+    Chấm điểm một lô hàng đặc trưng bằng một lần gọi rừng mảng phẳng vector hóa
+
+    Mỗi item mang theo ảnh chụp mô hình mà request đã đọc, nên các request gửi
+    trước khi tải lại mô hình vẫn được chấm điểm trên ảnh chụp cũ.
+
+    Parameters:
+        items: Danh sách cặp (ảnh chụp, hàng đặc trưng theo thứ tự EmissionModel.features)
+
+    Returns:
+        list: Giá trị dự đoán tương ứng từng item
+    """
+    # Nhóm các hàng theo ảnh chụp (thường chỉ có một nhóm)
+    groups = {}
+    for index, (snapshot, row) in enumerate(items):
+        indices, rows = groups.setdefault(snapshot, ([], []))
+        indices.append(index)
+        rows.append(row)
+
+    results = [None] * len(items)
+    for snapshot, (indices, rows) in groups.items():
+        for index, prediction in zip(indices, snapshot.predict_rows(rows).tolist()):
+            results[index] = prediction
+    return results
+
+
+def create_prediction_cache():
+    """Tạo cache dự đoán theo PREDICTION_CACHE_SIZE, PREDICTION_CACHE_TTL và PREDICTION_CACHE_KEY"""
+    return PredictionCache(max_size=PREDICTION_CACHE_SIZE, ttl_seconds=PREDICTION_CACHE_TTL,
+                           key_mode=PREDICTION_CACHE_KEY)
+
+
+def create_prediction_batcher(name='prediction-batcher'):
+    """Tạo bộ gom lô chấm điểm bằng score_rows theo BATCH_MAX_SIZE và BATCH_WINDOW_MS"""
+    return PredictionBatcher(score_rows, max_batch_size=BATCH_MAX_SIZE, max_wait_ms=BATCH_WINDOW_MS, name=name)
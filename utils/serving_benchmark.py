@@ -0,0 +1,104 @@
+# Mô tả: Benchmark thông lượng và độ trễ đuôi của đường phục vụ /predict trong process
+# So sánh đường cũ (khóa toàn cục quanh dự đoán từng hàng), bộ gom lô luôn xếp hàng và bộ gom
+# lô mặc định (chấm điểm trực tiếp khi không có tranh chấp) ở nhiều mức client đồng thời.
+# Chạy: python -m utils.serving_benchmark --clients 1 8 32 128
+
+import argparse
+import os
+import sys
+import threading
+import time
+import numpy as np
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emission_model import EmissionModel
+from utils.prediction_batcher import PredictionBatcher
+
+
+def random_rows(n_rows, seed=0):
+    """Sinh các hàng đặc trưng ngẫu nhiên giống MainView.generate_random_features (luôn trượt cache)"""
+    rng = np.random.default_rng(seed)
+    return np.column_stack([
+        rng.uniform(1.0, 8.0, n_rows),
+        rng.integers(3, 12, n_rows),
+        rng.uniform(4.0, 20.0, n_rows),
+        rng.uniform(100, 800, n_rows),
+        rng.uniform(1000, 4000, n_rows),
+        rng.integers(2015, 2024, n_rows)
+    ]).tolist()
+
+
+def run_clients(predict_fn, rows, n_clients):
+    """Chạy n_clients thread gọi predict_fn chia đều các hàng, trả về (thời gian, độ trễ ms)"""
+    latencies = np.empty(len(rows))
+    chunks = np.array_split(np.arange(len(rows)), n_clients)
+    start_barrier = threading.Barrier(n_clients + 1)
+
+    def client(indices):
+        start_barrier.wait()
+        for i in indices:
+            start = time.perf_counter()
+            predict_fn(rows[i])
+            latencies[i] = (time.perf_counter() - start) * 1000
+
+    threads = [threading.Thread(target=client, args=(chunk,)) for chunk in chunks]
+    for thread in threads:
+        thread.start()
+    start_barrier.wait()
+    start = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies
+
+
+def summarize(elapsed, latencies):
+    """Tính thông lượng và các phân vị độ trễ"""
+    return {
+        'rps': len(latencies) / elapsed,
+        'p50_ms': np.percentile(latencies, 50),
+        'p99_ms': np.percentile(latencies, 99)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh khóa toàn cục với bộ gom lô cho /predict")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu")
+    parser.add_argument('--clients', type=int, nargs='+', default=[1, 8, 32, 128], help="Các mức client đồng thời")
+    parser.add_argument('--requests', type=int, default=4000, help="Số request cho mỗi lần chạy")
+    parser.add_argument('--window-ms', type=float, default=1.0, help="Cửa sổ gom lô (ms)")
+    parser.add_argument('--max-batch', type=int, default=64, help="Kích thước lô tối đa")
+    args = parser.parse_args()
+
+    model = EmissionModel()
+    model.train(args.data)
+    rows = random_rows(args.requests)
+
+    # Đường cũ: mọi thread xếp hàng sau một RLock toàn cục, dự đoán từng hàng
+    lock = threading.RLock()
+
+    def locked_predict(row):
+        with lock:
+            return model.flat_forest.predict_row(row)
+
+    queued = PredictionBatcher(model.predict_compiled_batch, max_batch_size=args.max_batch,
+                               max_wait_ms=args.window_ms, inline_when_idle=False)
+    adaptive = PredictionBatcher(model.predict_compiled_batch, max_batch_size=args.max_batch,
+                                 max_wait_ms=args.window_ms)
+
+    print(f"{'clients':>8}{'path':>10}{'req/s':>12}{'p50 (ms)':>12}{'p99 (ms)':>12}{'inline':>9}")
+    for n_clients in args.clients:
+        for name, predict_fn, batcher in (('lock', locked_predict, None), ('queued', queued.predict, queued),
+                                          ('adaptive', adaptive.predict, adaptive)):
+            inline_before = batcher.inline_items if batcher else 0
+            stats = summarize(*run_clients(predict_fn, rows, n_clients))
+            inline = (batcher.inline_items - inline_before) / len(rows) if batcher else 1.0
+            print(f"{n_clients:>8}{name:>10}{stats['rps']:>12.0f}{stats['p50_ms']:>12.2f}{stats['p99_ms']:>12.2f}"
+                  f"{inline:>9.0%}")
+    print(f"Average batch size: queued {queued.get_stats()['avg_batch_size']:.1f}, "
+          f"adaptive {adaptive.get_stats()['avg_batch_size']:.1f}")
+
+
+if __name__ == '__main__':
+    main()
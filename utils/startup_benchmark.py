@@ -0,0 +1,90 @@
+# Mô tả: Benchmark thời gian khởi động nguội (cold start) của API
+# Mỗi lần đo chạy trong một process Python mới: import api_server rồi khởi tạo mô hình,
+# so sánh khi có file metadata (chỉ tải artifact) và khi không có (phải đọc lại CSV)
+# Chạy: python -m utils.startup_benchmark --runs 5
+
+import argparse
+import os
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+METADATA_PATH = os.path.join(PROJECT_DIR, 'models', 'trained_model.meta.json')
+
+# Đoạn mã chạy trong process con: đo import và khởi tạo mô hình, in ra ms
+STARTUP_SCRIPT = """
+import time
+start = time.perf_counter()
+import api_server
+imported = time.perf_counter()
+api_server.initialize_model()
+ready = time.perf_counter()
+assert api_server.current_snapshot is not None
+print((imported - start) * 1000, (ready - imported) * 1000)
+"""
+
+
+def measure_startup():
+    """Chạy một lần khởi động nguội trong process mới, trả về (import_ms, init_ms)"""
+    output = subprocess.run(
+        [sys.executable, '-c', STARTUP_SCRIPT],
+        cwd=PROJECT_DIR, capture_output=True, text=True, check=True
+    ).stdout
+    import_ms, init_ms = output.strip().splitlines()[-1].split()
+    return float(import_ms), float(init_ms)
+
+
+def run_case(runs, keep_metadata, backup_path):
+    """Đo nhiều lần khởi động; xóa metadata trước mỗi lần nếu keep_metadata=False"""
+    results = []
+    for _ in range(runs):
+        if keep_metadata:
+            shutil.copy(backup_path, METADATA_PATH)
+        elif os.path.exists(METADATA_PATH):
+            os.remove(METADATA_PATH)
+        results.append(measure_startup())
+    return results
+
+
+def print_case(label, results):
+    """In trung vị và giá trị lớn nhất của thời gian import/khởi tạo"""
+    import_ms = [r[0] for r in results]
+    init_ms = [r[1] for r in results]
+    total_ms = [a + b for a, b in results]
+    print(f"{label:<28}{statistics.median(import_ms):>10.0f}{statistics.median(init_ms):>10.0f}"
+          f"{statistics.median(total_ms):>10.0f}{max(total_ms):>10.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark thời gian khởi động nguội của API")
+    parser.add_argument('--runs', type=int, default=5, help="Số lần đo mỗi trường hợp")
+    args = parser.parse_args()
+
+    # Đảm bảo đã có mô hình và metadata (huấn luyện nếu cần)
+    measure_startup()
+    if not os.path.exists(METADATA_PATH):
+        raise RuntimeError("Metadata file was not created after initialization")
+
+    backup_dir = tempfile.mkdtemp()
+    backup_path = os.path.join(backup_dir, 'trained_model.meta.json')
+    shutil.copy(METADATA_PATH, backup_path)
+    try:
+        without_metadata = run_case(args.runs, keep_metadata=False, backup_path=backup_path)
+        with_metadata = run_case(args.runs, keep_metadata=True, backup_path=backup_path)
+    finally:
+        shutil.copy(backup_path, METADATA_PATH)  # Luôn khôi phục metadata ban đầu
+        shutil.rmtree(backup_dir)
+
+    print(f"{'case':<28}{'import':>10}{'init':>10}{'total':>10}{'max':>10}  (ms, median of {args.runs})")
+    print_case("without metadata (CSV)", without_metadata)
+    print_case("with metadata sidecar", with_metadata)
+
+
+if __name__ == '__main__':
+    main()
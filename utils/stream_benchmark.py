@@ -0,0 +1,126 @@
+# Mô tả: Benchmark endpoint /predict/stream với luồng NDJSON hàng triệu dòng
+# Khởi động gunicorn (1 worker), gửi thân request NDJSON theo chunked transfer từ một
+# thread trong khi thread chính đọc kết quả đồng thời (song công, tránh tắc bộ đệm TCP),
+# đo số dòng/giây và RSS của worker (lấy mẫu trong lúc chạy và đỉnh VmHWM)
+# Chạy: python -m utils.stream_benchmark --rows 100000 1000000 5000000
+
+import argparse
+import http.client
+import json
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.append(PROJECT_DIR)
+
+from utils.scaling_benchmark import child_pids, wait_until_healthy
+from utils.serving_benchmark import random_rows
+
+FEATURES = [
+    'Engine Size(L)', 'Cylinders', 'Fuel Consumption Comb (L/100 km)',
+    'Horsepower', 'Weight (kg)', 'Year'
+]
+
+
+def status_kb(pid, field):
+    """Đọc một trường bộ nhớ (kB) từ /proc/<pid>/status, ví dụ VmRSS hoặc VmHWM"""
+    with open(f"/proc/{pid}/status") as f:
+        for line in f:
+            if line.startswith(field + ':'):
+                return int(line.split()[1])
+    return 0
+
+
+def send_body(sock, n_rows, block_lines):
+    """Gửi n_rows dòng NDJSON theo chunked transfer, lặp lại một khối dòng dựng sẵn"""
+    lines = [(json.dumps(dict(zip(FEATURES, row))) + '\n').encode() for row in block_lines]
+    block = b''.join(lines)
+    remaining = n_rows
+    while remaining > 0:
+        data = block if remaining >= len(lines) else b''.join(lines[:remaining])
+        sock.sendall(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+        remaining -= min(remaining, len(lines))
+    sock.sendall(b"0\r\n\r\n")
+
+
+def stream_rows(port, n_rows, worker_pid, block_lines):
+    """Chạy một luồng n_rows dòng, trả về (số dòng nhận, giây, RSS lớn nhất kB khi lấy mẫu)"""
+    sock = socket.create_connection(('127.0.0.1', port))
+    sock.sendall(
+        b"POST /predict/stream HTTP/1.1\r\nHost: 127.0.0.1\r\n"
+        b"Content-Type: application/x-ndjson\r\nTransfer-Encoding: chunked\r\n\r\n"
+    )
+
+    peak_rss = [0]
+    done = threading.Event()
+
+    def sample_rss():
+        while not done.is_set():
+            peak_rss[0] = max(peak_rss[0], status_kb(worker_pid, 'VmRSS'))
+            time.sleep(0.2)
+
+    start = time.perf_counter()
+    sender = threading.Thread(target=send_body, args=(sock, n_rows, block_lines), daemon=True)
+    sampler = threading.Thread(target=sample_rss, daemon=True)
+    sender.start()
+    sampler.start()
+
+    # Đọc kết quả đồng thời với việc gửi
+    response = http.client.HTTPResponse(sock)
+    response.begin()
+    received = 0
+    while True:
+        data = response.read(1 << 16)
+        if not data:
+            break
+        received += data.count(b'\n')
+    elapsed = time.perf_counter() - start
+    done.set()
+    sender.join()
+    sampler.join()
+    sock.close()
+    return received, elapsed, peak_rss[0]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark /predict/stream: số dòng/giây và bộ nhớ worker")
+    parser.add_argument('--rows', type=int, nargs='+', default=[100000, 1000000, 5000000], help="Số dòng mỗi luồng")
+    parser.add_argument('--port', type=int, default=10120, help="Cổng chạy gunicorn")
+    args = parser.parse_args()
+
+    env = dict(os.environ, WEB_CONCURRENCY='1', PORT=str(args.port), RATELIMIT_ENABLED='false')
+    server = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn_config.py', 'api_server:app'],
+        cwd=PROJECT_DIR, env=env, start_new_session=True,
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        if not wait_until_healthy(f"http://127.0.0.1:{args.port}"):
+            raise RuntimeError("Server did not become ready")
+        worker_pid = child_pids(server.pid)[0]
+        block_lines = random_rows(10000, seed=0)
+        print(f"Worker RSS before streaming: {status_kb(worker_pid, 'VmRSS') / 1024:.1f} MB")
+        print(f"{'rows':>10}{'seconds':>10}{'rows/s':>10}{'peak RSS MB':>13}")
+        for n_rows in args.rows:
+            received, elapsed, peak_rss = stream_rows(args.port, n_rows, worker_pid, block_lines)
+            if received != n_rows:
+                raise RuntimeError(f"Expected {n_rows} result lines, got {received}")
+            print(f"{n_rows:>10}{elapsed:>10.1f}{n_rows / elapsed:>10.0f}{peak_rss / 1024:>13.1f}")
+        print(f"Worker VmHWM (lifetime peak RSS): {status_kb(worker_pid, 'VmHWM') / 1024:.1f} MB")
+    finally:
+        server.send_signal(signal.SIGINT)
+        try:
+            server.wait(timeout=30)
+        except subprocess.TimeoutExpired:
+            os.killpg(server.pid, signal.SIGKILL)
+            server.wait()
+
+
+if __name__ == '__main__':
+    main()
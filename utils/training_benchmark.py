@@ -0,0 +1,67 @@
+# Mô tả: Benchmark thời gian huấn luyện theo số lõi CPU và kích thước dữ liệu
+# So sánh cách huấn luyện cũ (fit trực tiếp 100 cây trên một lõi) với EmissionModel.fit_forest
+# (thêm dần cây bằng warm start, dừng theo điểm OOB) ở nhiều mức n_jobs và nhiều bội số
+# của bộ dữ liệu. Bản sao dữ liệu được thêm nhiễu nhỏ để không trùng hàng hoàn toàn
+# Chạy: python -m utils.training_benchmark --jobs 1 2 4 --scales 1 4 16
+
+import argparse
+import os
+import sys
+import time
+import numpy as np
+from sklearn.ensemble import RandomForestRegressor
+from sklearn.model_selection import train_test_split
+from sklearn.preprocessing import StandardScaler
+
+# Cho phép chạy trực tiếp từ thư mục gốc của dự án
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from models.emission_model import EmissionModel
+
+
+def scaled_split(model, data_path, scale, seed=0):
+    """Chia dữ liệu như EmissionModel.train rồi nhân tập huấn luyện lên scale lần (kèm nhiễu 1% độ lệch chuẩn)"""
+    df = model.load_and_preprocess_data(data_path)
+    X, y = model.prepare_features(df)
+    X_train, X_test, y_train, y_test = train_test_split(X, y, test_size=0.2, random_state=42)
+    X_train, y_train = X_train.to_numpy(), y_train.to_numpy()
+    rng = np.random.default_rng(seed)
+    copies = [X_train] + [
+        X_train + rng.normal(0, 0.01, X_train.shape) * X_train.std(axis=0)
+        for _ in range(scale - 1)
+    ]
+    scaler = StandardScaler().fit(X_train)
+    return (scaler.transform(np.vstack(copies)), np.tile(y_train, scale),
+            scaler.transform(X_test.to_numpy()), y_test.to_numpy())
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Thời gian huấn luyện theo số lõi và kích thước dữ liệu")
+    parser.add_argument('--data', default='co2 Emissions.csv', help="Đường dẫn file CSV dữ liệu")
+    parser.add_argument('--jobs', type=int, nargs='+', default=[1, 2, 4], help="Các mức n_jobs")
+    parser.add_argument('--scales', type=int, nargs='+', default=[1, 4, 16], help="Các bội số của tập huấn luyện")
+    args = parser.parse_args()
+
+    print(f"{os.cpu_count()} CPU(s)")
+    print(f"{'train rows':>11}{'n_jobs':>8}{'mode':>14}{'seconds':>10}{'trees':>7}{'OOB R2':>9}{'test R2':>9}")
+    for scale in args.scales:
+        model = EmissionModel()
+        X_train, y_train, X_test, y_test = scaled_split(model, args.data, scale)
+
+        # Cách cũ: 100 cây, một lõi, một lần fit
+        start = time.perf_counter()
+        forest = RandomForestRegressor(n_estimators=100, random_state=42).fit(X_train, y_train)
+        seconds = time.perf_counter() - start
+        print(f"{len(X_train):>11}{1:>8}{'full 100':>14}{seconds:>10.2f}{100:>7}{'-':>9}"
+              f"{forest.score(X_test, y_test):>9.4f}")
+
+        for n_jobs in args.jobs:
+            model = EmissionModel()
+            model.n_jobs = n_jobs
+            training = model.fit_forest(X_train, y_train)
+            print(f"{len(X_train):>11}{n_jobs:>8}{'incremental':>14}{training['fit_seconds']:>10.2f}"
+                  f"{training['n_estimators']:>7}{training['oob_score']:>9.4f}{model.model.score(X_test, y_test):>9.4f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -5,14 +5,20 @@ from utils.visualization import (
     create_gauge_chart,
     style_metric_cards
 )
-import pandas as pd
 import time
 import numpy as np
 from utils.benchmark_utils import BenchmarkUtils
 import requests
-from concurrent.futures import ThreadPoolExecutor, as_completed
+from utils.load_generator import LoadGenerator
 import os
 
+# Các chế độ tải của trang Benchmark (nhãn hiển thị -> chế độ của LoadGenerator)
+LOAD_MODES = {
+    "Vòng đóng (số kết nối cố định)": 'closed',
+    "Vòng mở - tốc độ đều": 'constant',
+    "Vòng mở - Poisson": 'poisson'
+}
+
 class MainView:
     """
     MainView là lớp chính quản lý giao diện người dùng của ứng dụng Streamlit
@@ -228,10 +234,11 @@ class MainView:
     def _show_benchmark_page(self):
         """
         Hiển thị trang benchmark để kiểm tra hiệu suất của API
-        Cho phép người dùng thực hiện 1000 request đến API để đánh giá thời gian đáp ứng
-        Hỗ trợ hai chế độ: tham số cố định hoặc tham số ngẫu nhiên
+        Cho phép người dùng gửi N request (mặc định 1000) đến API để đánh giá thời gian đáp ứng
+        Hỗ trợ hai chế độ tham số (cố định hoặc ngẫu nhiên) và ba chế độ tải của LoadGenerator:
+        vòng đóng, vòng mở tốc độ đều và vòng mở Poisson
         """
-        st.title("⏱️ Benchmark 1000 Requests")
+        st.title("⏱️ API Benchmark")
         
         # Lấy URL API từ biến môi trường hoặc sử dụng giá trị mặc định
         API_URL = os.environ.get('API_URL', 'https://thuco2tiep.onrender.com')
@@ -292,166 +299,99 @@ class MainView:
             st.info("Mỗi request sẽ sử dụng một bộ tham số ngẫu nhiên khác nhau")
             st.write("Ví dụ tham số ngẫu nhiên:", features)
         
+        # Cấu hình tải: vòng đóng (số client cố định) hoặc vòng mở (tốc độ gửi cố định)
+        st.subheader("Cấu hình tải:")
+        load_mode = st.radio(
+            "Chế độ tải",
+            list(LOAD_MODES),
+            help="Vòng mở gửi request đúng lịch bất kể server đã trả lời hay chưa; "
+                 "độ trễ được tính từ thời điểm request được lên lịch gửi"
+        )
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            n_requests = st.number_input("Số request", min_value=10, max_value=100000, value=1000, step=100)
+        with col2:
+            connections = st.number_input("Số kết nối tối đa", min_value=1, max_value=1000, value=50, step=10)
+        with col3:
+            target_rate = st.number_input(
+                "Tốc độ mục tiêu (request/giây)", min_value=1, max_value=20000, value=200, step=50,
+                disabled=LOAD_MODES[load_mode] == 'closed'
+            )
+
         # Nút kích hoạt quá trình benchmark
         if st.button("Chạy Benchmark"):
             # Tạo container cho log và thanh tiến trình
             log_container = st.empty()
             progress_bar = st.progress(0)
-            
-            # Bắt đầu đo thời gian
+            n_requests = int(n_requests)
+
+            # Tạo trước tham số của mọi request: cố định hoặc ngẫu nhiên tùy chế độ đã chọn
+            payloads = [
+                self.generate_random_features() if test_mode == "Tham số ngẫu nhiên" else features
+                for _ in range(n_requests)
+            ]
+
+            # Cập nhật thanh tiến trình và log khoảng 100 lần trong lượt chạy
             start_time = time.perf_counter()
-            
-            # Thiết lập thông số cho benchmark thực hiện 1000 request
-            n_requests = 1000
-            successful_requests = 0
-            completed_requests = 0
-            
-            # Khởi tạo benchmark utils và bắt đầu phiên benchmark mới
-            self.benchmark_utils.start_benchmark()
-            
-            # Danh sách lưu kết quả chi tiết
-            benchmark_results = []
-
-            # Hàm thực hiện một request đến API
-            def make_request():
-                try:
-                    # Tạo tham số: cố định hoặc ngẫu nhiên tùy chế độ đã chọn
-                    request_features = (
-                        self.generate_random_features() 
-                        if test_mode == "Tham số ngẫu nhiên" 
-                        else features
-                    )
-                    
-                    # Gọi API với timeout và đo thời gian
-                    req_start_time = time.perf_counter()
-                    response = requests.post(
-                        f"{API_URL}/predict",
-                        json=request_features,
-                        timeout=5  # 5 seconds timeout
-                    )
-                    req_end_time = time.perf_counter()
-                    total_time_ms = (req_end_time - req_start_time) * 1000  # ms
-                    total_time_sec = (req_end_time - req_start_time)  # seconds
-                    
-                    if response.status_code == 200:
-                        result = response.json()
-                        
-                        # Tính toán thời gian xử lý và mạng
-                        processing_time_ms = result.get('process_time_ms', 0)
-                        processing_time_sec = processing_time_ms / 1000  # Convert ms to seconds
-                        network_time_sec = total_time_sec - processing_time_sec if total_time_sec > processing_time_sec else 0
-                        
-                        # Lưu thông tin chi tiết request
-                        timing_data = {
-                            'timestamp': pd.Timestamp.now(),
-                            'total_time': total_time_sec,  # Seconds
-                            'network_time': network_time_sec,  # Seconds
-                            'processing_time': processing_time_sec,  # Seconds
-                            'prediction': result.get('prediction', 0),
-                            'status': result.get('status', 'success'),
-                            'error': None
-                        }
-                        benchmark_results.append(timing_data)
-                        
-                        # Debug thông tin request đầu tiên
-                        if completed_requests == 0:
-                            st.write("Debug - First request:", {
-                                'features': request_features,
-                                'prediction': result['prediction'],
-                                'api_process_time': f"{processing_time_sec:.3f}s ({processing_time_ms}ms)",
-                                'total_time': f"{total_time_sec:.3f}s",
-                                'network_latency': f"{network_time_sec:.3f}s"
-                            })
-                        return True
-                    else:
-                        # Lưu thông tin về request thất bại
-                        timing_data = {
-                            'timestamp': pd.Timestamp.now(),
-                            'total_time': total_time_sec,  # Seconds
-                            'network_time': 0,
-                            'processing_time': 0,
-                            'prediction': 0,
-                            'status': 'error',
-                            'error': f"HTTP {response.status_code}"
-                        }
-                        benchmark_results.append(timing_data)
-                        
-                        if completed_requests == 0:
-                            st.error(f"API Error: {response.text}")
-                        return False
-                        
-                except Exception as e:
-                    # Lưu thông tin về request lỗi
-                    timing_data = {
-                        'timestamp': pd.Timestamp.now(),
-                        'total_time': 0,
-                        'network_time': 0,
-                        'processing_time': 0,
-                        'prediction': 0,
-                        'status': 'error',
-                        'error': str(e)
-                    }
-                    benchmark_results.append(timing_data)
-                    
-                    if completed_requests == 0:
-                        st.error(f"Request Error: {str(e)}")
-                    return False
-
-            # Sử dụng ThreadPoolExecutor để gửi nhiều request đồng thời
-            with ThreadPoolExecutor(max_workers=50) as executor:
-                # Gửi tất cả request
-                future_to_request = {
-                    executor.submit(make_request): i 
-                    for i in range(n_requests)
-                }
-                
-                # Xử lý kết quả khi các request hoàn thành
-                for future in as_completed(future_to_request):
-                    completed_requests += 1
-                    if future.result():
-                        successful_requests += 1
-                    
-                    # Cập nhật thanh tiến trình
-                    progress = completed_requests / n_requests
-                    progress_bar.progress(progress)
-                    
-                    # Cập nhật log mỗi 100 request
-                    if completed_requests % 100 == 0:
-                        current_time = time.perf_counter() - start_time
-                        log_container.text(
-                            f"Đã xử lý {completed_requests}/{n_requests} requests... "
-                            f"({current_time:.1f}s)"
-                        )
-            
-            # Kết thúc đo thời gian
-            end_time = time.perf_counter()
-            total_time = end_time - start_time
-            
-            # Kết thúc phiên benchmark và lưu kết quả
-            self.benchmark_utils.end_benchmark()
-            
+
+            def on_progress(completed, total):
+                progress_bar.progress(completed / total)
+                log_container.text(
+                    f"Đã xử lý {completed}/{total} requests... "
+                    f"({time.perf_counter() - start_time:.1f}s)"
+                )
+
+            # Bộ sinh tải asyncio ghi kết quả vào benchmark_utils (bắt đầu, ghi từng request, kết thúc)
+            generator = LoadGenerator(API_URL, connections=int(connections), timeout=5.0)
+            benchmark_results = generator.run(
+                payloads,
+                mode=LOAD_MODES[load_mode],
+                concurrency=int(connections),
+                rate=float(target_rate),
+                benchmark_utils=self.benchmark_utils,
+                on_progress=on_progress
+            )
+            stats = self.benchmark_utils.get_statistics()
+            latency = stats['percentiles']['total_time']
+
+            # Debug thông tin phản hồi đầu tiên
+            first = benchmark_results.get(0)
+            if first['status'] == 'success':
+                st.write("Debug - First response:", {
+                    'prediction': first['prediction'],
+                    'api_process_time': f"{first['processing_time']:.3f}s",
+                    'total_time': f"{first['total_time']:.3f}s",
+                    'network_latency': f"{first['network_time']:.3f}s"
+                })
+            else:
+                st.error(f"API Error: {first['error']}")
+
             # Hiển thị kết quả benchmark
             st.success("Benchmark hoàn thành!")
+            target = "không giới hạn" if LOAD_MODES[load_mode] == 'closed' else f"{target_rate} requests/giây"
             st.markdown(f"""
             ### Kết quả:
             - Chế độ kiểm tra: {test_mode}
-            - Tổng thời gian: {total_time:.2f} giây
-            - Số request thành công: {successful_requests}/{n_requests}
-            - Tốc độ trung bình: {n_requests/total_time:.1f} requests/giây
+            - Chế độ tải: {load_mode}
+            - Tốc độ mục tiêu: {target}
+            - Tổng thời gian: {stats['total_time']:.2f} giây
+            - Số request thành công: {stats['successful_requests']}/{n_requests}
+            - Tốc độ trung bình: {stats['requests_per_second']:.1f} requests/giây
+            - Trễ so với lịch gửi trung bình: {stats['avg_queue_time'] * 1000:.1f} ms
+            - Độ trễ p50 / p99 / p99.9: {latency['p50'] * 1000:.1f} / {latency['p99'] * 1000:.1f} / {latency['p99.9'] * 1000:.1f} ms
             """)
-            
+
+            # Phân vị độ trễ từ histogram của benchmark_utils (ms)
+            st.markdown("### Phân vị độ trễ (ms):")
+            st.dataframe(self.benchmark_utils.get_percentiles_df().round(2), use_container_width=True)
+            st.pyplot(self.benchmark_utils.plot_percentiles())
+
             # Hiển thị bảng kết quả chi tiết từ benchmark_utils
             st.markdown("### Bảng chi tiết kết quả benchmark:")
             
-            # Lưu kết quả vào đối tượng benchmark_utils
-            self.benchmark_utils.results = benchmark_results
-            
-            # Sử dụng hàm get_results_df để lấy DataFrame kết quả
-            results_df = self.benchmark_utils.get_results_df()
-            
-            # Lấy mẫu để hiển thị (tối đa 100 dòng)
-            if len(results_df) > 100:
-                results_df = results_df.sample(n=100).sort_values('request_number')
+            # Lấy DataFrame kết quả, chỉ gồm mẫu để hiển thị (tối đa 100 dòng)
+            results_df = self.benchmark_utils.get_results_df(sample=100)
+            if len(benchmark_results) > 100:
                 st.info(f"Hiển thị 100 mẫu ngẫu nhiên từ tổng số {len(benchmark_results)} requests")
             
             # Thêm thông tin về đơn vị đo